@@ -10,18 +10,57 @@ export function setToken(token: string) {
   localStorage.setItem('token', token);
 }
 
-export async function api(path: string, options: RequestInit = {}) {
+// Last response per GET path, revalidated with If-None-Match so unchanged lists come back as an empty 304
+const etagCache = new Map<string, { etag: string; body: unknown; headers: Headers }>();
+
+// Largest page the list endpoints serve (PAGE_MAX_LIMIT)
+const PAGE_LIMIT = 1000;
+
+async function request(path: string, options: RequestInit = {}): Promise<{ body: any; headers: Headers }> {
   const headers = new Headers(options.headers || {});
   headers.set('Content-Type', 'application/json');
   const token = getToken();
   if (token) headers.set('Authorization', `Bearer ${token}`);
+  const isGet = !options.method || options.method.toUpperCase() === 'GET';
+  const cached = isGet ? etagCache.get(path) : undefined;
+  if (cached) headers.set('If-None-Match', cached.etag);
 
   const res = await fetch(`${API_BASE}${path}`, { ...options, headers });
+  if (res.status === 304 && cached) return { body: cached.body, headers: cached.headers };
   if (!res.ok) {
     const text = await res.text();
     throw new Error(text || `HTTP ${res.status}`);
   }
   const contentType = res.headers.get('content-type') || '';
-  if (contentType.includes('application/json')) return res.json();
-  return res.text();
+  const body = contentType.includes('application/json') ? await res.json() : await res.text();
+  const etag = res.headers.get('ETag');
+  if (isGet && etag) etagCache.set(path, { etag, body, headers: res.headers });
+  return { body, headers: res.headers };
+}
+
+export async function api(path: string, options: RequestInit = {}) {
+  return (await request(path, options)).body;
+}
+
+function withQuery(path: string, query: string): string {
+  return `${path}${path.includes('?') ? '&' : '?'}${query}`;
+}
+
+// Every row of a list endpoint: lists come one page at a time, the next page's cursor in X-Next-Cursor
+export async function apiAll(path: string): Promise<any[]> {
+  const rows: any[] = [];
+  let next = withQuery(path, `limit=${PAGE_LIMIT}`);
+  for (;;) {
+    const { body, headers } = await request(next);
+    rows.push(...body);
+    const cursor = headers.get('X-Next-Cursor');
+    if (!cursor) return rows;
+    next = withQuery(path, `limit=${PAGE_LIMIT}&after=${encodeURIComponent(cursor)}`);
+  }
+}
+
+// How many rows a list endpoint has, without fetching them (an estimate for large unfiltered tables on PostgreSQL)
+export async function apiCount(path: string): Promise<number> {
+  const { headers } = await request(withQuery(path, 'limit=1&count=1'));
+  return Number(headers.get('X-Total-Count') || 0);
 }
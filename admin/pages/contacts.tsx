@@ -1,6 +1,6 @@
 import Layout from '../components/Layout'
 import { FormEvent, useEffect, useState } from 'react'
-import { api } from '../lib/api'
+import { api, apiAll } from '../lib/api'
 
 type Contact = { id: number; name: string; email?: string; phone?: string; company?: string }
 
@@ -10,9 +10,13 @@ export default function ContactsPage() {
   const [email, setEmail] = useState('')
   const [phone, setPhone] = useState('')
   const [company, setCompany] = useState('')
+  const [query, setQuery] = useState('')
 
-  async function load() {
-    const data = await api('/contacts/')
+  async function load(q: string = query) {
+    // The search endpoint needs a word of three or more characters
+    const data = q.trim().length >= 3
+      ? await api(`/contacts/search?q=${encodeURIComponent(q.trim())}`)
+      : await apiAll('/contacts/')
     setItems(data)
   }
 
@@ -23,7 +27,10 @@ export default function ContactsPage() {
     await load()
   }
 
-  useEffect(() => { load() }, [])
+  useEffect(() => {
+    const timer = setTimeout(() => load(query), 250)
+    return () => clearTimeout(timer)
+  }, [query])
 
   return (
     <Layout title="Contacts" subtitle="Manage your customer and partner relationships">
@@ -55,7 +62,10 @@ export default function ContactsPage() {
       </div>
 
       <div className="card">
-        <div className="card-header">All Contacts ({items.length})</div>
+        <div className="card-header">{query.trim().length >= 3 ? 'Matching' : 'All'} Contacts ({items.length})</div>
+        <div className="form-group">
+          <input value={query} onChange={e=>setQuery(e.target.value)} placeholder="Search by name, email, company or phone" />
+        </div>
         {items.length > 0 ? (
           <div className="table-container">
             <table>
@@ -1,6 +1,6 @@
 import Layout from '../components/Layout'
 import { useEffect, useState } from 'react'
-import { api } from '../lib/api'
+import { api, apiCount } from '../lib/api'
 
 export default function DashboardPage() {
   const [stats, setStats] = useState({
@@ -12,6 +12,7 @@ export default function DashboardPage() {
     projects: 0,
   })
   const [recentActivity, setRecentActivity] = useState<any[]>([])
+  const [pipeline, setPipeline] = useState<any>({ stages: [], total: { count: 0, sum: 0, average: 0 } })
 
   useEffect(() => {
     loadDashboard()
@@ -19,25 +20,28 @@ export default function DashboardPage() {
 
   async function loadDashboard() {
     try {
-      const [contacts, deals, products, orders, invoices, projects] = await Promise.all([
-        api('/contacts/').catch(() => []),
-        api('/deals/').catch(() => []),
-        api('/inventory/').catch(() => []),
-        api('/sales/').catch(() => []),
-        api('/invoices/').catch(() => []),
-        api('/projects/').catch(() => []),
+      // Totals are counted by the server (X-Total-Count); lists only send one page at a time
+      const [contacts, summary, recentDeals, products, orders, invoices, projects] = await Promise.all([
+        apiCount('/contacts/').catch(() => 0),
+        api('/deals/pipeline').catch(() => null),
+        api('/deals/?limit=5').catch(() => []),
+        apiCount('/inventory/').catch(() => 0),
+        apiCount('/sales/').catch(() => 0),
+        apiCount('/invoices/').catch(() => 0),
+        apiCount('/projects/').catch(() => 0),
       ])
       setStats({
-        contacts: contacts.length,
-        deals: deals.length,
-        products: products.length,
-        orders: orders.length,
-        invoices: invoices.length,
-        projects: projects.length,
+        contacts,
+        deals: summary ? summary.total.count : 0,
+        products,
+        orders,
+        invoices,
+        projects,
       })
       
-      // Recent activity (last 5 deals)
-      setRecentActivity(deals.slice(0, 5))
+      if (summary) setPipeline(summary)
+      // Recent activity (last 5 deals; lists come newest first)
+      setRecentActivity(recentDeals)
     } catch (err) {
       console.error('Failed to load dashboard', err)
     }
@@ -72,6 +76,39 @@ export default function DashboardPage() {
         </div>
       </div>
 
+      <div className="card">
+        <div className="card-header">Deal Pipeline · ${pipeline.total.sum}</div>
+        {pipeline.stages.length > 0 ? (
+          <div className="table-container">
+            <table>
+              <thead>
+                <tr>
+                  <th>Stage</th>
+                  <th>Deals</th>
+                  <th>Total</th>
+                  <th>Average</th>
+                </tr>
+              </thead>
+              <tbody>
+                {pipeline.stages.map((s: any) => (
+                  <tr key={s.stage ?? ''}>
+                    <td>{s.stage ?? 'No stage'}</td>
+                    <td>{s.count}</td>
+                    <td>${s.sum}</td>
+                    <td>${s.average}</td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+          </div>
+        ) : (
+          <div className="empty-state">
+            <div className="empty-state-icon">💼</div>
+            <p>No deals in the pipeline yet</p>
+          </div>
+        )}
+      </div>
+
       <div className="card">
         <div className="card-header">Recent Deals</div>
         {recentActivity.length > 0 ? (
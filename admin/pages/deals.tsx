@@ -1,6 +1,6 @@
 import Layout from '../components/Layout'
 import { FormEvent, useEffect, useState } from 'react'
-import { api } from '../lib/api'
+import { api, apiAll } from '../lib/api'
 
 type Deal = { id: number; title: string; amount: number; stage?: string; contact_id?: number }
 type Contact = { id: number; name: string }
@@ -15,8 +15,8 @@ export default function DealsPage() {
 
   async function load() {
     const [ds, cs] = await Promise.all([
-      api('/deals/'),
-      api('/contacts/'),
+      apiAll('/deals/'),
+      apiAll('/contacts/'),
     ])
     setItems(ds)
     setContacts(cs)
@@ -1,6 +1,6 @@
 import Layout from '../components/Layout'
 import { FormEvent, useEffect, useState } from 'react'
-import { api } from '../lib/api'
+import { api, apiAll } from '../lib/api'
 
 type Product = { id: number; name: string; sku: string; description?: string; price: number; stock: number }
 
@@ -13,7 +13,7 @@ export default function InventoryPage() {
   const [stock, setStock] = useState('0')
 
   async function load() {
-    const data = await api('/inventory/')
+    const data = await apiAll('/inventory/')
     setItems(data)
   }
 
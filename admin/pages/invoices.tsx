@@ -1,6 +1,6 @@
 import Layout from '../components/Layout'
 import { FormEvent, useEffect, useState } from 'react'
-import { api } from '../lib/api'
+import { api, apiAll } from '../lib/api'
 
 type Invoice = {
   id: number
@@ -33,9 +33,9 @@ export default function InvoicesPage() {
 
   async function load() {
     const [invoices, orders, cs] = await Promise.all([
-      api('/invoices/').catch(() => []),
-      api('/sales/').catch(() => []),
-      api('/contacts/').catch(() => []),
+      apiAll('/invoices/').catch(() => []),
+      apiAll('/sales/').catch(() => []),
+      apiAll('/contacts/').catch(() => []),
     ])
     setItems(invoices)
     setSaleOrders(orders)
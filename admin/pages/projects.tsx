@@ -1,6 +1,6 @@
 import Layout from '../components/Layout'
 import { FormEvent, useEffect, useState } from 'react'
-import { api } from '../lib/api'
+import { api, apiAll } from '../lib/api'
 
 type Project = {
   id: number
@@ -28,8 +28,8 @@ export default function ProjectsPage() {
 
   async function load() {
     const [projects, cs] = await Promise.all([
-      api('/projects/').catch(() => []),
-      api('/contacts/').catch(() => []),
+      apiAll('/projects/').catch(() => []),
+      apiAll('/contacts/').catch(() => []),
     ])
     setItems(projects)
     setContacts(cs)
@@ -1,6 +1,6 @@
 import Layout from '../components/Layout'
 import { FormEvent, useEffect, useState } from 'react'
-import { api } from '../lib/api'
+import { api, apiAll } from '../lib/api'
 
 type SaleOrder = { id: number; order_number: string; contact_id?: number; status: string; total: number }
 type Contact = { id: number; name: string }
@@ -15,8 +15,8 @@ export default function SalesPage() {
 
   async function load() {
     const [orders, cs] = await Promise.all([
-      api('/sales/'),
-      api('/contacts/'),
+      apiAll('/sales/'),
+      apiAll('/contacts/'),
     ])
     setItems(orders)
     setContacts(cs)
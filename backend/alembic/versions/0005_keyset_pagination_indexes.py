@@ -0,0 +1,42 @@
+"""composite (sort key, id) indexes for keyset pagination
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+# hr and accounting tables are created by the FastAPI app (create_all), not by
+# earlier revisions, so only index the ones that exist
+INDEXES = [
+    ('ix_attendance_date_id', 'attendance', ['date', 'id']),
+    ('ix_leave_request_created_at_id', 'leave_request', ['created_at', 'id']),
+    ('ix_journal_entry_posted_at_id', 'journal_entry', ['posted_at', 'id']),
+]
+
+
+def _present():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        if inspector.has_table(table):
+            yield name, table, columns, name in {ix['name'] for ix in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    for name, table, columns, indexed in list(_present()):
+        if not indexed:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, columns, indexed in list(_present()):
+        if indexed:
+            op.drop_index(name, table_name=table)
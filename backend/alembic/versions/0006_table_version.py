@@ -0,0 +1,35 @@
+"""table_version change counters for ETags
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+# Tables served with ETags; the app upserts missing rows on SQLite/Postgres,
+# seeding them keeps other backends (plain UPDATE) working too
+TABLES = [
+    'contact', 'deal', 'product', 'sale_order', 'order_item', 'invoice', 'invoice_item', 'project', 'task',
+    'department', 'employee', 'attendance', 'leave_request', 'account', 'currency', 'journal_entry', 'journal_line',
+]
+
+
+def upgrade() -> None:
+    table = op.create_table(
+        'table_version',
+        sa.Column('table_name', sa.String(length=64), primary_key=True),
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+    op.bulk_insert(table, [{'table_name': name, 'version': 0} for name in TABLES])
+
+
+def downgrade() -> None:
+    op.drop_table('table_version')
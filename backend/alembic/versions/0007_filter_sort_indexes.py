@@ -0,0 +1,56 @@
+"""composite (column, id) indexes backing list filters and sorts
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+# One index per filterable/sortable column declared in app.filters; a list
+# endpoint refuses any filter these do not back
+INDEXES = [
+    ('ix_deal_stage_id', 'deal', ['stage', 'id']),
+    ('ix_deal_contact_id_id', 'deal', ['contact_id', 'id']),
+    ('ix_deal_amount_id', 'deal', ['amount', 'id']),
+    ('ix_product_price_id', 'product', ['price', 'id']),
+    ('ix_product_stock_id', 'product', ['stock', 'id']),
+    ('ix_sale_order_status_id', 'sale_order', ['status', 'id']),
+    ('ix_sale_order_contact_id_id', 'sale_order', ['contact_id', 'id']),
+    ('ix_sale_order_total_id', 'sale_order', ['total', 'id']),
+    ('ix_invoice_status_id', 'invoice', ['status', 'id']),
+    ('ix_invoice_contact_id_id', 'invoice', ['contact_id', 'id']),
+    ('ix_invoice_invoice_date_id', 'invoice', ['invoice_date', 'id']),
+    ('ix_invoice_due_date_id', 'invoice', ['due_date', 'id']),
+    ('ix_invoice_total_id', 'invoice', ['total', 'id']),
+    ('ix_project_status_id', 'project', ['status', 'id']),
+    ('ix_project_contact_id_id', 'project', ['contact_id', 'id']),
+    ('ix_task_project_id_status_id', 'task', ['project_id', 'status', 'id']),
+    ('ix_task_project_id_due_date_id', 'task', ['project_id', 'due_date', 'id']),
+]
+
+
+def _present():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        if inspector.has_table(table):
+            yield name, table, columns, name in {ix['name'] for ix in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    for name, table, columns, indexed in list(_present()):
+        if not indexed:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, columns, indexed in list(_present()):
+        if indexed:
+            op.drop_index(name, table_name=table)
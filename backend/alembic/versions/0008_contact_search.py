@@ -0,0 +1,65 @@
+"""contact search index: FTS5 trigram table (SQLite) or pg_trgm GiST (Postgres)
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+DOCUMENT = (
+    "lower(coalesce(name, '') || ' ' || coalesce(email, '') || ' ' "
+    "|| coalesce(company, '') || ' ' || coalesce(phone, ''))"
+)
+
+# Kept in step with app.models.contact.SEARCH_DDL; the FTS5 `trigram`
+# tokenizer needs SQLite 3.34+
+UPGRADE = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS contact_fts USING fts5("
+        "name, email, company, phone, content='contact', content_rowid='id', tokenize='trigram')",
+        "CREATE TRIGGER IF NOT EXISTS contact_fts_ai AFTER INSERT ON contact BEGIN "
+        "INSERT INTO contact_fts(rowid, name, email, company, phone) "
+        "VALUES (new.id, new.name, new.email, new.company, new.phone); END",
+        "CREATE TRIGGER IF NOT EXISTS contact_fts_ad AFTER DELETE ON contact BEGIN "
+        "INSERT INTO contact_fts(contact_fts, rowid, name, email, company, phone) "
+        "VALUES ('delete', old.id, old.name, old.email, old.company, old.phone); END",
+        "CREATE TRIGGER IF NOT EXISTS contact_fts_au AFTER UPDATE OF name, email, company, phone ON contact BEGIN "
+        "INSERT INTO contact_fts(contact_fts, rowid, name, email, company, phone) "
+        "VALUES ('delete', old.id, old.name, old.email, old.company, old.phone); "
+        "INSERT INTO contact_fts(rowid, name, email, company, phone) "
+        "VALUES (new.id, new.name, new.email, new.company, new.phone); END",
+        "INSERT INTO contact_fts(contact_fts) VALUES ('rebuild')",
+    ],
+    'postgresql': [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        f"CREATE INDEX IF NOT EXISTS ix_contact_search_trgm ON contact USING gist (({DOCUMENT}) gist_trgm_ops)",
+    ],
+}
+DOWNGRADE = {
+    'sqlite': [
+        "DROP TRIGGER IF EXISTS contact_fts_au",
+        "DROP TRIGGER IF EXISTS contact_fts_ad",
+        "DROP TRIGGER IF EXISTS contact_fts_ai",
+        "DROP TABLE IF EXISTS contact_fts",
+    ],
+    'postgresql': [
+        "DROP INDEX IF EXISTS ix_contact_search_trgm",
+    ],
+}
+
+
+def upgrade() -> None:
+    for statement in UPGRADE.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for statement in DOWNGRADE.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
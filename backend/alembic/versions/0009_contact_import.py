@@ -0,0 +1,39 @@
+"""contact_import jobs and the lower(email) index bulk import dedupes on
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'contact_import',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('format', sa.String(length=16), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('processed', sa.Integer(), nullable=False),
+        sa.Column('inserted', sa.Integer(), nullable=False),
+        sa.Column('duplicates', sa.Integer(), nullable=False),
+        sa.Column('failed', sa.Integer(), nullable=False),
+        sa.Column('errors', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_contact_import_id', 'contact_import', ['id'])
+    op.create_index('ix_contact_email_lower', 'contact', [sa.text('lower(email)')])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contact_email_lower', table_name='contact')
+    op.drop_index('ix_contact_import_id', table_name='contact_import')
+    op.drop_table('contact_import')
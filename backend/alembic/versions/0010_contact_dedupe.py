@@ -0,0 +1,64 @@
+"""contact dedupe: blocking keys, merge candidates and scan runs
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'contact_block',
+        sa.Column('key', sa.String(length=160), primary_key=True),
+        sa.Column('contact_id', sa.Integer(), primary_key=True),
+    )
+    op.create_index('ix_contact_block_contact_id', 'contact_block', ['contact_id'])
+
+    op.create_table(
+        'contact_duplicate',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('contact_id', sa.Integer(), nullable=False),
+        sa.Column('duplicate_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('signals', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint('contact_id', 'duplicate_id', name='uq_contact_duplicate_pair'),
+    )
+    op.create_index('ix_contact_duplicate_id', 'contact_duplicate', ['id'])
+    op.create_index('ix_contact_duplicate_contact_id', 'contact_duplicate', ['contact_id'])
+    op.create_index('ix_contact_duplicate_duplicate_id', 'contact_duplicate', ['duplicate_id'])
+    op.create_index('ix_contact_duplicate_status_score_id', 'contact_duplicate', ['status', 'score', 'id'])
+
+    op.create_table(
+        'contact_dedupe_run',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('last_contact_id', sa.Integer(), nullable=False),
+        sa.Column('scanned', sa.Integer(), nullable=False),
+        sa.Column('candidates', sa.Integer(), nullable=False),
+        sa.Column('error', sa.String(length=500), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_contact_dedupe_run_id', 'contact_dedupe_run', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contact_dedupe_run_id', table_name='contact_dedupe_run')
+    op.drop_table('contact_dedupe_run')
+    for name in ('ix_contact_duplicate_status_score_id', 'ix_contact_duplicate_duplicate_id',
+                 'ix_contact_duplicate_contact_id', 'ix_contact_duplicate_id'):
+        op.drop_index(name, table_name='contact_duplicate')
+    op.drop_table('contact_duplicate')
+    op.drop_index('ix_contact_block_contact_id', table_name='contact_block')
+    op.drop_table('contact_block')
@@ -0,0 +1,101 @@
+"""deal_stage_summary for /deals/pipeline, maintained by triggers on deal
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+# Kept in step with app.models.deal.PIPELINE_DDL; the last three statements
+# fill the summary from the deals already there
+TRIGGERS = {
+    'sqlite': [
+        "CREATE TRIGGER IF NOT EXISTS deal_stage_summary_ai AFTER INSERT ON deal BEGIN INSERT OR IGNORE "
+        "INTO deal_stage_summary (contact_id, stage, deals, amount) SELECT scope, coalesce(new.stage, "
+        "''), 0, 0 FROM (SELECT 0 AS scope UNION ALL SELECT new.contact_id) WHERE scope IS NOT NULL; "
+        "UPDATE deal_stage_summary SET deals = deals + 1, amount = amount + new.amount WHERE stage = "
+        "coalesce(new.stage, '') AND contact_id IN (0, new.contact_id); END",
+        "CREATE TRIGGER IF NOT EXISTS deal_stage_summary_ad AFTER DELETE ON deal BEGIN UPDATE "
+        "deal_stage_summary SET deals = deals - 1, amount = amount - old.amount WHERE stage = "
+        "coalesce(old.stage, '') AND contact_id IN (0, old.contact_id); DELETE FROM deal_stage_summary "
+        "WHERE stage = coalesce(old.stage, '') AND contact_id IN (0, old.contact_id) AND deals = 0; END",
+        "CREATE TRIGGER IF NOT EXISTS deal_stage_summary_au AFTER UPDATE OF stage, amount, contact_id ON "
+        "deal BEGIN UPDATE deal_stage_summary SET deals = deals - 1, amount = amount - old.amount WHERE "
+        "stage = coalesce(old.stage, '') AND contact_id IN (0, old.contact_id); DELETE FROM "
+        "deal_stage_summary WHERE stage = coalesce(old.stage, '') AND contact_id IN (0, old.contact_id) "
+        "AND deals = 0; INSERT OR IGNORE INTO deal_stage_summary (contact_id, stage, deals, amount) "
+        "SELECT scope, coalesce(new.stage, ''), 0, 0 FROM (SELECT 0 AS scope UNION ALL SELECT "
+        "new.contact_id) WHERE scope IS NOT NULL; UPDATE deal_stage_summary SET deals = deals + 1, "
+        "amount = amount + new.amount WHERE stage = coalesce(new.stage, '') AND contact_id IN (0, "
+        "new.contact_id); END",
+        "DELETE FROM deal_stage_summary",
+        "INSERT INTO deal_stage_summary (contact_id, stage, deals, amount) SELECT 0, coalesce(stage, "
+        "''), count(*), sum(amount) FROM deal GROUP BY coalesce(stage, '')",
+        "INSERT INTO deal_stage_summary (contact_id, stage, deals, amount) SELECT contact_id, "
+        "coalesce(stage, ''), count(*), sum(amount) FROM deal WHERE contact_id IS NOT NULL GROUP BY "
+        "contact_id, coalesce(stage, '')",
+    ],
+    'postgresql': [
+        "CREATE OR REPLACE FUNCTION deal_stage_summary_apply(scope integer, stage_ text, deals_ integer, "
+        "amount_ numeric) RETURNS void AS $$ BEGIN INSERT INTO deal_stage_summary AS s (contact_id, "
+        "stage, deals, amount) VALUES (scope, stage_, deals_, amount_) ON CONFLICT (contact_id, stage) "
+        "DO UPDATE SET deals = s.deals + excluded.deals, amount = s.amount + excluded.amount; DELETE "
+        "FROM deal_stage_summary WHERE contact_id = scope AND stage = stage_ AND deals = 0; END $$ "
+        "LANGUAGE plpgsql",
+        "CREATE OR REPLACE FUNCTION deal_stage_summary_track() RETURNS trigger AS $$ BEGIN IF TG_OP IN "
+        "('UPDATE', 'DELETE') THEN PERFORM deal_stage_summary_apply(0, coalesce(OLD.stage, ''), -1, "
+        "-OLD.amount); IF OLD.contact_id IS NOT NULL THEN PERFORM "
+        "deal_stage_summary_apply(OLD.contact_id, coalesce(OLD.stage, ''), -1, -OLD.amount); END IF; END "
+        "IF; IF TG_OP IN ('INSERT', 'UPDATE') THEN PERFORM deal_stage_summary_apply(0, "
+        "coalesce(NEW.stage, ''), 1, NEW.amount); IF NEW.contact_id IS NOT NULL THEN PERFORM "
+        "deal_stage_summary_apply(NEW.contact_id, coalesce(NEW.stage, ''), 1, NEW.amount); END IF; END "
+        "IF; RETURN NULL; END $$ LANGUAGE plpgsql",
+        "DROP TRIGGER IF EXISTS deal_stage_summary_track ON deal",
+        "CREATE TRIGGER deal_stage_summary_track AFTER INSERT OR DELETE OR UPDATE OF stage, amount, "
+        "contact_id ON deal FOR EACH ROW EXECUTE FUNCTION deal_stage_summary_track()",
+        "DELETE FROM deal_stage_summary",
+        "INSERT INTO deal_stage_summary (contact_id, stage, deals, amount) SELECT 0, coalesce(stage, "
+        "''), count(*), sum(amount) FROM deal GROUP BY coalesce(stage, '')",
+        "INSERT INTO deal_stage_summary (contact_id, stage, deals, amount) SELECT contact_id, "
+        "coalesce(stage, ''), count(*), sum(amount) FROM deal WHERE contact_id IS NOT NULL GROUP BY "
+        "contact_id, coalesce(stage, '')",
+    ],
+}
+DOWNGRADE = {
+    'sqlite': [
+        "DROP TRIGGER IF EXISTS deal_stage_summary_au",
+        "DROP TRIGGER IF EXISTS deal_stage_summary_ad",
+        "DROP TRIGGER IF EXISTS deal_stage_summary_ai",
+    ],
+    'postgresql': [
+        "DROP TRIGGER IF EXISTS deal_stage_summary_track ON deal",
+        "DROP FUNCTION IF EXISTS deal_stage_summary_track()",
+        "DROP FUNCTION IF EXISTS deal_stage_summary_apply(integer, text, integer, numeric)",
+    ],
+}
+
+
+def upgrade() -> None:
+    op.create_table(
+        'deal_stage_summary',
+        sa.Column('contact_id', sa.Integer(), primary_key=True),
+        sa.Column('stage', sa.String(length=50), primary_key=True),
+        sa.Column('deals', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Numeric(16, 2), nullable=False),
+    )
+    for statement in TRIGGERS.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for statement in DOWNGRADE.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+    op.drop_table('deal_stage_summary')
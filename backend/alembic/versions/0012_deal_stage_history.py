@@ -0,0 +1,115 @@
+"""deal stage history: the stage-change log, its rollups and compaction runs
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+# Kept in step with app.models.deal_history.HISTORY_DDL; the last statement
+# records every existing deal as entering its current stage now
+TRIGGERS = {
+    'sqlite': [
+        "CREATE TRIGGER IF NOT EXISTS deal_stage_event_ai AFTER INSERT ON deal BEGIN INSERT INTO "
+        "deal_stage_event (deal_id, from_stage, to_stage, amount, changed_at) VALUES (new.id, NULL, "
+        "new.stage, new.amount, strftime('%Y-%m-%d %H:%M:%f', 'now')); END",
+        "CREATE TRIGGER IF NOT EXISTS deal_stage_event_au AFTER UPDATE OF stage ON deal WHEN old.stage "
+        "IS NOT new.stage BEGIN INSERT INTO deal_stage_event (deal_id, from_stage, to_stage, amount, "
+        "changed_at) VALUES (new.id, old.stage, new.stage, new.amount, strftime('%Y-%m-%d %H:%M:%f', "
+        "'now')); END",
+        "INSERT INTO deal_stage_event (deal_id, from_stage, to_stage, amount, changed_at) SELECT id, "
+        "NULL, stage, amount, strftime('%Y-%m-%d %H:%M:%f', 'now') FROM deal ORDER BY id",
+    ],
+    'postgresql': [
+        "CREATE OR REPLACE FUNCTION deal_stage_event_log() RETURNS trigger AS $$ DECLARE from_stage_ "
+        "text; BEGIN IF TG_OP = 'UPDATE' THEN from_stage_ := OLD.stage; END IF; INSERT INTO "
+        "deal_stage_event (deal_id, from_stage, to_stage, amount, changed_at) VALUES (NEW.id, "
+        "from_stage_, NEW.stage, NEW.amount, clock_timestamp()); RETURN NULL; END $$ LANGUAGE plpgsql",
+        "DROP TRIGGER IF EXISTS deal_stage_event_ai ON deal",
+        "CREATE TRIGGER deal_stage_event_ai AFTER INSERT ON deal FOR EACH ROW EXECUTE FUNCTION "
+        "deal_stage_event_log()",
+        "DROP TRIGGER IF EXISTS deal_stage_event_au ON deal",
+        "CREATE TRIGGER deal_stage_event_au AFTER UPDATE OF stage ON deal FOR EACH ROW WHEN (OLD.stage "
+        "IS DISTINCT FROM NEW.stage) EXECUTE FUNCTION deal_stage_event_log()",
+        "INSERT INTO deal_stage_event (deal_id, from_stage, to_stage, amount, changed_at) SELECT id, "
+        "NULL, stage, amount, now() FROM deal ORDER BY id",
+    ],
+}
+DOWNGRADE = {
+    'sqlite': [
+        "DROP TRIGGER IF EXISTS deal_stage_event_au",
+        "DROP TRIGGER IF EXISTS deal_stage_event_ai",
+    ],
+    'postgresql': [
+        "DROP TRIGGER IF EXISTS deal_stage_event_au ON deal",
+        "DROP TRIGGER IF EXISTS deal_stage_event_ai ON deal",
+        "DROP FUNCTION IF EXISTS deal_stage_event_log()",
+    ],
+}
+
+
+def upgrade() -> None:
+    op.create_table(
+        'deal_stage_event',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('deal_id', sa.Integer(), nullable=False),
+        sa.Column('from_stage', sa.String(length=50), nullable=True),
+        sa.Column('to_stage', sa.String(length=50), nullable=True),
+        sa.Column('amount', sa.Numeric(12, 2), nullable=False),
+        sa.Column('changed_at', sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index('ix_deal_stage_event_id', 'deal_stage_event', ['id'])
+    op.create_index('ix_deal_stage_event_deal_id_id', 'deal_stage_event', ['deal_id', 'id'])
+
+    op.create_table(
+        'deal_stage_rollup',
+        sa.Column('stage', sa.String(length=50), primary_key=True),
+        sa.Column('entered', sa.Integer(), nullable=False),
+        sa.Column('entered_amount', sa.Numeric(16, 2), nullable=False),
+        sa.Column('entered_age', sa.Float(), nullable=False),
+        sa.Column('exited', sa.Integer(), nullable=False),
+        sa.Column('converted', sa.Integer(), nullable=False),
+        sa.Column('stay_seconds', sa.Float(), nullable=False),
+    )
+    op.create_table(
+        'deal_stage_duration',
+        sa.Column('stage', sa.String(length=50), primary_key=True),
+        sa.Column('bucket', sa.Integer(), primary_key=True),
+        sa.Column('stays', sa.Integer(), nullable=False),
+    )
+
+    op.create_table(
+        'deal_stage_compaction',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('last_event_id', sa.Integer(), nullable=False),
+        sa.Column('events', sa.Integer(), nullable=False),
+        sa.Column('stays', sa.Integer(), nullable=False),
+        sa.Column('error', sa.String(length=500), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_deal_stage_compaction_id', 'deal_stage_compaction', ['id'])
+
+    for statement in TRIGGERS.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for statement in DOWNGRADE.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+    op.drop_index('ix_deal_stage_compaction_id', table_name='deal_stage_compaction')
+    op.drop_table('deal_stage_compaction')
+    op.drop_table('deal_stage_duration')
+    op.drop_table('deal_stage_rollup')
+    op.drop_index('ix_deal_stage_event_deal_id_id', table_name='deal_stage_event')
+    op.drop_index('ix_deal_stage_event_id', table_name='deal_stage_event')
+    op.drop_table('deal_stage_event')
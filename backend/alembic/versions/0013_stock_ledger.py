@@ -0,0 +1,56 @@
+"""stock ledger: stock movements and per-product snapshots
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'stock_movement',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('reference', sa.String(length=100), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index('ix_stock_movement_id', 'stock_movement', ['id'])
+    op.create_index('ix_stock_movement_product_id_id', 'stock_movement', ['product_id', 'id'])
+
+    op.create_table(
+        'stock_snapshot',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('movement_id', sa.Integer(), nullable=False),
+        sa.Column('on_hand', sa.Integer(), nullable=False),
+        sa.Column('taken_at', sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index('ix_stock_snapshot_id', 'stock_snapshot', ['id'])
+    op.create_index('ix_stock_snapshot_product_id_taken_at', 'stock_snapshot', ['product_id', 'taken_at'])
+
+    # The ledger starts from the stock on hand now
+    op.execute(
+        "INSERT INTO stock_movement (product_id, kind, quantity, reference, created_at) "
+        "SELECT id, 'adjustment', stock, 'opening balance', CURRENT_TIMESTAMP FROM product "
+        "WHERE stock <> 0 ORDER BY id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_stock_snapshot_product_id_taken_at', table_name='stock_snapshot')
+    op.drop_index('ix_stock_snapshot_id', table_name='stock_snapshot')
+    op.drop_table('stock_snapshot')
+    op.drop_index('ix_stock_movement_product_id_id', table_name='stock_movement')
+    op.drop_index('ix_stock_movement_id', table_name='stock_movement')
+    op.drop_table('stock_movement')
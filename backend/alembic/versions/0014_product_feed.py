@@ -0,0 +1,38 @@
+"""product_feed jobs for bulk product upserts
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0014'
+down_revision = '0013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'product_feed',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('format', sa.String(length=16), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('processed', sa.Integer(), nullable=False),
+        sa.Column('inserted', sa.Integer(), nullable=False),
+        sa.Column('updated', sa.Integer(), nullable=False),
+        sa.Column('unchanged', sa.Integer(), nullable=False),
+        sa.Column('failed', sa.Integer(), nullable=False),
+        sa.Column('errors', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_product_feed_id', 'product_feed', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_feed_id', table_name='product_feed')
+    op.drop_table('product_feed')
@@ -0,0 +1,41 @@
+"""NOT NULL on the DateTime keyset-pagination keys
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0015'
+down_revision = '0014'
+branch_labels = None
+depends_on = None
+
+# Like 0005: hr and accounting tables are created by the FastAPI app (create_all)
+KEYS = [
+    ('leave_request', 'created_at'),
+    ('journal_entry', 'posted_at'),
+]
+
+
+def _present():
+    inspector = sa.inspect(op.get_bind())
+    return [(table, column) for table, column in KEYS if inspector.has_table(table)]
+
+
+def upgrade() -> None:
+    for table, column in _present():
+        op.execute(f"UPDATE {table} SET {column} = CURRENT_TIMESTAMP WHERE {column} IS NULL")
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.DateTime(timezone=True), nullable=False,
+                                  existing_server_default=sa.func.now())
+
+
+def downgrade() -> None:
+    for table, column in _present():
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.DateTime(timezone=True), nullable=True,
+                                  existing_server_default=sa.func.now())
@@ -0,0 +1,37 @@
+"""batch_job positions, claimed by each batch of the dedupe scan and stage compaction
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0016'
+down_revision = '0015'
+branch_labels = None
+depends_on = None
+
+# Each job starts where its furthest run got to; the app inserts missing rows
+# on SQLite/Postgres, seeding them keeps other backends working too
+JOBS = [
+    ('contact-dedupe', 'contact_dedupe_run', 'last_contact_id'),
+    ('deal-stage-compaction', 'deal_stage_compaction', 'last_event_id'),
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        'batch_job',
+        sa.Column('name', sa.String(length=50), primary_key=True),
+        sa.Column('position', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    for name, runs, position in JOBS:
+        op.execute(f"INSERT INTO batch_job (name, position) SELECT '{name}', COALESCE(MAX({position}), 0) FROM {runs}")
+
+
+def downgrade() -> None:
+    op.drop_table('batch_job')
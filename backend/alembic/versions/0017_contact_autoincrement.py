@@ -0,0 +1,63 @@
+"""contact ids never given out again: AUTOINCREMENT on SQLite
+
+Revision ID: 0017
+Revises: 0016
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0017'
+down_revision = '0016'
+branch_labels = None
+depends_on = None
+
+# Without AUTOINCREMENT SQLite hands out the highest id again once that
+# contact is deleted (a merge), below the dedupe scan's position. Postgres
+# ids come from a sequence and are never reused.
+#
+# SQLite cannot add AUTOINCREMENT to a table, so `contact` is rebuilt: its
+# indexes and the search triggers (0008) are recreated from their own DDL,
+# and the sequence starts past every id the dedupe tables have seen.
+SEEN = (
+    "SELECT MAX(id) FROM ("
+    "SELECT MAX(id) AS id FROM contact "
+    "UNION ALL SELECT MAX(duplicate_id) FROM contact_duplicate "
+    "UNION ALL SELECT MAX(contact_id) FROM contact_block "
+    "UNION ALL SELECT position FROM batch_job WHERE name = 'contact-dedupe')"
+)
+
+
+def _rebuild(autoincrement: bool) -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    ddl = [sql for sql, in bind.execute(sa.text(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'contact' AND type IN ('index', 'trigger') "
+        "AND sql IS NOT NULL ORDER BY type"))]
+    seen = bind.execute(sa.text(SEEN)).scalar() or 0
+    columns = sa.inspect(bind).get_columns('contact')
+    sa.Table('contact_rebuild', sa.MetaData(), *(
+        sa.Column(c['name'], c['type'], primary_key=bool(c['primary_key']), nullable=c['nullable'],
+                  server_default=sa.text(c['default']) if c['default'] is not None else None)
+        for c in columns
+    ), sqlite_autoincrement=autoincrement).create(bind)
+    names = ', '.join(c['name'] for c in columns)
+    op.execute(f"INSERT INTO contact_rebuild ({names}) SELECT {names} FROM contact")
+    op.drop_table('contact')
+    op.rename_table('contact_rebuild', 'contact')
+    for statement in ddl:
+        op.execute(statement)
+    if autoincrement:
+        op.execute("DELETE FROM sqlite_sequence WHERE name = 'contact'")
+        op.execute(f"INSERT INTO sqlite_sequence (name, seq) VALUES ('contact', {int(seen)})")
+
+
+def upgrade() -> None:
+    _rebuild(True)
+
+
+def downgrade() -> None:
+    _rebuild(False)
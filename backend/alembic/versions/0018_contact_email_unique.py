@@ -0,0 +1,36 @@
+"""one contact per email: make ix_contact_email_lower unique
+
+Revision ID: 0018
+Revises: 0017
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0018'
+down_revision = '0017'
+branch_labels = None
+depends_on = None
+
+DUPLICATES = (
+    "SELECT lower(email), COUNT(*) FROM contact WHERE email IS NOT NULL "
+    "GROUP BY lower(email) HAVING COUNT(*) > 1 ORDER BY COUNT(*) DESC LIMIT 5"
+)
+
+
+def upgrade() -> None:
+    taken = op.get_bind().execute(sa.text(DUPLICATES)).all()
+    if taken:
+        examples = ', '.join(f'{email} ({count})' for email, count in taken)
+        raise RuntimeError(
+            f'contacts share an email (ignoring case), e.g. {examples}: merge them '
+            '(POST /contacts/<id>/merge) or clear the extra emails, then upgrade again')
+    op.drop_index('ix_contact_email_lower', table_name='contact')
+    op.create_index('ix_contact_email_lower', 'contact', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contact_email_lower', table_name='contact')
+    op.create_index('ix_contact_email_lower', 'contact', [sa.text('lower(email)')])
@@ -0,0 +1,83 @@
+"""deal_stage_summary without the all-deals rows: each deal counts in one row
+
+Revision ID: 0019
+Revises: 0018
+Create Date: 2026-10-18
+"""
+
+import importlib.util
+from pathlib import Path
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0019'
+down_revision = '0018'
+branch_labels = None
+depends_on = None
+
+# Kept in step with app.models.deal.PIPELINE_DDL. The contact_id 0 rows held
+# every deal, so every deal write updated them; now they hold the deals
+# without a contact and /deals/pipeline sums the rows per stage. The last two
+# statements rebuild the summary in the new shape.
+TRIGGERS = {
+    'sqlite': [
+        "DROP TRIGGER IF EXISTS deal_stage_summary_au",
+        "DROP TRIGGER IF EXISTS deal_stage_summary_ad",
+        "DROP TRIGGER IF EXISTS deal_stage_summary_ai",
+        "CREATE TRIGGER deal_stage_summary_ai AFTER INSERT ON deal BEGIN INSERT OR IGNORE INTO "
+        "deal_stage_summary (contact_id, stage, deals, amount) VALUES (coalesce(new.contact_id, 0), "
+        "coalesce(new.stage, ''), 0, 0); UPDATE deal_stage_summary SET deals = deals + 1, amount = amount "
+        "+ new.amount WHERE contact_id = coalesce(new.contact_id, 0) AND stage = coalesce(new.stage, ''); END",
+        "CREATE TRIGGER deal_stage_summary_ad AFTER DELETE ON deal BEGIN UPDATE deal_stage_summary SET "
+        "deals = deals - 1, amount = amount - old.amount WHERE contact_id = coalesce(old.contact_id, 0) AND "
+        "stage = coalesce(old.stage, ''); DELETE FROM deal_stage_summary WHERE contact_id = "
+        "coalesce(old.contact_id, 0) AND stage = coalesce(old.stage, '') AND deals = 0; END",
+        "CREATE TRIGGER deal_stage_summary_au AFTER UPDATE OF stage, amount, contact_id ON deal BEGIN "
+        "UPDATE deal_stage_summary SET deals = deals - 1, amount = amount - old.amount WHERE contact_id = "
+        "coalesce(old.contact_id, 0) AND stage = coalesce(old.stage, ''); DELETE FROM deal_stage_summary "
+        "WHERE contact_id = coalesce(old.contact_id, 0) AND stage = coalesce(old.stage, '') AND deals = 0; "
+        "INSERT OR IGNORE INTO deal_stage_summary (contact_id, stage, deals, amount) VALUES "
+        "(coalesce(new.contact_id, 0), coalesce(new.stage, ''), 0, 0); UPDATE deal_stage_summary SET deals "
+        "= deals + 1, amount = amount + new.amount WHERE contact_id = coalesce(new.contact_id, 0) AND stage "
+        "= coalesce(new.stage, ''); END",
+        "DELETE FROM deal_stage_summary",
+        "INSERT INTO deal_stage_summary (contact_id, stage, deals, amount) SELECT coalesce(contact_id, 0), "
+        "coalesce(stage, ''), count(*), sum(amount) FROM deal GROUP BY coalesce(contact_id, 0), "
+        "coalesce(stage, '')",
+    ],
+    'postgresql': [
+        "CREATE OR REPLACE FUNCTION deal_stage_summary_track() RETURNS trigger AS $$ BEGIN IF TG_OP IN "
+        "('UPDATE', 'DELETE') THEN PERFORM deal_stage_summary_apply(coalesce(OLD.contact_id, 0), "
+        "coalesce(OLD.stage, ''), -1, -OLD.amount); END IF; IF TG_OP IN ('INSERT', 'UPDATE') THEN PERFORM "
+        "deal_stage_summary_apply(coalesce(NEW.contact_id, 0), coalesce(NEW.stage, ''), 1, NEW.amount); "
+        "END IF; RETURN NULL; END $$ LANGUAGE plpgsql",
+        "DELETE FROM deal_stage_summary",
+        "INSERT INTO deal_stage_summary (contact_id, stage, deals, amount) SELECT coalesce(contact_id, 0), "
+        "coalesce(stage, ''), count(*), sum(amount) FROM deal GROUP BY coalesce(contact_id, 0), "
+        "coalesce(stage, '')",
+    ],
+}
+
+
+def _revision_0011():
+    path = Path(__file__).with_name('0011_deal_stage_summary.py')
+    spec = importlib.util.spec_from_file_location('revision_0011', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def upgrade() -> None:
+    for statement in TRIGGERS.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    # Back to 0011's triggers, which also rebuild the summary with the all-deals rows
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in TRIGGERS['sqlite'][:3]:
+            op.execute(statement)
+    for statement in _revision_0011().TRIGGERS.get(dialect, []):
+        op.execute(statement)
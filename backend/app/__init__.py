@@ -1,14 +1,38 @@
-from flask import Flask
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 import os
 
+from app.core.config import settings
+from app.db.routing import RECENT_WRITE_COOKIE, marks_recent_write, reads_from_replica, read_only_context
+from app.pagination import PAGE_HEADERS
+from app.serialization import ORJSONProvider
+
 
 def create_app() -> Flask:
     app = Flask(__name__)
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret")
-    CORS(app)
+    app.json = ORJSONProvider(app)
+    CORS(app, expose_headers=[*PAGE_HEADERS, "ETag"])
+
+    # Sessions opened while handling GET/HEAD read from the read pool or replicas,
+    # unless the client wrote recently (read-your-writes)
+    @app.before_request
+    def _route_reads():
+        read_only_context.set(reads_from_replica(request.method, request.headers, request.cookies))
+
+    @app.after_request
+    def _mark_recent_write(response):
+        if marks_recent_write(request.method, response.status_code):
+            response.set_cookie(RECENT_WRITE_COOKIE, "1", max_age=settings.read_your_writes_seconds, httponly=True)
+        return response
+
+    @app.teardown_request
+    def _reset_read_route(exc):
+        read_only_context.set(False)
 
     # Late imports to avoid circular refs
+    from app.filters import InvalidFilter
+    from app.projections import InvalidFields
     from app.routes.contacts import contacts_bp
     from app.routes.deals import deals_bp
     from app.routes.inventory import inventory_bp
@@ -25,4 +49,12 @@ def create_app() -> Flask:
     app.register_blueprint(projects_bp, url_prefix="/projects")
     app.register_blueprint(auth_bp, url_prefix="/auth")
 
+    @app.errorhandler(InvalidFields)
+    def _invalid_fields(exc):
+        return jsonify({"error": str(exc)}), 400
+
+    @app.errorhandler(InvalidFilter)
+    def _invalid_filter(exc):
+        return jsonify({"error": str(exc)}), 400
+
     return app
@@ -1,34 +1,147 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
-from app.db import SessionLocal
+from typing import Optional
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import Page, etag, get_db
+from app.projections import CONTACT, CONTACT_DUPLICATE
 from app.models.contact import Contact
 from app.fastapi_auth import require_auth
+from app.contact_import import (InvalidImport, import_format, new_job, report, run_import_async, runs_inline, spool,
+                                start_import)
+from app.models.contact_import import ContactImportJob
+from app.models.contact_dedupe import ContactDedupeRun, ContactDuplicate
+from app import dedupe
+from app.overview import DEFAULT_ITEMS, MAX_ITEMS, RELATIONS, ContactOverview
+from app.serialization import ORJSONResponse
+from app.search import DEFAULT_RESULTS, MAX_RESULTS, ContactSearch, InvalidSearch
 
 router = APIRouter()
 
 
-def get_session():
-    return SessionLocal()
+@router.get("/", dependencies=[Depends(etag("contact"))])
+async def list_contacts(fields: Optional[str] = None, page: Page = Depends(), db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    names = CONTACT.names(fields)
+    return await page.respond(db, CONTACT, names, [Contact.id])
 
 
-@router.get("/")
-async def list_contacts(_: dict = Depends(require_auth)):
-    with get_session() as db:
-        rows = db.execute(select(Contact).order_by(Contact.id.desc())).scalars().all()
-        return [
-            {
-                "id": c.id,
-                "name": c.name,
-                "email": c.email,
-                "phone": c.phone,
-                "company": c.company,
-            }
-            for c in rows
-        ]
+@router.get("/search", dependencies=[Depends(etag("contact"))])
+async def search_contacts(q: str = "", limit: int = Query(DEFAULT_RESULTS, ge=1, le=MAX_RESULTS),
+                          fields: Optional[str] = None, db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    names = CONTACT.names(fields)
+    try:
+        search = ContactSearch(db.bind.dialect.name, q, CONTACT, names, limit)
+    except InvalidSearch as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    for stmt in search.statements():
+        if search.add((await db.execute(stmt)).all()):
+            break
+    return CONTACT.render(search.rows, names)
+
+
+@router.post("/import")
+async def import_contacts(request: Request, format: Optional[str] = None, db: AsyncSession = Depends(get_db),
+                          _: dict = Depends(require_auth)):
+    try:
+        fmt = import_format(format, request.headers.get("content-type", ""))
+    except InvalidImport as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    length = request.headers.get("content-length")
+    if runs_inline(int(length) if length and length.isdigit() else None):
+        job = new_job(fmt)
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        await run_import_async(db, job, request.stream())
+        return ORJSONResponse(report(job), status_code=201 if job.status == "completed" else 422)
+    # Too large to hold the request for: take the whole body, then import it in the background
+    body = spool()
+    try:
+        spooled = anyio.wrap_file(body)  # the file is handed on, so not closed here
+        async for chunk in request.stream():
+            await spooled.write(chunk)
+        job = new_job(fmt)
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+    except Exception:
+        body.close()
+        raise
+    started = report(job)
+    start_import(job.id, body)
+    return ORJSONResponse(started, status_code=202)
+
+
+@router.get("/imports/{import_id}")
+async def get_import(import_id: int, db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    job = await db.get(ContactImportJob, import_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return report(job)
+
+
+@router.get("/duplicates", dependencies=[Depends(etag("contact_duplicate"))])
+async def list_duplicates(fields: Optional[str] = None, page: Page = Depends(), db: AsyncSession = Depends(get_db),
+                          _: dict = Depends(require_auth)):
+    names = CONTACT_DUPLICATE.names(fields)
+    return await page.respond(db, CONTACT_DUPLICATE, names, [ContactDuplicate.score, ContactDuplicate.id],
+                              where=ContactDuplicate.status == "open")
+
+
+@router.post("/duplicates/scan", status_code=202)
+async def scan_duplicates(_: dict = Depends(require_auth)):
+    run = await run_in_threadpool(dedupe.start_scan)  # a sync Session: keep it off the event loop
+    if run is None:
+        raise HTTPException(status_code=409, detail="A duplicate scan is already running")
+    return ORJSONResponse(run, status_code=202 if run["status"] == "running" else 200)
+
+
+@router.get("/duplicates/runs/{run_id}")
+async def get_duplicate_run(run_id: int, db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    run = await db.get(ContactDedupeRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    return dedupe.report(run)
+
+
+@router.post("/{contact_id}/merge")
+async def merge_contacts(contact_id: int, payload: dict, db: AsyncSession = Depends(get_db),
+                         _: dict = Depends(require_auth)):
+    duplicates = payload.get("duplicates")
+    if not isinstance(duplicates, list) or not all(isinstance(i, int) for i in duplicates):
+        raise HTTPException(status_code=400, detail="duplicates must be a list of contact ids")
+    try:
+        repointed = await dedupe.merge_async(db, contact_id, duplicates)
+    except dedupe.MergeError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except LookupError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    row = (await db.execute(CONTACT.select(CONTACT.list_fields).where(Contact.id == contact_id))).first()
+    return {"contact": CONTACT.render_one(row, CONTACT.list_fields), "merged": sorted(set(duplicates)),
+            "repointed": repointed}
+
+
+@router.get("/{contact_id}/overview",
+            dependencies=[Depends(etag("contact", "deal", "sale_order", "invoice", "project"))])
+async def contact_overview(contact_id: int,
+                           deals_limit: int = Query(DEFAULT_ITEMS, ge=0, le=MAX_ITEMS),
+                           orders_limit: int = Query(DEFAULT_ITEMS, ge=0, le=MAX_ITEMS),
+                           open_invoices_limit: int = Query(DEFAULT_ITEMS, ge=0, le=MAX_ITEMS),
+                           active_projects_limit: int = Query(DEFAULT_ITEMS, ge=0, le=MAX_ITEMS),
+                           db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    limits = dict(zip(RELATIONS, (deals_limit, orders_limit, open_invoices_limit, active_projects_limit)))
+    overview = ContactOverview(contact_id, limits)
+    rows = {}
+    for name, stmt in overview.statements():
+        rows[name] = (await db.execute(stmt)).all()
+        if name == "contact" and not rows[name]:
+            raise HTTPException(status_code=404, detail="Contact not found")
+    return overview.render(rows)
 
 
 @router.post("/")
-async def create_contact(payload: dict, _: dict = Depends(require_auth)):
+async def create_contact(payload: dict, db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
     name = payload.get("name")
     if not name:
         raise HTTPException(status_code=400, detail="name is required")
@@ -39,14 +152,16 @@ async def create_contact(payload: dict, _: dict = Depends(require_auth)):
         phone=payload.get("phone"),
         company=payload.get("company"),
     )
-    with get_session() as db:
-        db.add(c)
-        db.commit()
-        db.refresh(c)
-        return {
-            "id": c.id,
-            "name": c.name,
-            "email": c.email,
-            "phone": c.phone,
-            "company": c.company,
-        }
+    db.add(c)
+    try:
+        await db.commit()
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="A contact with this email already exists")
+    await db.refresh(c)
+    return {
+        "id": c.id,
+        "name": c.name,
+        "email": c.email,
+        "phone": c.phone,
+        "company": c.company,
+    }
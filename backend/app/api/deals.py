@@ -1,34 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
-from app.db import SessionLocal
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import Page, etag, get_db
+from app.filters import DEALS
+from app.projections import DEAL, money
 from app.models.deal import Deal
 from app.fastapi_auth import require_auth
+from app.pipeline import pipeline_statement, render as render_pipeline
+from app import stage_analytics
+from app.serialization import ORJSONResponse
 
 router = APIRouter()
 
 
-def get_session():
-    return SessionLocal()
+@router.get("/", dependencies=[Depends(etag("deal"))])
+async def list_deals(fields: Optional[str] = None, page: Page = Depends(), db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    names = DEAL.names(fields)
+    return await page.respond(db, DEAL, names, [Deal.id], spec=DEALS)
 
 
-@router.get("/")
-async def list_deals(_: dict = Depends(require_auth)):
-    with get_session() as db:
-        rows = db.execute(select(Deal).order_by(Deal.id.desc())).scalars().all()
-        return [
-            {
-                "id": d.id,
-                "title": d.title,
-                "amount": float(d.amount) if d.amount is not None else 0.0,
-                "stage": d.stage,
-                "contact_id": d.contact_id,
-            }
-            for d in rows
-        ]
+@router.get("/pipeline", dependencies=[Depends(etag("deal"))])
+async def deal_pipeline(contact_id: Optional[int] = Query(None, ge=1), db: AsyncSession = Depends(get_db),
+                        _: dict = Depends(require_auth)):
+    rows = (await db.execute(pipeline_statement(db.bind.dialect.name, contact_id))).all()
+    return render_pipeline(rows)
+
+
+@router.get("/analytics", dependencies=[Depends(etag(*stage_analytics.TABLES))])
+async def deal_analytics(db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    statements = stage_analytics.statements(db.bind.dialect.name)
+    rows = {name: (await db.execute(stmt)).all() for name, stmt in statements}
+    return stage_analytics.render(rows)
+
+
+@router.post("/analytics/compact", status_code=202)
+async def compact_analytics(_: dict = Depends(require_auth)):
+    run = await run_in_threadpool(stage_analytics.start_compaction)  # a sync Session: keep it off the event loop
+    if run is None:
+        raise HTTPException(status_code=409, detail="A stage compaction is already running")
+    return ORJSONResponse(run, status_code=202 if run["status"] == "running" else 200)
 
 
 @router.post("/")
-async def create_deal(payload: dict, _: dict = Depends(require_auth)):
+async def create_deal(payload: dict, db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
     title = payload.get("title")
     if not title:
         raise HTTPException(status_code=400, detail="title is required")
@@ -39,14 +54,13 @@ async def create_deal(payload: dict, _: dict = Depends(require_auth)):
         stage=payload.get("stage"),
         contact_id=payload.get("contact_id"),
     )
-    with get_session() as db:
-        db.add(d)
-        db.commit()
-        db.refresh(d)
-        return {
-            "id": d.id,
-            "title": d.title,
-            "amount": float(d.amount) if d.amount is not None else 0.0,
-            "stage": d.stage,
-            "contact_id": d.contact_id,
-        }
+    db.add(d)
+    await db.commit()
+    await db.refresh(d)
+    return {
+        "id": d.id,
+        "title": d.title,
+        "amount": money(d.amount),
+        "stage": d.stage,
+        "contact_id": d.contact_id,
+    }
@@ -1,11 +1,136 @@
-from collections.abc import Generator
-from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from collections.abc import AsyncIterator
+from typing import List, Optional, Sequence
+from fastapi import Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+from app.db import AsyncSessionLocal
+from app.db.routing import reads_from_replica
+from app.etags import etag_stats, if_none_match_contains, make_etag, representation_key, versions_statement
+from app.fastapi_auth import require_auth
+from app.filters import ListSpec
+from app.pagination import (DEFAULT_LIMIT, MAX_LIMIT, InvalidPage, PageParams, after_cursor, keyset,
+                            page_headers, split_page, total_statement)
+from app.projections import Projection
+from app.response_cache import cache_key, principal_scope, response_cache
+from app.serialization import ORJSONResponse
+from app.api.streaming import Expand, stream_format, stream_response
 
 
-def get_db() -> Generator[Session, None, None]:
-    db = SessionLocal()
-    try:
+async def get_db(request: Request) -> AsyncIterator[AsyncSession]:
+    # GET/HEAD handlers read from the read pool or replicas unless the client wrote recently
+    read_only = reads_from_replica(request.method, request.headers, request.cookies)
+    async with AsyncSessionLocal(info={"read_only": read_only}) as db:
         yield db
-    finally:
-        db.close()
+
+
+def etag(*tables: str):
+    """Conditional GET on `tables`' change versions (see app.etags); a match is a 304 and skips the handler."""
+
+    async def check(request: Request, response: Response, db: AsyncSession = Depends(get_db),
+                    _: dict = Depends(require_auth)) -> str:
+        versions = dict((await db.execute(versions_statement(tables))).all())
+        representation = representation_key(request.url.path, request.url.query, request.headers.get("accept", ""))
+        tag = make_etag(versions, tables, representation)
+        matched = if_none_match_contains(request.headers.get("if-none-match", ""), tag)
+        etag_stats.record(matched)
+        if matched:
+            raise HTTPException(status_code=304, headers={"ETag": tag})
+        response.headers["ETag"] = tag
+        return tag
+
+    return check
+
+
+class CacheSlot:
+    """This request's entry in the response cache: replay `hit`, or `store` what the handler built."""
+
+    def __init__(self, key: Optional[str], tables: Sequence[str], response: Response):
+        self.key = key
+        self.tables = tables
+        self.response = response
+        entry = response_cache.get(key) if key else None
+        self.hit = Response(entry[0], headers=dict(entry[1])) if entry else None
+
+    def store(self, content) -> Response:
+        if not isinstance(content, Response):
+            content = ORJSONResponse(content)
+            content.headers.raw.extend(self.response.headers.raw)
+        if self.key and hasattr(content, "body") and content.status_code == 200:
+            response_cache.put(self.key, content.body, content.headers.items(), self.tables)
+        return content
+
+
+def cached(*tables: str):
+    """`etag(*tables)` plus a CacheSlot keyed by the caller's role and the ETag (see app.response_cache)."""
+    check = etag(*tables)
+
+    async def slot(response: Response, tag: str = Depends(check), principal=Depends(require_auth)) -> CacheSlot:
+        key = cache_key(principal_scope(principal), tag) if response_cache.enabled else None
+        return CacheSlot(key, tables, response)
+
+    return slot
+
+
+class Page:
+    """Keyset page of a list endpoint: `?limit=&after=&count=`; see app.pagination.
+
+    `?format=ndjson|csv` (or the matching Accept header) streams the whole
+    collection instead; see app.api.streaming.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        response: Response,
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+        after: Optional[str] = None,
+        count: bool = False,
+        fmt: Optional[str] = Query(None, alias="format", pattern="^(json|ndjson|csv)$"),
+    ):
+        self.request = request
+        self.response = response
+        self.params = PageParams(limit=limit, after=after, with_total=count)
+        self.stream = stream_format(fmt, request.headers.get("accept", ""))
+
+    async def fetch(self, db: AsyncSession, stmt: Select, keys: Sequence, scalars: bool = True,
+                    descending: bool = True) -> List:
+        try:
+            query = keyset(stmt, keys, self.params, descending)
+        except InvalidPage as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        result = await db.execute(query)
+        rows, cursor = split_page(result.scalars().all() if scalars else result.all(), keys, self.params)
+        total = None
+        if self.params.with_total:
+            total = (await db.execute(total_statement(stmt, db.bind.dialect.name))).scalar()
+        base_url = str(self.request.url.replace(query=""))
+        self.response.headers.update(page_headers(base_url, self.request.query_params, cursor, total))
+        return rows
+
+    async def respond(self, db: AsyncSession, projection: Projection, names: Sequence[str], keys: Sequence,
+                      where=None, expand: Optional[Expand] = None, spec: Optional[ListSpec] = None):
+        """A JSON page of `projection` rows, or the streamed collection when one was asked for.
+
+        With `spec` (see app.filters) the query string's filters and `?sort=` apply.
+        """
+        descending = True
+        if spec is not None:
+            stmt, keys, descending = spec.query(projection, names, self.request.query_params, keys)
+        else:
+            stmt = projection.select(names, keys)
+        if where is not None:
+            stmt = stmt.where(where)
+        if self.stream:
+            try:
+                stmt = after_cursor(stmt, keys, self.params.after, descending)
+            except InvalidPage as exc:
+                raise HTTPException(status_code=400, detail=str(exc))
+            return stream_response(stmt, projection, names, self.stream, db.info["read_only"], expand)
+        rows = await self.fetch(db, stmt, keys, scalars=False, descending=descending)
+        items = projection.render(rows, names)
+        if expand is not None:
+            await expand(db, rows, items)
+        # Returned as a response so the rows skip jsonable_encoder and go straight to orjson
+        response = ORJSONResponse(items)
+        response.headers.raw.extend(self.response.headers.raw)
+        return response
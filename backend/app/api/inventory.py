@@ -1,35 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
 from sqlalchemy import select
-from app.db import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import CacheSlot, Page, cached, etag, get_db
+from app.filters import PRODUCTS
+from app.projections import PRODUCT, STOCK_MOVEMENT, money
 from app.models.product import Product
+from app.models.product_feed import ProductFeedJob
+from app.models.stock_movement import StockMovement
 from app.fastapi_auth import require_auth
+from app.contact_import import InvalidImport, import_format
+from app.serialization import ORJSONResponse
+from app import product_feed, sku_index, stock
 
 router = APIRouter()
 
 
-def get_session():
-    return SessionLocal()
-
-
 @router.get("/")
-async def list_products(_: dict = Depends(require_auth)):
-    with get_session() as db:
-        rows = db.execute(select(Product).order_by(Product.id.desc())).scalars().all()
-        return [
-            {
-                "id": p.id,
-                "name": p.name,
-                "sku": p.sku,
-                "description": p.description,
-                "price": float(p.price) if p.price is not None else 0.0,
-                "stock": p.stock,
-            }
-            for p in rows
-        ]
+async def list_products(fields: Optional[str] = None, page: Page = Depends(), cache: CacheSlot = Depends(cached("product")), db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    if cache.hit:
+        return cache.hit
+    names = PRODUCT.names(fields)
+    return cache.store(await page.respond(db, PRODUCT, names, [Product.id], spec=PRODUCTS))
 
 
 @router.post("/")
-async def create_product(payload: dict, _: dict = Depends(require_auth)):
+async def create_product(payload: dict, db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
     name = payload.get("name")
     sku = payload.get("sku")
     if not name or not sku:
@@ -42,15 +39,106 @@ async def create_product(payload: dict, _: dict = Depends(require_auth)):
         price=payload.get("price", 0),
         stock=payload.get("stock", 0),
     )
-    with get_session() as db:
-        db.add(p)
-        db.commit()
-        db.refresh(p)
-        return {
-            "id": p.id,
-            "name": p.name,
-            "sku": p.sku,
-            "description": p.description,
-            "price": float(p.price) if p.price is not None else 0.0,
-            "stock": p.stock,
-        }
+    db.add(p)
+    await db.flush()
+    opening = stock.opening_movement(p)
+    if opening is not None:
+        db.add(opening)
+    await db.commit()
+    await db.refresh(p)
+    return {
+        "id": p.id,
+        "name": p.name,
+        "sku": p.sku,
+        "description": p.description,
+        "price": money(p.price),
+        "stock": p.stock,
+    }
+
+
+@router.post("/reserve")
+async def reserve_stock(payload: dict, db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    try:
+        items = await stock.reserve_async(db, stock.parse_items(payload), stock.parse_reference(payload))
+    except (stock.InvalidReservation, stock.InvalidMovement) as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except stock.OutOfStock as exc:
+        return JSONResponse({"detail": str(exc), "shortages": exc.shortages}, status_code=409)
+    return {"items": items}
+
+
+@router.post("/release")
+async def release_stock(payload: dict, db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    try:
+        items = await stock.release_async(db, stock.parse_items(payload), stock.parse_reference(payload))
+    except (stock.InvalidReservation, stock.InvalidMovement) as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"items": items}
+
+
+@router.post("/lookup")
+async def lookup_skus(payload: dict, db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    try:
+        skus = sku_index.parse_skus(payload)
+    except sku_index.InvalidLookup as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return await sku_index.lookup_async(db, skus)
+
+
+@router.post("/feed")
+async def upsert_feed(request: Request, format: Optional[str] = None, db: AsyncSession = Depends(get_db),
+                      _: dict = Depends(require_auth)):
+    try:
+        fmt = import_format(format, request.headers.get("content-type", ""))
+    except InvalidImport as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    job = product_feed.new_job(fmt)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    await product_feed.run_feed_async(db, job, request.stream())
+    return ORJSONResponse(product_feed.report(job), status_code=201 if job.status == "completed" else 422)
+
+
+@router.get("/feeds/{feed_id}")
+async def get_feed(feed_id: int, db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    job = await db.get(ProductFeedJob, feed_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Feed not found")
+    return product_feed.report(job)
+
+
+@router.post("/movements", status_code=201)
+async def record_movement(payload: dict, db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    product_id = payload.get("product_id")
+    if not isinstance(product_id, int):
+        raise HTTPException(status_code=400, detail="product_id is required")
+    try:
+        movement = await stock.record_async(db, product_id, *stock.parse_movement(payload))
+    except stock.InvalidMovement as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except stock.OutOfStock as exc:
+        return JSONResponse({"detail": str(exc), "shortages": exc.shortages}, status_code=409)
+    if movement is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return movement
+
+
+@router.get("/{product_id}/movements", dependencies=[Depends(etag("stock_movement"))])
+async def list_movements(product_id: int, fields: Optional[str] = None, page: Page = Depends(),
+                         db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    names = STOCK_MOVEMENT.names(fields)
+    return await page.respond(db, STOCK_MOVEMENT, names, [StockMovement.id],
+                              where=StockMovement.product_id == product_id)
+
+
+@router.get("/{product_id}/stock", dependencies=[Depends(etag("product", "stock_movement", "stock_snapshot"))])
+async def stock_as_of(product_id: int, as_of: Optional[str] = None, db: AsyncSession = Depends(get_db),
+                      _: dict = Depends(require_auth)):
+    try:
+        moment = stock.parse_as_of(as_of)
+    except stock.InvalidMovement as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if (await db.execute(select(Product.id).where(Product.id == product_id))).first() is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return await stock.stock_as_of_async(db, product_id, moment)
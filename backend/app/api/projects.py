@@ -1,36 +1,23 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
-from app.db import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import Page, etag, get_db
+from app.filters import PROJECT_TASKS, PROJECTS
+from app.projections import PROJECT, PROJECT_TASK_FIELDS, TASK
 from app.models.project import Project, Task
 from app.fastapi_auth import require_auth
 
 router = APIRouter()
 
 
-def get_session():
-    return SessionLocal()
-
-
-@router.get("/")
-async def list_projects(_: dict = Depends(require_auth)):
-    with get_session() as db:
-        rows = db.execute(select(Project).order_by(Project.id.desc())).scalars().all()
-        return [
-            {
-                "id": p.id,
-                "name": p.name,
-                "code": p.code,
-                "status": p.status,
-                "contact_id": p.contact_id,
-                "start_date": str(p.start_date) if p.start_date else None,
-                "end_date": str(p.end_date) if p.end_date else None,
-            }
-            for p in rows
-        ]
+@router.get("/", dependencies=[Depends(etag("project"))])
+async def list_projects(fields: Optional[str] = None, page: Page = Depends(), db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    names = PROJECT.names(fields)
+    return await page.respond(db, PROJECT, names, [Project.id], spec=PROJECTS)
 
 
 @router.post("/")
-async def create_project(payload: dict, _: dict = Depends(require_auth)):
+async def create_project(payload: dict, db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
     name = payload.get("name")
     code = payload.get("code")
     if not name or not code:
@@ -45,67 +32,38 @@ async def create_project(payload: dict, _: dict = Depends(require_auth)):
         start_date=payload.get("start_date"),
         end_date=payload.get("end_date"),
     )
-    with get_session() as db:
-        db.add(p)
-        db.commit()
-        db.refresh(p)
-        return {
-            "id": p.id,
-            "name": p.name,
-            "code": p.code,
-            "status": p.status,
-        }
-
-
-@router.get("/{project_id}")
-async def get_project(project_id: int, _: dict = Depends(require_auth)):
-    with get_session() as db:
-        p = db.get(Project, project_id)
-        if not p:
-            raise HTTPException(status_code=404, detail="Project not found")
-        return {
-            "id": p.id,
-            "name": p.name,
-            "code": p.code,
-            "description": p.description,
-            "contact_id": p.contact_id,
-            "status": p.status,
-            "start_date": str(p.start_date) if p.start_date else None,
-            "end_date": str(p.end_date) if p.end_date else None,
-            "tasks": [
-                {
-                    "id": t.id,
-                    "title": t.title,
-                    "status": t.status,
-                    "priority": t.priority,
-                    "assigned_to_id": t.assigned_to_id,
-                    "due_date": str(t.due_date) if t.due_date else None,
-                }
-                for t in p.tasks
-            ],
-        }
-
-
-@router.get("/{project_id}/tasks")
-async def list_tasks(project_id: int, _: dict = Depends(require_auth)):
-    with get_session() as db:
-        rows = db.execute(select(Task).where(Task.project_id == project_id).order_by(Task.id.desc())).scalars().all()
-        return [
-            {
-                "id": t.id,
-                "project_id": t.project_id,
-                "title": t.title,
-                "status": t.status,
-                "priority": t.priority,
-                "assigned_to_id": t.assigned_to_id,
-                "due_date": str(t.due_date) if t.due_date else None,
-            }
-            for t in rows
-        ]
+    db.add(p)
+    await db.commit()
+    await db.refresh(p)
+    return {
+        "id": p.id,
+        "name": p.name,
+        "code": p.code,
+        "status": p.status,
+    }
+
+
+@router.get("/{project_id}", dependencies=[Depends(etag("project", "task"))])
+async def get_project(project_id: int, fields: Optional[str] = None, db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    names = PROJECT.names(fields, detail=True)
+    row = (await db.execute(PROJECT.select(names).where(Project.id == project_id))).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Project not found")
+    tasks = (await db.execute(
+        TASK.select(PROJECT_TASK_FIELDS).where(Task.project_id == project_id).order_by(Task.id)
+    )).all()
+    return {**PROJECT.render_one(row, names), "tasks": TASK.render(tasks, PROJECT_TASK_FIELDS)}
+
+
+@router.get("/{project_id}/tasks", dependencies=[Depends(etag("task"))])
+async def list_tasks(project_id: int, fields: Optional[str] = None, page: Page = Depends(), db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    names = TASK.names(fields)
+    return await page.respond(db, TASK, names, [Task.id], where=Task.project_id == project_id,
+                              spec=PROJECT_TASKS)
 
 
 @router.post("/{project_id}/tasks")
-async def create_task(project_id: int, payload: dict, _: dict = Depends(require_auth)):
+async def create_task(project_id: int, payload: dict, db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
     title = payload.get("title")
     if not title:
         raise HTTPException(status_code=400, detail="title is required")
@@ -119,24 +77,22 @@ async def create_task(project_id: int, payload: dict, _: dict = Depends(require_
         priority=payload.get("priority", "medium"),
         due_date=payload.get("due_date"),
     )
-    with get_session() as db:
-        db.add(t)
-        db.commit()
-        db.refresh(t)
-        return {
-            "id": t.id,
-            "project_id": t.project_id,
-            "title": t.title,
-            "status": t.status,
-        }
+    db.add(t)
+    await db.commit()
+    await db.refresh(t)
+    return {
+        "id": t.id,
+        "project_id": t.project_id,
+        "title": t.title,
+        "status": t.status,
+    }
 
 
 @router.delete("/{project_id}")
-async def delete_project(project_id: int, _: dict = Depends(require_auth)):
-    with get_session() as db:
-        p = db.get(Project, project_id)
-        if not p:
-            raise HTTPException(status_code=404, detail="Project not found")
-        db.delete(p)
-        db.commit()
-        return {"ok": True}
+async def delete_project(project_id: int, db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    p = await db.get(Project, project_id)
+    if not p:
+        raise HTTPException(status_code=404, detail="Project not found")
+    await db.delete(p)
+    await db.commit()
+    return {"ok": True}
@@ -1,34 +1,23 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
-from app.db import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import Page, etag, get_db
+from app.filters import SALE_ORDERS
+from app.projections import SALE_ORDER, money
 from app.models.sale_order import SaleOrder
 from app.fastapi_auth import require_auth
 
 router = APIRouter()
 
 
-def get_session():
-    return SessionLocal()
-
-
-@router.get("/")
-async def list_orders(_: dict = Depends(require_auth)):
-    with get_session() as db:
-        rows = db.execute(select(SaleOrder).order_by(SaleOrder.id.desc())).scalars().all()
-        return [
-            {
-                "id": o.id,
-                "order_number": o.order_number,
-                "contact_id": o.contact_id,
-                "status": o.status,
-                "total": float(o.total) if o.total is not None else 0.0,
-            }
-            for o in rows
-        ]
+@router.get("/", dependencies=[Depends(etag("sale_order"))])
+async def list_orders(fields: Optional[str] = None, page: Page = Depends(), db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
+    names = SALE_ORDER.names(fields)
+    return await page.respond(db, SALE_ORDER, names, [SaleOrder.id], spec=SALE_ORDERS)
 
 
 @router.post("/")
-async def create_order(payload: dict, _: dict = Depends(require_auth)):
+async def create_order(payload: dict, db: AsyncSession = Depends(get_db), _: dict = Depends(require_auth)):
     order_number = payload.get("order_number")
     if not order_number:
         raise HTTPException(status_code=400, detail="order_number is required")
@@ -39,14 +28,13 @@ async def create_order(payload: dict, _: dict = Depends(require_auth)):
         status=payload.get("status", "draft"),
         total=payload.get("total", 0),
     )
-    with get_session() as db:
-        db.add(o)
-        db.commit()
-        db.refresh(o)
-        return {
-            "id": o.id,
-            "order_number": o.order_number,
-            "contact_id": o.contact_id,
-            "status": o.status,
-            "total": float(o.total) if o.total is not None else 0.0,
-        }
+    db.add(o)
+    await db.commit()
+    await db.refresh(o)
+    return {
+        "id": o.id,
+        "order_number": o.order_number,
+        "contact_id": o.contact_id,
+        "status": o.status,
+        "total": money(o.total),
+    }
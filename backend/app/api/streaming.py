@@ -0,0 +1,80 @@
+"""
+Streaming NDJSON/CSV bodies for full-collection pulls (BI syncs).
+
+A list endpoint streams instead of paging when the client sends
+`Accept: application/x-ndjson` / `Accept: text/csv` or `?format=ndjson|csv`.
+Rows come off a server-side cursor (`AsyncSession.stream` with `yield_per`)
+one partition at a time and are encoded and flushed before the next is
+fetched, so memory stays flat however large the table is.
+
+`limit` is ignored in this mode; `after` still applies, so an interrupted
+sync can resume from the last key it saw. CSV carries the scalar fields
+only; nested collections (e.g. journal lines) are NDJSON-only.
+"""
+import csv
+import io
+import os
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Sequence
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.db import AsyncSessionLocal
+from app.projections import Projection
+from app.serialization import dumps
+
+STREAM_BATCH = int(os.getenv("STREAM_BATCH_ROWS", "1000"))
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Adds nested collections to one partition of rendered rows
+Expand = Callable[[AsyncSession, Sequence, List[dict]], Awaitable[None]]
+
+
+def stream_format(fmt: Optional[str], accept: str) -> Optional[str]:
+    """'ndjson', 'csv' or None (a regular JSON page)."""
+    if fmt:
+        return fmt if fmt in MEDIA_TYPES else None
+    for fmt, media_type in MEDIA_TYPES.items():
+        if media_type in accept:
+            return fmt
+    return None
+
+
+def _ndjson(items: List[dict]) -> bytes:
+    return b"".join(dumps(item) + b"\n" for item in items)
+
+
+def _csv(items: List[dict], names: Sequence[str], header: bool) -> str:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(names)
+    writer.writerows([item[name] for name in names] for item in items)
+    return buf.getvalue()
+
+
+async def _generate(stmt: Select, projection: Projection, names: Sequence[str], fmt: str,
+                    read_only: bool, expand: Optional[Expand]) -> AsyncIterator:
+    # The request's own session is closed before the body is sent, so the stream
+    # opens its own; nested lookups run on it between batches of the open cursor
+    async with AsyncSessionLocal(info={"read_only": read_only}) as db:
+        result = await db.stream(stmt.execution_options(yield_per=STREAM_BATCH))
+        header = fmt == "csv"
+        if header:
+            yield _csv([], names, header=True)
+        async for rows in result.partitions():
+            items = projection.render(rows, names)
+            if fmt == "csv":
+                yield _csv(items, names, header=False)
+                continue
+            if expand is not None:
+                await expand(db, rows, items)
+            yield _ndjson(items)
+
+
+def stream_response(stmt: Select, projection: Projection, names: Sequence[str], fmt: str,
+                    read_only: bool, expand: Optional[Expand] = None) -> StreamingResponse:
+    return StreamingResponse(_generate(stmt, projection, names, fmt, read_only, expand),
+                             media_type=MEDIA_TYPES[fmt])
@@ -1,18 +1,18 @@
 import os
 from functools import wraps
 from flask import Blueprint, request, jsonify, current_app, g
-from itsdangerous import TimestampSigner, BadSignature, SignatureExpired
 from sqlalchemy import select
 from app.db import SessionLocal
 from app.models.user import User
+from app.permissions import mask_allows
+from app.tokens import authenticate, decode_token, issue_token
 from app.utils import verify_password
 
 auth_bp = Blueprint("auth", __name__)
 
 
-def _signer() -> TimestampSigner:
-    secret = current_app.config.get("SECRET_KEY") or os.getenv("SECRET_KEY", "dev-secret")
-    return TimestampSigner(secret_key=secret)
+def _secret() -> str:
+    return current_app.config.get("SECRET_KEY") or os.getenv("SECRET_KEY", "dev-secret")
 
 
 @auth_bp.post("/login")
@@ -24,7 +24,7 @@ def login():
     if not username or not password:
         return jsonify({"error": "username and password required"}), 400
 
-    with SessionLocal() as db:
+    with SessionLocal(info={"read_only": True}) as db:
         user = db.execute(select(User).where(User.username == username)).scalar_one_or_none()
         
         if not user or not user.is_active:
@@ -40,7 +40,7 @@ def login():
             if password != expected_p:
                 return jsonify({"error": "invalid credentials"}), 401
 
-        token = _signer().sign(f"{user.id}:{user.username}".encode()).decode()
+        token = issue_token(user, _secret())
         return jsonify({
             "token": token,
             "user": {
@@ -57,16 +57,7 @@ def get_current_user():
     auth_header = request.headers.get("Authorization", "")
     if not auth_header.startswith("Bearer "):
         return None
-    
-    token = auth_header[7:]
-    try:
-        payload = _signer().unsign(token, max_age=60 * 60 * 24).decode()  # 24h
-        user_id = int(payload.split(":")[0])
-        with SessionLocal() as db:
-            user = db.get(User, user_id)
-            return user
-    except (BadSignature, SignatureExpired, ValueError, IndexError):
-        return None
+    return authenticate(auth_header[7:], _secret())
 
 
 def require_auth(f):
@@ -90,19 +81,9 @@ def require_permission(permission_name: str):
             if not user:
                 return jsonify({"error": "unauthorized"}), 401
             
-            # Check if user's role has the required permission
-            # For now, admin role (id=1) has all permissions
-            # TODO: implement full permission checking via RolePermission table
-            if user.role_id == 1:  # admin
-                g.current_user = user
-                return f(*args, **kwargs)
-            
-            # For other roles, implement permission lookup
-            # with SessionLocal() as db:
-            #     has_perm = check_permission(db, user.role_id, permission_name)
-            #     if not has_perm:
-            #         return jsonify({"error": "forbidden"}), 403
-            
+            if not mask_allows(user.role_id, user.permissions, permission_name):
+                return jsonify({"error": "forbidden"}), 403
+
             g.current_user = user
             return f(*args, **kwargs)
         return decorated
@@ -111,8 +92,4 @@ def require_permission(permission_name: str):
 
 def verify_token(token: str) -> bool:
     """Legacy token verification function."""
-    try:
-        _signer().unsign(token, max_age=60 * 60 * 24)
-        return True
-    except (BadSignature, SignatureExpired):
-        return False
+    return decode_token(token, _secret()) is not None
@@ -0,0 +1,184 @@
+"""
+Background batch jobs over a table's new rows: the duplicate scan
+(app.dedupe) and the stage compaction (app.stage_analytics).
+
+A job is a `step(db, after_id, upto)` that handles the rows of its source
+table after `after_id`, up to `upto` and some batch size, and returns (last
+id handled, *counts); `after_id` back means caught up (after counting what
+it did handle, if anything). A run reads `upto` once, at its start, with
+`committed_upto`, so it never passes a row that may still commit below it.
+
+A run is only started when the source has rows past the job's position;
+otherwise the job reports itself caught up and writes nothing.
+
+Every run is a row of the job's run model, with `status` (running,
+completed, superseded, failed), `error`, `finished_at`, the id it has got to
+and one column per count, committed with each batch so it shows progress
+while it runs.
+
+Only one run may handle a batch, whichever process it runs in, so the
+job's position is a `batch_job` row and each batch claims it first:
+
+    UPDATE batch_job SET position = :after WHERE name = :job AND position = :after
+
+and advances it in the same transaction as the batch's writes. A second
+run waits on that row (PostgreSQL re-checks the WHERE once the first
+commits; SQLite has a single writer), then finds the position moved, matches
+no row and stops as superseded without writing anything.
+
+`run_in_background` is the thread runner under `BatchJob.start`, also used
+for work that is not a batch job (a large contact import).
+"""
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Optional, Sequence
+
+from sqlalchemy import func, literal, select, text, true, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.models.batch_job import BatchJobPosition
+
+_INSERTS = {"sqlite": sqlite_insert, "postgresql": pg_insert}
+
+
+def committed_upto(db, column) -> int:
+    """The highest id in `column` that no transaction still in flight can add a row below (committed here).
+
+    PostgreSQL hands out ids at insert, so a row can commit after a later one
+    was read: a SHARE lock on the table waits for every transaction writing
+    it to finish, and holds new writers off only until this commit. SQLite
+    has a single writer, so its last id is already committed.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"LOCK TABLE {column.table.name} IN SHARE MODE"))
+    upto = db.execute(select(func.max(column))).scalar() or 0
+    db.commit()
+    return upto
+
+
+def run_in_background(name: str, work: Callable, done: Optional[Callable[[], None]] = None) -> threading.Thread:
+    """Run `work(db)` in a daemon thread named `name`, with its own Session on the primary; then `done()`, however it ends."""
+    from app.db import SessionLocal
+
+    def target():
+        try:
+            with SessionLocal(info={"read_only": False}) as db:
+                work(db)
+        finally:
+            if done is not None:
+                done()
+
+    thread = threading.Thread(target=target, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+class BatchJob:
+    def __init__(self, name: str, source, model, position: str, counters: Sequence[str], step: Callable,
+                 report: Callable[[object], dict]):
+        self.name = name  # also the worker thread's name
+        self.source = source  # the id column positions refer to
+        self.model = model
+        self.position = position
+        self.counters = tuple(counters)
+        self.step = step
+        self.report = report
+        self._running = threading.Lock()
+
+    def _position_statement(self, dialect: str):
+        """Insert the job's position row if it is missing, at the furthest run's (migration 0016 seeds it)."""
+        insert = _INSERTS.get(dialect)
+        if insert is None:
+            return None
+        # WHERE true: SQLite cannot otherwise tell ON CONFLICT from a join constraint of the SELECT
+        furthest = select(literal(self.name), func.coalesce(func.max(getattr(self.model, self.position)), 0)) \
+            .where(true())
+        return insert(BatchJobPosition).from_select(["name", "position"], furthest) \
+            .on_conflict_do_nothing(index_elements=[BatchJobPosition.name])
+
+    def position_of(self, db) -> int:
+        """The id the job has got to (its `batch_job` row, inserted if missing)."""
+        stmt = self._position_statement(db.get_bind().dialect.name)
+        if stmt is not None:
+            db.execute(stmt)
+        return db.execute(select(BatchJobPosition.position).where(BatchJobPosition.name == self.name)).scalar()
+
+    def caught_up(self, position: int) -> dict:
+        return {"status": "caught_up", self.position: position}
+
+    def new_run(self, db):
+        """A committed run that starts at the job's position; None if no row has been added past it."""
+        start = self.position_of(db)
+        if (db.execute(select(func.max(self.source))).scalar() or 0) <= start:
+            db.commit()
+            return None
+        run = self.model(status="running", **{self.position: start}, **dict.fromkeys(self.counters, 0))
+        db.add(run)
+        db.commit()
+        return run
+
+    def _claim(self, db, after: int) -> bool:
+        claim = update(BatchJobPosition).where(BatchJobPosition.name == self.name, BatchJobPosition.position == after) \
+            .values(position=after).execution_options(synchronize_session=False)
+        return db.execute(claim).rowcount == 1
+
+    def run(self, db, run):
+        """Work through every row added since `run`'s position, committing its progress with each batch."""
+        status = "completed"
+        try:
+            upto = committed_upto(db, self.source)
+            while True:
+                after = getattr(run, self.position)
+                if not self._claim(db, after):
+                    status = "superseded"  # another run has done these rows
+                    break
+                last_id, *counts = self.step(db, after, upto)
+                if counts[0]:
+                    db.execute(update(BatchJobPosition).where(BatchJobPosition.name == self.name)
+                               .values(position=last_id).execution_options(synchronize_session=False))
+                    setattr(run, self.position, last_id)
+                    for counter, count in zip(self.counters, counts):
+                        setattr(run, counter, getattr(run, counter) + count)
+                    db.commit()
+                if last_id == after:
+                    break
+        except Exception as exc:
+            db.rollback()
+            run.status, run.error = "failed", str(exc)[:500]
+            raise
+        else:
+            run.status = status
+        finally:
+            run.finished_at = datetime.now(timezone.utc)
+            db.commit()
+        return run
+
+    def run_once(self, db) -> dict:
+        """Run in this thread (the CLI); the run's report, or a caught-up one if there was nothing new."""
+        run = self.new_run(db)
+        return self.report(self.run(db, run)) if run else self.caught_up(self.position_of(db))
+
+    def start(self) -> Optional[dict]:
+        """Start a run in a background thread; None if this process is already running one.
+
+        Returns the new run's report, or a caught-up one, without a run, if there is nothing new.
+        """
+        from app.db import SessionLocal
+
+        if not self._running.acquire(blocking=False):
+            return None
+        # On the primary: the position must be current
+        try:
+            with SessionLocal(info={"read_only": False}) as db:
+                run = self.new_run(db)
+                started = self.report(run) if run else self.caught_up(self.position_of(db))
+        except Exception:
+            self._running.release()
+            raise
+        if run is None:
+            self._running.release()
+            return started
+
+        run_in_background(self.name, lambda db: self.run(db, db.get(self.model, started["id"])), self._running.release)
+        return started
@@ -0,0 +1,392 @@
+"""
+Streaming bulk contact import: `POST /contacts/import` and the CLI.
+
+The body is CSV (header row naming the columns) or NDJSON (one object per
+line); either is decoded as it arrives, so memory stays flat however large
+the file. Rows are validated with the contacts schema (`ContactCreate`; an
+empty CSV cell is a missing value) and written IMPORT_BATCH_ROWS at a time
+with one executemany INSERT per batch, each batch in its own commit.
+
+Emails are deduplicated on lower(email), in the same pass: a row whose email
+is already taken, by an existing contact or by an earlier row of the file, is
+skipped and reported with the id it duplicates. Rows without an email are
+never duplicates. The lookup before each batch only saves work: the unique
+ix_contact_email_lower index decides, and a row that another import or a
+create committed since is skipped by the INSERT's ON CONFLICT DO NOTHING and
+reported the same way.
+
+A body of up to IMPORT_INLINE_BYTES (by Content-Length) is imported within
+the request, which answers 201 (422 if the import failed). A larger one, or
+one of unknown length, is spooled to a temporary file and imported in a
+background thread; the request answers 202 with the running job.
+
+Every import is a `contact_import` row whose counters are committed with each
+batch, so `GET /contacts/imports/<id>` shows progress while it runs and the
+final report after. The report lists the first IMPORT_MAX_ERRORS problem rows
+(`row` counts data rows from 1); the counters are always exact.
+
+    python -m app.contact_import contacts.csv
+    python -m app.contact_import contacts.ndjson --format ndjson
+"""
+import codecs
+import csv
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.batch_job import run_in_background
+from app.models.contact import Contact
+from app.models.contact_import import ContactImportJob
+from app.modules.contacts.schemas import ContactCreate
+
+BATCH_ROWS = int(os.getenv("IMPORT_BATCH_ROWS", "5000"))
+MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+INLINE_BYTES = int(os.getenv("IMPORT_INLINE_BYTES", str(1 << 20)))
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+FIELDS = tuple(ContactCreate.model_fields)
+# Emails per duplicate lookup (bound parameters per statement stay well inside SQLite's limit)
+_LOOKUP_CHUNK = 500
+_UPSERTS = {"sqlite": sqlite_insert, "postgresql": pg_insert}
+
+
+class InvalidImport(ValueError):
+    """An unknown format, or a body that cannot be read as one (e.g. a CSV without a name column)."""
+
+
+def import_format(fmt: Optional[str], content_type: str) -> str:
+    """'csv' or 'ndjson', from `?format=` or else the Content-Type."""
+    if fmt:
+        if fmt not in FORMATS:
+            raise InvalidImport(f"unsupported format: {fmt} (supported: {', '.join(FORMATS)})")
+        return fmt
+    for fmt, media_type in FORMATS.items():
+        if media_type in (content_type or ""):
+            return fmt
+    raise InvalidImport(f"set ?format= or Content-Type to one of: {', '.join(FORMATS.values())}")
+
+
+class RowDecoder:
+    """Turns body chunks into records (dicts, or an error string), pushed one chunk at a time.
+
+    A CSV header must name the `required` column.
+    """
+
+    def __init__(self, fmt: str, required: str = "name"):
+        self.fmt = fmt
+        self.required = required
+        self._text = codecs.getincrementaldecoder("utf-8-sig")()
+        self._tail = ""
+        self._record = ""
+        self._header: Optional[List[str]] = None
+
+    def feed(self, chunk: bytes, final: bool = False) -> List:
+        lines = (self._tail + self._text.decode(chunk, final)).split("\n")
+        self._tail = "" if final else lines.pop()
+        records = []
+        for line in lines:
+            if self.fmt == "ndjson":
+                if line.strip():
+                    records.append(self._object(line))
+                continue
+            # A quoted CSV field may span lines: keep going until the quotes balance
+            self._record += line if not self._record else "\n" + line
+            if self._record.count('"') % 2 == 0:
+                record, self._record = self._record, ""
+                if record.strip():
+                    records.extend(self._csv(record))
+        if final and self._record:
+            raise InvalidImport("unterminated quoted field at end of CSV")
+        return records
+
+    def _object(self, line: str):
+        try:
+            value = orjson.loads(line)
+        except orjson.JSONDecodeError as exc:
+            return f"invalid JSON: {exc}"
+        return value if isinstance(value, dict) else "expected a JSON object"
+
+    def _csv(self, record: str):
+        values = next(csv.reader([record.rstrip("\r")]))
+        if self._header is None:
+            self._header = [name.strip().lower() for name in values]
+            if self.required not in self._header:
+                raise InvalidImport(f"CSV header must include a {self.required} column")
+            return []
+        if len(values) > len(self._header):
+            return [f"expected {len(self._header)} columns, got {len(values)}"]
+        return [{name: value or None for name, value in zip(self._header, values)}]
+
+
+def describe_errors(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}" for e in exc.errors())
+
+
+class ContactImporter:
+    """Validation, batching and deduplication of one import; the drivers below do the I/O.
+
+    `feed` returns the batches that are ready, each a list of (row, values);
+    for each, run `lookups(batch)`, pass the (id, email key) rows they return
+    to `prepare`, insert what it returns with `statement` and hand the (id,
+    email) rows it returns to `inserted`. That gives back the rows the INSERT
+    skipped as already taken: run `lookups` for those too and pass what they
+    return to `settle`. Rows that failed validation never reach a batch.
+    """
+
+    def __init__(self, fmt: str, job: ContactImportJob, dialect: str):
+        self.decoder = RowDecoder(fmt)
+        self.job = job
+        self.statement = insert_statement(dialect)
+        self.row = 0
+        self.duplicates = self.failed = 0
+        self.errors: List[dict] = []
+        self._batch: List[Tuple[int, dict]] = []
+        self._pending: List[Tuple[int, dict]] = []
+        self._repeats: List[Tuple[int, str]] = []
+        self._skipped: List[Tuple[int, dict]] = []
+        self._ids: Dict[str, int] = {}
+
+    def feed(self, chunk: bytes, final: bool = False) -> List[List[Tuple[int, dict]]]:
+        batches = []
+        for record in self.decoder.feed(chunk, final):
+            self.row += 1
+            self._validate(record)
+            if self.row % BATCH_ROWS == 0:
+                batches.append(self._take())
+        if final and self.row % BATCH_ROWS:
+            batches.append(self._take())
+        return batches
+
+    def _take(self) -> List[Tuple[int, dict]]:
+        batch, self._batch = self._batch, []
+        self.job.processed = self.row
+        return batch
+
+    def _validate(self, record) -> None:
+        if isinstance(record, str):
+            return self._error(self.row, record)
+        try:
+            contact = ContactCreate(**{name: record.get(name) for name in FIELDS})
+        except ValidationError as exc:
+            return self._error(self.row, describe_errors(exc))
+        self._batch.append((self.row, contact.model_dump()))
+
+    def _error(self, row: int, error: str, **extra) -> None:
+        if "duplicate_of" in extra:
+            self.duplicates += 1
+        else:
+            self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"row": row, "error": error, **extra})
+
+    @staticmethod
+    def key(values: dict) -> Optional[str]:
+        email = values.get("email")
+        return email.strip().lower() if email else None
+
+    def lookups(self, batch: List[Tuple[int, dict]]):
+        """SELECTs of the existing contacts sharing an email with `batch` (served by ix_contact_email_lower)."""
+        keys = sorted({k for k in (self.key(values) for _, values in batch) if k})
+        email = func.lower(Contact.email)
+        for start in range(0, len(keys), _LOOKUP_CHUNK):
+            yield select(Contact.id, email).where(email.in_(keys[start:start + _LOOKUP_CHUNK]))
+
+    def prepare(self, batch: List[Tuple[int, dict]], existing: Iterable[Tuple[int, str]]) -> List[dict]:
+        """The rows of `batch` to insert; the rest are recorded as duplicates."""
+        taken = {key: id_ for id_, key in existing}
+        first_row: Dict[str, int] = {}
+        self._pending, self._repeats = [], []
+        for row, values in batch:
+            key = self.key(values)
+            if key in taken:
+                self._error(row, "duplicate email", email=values["email"], duplicate_of=taken[key])
+            elif key in first_row:
+                self._repeats.append((row, values["email"]))  # its id is known once the first row is in
+            else:
+                if key is not None:
+                    first_row[key] = row
+                self._pending.append((row, values))
+        return [values for _, values in self._pending]
+
+    def inserted(self, rows: List[Tuple[int, Optional[str]]]) -> List[Tuple[int, dict]]:
+        """Record the (id, email) rows RETURNING gave back for what `prepare` returned.
+
+        Returns the rows ON CONFLICT skipped: their email was committed by someone else since the lookup.
+        """
+        self._ids = {self.key({"email": email}): id_ for id_, email in rows}
+        self.job.inserted += len(rows)
+        self._skipped = [(row, values) for row, values in self._pending
+                         if self.key(values) is not None and self.key(values) not in self._ids]
+        return self._skipped
+
+    def settle(self, existing: Iterable[Tuple[int, str]]) -> None:
+        """Record the batch's duplicates found after the insert; `existing` is what `lookups` found for the skipped rows."""
+        taken = {key: id_ for id_, key in existing}
+        for row, values in self._skipped:
+            self._error(row, "duplicate email", email=values["email"], duplicate_of=taken.get(self.key(values)))
+        for row, email in self._repeats:
+            key = self.key({"email": email})
+            self._error(row, "duplicate email", email=email, duplicate_of=self._ids.get(key, taken.get(key)))
+        self._sync()
+
+    def _sync(self) -> None:
+        self.job.duplicates = self.duplicates
+        self.job.failed = self.failed
+        self.job.errors = list(self.errors)  # a new list, so the JSON column is seen as changed
+
+    def finish(self, status: str, error: Optional[str] = None) -> None:
+        if error:
+            self.errors.append({"row": self.row, "error": error})
+        self._sync()
+        self.job.processed = self.row
+        self.job.status = status
+        self.job.finished_at = datetime.now(timezone.utc)
+
+
+def insert_statement(dialect: str):
+    """INSERT ... ON CONFLICT (lower(email)) DO NOTHING RETURNING id, email."""
+    # RETURNING order is not guaranteed, so the email comes back to match ids to rows; asking
+    # SQLAlchemy for parameter order instead costs more than twice as much per row
+    return _UPSERTS[dialect](Contact).on_conflict_do_nothing(index_elements=[func.lower(Contact.email)]) \
+        .returning(Contact.id, Contact.email)
+
+
+def new_job(fmt: str) -> ContactImportJob:
+    return ContactImportJob(format=fmt, status="running", processed=0, inserted=0, duplicates=0,
+                            failed=0, errors=[])
+
+
+def run_import(db, job: ContactImportJob, chunks: Iterable[bytes]) -> ContactImportJob:
+    """Import `chunks` into the committed `job` with a Session; the job's final state is committed too.
+
+    A malformed body ends the job as failed; any other error does as well, and is raised again after.
+    """
+    importer = ContactImporter(job.format, job, db.get_bind().dialect.name)
+    try:
+        for chunk in chunks:
+            _write(db, importer, importer.feed(chunk))
+        _write(db, importer, importer.feed(b"", final=True))
+    except InvalidImport as exc:
+        db.rollback()
+        importer.finish("failed", str(exc))
+    except Exception as exc:
+        # Anything else (a database error, the client going away) still ends the job
+        db.rollback()
+        importer.finish("failed", str(exc)[:500])
+        db.commit()
+        raise
+    else:
+        importer.finish("completed")
+    db.commit()
+    return job
+
+
+def _write(db, importer: ContactImporter, batches) -> None:
+    for batch in batches:
+        existing = [row for stmt in importer.lookups(batch) for row in db.execute(stmt).all()]
+        rows = importer.prepare(batch, existing)
+        skipped = importer.inserted(db.execute(importer.statement, rows).all() if rows else [])
+        importer.settle([row for stmt in importer.lookups(skipped) for row in db.execute(stmt).all()])
+        db.commit()
+
+
+async def run_import_async(db, job: ContactImportJob, chunks) -> ContactImportJob:
+    """`run_import` for an AsyncSession and an async iterable of chunks."""
+    importer = ContactImporter(job.format, job, db.bind.dialect.name)
+    try:
+        async for chunk in chunks:
+            await _write_async(db, importer, importer.feed(chunk))
+        await _write_async(db, importer, importer.feed(b"", final=True))
+    except InvalidImport as exc:
+        await db.rollback()
+        await db.refresh(job)  # the rollback expired it, and async sessions do not lazy-load
+        importer.finish("failed", str(exc))
+    except Exception as exc:
+        await db.rollback()
+        await db.refresh(job)
+        importer.finish("failed", str(exc)[:500])
+        await db.commit()
+        raise
+    else:
+        importer.finish("completed")
+    await db.commit()
+    return job
+
+
+async def _write_async(db, importer: ContactImporter, batches) -> None:
+    for batch in batches:
+        existing = [row for stmt in importer.lookups(batch) for row in (await db.execute(stmt)).all()]
+        rows = importer.prepare(batch, existing)
+        skipped = importer.inserted((await db.execute(importer.statement, rows)).all() if rows else [])
+        importer.settle([row for stmt in importer.lookups(skipped) for row in (await db.execute(stmt)).all()])
+        await db.commit()
+
+
+def runs_inline(content_length: Optional[int]) -> bool:
+    """Whether a body of `content_length` bytes (None: unknown) is imported within the request."""
+    return content_length is not None and content_length <= INLINE_BYTES
+
+
+def spool():
+    """The temporary file a body that does not run inline is copied to (removed once closed)."""
+    return tempfile.TemporaryFile()
+
+
+def start_import(job_id: int, body) -> threading.Thread:
+    """Import the spooled `body` into the committed job `job_id` in a background thread, closing it after."""
+    def work(db):
+        with body:
+            body.seek(0)
+            run_import(db, db.get(ContactImportJob, job_id), iter(lambda: body.read(1 << 20), b""))
+
+    return run_in_background(f"contact-import-{job_id}", work)
+
+
+def report(job: ContactImportJob) -> dict:
+    return {
+        "id": job.id,
+        "format": job.format,
+        "status": job.status,
+        "processed": job.processed,
+        "inserted": job.inserted,
+        "duplicates": job.duplicates,
+        "failed": job.failed,
+        "errors": job.errors,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def main() -> None:
+    import argparse
+    import json
+
+    import app.main  # noqa: F401  registers every model with the mapper
+
+    from app.db import SessionLocal
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=sorted(FORMATS), help="default: from the file extension")
+    args = parser.parse_args()
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+
+    with SessionLocal() as db, open(args.path, "rb") as body:
+        job = new_job(fmt)
+        db.add(job)
+        db.commit()
+        print(f"import {job.id}: progress at GET /contacts/imports/{job.id}")
+        run_import(db, job, iter(lambda: body.read(1 << 20), b""))
+        print(json.dumps(report(job), indent=2))
+
+
+if __name__ == "__main__":
+    main()
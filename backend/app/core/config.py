@@ -1,5 +1,7 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
-from pydantic import Field
+from pydantic import AliasChoices, Field
 
 
 class Settings(BaseSettings):
@@ -10,11 +12,48 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = Field(default=60 * 24)
 
     # SQLite for local dev; switch to Postgres in production
-    sqlalchemy_database_uri: str = Field(default="sqlite:///./data/app.db")
+    sqlalchemy_database_uri: str = Field(
+        default="sqlite:///./data/app.db",
+        validation_alias=AliasChoices("DATABASE_URL", "SQLALCHEMY_DATABASE_URI"),
+    )
+    # Async-driver URL for the FastAPI routers; derived from the above when unset
+    async_database_uri: str | None = Field(
+        default=None,
+        validation_alias=AliasChoices("ASYNC_DATABASE_URL", "ASYNC_DATABASE_URI"),
+    )
+
+    # Connection pool (applies to the sync and the async engine alike)
+    db_pool_size: int = Field(default=5)
+    db_max_overflow: int = Field(default=10)
+    db_pool_timeout: float = Field(default=30.0)  # seconds to wait for a free connection
+    db_pool_recycle: int = Field(default=1800)  # seconds; -1 disables recycling
+    db_pool_pre_ping: bool = Field(default=True)
+    db_connect_timeout: int = Field(default=10)  # seconds (Postgres only)
+    db_statement_timeout_ms: int = Field(default=0)  # 0 disables (Postgres only)
+    db_echo: bool = Field(default=False)
+
+    # Read replicas: comma-separated URLs that GET requests read from (empty = primary only)
+    database_replica_urls: str = Field(default="", validation_alias=AliasChoices("DATABASE_REPLICA_URLS", "database_replica_urls"))
+    db_replica_strategy: Literal["round_robin", "least_connections"] = Field(default="round_robin")
+    # How long after a write the client's reads stay on the primary (recent-write cookie)
+    read_your_writes_seconds: int = Field(default=5)
+
+    # SQLite profile, applied on connect to file databases
+    sqlite_journal_mode: Literal["WAL", "DELETE", "TRUNCATE", "PERSIST"] = Field(default="WAL")
+    sqlite_synchronous: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = Field(default="NORMAL")
+    sqlite_mmap_size: int = Field(default=256 * 1024 * 1024)  # bytes; 0 disables memory-mapped I/O
+    sqlite_cache_size: int = Field(default=-64000)  # pages, or KiB when negative
+    sqlite_busy_timeout_ms: int = Field(default=5000)
+    sqlite_read_pool_size: int = Field(default=4)  # read-only connections for GET requests; 0 disables
+    sqlite_single_writer: bool = Field(default=True)  # serialize writes through one pooled connection
+
+    @property
+    def replica_urls(self) -> list[str]:
+        return [url.strip() for url in self.database_replica_urls.split(",") if url.strip()]
 
     class Config:
         env_file = ".env"
         extra = "ignore"
 
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -0,0 +1,20 @@
+from sqlalchemy.orm import DeclarativeBase
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+# Engines, pools and session factories live in app.db.session (one per process)
+from app.db.session import (  # noqa: E402
+    AsyncSessionLocal,
+    SessionLocal,
+    async_engine,
+    async_read_engine,
+    async_url,
+    engine,
+    read_engine,
+)
+from app.core.config import settings  # noqa: E402
+
+DB_URL = settings.sqlalchemy_database_uri
@@ -0,0 +1,94 @@
+"""
+Read/write routing for ORM sessions.
+
+Sessions built by `app.db.session` pick their engine per statement: flushes
+and INSERT/UPDATE/DELETE always go to the writer, plain reads go to a reader
+when the session is marked read-only. A session is read-only when it was
+created with `info={"read_only": True}` (FastAPI's `get_db` does this for
+GET/HEAD) or while the `read_only` context variable is set (the Flask app
+sets it per request from the HTTP method).
+
+Readers are replicas when DATABASE_REPLICA_URLS is set, picked round-robin or
+by fewest checked-out connections. A client that just wrote is pinned to the
+primary for a few seconds by the recent-write cookie set on write responses,
+or for a single request by sending the X-Read-Your-Writes header.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import count
+from typing import Iterator, Mapping, Sequence
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+RECENT_WRITE_COOKIE = "recent_write"
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes"
+
+read_only_context: ContextVar[bool] = ContextVar("db_read_only", default=False)
+
+
+@contextmanager
+def read_only() -> Iterator[None]:
+    """Route reads of sessions used inside this block to the read pool."""
+    token = read_only_context.set(True)
+    try:
+        yield
+    finally:
+        read_only_context.reset(token)
+
+
+def reads_from_replica(method: str, headers: Mapping[str, str], cookies: Mapping[str, str]) -> bool:
+    """True when a request may be served from a reader: safe method and no pending read-your-writes."""
+    if method not in SAFE_METHODS or RECENT_WRITE_COOKIE in cookies:
+        return False
+    return headers.get(READ_YOUR_WRITES_HEADER, "0") in ("", "0")
+
+
+def marks_recent_write(method: str, status_code: int) -> bool:
+    """Whether a response should carry the recent-write cookie."""
+    return method not in SAFE_METHODS and status_code < 400
+
+
+class EngineRouter:
+    """One writer engine plus zero or more read-only engines for the same data."""
+
+    def __init__(self, writer: Engine, readers: Sequence[Engine] = (), strategy: str = "round_robin"):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"unknown replica strategy {strategy!r}")
+        self.writer = writer
+        self.readers = list(readers)
+        self.strategy = strategy
+        self._turn = count()
+
+    def reader(self) -> Engine:
+        if not self.readers:
+            return self.writer
+        if len(self.readers) == 1:
+            return self.readers[0]
+        if self.strategy == "least_connections":
+            return min(self.readers, key=lambda eng: getattr(eng.pool, "checkedout", int)())
+        return self.readers[next(self._turn) % len(self.readers)]
+
+
+class RoutingSession(Session):
+    def __init__(self, *args, router: EngineRouter, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.router = router
+        self._reader = None
+
+    def is_read_only(self) -> bool:
+        return self.info.get("read_only", read_only_context.get())
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase) or not self.is_read_only():
+            return self.router.writer
+        # One reader per session, so a request sees a single replica's snapshot
+        if self._reader is None:
+            self._reader = self.router.reader()
+        return self._reader
+
+    def close(self) -> None:
+        super().close()
+        self._reader = None
@@ -1,8 +1,230 @@
-from sqlalchemy import create_engine
+"""
+Engine factory shared by every entry point (Flask, FastAPI, seeds, scripts).
+
+Pool sizing, overflow, recycle, pre-ping and timeouts all come from
+`app.core.config.Settings`. Each engine's pool reports checkout wait time,
+saturation and connection age through `app.metrics`.
+
+SQLite file databases get the tuning profile from Settings on connect (WAL,
+synchronous, mmap, cache, busy timeout), a single serialized writer
+connection and a separate `mode=ro` pool that read-only sessions use (see
+`app.db.routing`).
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from app.core.config import settings
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app import metrics
+from app.core.config import Settings, settings
+from app.db.routing import EngineRouter, RoutingSession
+
+# Async drivers for the FastAPI routers: asyncpg for Postgres, aiosqlite for dev
+_ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_url(url: str) -> str:
+    """Return the async-driver equivalent of a sync database URL."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise ValueError(f"no async driver configured for {backend!r} URLs")
+    return parsed.set(drivername=_ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+class PoolMetrics:
+    """Checkout wait, saturation and connection-age counters for one engine's pool."""
+
+    def __init__(self, name: str, samples: int = 1024):
+        self.name = name
+        self.engine = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._waits = deque(maxlen=samples)
+        self._connected_at = {}
+        self._lock = threading.Lock()
+
+    def observe_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self._waits.append(seconds)
+
+    def on_connect(self, dbapi_connection, connection_record) -> None:
+        self._connected_at[id(dbapi_connection)] = time.monotonic()
+
+    def on_close(self, dbapi_connection, connection_record) -> None:
+        self._connected_at.pop(id(dbapi_connection), None)
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool if self.engine is not None else None
+        capacity = (pool.size() + pool._max_overflow) if isinstance(pool, QueuePool) else None
+        checked_out = pool.checkedout() if isinstance(pool, QueuePool) else None
+        now = time.monotonic()
+        with self._lock:
+            waits = sorted(self._waits)
+            ages = [now - t for t in self._connected_at.values()]
+            return {
+                "pool_size": pool.size() if isinstance(pool, QueuePool) else None,
+                "capacity": capacity,
+                "checked_out": checked_out,
+                "saturation": round(checked_out / capacity, 4) if capacity else None,
+                "connections": len(ages),
+                "connection_age_max_s": round(max(ages), 3) if ages else 0.0,
+                "connection_age_mean_s": round(sum(ages) / len(ages), 3) if ages else 0.0,
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "checkout_wait_mean_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "checkout_wait_p99_ms": round(waits[int(0.99 * (len(waits) - 1))] * 1000, 3) if waits else 0.0,
+                "checkout_wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+def _instrumented(pool_class, pool_metrics: PoolMetrics):
+    """Subclass `pool_class` so every checkout is timed (survives pool.recreate())."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = pool_class._do_get(self)
+        except Exception:
+            pool_metrics.observe_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_metrics.observe_wait(time.perf_counter() - started)
+        return conn
+
+    return type(f"Instrumented{pool_class.__name__}", (pool_class,), {"_do_get": _do_get})
+
+
+def _is_sqlite_file(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def read_only_url(url: str) -> str:
+    """SQLite file URL opened with `mode=ro`, so reader connections can never take the write lock."""
+    if not _is_sqlite_file(url):
+        return url
+    parsed = make_url(url)
+    path = os.path.abspath(parsed.database)
+    return parsed.set(database=f"file:{path}", query={"mode": "ro", "uri": "true"}).render_as_string(hide_password=False)
+
+
+def _sqlite_profile(cfg: Settings, writer: bool):
+    def on_connect(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        if writer:
+            # Persistent in the database file; read-only connections inherit it
+            cursor.execute(f"PRAGMA journal_mode={cfg.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={cfg.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(cfg.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA mmap_size={int(cfg.sqlite_mmap_size)}")
+        cursor.execute(f"PRAGMA cache_size={int(cfg.sqlite_cache_size)}")
+        cursor.close()
+
+    return on_connect
+
+
+def _engine_kwargs(url: str, cfg: Settings, pool_class, pool_metrics: PoolMetrics, read_only: bool) -> dict:
+    parsed = make_url(url)
+    kwargs = {"echo": cfg.db_echo}
+    connect_args = {}
+    pool_size, max_overflow = cfg.db_pool_size, cfg.db_max_overflow
+    if parsed.get_backend_name() == "sqlite":
+        connect_args["check_same_thread"] = False
+        if not _is_sqlite_file(url):
+            # In-memory databases live and die with a single connection
+            return {**kwargs, "connect_args": connect_args}
+        if read_only:
+            pool_size = cfg.sqlite_read_pool_size
+        elif cfg.sqlite_single_writer:
+            # SQLite allows one writer at a time; queue in the pool, not on the file lock
+            pool_size, max_overflow = 1, 0
+    elif parsed.get_backend_name() == "postgresql":
+        if parsed.get_driver_name() == "asyncpg":
+            connect_args["timeout"] = cfg.db_connect_timeout
+            if cfg.db_statement_timeout_ms:
+                connect_args["server_settings"] = {"statement_timeout": str(cfg.db_statement_timeout_ms)}
+        else:
+            connect_args["connect_timeout"] = cfg.db_connect_timeout
+            if cfg.db_statement_timeout_ms:
+                connect_args["options"] = f"-c statement_timeout={cfg.db_statement_timeout_ms}"
+    return {
+        **kwargs,
+        "connect_args": connect_args,
+        "poolclass": _instrumented(pool_class, pool_metrics),
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": cfg.db_pool_timeout,
+        "pool_recycle": cfg.db_pool_recycle,
+        "pool_pre_ping": cfg.db_pool_pre_ping,
+    }
+
+
+def _watch(sync_engine: Engine, pool_metrics: PoolMetrics, cfg: Settings, read_only: bool) -> None:
+    pool_metrics.engine = sync_engine
+    event.listen(sync_engine, "connect", pool_metrics.on_connect)
+    event.listen(sync_engine.pool, "close", pool_metrics.on_close)
+    event.listen(sync_engine.pool, "close_detached", pool_metrics.on_close)
+    if _is_sqlite_file(sync_engine.url.render_as_string(hide_password=False)):
+        event.listen(sync_engine, "connect", _sqlite_profile(cfg, writer=not read_only))
+    metrics.register(pool_metrics.name, pool_metrics.snapshot)
+
+
+def create_db_engine(url: Optional[str] = None, cfg: Settings = settings, name: str = "db_pool",
+                     read_only: bool = False) -> Engine:
+    url = url or cfg.sqlalchemy_database_uri
+    if read_only:
+        url = read_only_url(url)
+    pool_metrics = PoolMetrics(name)
+    eng = create_engine(url, future=True, **_engine_kwargs(url, cfg, QueuePool, pool_metrics, read_only))
+    _watch(eng, pool_metrics, cfg, read_only)
+    return eng
+
+
+def create_async_db_engine(url: Optional[str] = None, cfg: Settings = settings, name: str = "db_pool_async",
+                           read_only: bool = False) -> AsyncEngine:
+    url = url or cfg.async_database_uri or async_url(cfg.sqlalchemy_database_uri)
+    if read_only:
+        url = read_only_url(url)
+    pool_metrics = PoolMetrics(name)
+    eng = create_async_engine(url, **_engine_kwargs(url, cfg, AsyncAdaptedQueuePool, pool_metrics, read_only))
+    _watch(eng.sync_engine, pool_metrics, cfg, read_only)
+    return eng
+
+
+def has_read_pool(url: str, cfg: Settings = settings) -> bool:
+    return _is_sqlite_file(url) and cfg.sqlite_read_pool_size > 0
+
+
+engine = create_db_engine()
+read_engine = create_db_engine(name="db_pool_read", read_only=True) if has_read_pool(str(engine.url)) else engine
+replica_engines = [create_db_engine(url, name=f"db_replica_{i}", read_only=True)
+                   for i, url in enumerate(settings.replica_urls)]
+router = EngineRouter(engine, replica_engines or [read_engine], strategy=settings.db_replica_strategy)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True,
+                            class_=RoutingSession, router=router)
 
-# SQLite needs check_same_thread=False for use in FastAPI dev
-connect_args = {"check_same_thread": False} if settings.sqlalchemy_database_uri.startswith("sqlite") else {}
-engine = create_engine(settings.sqlalchemy_database_uri, echo=False, future=True, connect_args=connect_args)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
+async_engine = create_async_db_engine()
+async_read_engine = (create_async_db_engine(name="db_pool_async_read", read_only=True)
+                     if has_read_pool(str(async_engine.url)) else async_engine)
+async_replica_engines = [create_async_db_engine(async_url(url), name=f"db_replica_async_{i}", read_only=True)
+                         for i, url in enumerate(settings.replica_urls)]
+async_router = EngineRouter(async_engine.sync_engine,
+                            [eng.sync_engine for eng in async_replica_engines or [async_read_engine]],
+                            strategy=settings.db_replica_strategy)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False,
+                                       sync_session_class=RoutingSession, router=async_router)
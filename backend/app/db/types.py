@@ -0,0 +1,13 @@
+"""Column types shared by the models."""
+from sqlalchemy import DateTime
+from sqlalchemy.dialects import sqlite
+
+# SQLite keeps datetimes as text and compares them as text. A func.now() default is
+# stored as CURRENT_TIMESTAMP ('YYYY-MM-DD HH:MM:SS'), while SQLAlchemy binds Python
+# datetimes with microseconds, which sort after it: a keyset cursor bound that way
+# would land past its own row. Columns used as a sort key are stored, and bound,
+# in CURRENT_TIMESTAMP's format instead (the id that follows them breaks ties).
+Timestamp = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
@@ -0,0 +1,354 @@
+"""
+Duplicate-contact detection and merging.
+
+Comparing every pair of contacts is quadratic, so contacts are compared only
+within blocks: groups sharing a blocking key.
+
+    email:<address>     the same normalized email
+    domain:<domain>     the same email domain (free-mail providers excluded)
+    phone:<digits>      the same last ten phone digits, however formatted
+    name:<words>        a name or company, legal suffixes dropped and words
+                        sorted ("acme", "john smith"), and its last word ("smith")
+
+Keys live in `contact_block`. A key shared by more than DEDUPE_MAX_BLOCK
+contacts ("smith", a big customer's domain) is too common to tell anything and
+is skipped, which keeps the work per contact bounded.
+
+The job is incremental: each run indexes and compares only the contacts
+added since the previous one (its position in `batch_job`, see app.batch_job),
+DEDUPE_BATCH_ROWS at a time, one commit per batch. Contact ids are never
+given out again (AUTOINCREMENT on SQLite, a sequence on PostgreSQL), so no
+new contact lands below the position. Each new contact is scored
+against every contact it shares a usable key with. Signals are exact email,
+exact phone digits, and trigram similarity of name and company. They are
+combined as a noisy-or, so agreeing signals reinforce each other, and two
+different emails or phones count against a pair. Pairs scoring at least
+DEDUPE_MIN_SCORE become `contact_duplicate` candidates; a pair recorded
+before is re-scored only while it is open, so a merged one keeps its history.
+
+Merging re-points the duplicates' deals, sale orders, invoices and projects
+at the kept contact, fills its empty fields from them and deletes them.
+
+    python -m app.dedupe          # one run, e.g. from cron
+"""
+import functools
+import os
+import re
+import unicodedata
+from types import SimpleNamespace
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.batch_job import BatchJob
+from app.models.contact import Contact
+from app.models.contact_dedupe import ContactBlock, ContactDedupeRun, ContactDuplicate
+from app.models.deal import Deal
+from app.models.invoice import Invoice
+from app.models.project import Project
+from app.models.sale_order import SaleOrder
+
+MIN_SCORE = float(os.getenv("DEDUPE_MIN_SCORE", "0.6"))
+MAX_BLOCK = int(os.getenv("DEDUPE_MAX_BLOCK", "200"))
+BATCH_ROWS = int(os.getenv("DEDUPE_BATCH_ROWS", "1000"))
+
+# How much a perfect match of each field alone says about two contacts, and how
+# much an outright mismatch (two different emails) counts against them
+WEIGHTS = (("email", 0.95), ("phone", 0.85), ("name", 0.8), ("company", 0.4))
+CONFLICTS = (("email", 0.3), ("phone", 0.2))
+FREE_MAIL = frozenset({
+    "gmail.com", "googlemail.com", "yahoo.com", "hotmail.com", "outlook.com", "live.com", "msn.com",
+    "icloud.com", "me.com", "aol.com", "proton.me", "protonmail.com", "gmx.com", "gmx.de", "mail.com",
+    "yandex.ru", "qq.com", "163.com",
+})
+SUFFIXES = frozenset({
+    "the", "and", "inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited", "llc",
+    "llp", "plc", "gmbh", "ag", "sa", "sas", "bv", "nv", "pty", "group", "holdings",
+})
+# Contacts re-pointed by a merge, by table
+REFERENCES = (Deal, SaleOrder, Invoice, Project)
+_KEY_LENGTH = ContactBlock.key.type.length
+_CHUNK = 500  # ids or keys per IN (...)
+_UPSERTS = {"sqlite": sqlite_insert, "postgresql": pg_insert}
+_word = re.compile(r"[^\W_]+")
+
+
+class MergeError(ValueError):
+    """A merge that names no duplicates, or the kept contact among them."""
+
+
+class Features(NamedTuple):
+    id: int
+    email: Optional[str]
+    phone: Optional[str]
+    name: Tuple[str, ...]
+    company: Tuple[str, ...]
+    name_grams: FrozenSet[str]
+    company_grams: FrozenSet[str]
+
+
+def tokens(text: Optional[str]) -> Tuple[str, ...]:
+    """Lower-case words of `text`, accents and legal suffixes dropped ("ACME Corp." -> ("acme",))."""
+    if not text:
+        return ()
+    if not text.isascii():
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return tuple(w for w in _word.findall(text.lower()) if w not in SUFFIXES)
+
+
+def phone_digits(phone: Optional[str]) -> Optional[str]:
+    digits = re.sub(r"\D", "", phone or "")
+    return digits[-10:] if len(digits) >= 7 else None
+
+
+def _grams(words: Sequence[str]) -> FrozenSet[str]:
+    text = f" {' '.join(words)} "
+    return frozenset(text[i:i + 3] for i in range(len(text) - 2)) if words else frozenset()
+
+
+def features(row) -> Features:
+    name, company = tokens(row.name), tokens(row.company)
+    email = (row.email or "").strip().lower() or None
+    return Features(row.id, email, phone_digits(row.phone), name, company, _grams(name), _grams(company))
+
+
+# Contacts in popular blocks are loaded again for batch after batch; rows are
+# (id, name, email, phone, company) tuples, so an edited contact misses the cache
+_cached_features = functools.lru_cache(maxsize=200_000)(features)
+
+
+def block_keys(f: Features) -> Set[str]:
+    keys = set()
+    if f.email:
+        keys.add(f"email:{f.email}")
+        domain = f.email.rpartition("@")[2]
+        if domain and domain not in FREE_MAIL:
+            keys.add(f"domain:{domain}")
+    if f.phone:
+        keys.add(f"phone:{f.phone}")
+    for words in (f.name, f.company):
+        if words:
+            # Not every word: first names would put each contact in a block of thousands
+            keys.add(f"name:{' '.join(sorted(words))}")
+            if len(words[-1]) >= 3:
+                keys.add(f"name:{words[-1]}")
+    return {key[:_KEY_LENGTH] for key in keys}
+
+
+def _dice(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def similarity(a: Features, b: Features) -> Dict[str, float]:
+    """Per-field similarity in [0, 1], for the fields both contacts have."""
+    signals = {}
+    if a.email and b.email:
+        signals["email"] = float(a.email == b.email)
+    if a.phone and b.phone:
+        signals["phone"] = float(a.phone == b.phone)
+    if a.name_grams and b.name_grams:
+        signals["name"] = 1.0 if a.name == b.name else _dice(a.name_grams, b.name_grams)
+    if a.company_grams and b.company_grams:
+        signals["company"] = 1.0 if a.company == b.company else _dice(a.company_grams, b.company_grams)
+    return signals
+
+
+def score(signals: Dict[str, float]) -> float:
+    missing = 1.0
+    for field, weight in WEIGHTS:
+        missing *= 1 - weight * signals.get(field, 0.0)
+    value = 1 - missing
+    for field, penalty in CONFLICTS:
+        if signals.get(field) == 0.0:
+            value *= 1 - penalty
+    return round(value, 4)
+
+
+def _chunks(values: Sequence, size: int = _CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+_CONTACT_COLUMNS = (Contact.id, Contact.name, Contact.email, Contact.phone, Contact.company)
+
+
+def _candidates_statement(dialect: str):
+    """INSERT of candidates; a pair already recorded is re-scored only while it is open."""
+    upsert = _UPSERTS.get(dialect)
+    if upsert is None:
+        return insert(ContactDuplicate)
+    stmt = upsert(ContactDuplicate)
+    return stmt.on_conflict_do_update(index_elements=["contact_id", "duplicate_id"],
+                                      set_={name: stmt.excluded[name] for name in ("score", "signals")},
+                                      where=ContactDuplicate.status == "open")
+
+
+def scan_batch(db, after_id: int, upto: int) -> Tuple[int, int, int]:
+    """Index and compare the next batch of contacts in (`after_id`, `upto`].
+
+    Returns (last id scanned, contacts scanned, candidates found); the last id is `after_id` when caught up.
+    """
+    rows = db.execute(select(*_CONTACT_COLUMNS).where(Contact.id > after_id, Contact.id <= upto)
+                      .order_by(Contact.id).limit(BATCH_ROWS)).all()
+    if not rows:
+        return after_id, 0, 0
+    new = {row.id: _cached_features(row) for row in rows}
+    keys = {id_: block_keys(f) for id_, f in new.items()}
+    # Index the batch first, so its contacts meet each other as well as older ones
+    blocks = [{"key": key, "contact_id": id_} for id_, ks in keys.items() for key in ks]
+    if blocks:
+        db.execute(ContactBlock.__table__.insert(), blocks)  # Core: no per-row ORM bookkeeping
+
+    wanted = sorted(set().union(*keys.values()))
+    usable = []
+    for chunk in _chunks(wanted):
+        sizes = db.execute(select(ContactBlock.key, func.count()).where(ContactBlock.key.in_(chunk))
+                           .group_by(ContactBlock.key)).all()
+        usable += [key for key, size in sizes if 1 < size <= MAX_BLOCK]
+    holders: Dict[str, List[int]] = {}
+    for id_, ks in keys.items():
+        for key in ks:
+            holders.setdefault(key, []).append(id_)
+    pairs: Set[Tuple[int, int]] = set()
+    for chunk in _chunks(usable):
+        for key, other in db.execute(select(ContactBlock.key, ContactBlock.contact_id)
+                                     .where(ContactBlock.key.in_(chunk))).all():
+            pairs.update((min(id_, other), max(id_, other)) for id_ in holders[key] if id_ != other)
+
+    known = dict(new)
+    missing = sorted({id_ for pair in pairs for id_ in pair} - known.keys())
+    for chunk in _chunks(missing):
+        known.update((row.id, _cached_features(row)) for row in db.execute(
+            select(*_CONTACT_COLUMNS).where(Contact.id.in_(chunk))).all())
+    candidates = []
+    for a, b in sorted(pairs):
+        if a in known and b in known:  # a contact deleted since it was indexed is skipped
+            signals = similarity(known[a], known[b])
+            value = score(signals)
+            if value >= MIN_SCORE:
+                candidates.append({"contact_id": a, "duplicate_id": b, "score": value, "status": "open",
+                                   "signals": {field: round(v, 4) for field, v in signals.items()}})
+    if candidates:
+        db.execute(_candidates_statement(db.get_bind().dialect.name), candidates)
+    return rows[-1].id, len(rows), len(candidates)
+
+
+def run_scan(db, run: ContactDedupeRun) -> ContactDedupeRun:
+    """Scan every contact added since the last run, committing `run`'s progress with each batch."""
+    return JOB.run(db, run)
+
+
+def new_run(db) -> Optional[ContactDedupeRun]:
+    """A committed run that starts where the furthest previous one got to; None if no contact is past it."""
+    return JOB.new_run(db)
+
+
+def start_scan() -> Optional[dict]:
+    """Start a run in a background thread (its report, or a caught-up one); None if one is already running."""
+    return JOB.start()
+
+
+def report(run: ContactDedupeRun) -> dict:
+    return {
+        "id": run.id,
+        "status": run.status,
+        "last_contact_id": run.last_contact_id,
+        "scanned": run.scanned,
+        "candidates": run.candidates,
+        "error": run.error,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+    }
+
+
+JOB = BatchJob("contact-dedupe", Contact.id, ContactDedupeRun, "last_contact_id", ("scanned", "candidates"), scan_batch,
+               report)
+
+
+def contacts_statement(ids: Iterable[int]):
+    return select(*_CONTACT_COLUMNS).where(Contact.id.in_(list(ids)))
+
+
+def merge_plan(keep_id: int, drop_ids: Sequence[int], rows: Sequence):
+    """(label, statement) pairs merging `drop_ids` into `keep_id`; `rows` are all of them
+    (contacts_statement). Labelled statements are the re-pointing UPDATEs, by table.
+
+    Raises MergeError for a malformed request, LookupError for a missing contact.
+    """
+    drop_ids = sorted(set(drop_ids))
+    if not drop_ids:
+        raise MergeError("name at least one duplicate to merge")
+    if keep_id in drop_ids:
+        raise MergeError("a contact cannot be merged into itself")
+    by_id = {row.id: row for row in rows}
+    missing = [id_ for id_ in (keep_id, *drop_ids) if id_ not in by_id]
+    if missing:
+        raise LookupError(f"Contact not found: {', '.join(map(str, missing))}")
+
+    for model in REFERENCES:
+        yield model.__tablename__, (update(model).where(model.contact_id.in_(drop_ids))
+                                    .values(contact_id=keep_id))
+    keep = by_id[keep_id]
+    filled = {}
+    for field in ("email", "phone", "company"):
+        if not getattr(keep, field):
+            value = next((getattr(by_id[i], field) for i in drop_ids if getattr(by_id[i], field)), None)
+            if value:
+                filled[field] = value
+
+    pair = or_(and_(ContactDuplicate.contact_id == keep_id, ContactDuplicate.duplicate_id.in_(drop_ids)),
+               and_(ContactDuplicate.contact_id.in_(drop_ids), ContactDuplicate.duplicate_id == keep_id))
+    yield None, update(ContactDuplicate).where(pair).values(status="merged")
+    yield None, delete(ContactDuplicate).where(
+        ContactDuplicate.status == "open",
+        or_(ContactDuplicate.contact_id.in_(drop_ids), ContactDuplicate.duplicate_id.in_(drop_ids)))
+    yield None, delete(ContactBlock).where(ContactBlock.contact_id.in_([keep_id, *drop_ids]))
+    yield None, delete(Contact).where(Contact.id.in_(drop_ids))
+    if filled:  # after the DELETE: an email taken over from a duplicate is unique
+        yield None, update(Contact).where(Contact.id == keep_id).values(**filled)
+    # Re-index the kept contact as it now reads (it may have gained an email or phone)
+    merged = features(SimpleNamespace(**{**keep._asdict(), **filled}))
+    blocks = [{"key": key, "contact_id": keep_id} for key in sorted(block_keys(merged))]
+    if blocks:
+        yield None, insert(ContactBlock).values(blocks)
+
+
+def merge(db, keep_id: int, drop_ids: Sequence[int]) -> Dict[str, int]:
+    """Merge with a Session and commit; returns the re-pointed row counts by table."""
+    rows = db.execute(contacts_statement([keep_id, *drop_ids])).all()
+    repointed = {}
+    for label, stmt in merge_plan(keep_id, drop_ids, rows):
+        result = db.execute(stmt)
+        if label:
+            repointed[label] = result.rowcount
+    db.commit()
+    return repointed
+
+
+async def merge_async(db, keep_id: int, drop_ids: Sequence[int]) -> Dict[str, int]:
+    """`merge` for an AsyncSession."""
+    rows = (await db.execute(contacts_statement([keep_id, *drop_ids]))).all()
+    repointed = {}
+    for label, stmt in merge_plan(keep_id, drop_ids, rows):
+        result = await db.execute(stmt)
+        if label:
+            repointed[label] = result.rowcount
+    await db.commit()
+    return repointed
+
+
+def main() -> None:
+    import json
+
+    import app.main  # noqa: F401  registers every model with the mapper
+
+    from app.db import SessionLocal
+
+    with SessionLocal() as db:
+        print(json.dumps(JOB.run_once(db), indent=2))
+
+
+if __name__ == "__main__":
+    main()
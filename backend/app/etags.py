@@ -0,0 +1,205 @@
+"""
+Strong ETags for GET endpoints, derived from per-table change versions.
+
+Every write bumps a counter row in `table_version` for each table it touched,
+in the same transaction as the write itself (ORM flushes and ORM-executed
+INSERT/UPDATE/DELETE statements both count). The bumps are the transaction's
+last statements, issued at commit in table-name order: the version rows are
+locked only from then to the commit, and always after the rows the
+transaction changed, so they cannot close a lock cycle with them (a
+reservation's product UPDATEs and a PUT's SELECT ... FOR UPDATE). Writers of
+one table still take turns on its version row for that moment; on
+PostgreSQL that is one row lock per table per commit. A GET names the tables its
+response is built from; the ETag is a hash of their versions and of the
+request's representation (path, query, Accept, decimal mode). When it matches
+`If-None-Match` the handler is skipped entirely: one primary-key lookup, a
+304 and no query or serialization of the collection.
+
+    @contacts_bp.get("/")
+    @require_auth
+    @conditional("contact")
+    def list_contacts(): ...
+
+The FastAPI side is `Depends(etag("contact"))` in app.api.deps.
+"""
+import functools
+import hashlib
+import threading
+from typing import Callable, Dict, Iterable, List, Mapping, Sequence, Set
+
+from sqlalchemy import event, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app import metrics, serialization
+from app.db import SessionLocal
+from app.models.table_version import TableVersion
+
+_table = TableVersion.__table__
+_UPSERTS = {"sqlite": sqlite_insert, "postgresql": pg_insert}
+_commit_callbacks: List[Callable[[Set[str]], None]] = []
+
+
+class EtagStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.not_modified = 0
+
+    def record(self, matched: bool) -> None:
+        with self._lock:
+            self.checks += 1
+            self.not_modified += matched
+
+    def stats(self) -> dict:
+        return {
+            "checks": self.checks,
+            "not_modified": self.not_modified,
+            "hit_ratio": self.not_modified / self.checks if self.checks else 0.0,
+        }
+
+
+etag_stats = EtagStats()
+metrics.register("etags", etag_stats.stats)
+
+
+def bump_statements(dialect: str, tables: Iterable[str]):
+    """Statements adding one to each table's version (creating missing rows), in a stable lock order."""
+    names = sorted(set(tables))
+    upsert = _UPSERTS.get(dialect)
+    if upsert is not None:
+        stmt = upsert(_table).values([{"table_name": name, "version": 1} for name in names])
+        return [stmt.on_conflict_do_update(index_elements=[_table.c.table_name],
+                                           set_={"version": _table.c.version + 1})]
+    # Other backends: seed the rows (migration 0006 does) and only update here
+    return [update(_table).where(_table.c.table_name.in_(names)).values(version=_table.c.version + 1)]
+
+
+def versions_statement(tables: Sequence[str]):
+    return select(_table.c.table_name, _table.c.version).where(_table.c.table_name.in_(tables))
+
+
+def make_etag(versions: Mapping[str, int], tables: Sequence[str], representation: str) -> str:
+    state = ",".join(f"{name}={versions.get(name, 0)}" for name in sorted(tables))
+    key = f"{state}|{representation}|exact={serialization.EXACT_DECIMALS}"
+    return '"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+
+
+def representation_key(path: str, query: str, accept: str) -> str:
+    return f"{path}?{query}|{accept}"
+
+
+def if_none_match_contains(header: str, tag: str) -> bool:
+    if not header:
+        return False
+    candidates = {part.strip() for part in header.split(",")}
+    return "*" in candidates or tag in candidates
+
+
+def _written_tables(session: Session) -> Dict[str, None]:
+    tables = {}
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, "__table__", None)
+        if table is not None and table is not _table and (obj not in session.dirty or session.is_modified(obj)):
+            tables[table.name] = None
+    return tables
+
+
+def on_commit(callback: Callable[[Set[str]], None]) -> None:
+    """Call `callback(tables)` after each commit that wrote to `tables` (e.g. to drop cached responses)."""
+    _commit_callbacks.append(callback)
+
+
+def _note_written(session: Session, tables: Iterable[str]) -> None:
+    session.info.setdefault("written_tables", set()).update(tables)
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flushed_tables(session: Session, flush_context) -> None:
+    tables = _written_tables(session)
+    if tables:
+        _note_written(session, tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_statement_tables(state: ORMExecuteState) -> None:
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    table = getattr(state.statement, "table", None)
+    if table is None or table is _table:
+        return
+    _note_written(state.session, [table.name])
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_written_tables(session: Session) -> None:
+    if session.in_nested_transaction():
+        return  # a savepoint; the enclosing commit bumps
+    session.flush()  # the commit's own flush would come after this hook
+    tables = session.info.get("written_tables")
+    if tables:
+        # Executed like the writes themselves, so they route to the writer
+        dialect = session.get_bind(clause=update(_table)).dialect.name
+        for stmt in bump_statements(dialect, tables):
+            session.execute(stmt)
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_commit(session: Session) -> None:
+    tables = session.info.pop("written_tables", None)
+    if tables:
+        for callback in _commit_callbacks:
+            callback(tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop("written_tables", None)
+
+
+def conditional(*tables: str, cache=None):
+    """Flask view decorator: ETag from `tables`' versions, 304 when If-None-Match matches.
+
+    With `cache` (an app.response_cache.ResponseCache) a 200 is also stored and replayed.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import g, make_response, request
+
+            # Routed like the view's own session, so a client that just wrote reads the primary
+            with SessionLocal() as db:
+                versions = dict(db.execute(versions_statement(tables)).all())
+            representation = representation_key(request.path, request.query_string.decode(),
+                                                request.headers.get("Accept", ""))
+            tag = make_etag(versions, tables, representation)
+            matched = if_none_match_contains(request.headers.get("If-None-Match", ""), tag)
+            etag_stats.record(matched)
+            if matched:
+                response = make_response("", 304)
+                response.headers["ETag"] = tag
+                return response
+
+            key = None
+            if cache is not None and cache.enabled:
+                from app.response_cache import cache_key, principal_scope
+
+                key = cache_key(principal_scope(getattr(g, "current_user", None)), tag)
+                entry = cache.get(key)
+                if entry is not None:
+                    body, headers = entry
+                    return make_response(body, 200, headers)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            response.headers["ETag"] = tag
+            if key is not None and not response.is_streamed:
+                cache.put(key, response.get_data(), response.headers.items(), tables)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -1,18 +1,23 @@
 import os
 from typing import Optional, Callable
 from fastapi import APIRouter, Depends, Header, HTTPException, status
-from itsdangerous import TimestampSigner, BadSignature, SignatureExpired
 from sqlalchemy import select
-from app.db import SessionLocal
+from app.db import AsyncSessionLocal
 from app.models.user import User
-from app.utils import verify_password
+from app.permissions import mask_allows, permission_map
+from app.tokens import Principal, authenticate_async, issue_token
+from app.utils import PasswordHashBusy, verify_password_async
 
 router = APIRouter()
 
 
-def _signer() -> TimestampSigner:
-    secret = os.getenv("SECRET_KEY", "dev-secret")
-    return TimestampSigner(secret_key=secret)
+def _secret() -> str:
+    return os.getenv("SECRET_KEY", "dev-secret")
+
+
+async def _find_user(username: str) -> Optional[User]:
+    async with AsyncSessionLocal(info={"read_only": True}) as db:
+        return (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
 
 
 @router.post("/login")
@@ -22,56 +27,52 @@ async def login(payload: dict):
     if not username or not password:
         raise HTTPException(status_code=400, detail="username and password required")
 
-    with SessionLocal() as db:
-        user = db.execute(select(User).where(User.username == username)).scalar_one_or_none()
-        if not user or not user.is_active:
+    # Cheap rejections happen before anything is queued on the bcrypt executor
+    user = await _find_user(username)
+    if not user or not user.is_active:
+        raise HTTPException(status_code=401, detail="invalid credentials")
+
+    if user.password_hash:
+        try:
+            verified = await verify_password_async(password, user.password_hash)
+        except PasswordHashBusy:
+            raise HTTPException(status_code=503, detail="too many logins in progress, retry shortly",
+                                headers={"Retry-After": "1"})
+        if not verified:
+            raise HTTPException(status_code=401, detail="invalid credentials")
+    else:
+        expected_p = os.getenv("ADMIN_PASSWORD", "admin")
+        if password != expected_p:
             raise HTTPException(status_code=401, detail="invalid credentials")
 
-        if user.password_hash:
-            if not verify_password(password, user.password_hash):
-                raise HTTPException(status_code=401, detail="invalid credentials")
-        else:
-            expected_p = os.getenv("ADMIN_PASSWORD", "admin")
-            if password != expected_p:
-                raise HTTPException(status_code=401, detail="invalid credentials")
-
-        token = _signer().sign(f"{user.id}:{user.username}".encode()).decode()
-        return {
-            "token": token,
-            "user": {
-                "id": user.id,
-                "username": user.username,
-                "email": user.email,
-                "role_id": user.role_id,
-            },
-        }
-
-
-async def get_current_user(Authorization: Optional[str] = Header(default=None)) -> Optional[User]:
+    await permission_map.refresh_async()  # the token carries the role's mask
+    token = issue_token(user, _secret())
+    return {
+        "token": token,
+        "user": {
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "role_id": user.role_id,
+        },
+    }
+
+
+async def get_current_user(Authorization: Optional[str] = Header(default=None)) -> Optional[Principal]:
     if not Authorization or not Authorization.startswith("Bearer "):
         return None
-    token = Authorization[7:]
-    try:
-        payload = _signer().unsign(token, max_age=60 * 60 * 24).decode()
-        user_id = int(payload.split(":")[0])
-        with SessionLocal() as db:
-            user = db.get(User, user_id)
-            return user
-    except (BadSignature, SignatureExpired, ValueError, IndexError):
-        return None
+    return await authenticate_async(Authorization[7:], _secret())
 
 
-async def require_auth(user: Optional[User] = Depends(get_current_user)) -> User:
+async def require_auth(user: Optional[Principal] = Depends(get_current_user)) -> Principal:
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="unauthorized")
     return user
 
 
 def require_permission(permission_name: str) -> Callable:
-    async def dependency(user: User = Depends(require_auth)) -> User:
-        # Admin shortcut
-        if user.role_id == 1:
-            return user
-        # TODO: implement proper RolePermission lookup
+    async def dependency(user: Principal = Depends(require_auth)) -> Principal:
+        if not mask_allows(user.role_id, user.permissions, permission_name):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="forbidden")
         return user
     return dependency
@@ -1,7 +1,17 @@
-from fastapi import FastAPI
+from decimal import Decimal
+from fastapi import FastAPI, Request
+from fastapi.encoders import ENCODERS_BY_TYPE
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
+from app import metrics
+from app.core.config import settings
 from app.db import Base, engine
+from app.db.routing import RECENT_WRITE_COOKIE, marks_recent_write
+from app.pagination import PAGE_HEADERS
+from app.filters import InvalidFilter
+from app.projections import InvalidFields
+from app.serialization import ORJSONResponse, encode_decimal
 from app.api.contacts import router as contacts_router
 from app.api.deals import router as deals_router
 from app.api.inventory import router as inventory_router
@@ -18,7 +28,12 @@ Path("data").mkdir(parents=True, exist_ok=True)
 # Create tables (dev convenience)
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="KellyOS API", version="1.0.0", description="Modern business operating system - better than Odoo")
+# Dicts returned by handlers go through jsonable_encoder before the response class;
+# encode Decimals there the same way app.serialization does
+ENCODERS_BY_TYPE[Decimal] = encode_decimal
+
+app = FastAPI(title="KellyOS API", version="1.0.0", description="Modern business operating system - better than Odoo",
+              default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,8 +41,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[*PAGE_HEADERS, "ETag"],
 )
 
+
+@app.middleware("http")
+async def mark_recent_write(request: Request, call_next):
+    # Keeps this client's reads on the primary until replicas have caught up
+    response = await call_next(request)
+    if marks_recent_write(request.method, response.status_code):
+        response.set_cookie(RECENT_WRITE_COOKIE, "1", max_age=settings.read_your_writes_seconds, httponly=True)
+    return response
+
+
+@app.exception_handler(InvalidFields)
+async def invalid_fields(request: Request, exc: InvalidFields):
+    return JSONResponse({"detail": str(exc)}, status_code=400)
+
+
+@app.exception_handler(InvalidFilter)
+async def invalid_filter(request: Request, exc: InvalidFilter):
+    return JSONResponse({"detail": str(exc)}, status_code=400)
+
+
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(contacts_router, prefix="/contacts", tags=["contacts"])
 app.include_router(deals_router, prefix="/deals", tags=["deals"])
@@ -42,3 +78,8 @@ app.include_router(hr_router, prefix="/hr", tags=["hr"])
 @app.get("/")
 async def health():
     return {"app": "KellyOS", "version": "1.0.0", "status": "ok"}
+
+
+@app.get("/metrics")
+async def metrics_snapshot():
+    return metrics.snapshot()
@@ -0,0 +1,142 @@
+"""
+Declarative, index-backed filtering and sorting for list endpoints.
+
+Each resource declares which columns can be filtered and how, and which can
+be sorted on; everything else is a 400. The query string compiles straight
+to SQL:
+
+    ?stage=won                  stage = 'won'
+    ?status=sent,paid           status IN ('sent', 'paid')
+    ?invoice_date__gte=2026-01-01&invoice_date__lte=2026-03-31
+    ?sort=-total                ORDER BY total DESC, id DESC (keyset-paged)
+    ?sort=price                 ORDER BY price ASC, id ASC
+
+A spec refuses (at import) any filter or sort column that no index on the
+table leads with, so a client can never ask for a full scan, and sorting on
+nullable columns (keyset cursors cannot step past NULLs). `scope` names
+columns the endpoint always pins with equality (e.g. a task list's
+project_id); an index may lead with those before the filtered column.
+"""
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy.sql import Select
+
+from app.models.deal import Deal
+from app.models.invoice import Invoice
+from app.models.product import Product
+from app.models.project import Project, Task
+from app.models.sale_order import SaleOrder
+
+EQ = ("eq",)
+RANGE = ("gte", "lte")
+EQ_RANGE = EQ + RANGE
+
+# Query parameters owned by pagination, projections and streaming
+RESERVED = frozenset({"limit", "after", "count", "fields", "format", "sort"})
+
+
+class InvalidFilter(ValueError):
+    """A filter or sort the resource does not support, or a value of the wrong type."""
+
+
+def _coerce(column, raw: str):
+    python_type = column.type.python_type
+    try:
+        if python_type is date:
+            return date.fromisoformat(raw)
+        if python_type is datetime:
+            return datetime.fromisoformat(raw)
+        if python_type is Decimal:
+            return Decimal(raw)
+        return python_type(raw)
+    except (ValueError, InvalidOperation):
+        raise InvalidFilter(f"invalid value for {column.key}: {raw!r}")
+
+
+class ListSpec:
+    def __init__(self, model, filters: Mapping[str, Sequence[str]], sorts: Sequence[str] = (),
+                 scope: Sequence[str] = ()):
+        self.model = model
+        self.filters = {name: tuple(ops) for name, ops in filters.items()}
+        self.sorts = tuple(sorts)
+        self.scope = tuple(scope)
+        table = model.__table__
+        unindexed = [name for name in (*self.filters, *self.sorts) if not self._indexed(name)]
+        if unindexed:
+            raise ValueError(f"{table.name}: no index leads with {', '.join(unindexed)}")
+        # Keyset cursors compare sort keys, and NULLs never compare (see app.pagination)
+        nullable = [name for name in self.sorts if table.c[name].nullable]
+        if nullable:
+            raise ValueError(f"{table.name}: cannot sort on nullable {', '.join(nullable)}")
+
+    def _indexed(self, name: str) -> bool:
+        table = self.model.__table__
+        if name in table.primary_key.columns:
+            return True
+        for index in table.indexes:
+            columns = [c.key for c in index.columns]
+            while columns and columns[0] in self.scope and columns[0] != name:
+                columns.pop(0)
+            if columns and columns[0] == name:
+                return True
+        return False
+
+    def query(self, projection, names: Sequence[str], args: Mapping[str, str],
+              keys: Optional[Sequence] = None) -> Tuple[Select, List, bool]:
+        """SELECT `names` from `projection` with the requested filters and sort.
+
+        Returns (stmt, keyset keys, descending) for app.pagination; `keys`
+        defaults to the primary key, newest first.
+        """
+        keys, descending = self.ordering(args.get("sort"), keys or [self.model.id])
+        return self.filter(projection.select(names, keys), args), keys, descending
+
+    def filter(self, stmt: Select, args: Mapping[str, str]) -> Select:
+        for param in args.keys():
+            if param in RESERVED:
+                continue
+            name, _, op = param.partition("__")
+            op = op or "eq"
+            if op not in self.filters.get(name, ()):
+                raise InvalidFilter(f"unsupported filter: {param} (supported: {', '.join(self.describe()) or 'none'})")
+            stmt = stmt.where(self._condition(name, op, args.get(param)))
+        return stmt
+
+    def ordering(self, sort: Optional[str], keys: Sequence) -> Tuple[List, bool]:
+        if not sort:
+            return list(keys), True
+        descending = sort.startswith("-")
+        name = sort.lstrip("-")
+        if name not in self.sorts:
+            raise InvalidFilter(f"unsupported sort: {name} (supported: {', '.join(self.sorts) or 'none'})")
+        return [getattr(self.model, name), self.model.id], descending
+
+    def _condition(self, name: str, op: str, raw: str):
+        column = getattr(self.model, name)
+        if op == "gte":
+            return column >= _coerce(column, raw)
+        if op == "lte":
+            return column <= _coerce(column, raw)
+        values = [_coerce(column, value) for value in raw.split(",") if value != ""]
+        if not values:
+            raise InvalidFilter(f"empty filter: {name}")
+        return column == values[0] if len(values) == 1 else column.in_(values)
+
+    def describe(self) -> Iterable[str]:
+        """Accepted query parameters, for error messages and docs."""
+        for name, ops in self.filters.items():
+            yield from (name if op == "eq" else f"{name}__{op}" for op in ops)
+
+
+DEALS = ListSpec(Deal, {"stage": EQ, "contact_id": EQ, "amount": RANGE}, sorts=("amount",))
+PRODUCTS = ListSpec(Product, {"price": RANGE, "stock": RANGE}, sorts=("price", "stock"))
+SALE_ORDERS = ListSpec(SaleOrder, {"status": EQ, "contact_id": EQ, "total": RANGE}, sorts=("total",))
+INVOICES = ListSpec(
+    Invoice,
+    {"status": EQ, "contact_id": EQ, "invoice_date": EQ_RANGE, "due_date": EQ_RANGE, "total": RANGE},
+    sorts=("total",),
+)
+PROJECTS = ListSpec(Project, {"status": EQ, "contact_id": EQ})
+PROJECT_TASKS = ListSpec(Task, {"status": EQ, "due_date": EQ_RANGE}, scope=("project_id",))
@@ -2,15 +2,22 @@ from flask import Flask, jsonify
 import os
 from pathlib import Path
 from app.db import Base, engine
-from app import create_app
+from app import create_app, metrics
+from app.models.batch_job import BatchJobPosition  # noqa: F401  ensure model is imported
 from app.models.contact import Contact  # noqa: F401  ensure model is imported
+from app.models.contact_import import ContactImportJob  # noqa: F401  ensure model is imported
+from app.models.contact_dedupe import ContactBlock, ContactDedupeRun, ContactDuplicate  # noqa: F401  ensure models are imported
 from app.models.deal import Deal  # noqa: F401  ensure model is imported
+from app.models.deal_history import DealStageCompaction, DealStageEvent  # noqa: F401  ensure models are imported
 from app.models.product import Product  # noqa: F401  ensure model is imported
+from app.models.product_feed import ProductFeedJob  # noqa: F401  ensure model is imported
+from app.models.stock_movement import StockMovement, StockSnapshot  # noqa: F401  ensure models are imported
 from app.models.sale_order import SaleOrder, OrderItem  # noqa: F401  ensure models are imported
 from app.models.user import User, Role  # noqa: F401  ensure models are imported
 from app.models.permission import Permission, RolePermission  # noqa: F401  ensure models are imported
 from app.models.invoice import Invoice, InvoiceItem  # noqa: F401  ensure models are imported
 from app.models.project import Project, Task, TimeSheet  # noqa: F401  ensure models are imported
+from app.models.table_version import TableVersion  # noqa: F401  ensure model is imported
 
 
 # Ensure data dir exists for SQLite
@@ -27,6 +34,11 @@ def health():
     return jsonify({"app": "KellyOS (Legacy Flask)", "status": "ok"})
 
 
+@app.get("/metrics")
+def metrics_snapshot():
+    return jsonify(metrics.snapshot())
+
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "8000"))
     app.run(host="127.0.0.1", port=port, debug=True)
@@ -0,0 +1,19 @@
+"""
+Tiny in-process metrics registry.
+
+Components register a callable returning a dict of counters; `snapshot()`
+collects them all for the `/metrics` endpoint of both apps.
+"""
+from typing import Callable, Dict
+
+_sources: Dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, source: Callable[[], dict]) -> None:
+    """Register (or replace) a metrics source under `name`."""
+    _sources[name] = source
+
+
+def snapshot() -> dict:
+    """Collect the current value of every registered source."""
+    return {name: source() for name, source in _sources.items()}
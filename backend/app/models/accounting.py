@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, DateTime, Enum, func
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, DateTime, Enum, Index, func
 from sqlalchemy.orm import relationship
 from app.db import Base
+from app.db.types import Timestamp
 import enum
 
 class AccountType(str, enum.Enum):
@@ -44,11 +45,12 @@ class JournalEntry(Base):
     ref = Column(String(100), nullable=True, index=True)
     memo = Column(String(200), nullable=True)
     currency_id = Column(Integer, ForeignKey("currency.id"), nullable=True)
-    posted_at = Column(DateTime(timezone=True), server_default=func.now())
+    posted_at = Column(Timestamp, server_default=func.now(), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     currency = relationship("Currency")
     lines = relationship("JournalLine", back_populates="entry", cascade="all, delete-orphan")
+    __table_args__ = (Index("ix_journal_entry_posted_at_id", "posted_at", "id"),)  # keyset pagination
 
 class JournalLine(Base):
     __tablename__ = "journal_line"
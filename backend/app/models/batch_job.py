@@ -0,0 +1,12 @@
+from sqlalchemy import Column, DateTime, Integer, String, func
+from app.db import Base
+
+
+class BatchJobPosition(Base):
+    """How far a batch job has got (see app.batch_job); each batch claims and advances it."""
+
+    __tablename__ = "batch_job"
+
+    name = Column(String(50), primary_key=True)
+    position = Column(Integer, nullable=False, default=0)  # rows up to this id are done
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,4 +1,6 @@
-from sqlalchemy import String, Integer, DateTime, func, Column
+import sqlite3
+
+from sqlalchemy import String, Integer, DateTime, func, Column, Index, event, text
 from app.db import Base
 
 
@@ -12,3 +14,58 @@ class Contact(Base):
     company = Column(String(200), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # one contact per email, ignoring case (bulk import relies on it, app.contact_import); ids
+    # are never given out again, which the dedupe scan's position relies on (app.dedupe)
+    __table_args__ = (Index("ix_contact_email_lower", func.lower(email), unique=True), {"sqlite_autoincrement": True})
+
+
+# Search index (app.search). SQLite keeps an external-content FTS5 trigram
+# table in step with `contact` through triggers; Postgres maintains a pg_trgm
+# GiST expression index itself (GiST, so the nearest matches are read off the
+# index in order). Migration 0008 carries the same DDL.
+FTS_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34, 0)
+SEARCH_DOCUMENT = (
+    "lower(coalesce(name, '') || ' ' || coalesce(email, '') || ' ' "
+    "|| coalesce(company, '') || ' ' || coalesce(phone, ''))"
+)
+SEARCH_DDL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS contact_fts USING fts5("
+        "name, email, company, phone, content='contact', content_rowid='id', tokenize='trigram')",
+        "CREATE TRIGGER IF NOT EXISTS contact_fts_ai AFTER INSERT ON contact BEGIN "
+        "INSERT INTO contact_fts(rowid, name, email, company, phone) "
+        "VALUES (new.id, new.name, new.email, new.company, new.phone); END",
+        "CREATE TRIGGER IF NOT EXISTS contact_fts_ad AFTER DELETE ON contact BEGIN "
+        "INSERT INTO contact_fts(contact_fts, rowid, name, email, company, phone) "
+        "VALUES ('delete', old.id, old.name, old.email, old.company, old.phone); END",
+        "CREATE TRIGGER IF NOT EXISTS contact_fts_au AFTER UPDATE OF name, email, company, phone ON contact BEGIN "
+        "INSERT INTO contact_fts(contact_fts, rowid, name, email, company, phone) "
+        "VALUES ('delete', old.id, old.name, old.email, old.company, old.phone); "
+        "INSERT INTO contact_fts(rowid, name, email, company, phone) "
+        "VALUES (new.id, new.name, new.email, new.company, new.phone); END",
+        # Index rows written before the triggers existed
+        "INSERT INTO contact_fts(contact_fts) VALUES ('rebuild')",
+    ],
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        f"CREATE INDEX IF NOT EXISTS ix_contact_search_trgm ON contact USING gist (({SEARCH_DOCUMENT}) gist_trgm_ops)",
+    ],
+}
+
+
+def search_index_supported(dialect: str) -> bool:
+    return dialect == "postgresql" or (dialect == "sqlite" and FTS_TRIGRAM)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_search_index(metadata, connection, **kw) -> None:
+    dialect = connection.dialect.name
+    if not search_index_supported(dialect):
+        return
+    if dialect == "sqlite":
+        present = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'contact_fts'")).first()
+        if present:
+            return  # triggers have kept it current; skip the rebuild
+    for statement in SEARCH_DDL[dialect]:
+        connection.execute(text(statement))
@@ -0,0 +1,49 @@
+from sqlalchemy import JSON, Column, DateTime, Float, Index, Integer, String, UniqueConstraint, func
+from app.db import Base
+
+# Rows here outlive the contacts they name (a merge deletes one side), so the
+# contact ids carry no foreign keys.
+
+
+class ContactBlock(Base):
+    """A blocking key of a contact (see app.dedupe); contacts sharing a key get compared."""
+
+    __tablename__ = "contact_block"
+
+    key = Column(String(160), primary_key=True)
+    contact_id = Column(Integer, primary_key=True, index=True)
+
+
+class ContactDuplicate(Base):
+    """A scored merge candidate: `duplicate_id` (the newer contact) likely repeats `contact_id`."""
+
+    __tablename__ = "contact_duplicate"
+
+    id = Column(Integer, primary_key=True, index=True)
+    contact_id = Column(Integer, nullable=False, index=True)
+    duplicate_id = Column(Integer, nullable=False, index=True)
+    score = Column(Float, nullable=False)
+    signals = Column(JSON, nullable=False, default=dict)  # per-field similarity, e.g. {"phone": 1.0}
+    status = Column(String(20), nullable=False, default="open")  # open, merged
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("contact_id", "duplicate_id", name="uq_contact_duplicate_pair"),
+        # review queue: open candidates, best first (keyset on score, id)
+        Index("ix_contact_duplicate_status_score_id", "status", "score", "id"),
+    )
+
+
+class ContactDedupeRun(Base):
+    """One pass of the dedupe job over the contacts added since the previous one."""
+
+    __tablename__ = "contact_dedupe_run"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String(20), nullable=False, default="running")  # running, completed, superseded, failed
+    last_contact_id = Column(Integer, nullable=False, default=0)  # contacts up to here are indexed
+    scanned = Column(Integer, nullable=False, default=0)
+    candidates = Column(Integer, nullable=False, default=0)
+    error = Column(String(500), nullable=True)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
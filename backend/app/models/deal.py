@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, ForeignKey
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, Index, event, text
 from sqlalchemy.orm import relationship
 from app.db import Base
 
@@ -13,3 +13,97 @@ class Deal(Base):
     contact_id = Column(Integer, ForeignKey("contact.id"), nullable=True, index=True)
 
     contact = relationship("Contact", backref="deals")
+
+    # filter/sort access patterns (app.filters)
+    __table_args__ = (
+        Index("ix_deal_stage_id", "stage", "id"),
+        Index("ix_deal_contact_id_id", "contact_id", "id"),
+        Index("ix_deal_amount_id", "amount", "id"),
+    )
+
+
+class DealStageSummary(Base):
+    """Deal count and amount per stage, kept current by triggers on `deal` (see PIPELINE_DDL)."""
+
+    __tablename__ = "deal_stage_summary"
+
+    contact_id = Column(Integer, primary_key=True)  # 0: deals without a contact; otherwise that contact's deals
+    stage = Column(String(50), primary_key=True)  # '' for deals without a stage
+    deals = Column(Integer, nullable=False, default=0)
+    amount = Column(Numeric(16, 2), nullable=False, default=0)
+
+
+# /deals/pipeline summary (app.pipeline). Each deal counts in one row, its
+# contact's (0 for deals without a contact), so concurrent writes for
+# different contacts never update the same row; the unfiltered pipeline sums
+# the rows per stage. Triggers apply every insert, delete and
+# stage/amount/contact change, whatever issued it (ORM, bulk statements, raw
+# SQL); rows that drop to zero deals are removed. Creating them rebuilds the
+# table from a GROUP BY over `deal`. Migrations 0011 and 0019 carry the same DDL.
+_SQLITE_REMOVE = (
+    "UPDATE deal_stage_summary SET deals = deals - 1, amount = amount - old.amount "
+    "WHERE contact_id = coalesce(old.contact_id, 0) AND stage = coalesce(old.stage, ''); "
+    "DELETE FROM deal_stage_summary "
+    "WHERE contact_id = coalesce(old.contact_id, 0) AND stage = coalesce(old.stage, '') AND deals = 0;"
+)
+_SQLITE_ADD = (
+    "INSERT OR IGNORE INTO deal_stage_summary (contact_id, stage, deals, amount) "
+    "VALUES (coalesce(new.contact_id, 0), coalesce(new.stage, ''), 0, 0); "
+    "UPDATE deal_stage_summary SET deals = deals + 1, amount = amount + new.amount "
+    "WHERE contact_id = coalesce(new.contact_id, 0) AND stage = coalesce(new.stage, '');"
+)
+PIPELINE_REBUILD = [
+    "DELETE FROM deal_stage_summary",
+    "INSERT INTO deal_stage_summary (contact_id, stage, deals, amount) "
+    "SELECT coalesce(contact_id, 0), coalesce(stage, ''), count(*), sum(amount) FROM deal "
+    "GROUP BY coalesce(contact_id, 0), coalesce(stage, '')",
+]
+PIPELINE_DDL = {
+    "sqlite": [
+        f"CREATE TRIGGER IF NOT EXISTS deal_stage_summary_ai AFTER INSERT ON deal BEGIN {_SQLITE_ADD} END",
+        f"CREATE TRIGGER IF NOT EXISTS deal_stage_summary_ad AFTER DELETE ON deal BEGIN {_SQLITE_REMOVE} END",
+        "CREATE TRIGGER IF NOT EXISTS deal_stage_summary_au AFTER UPDATE OF stage, amount, contact_id ON deal "
+        f"BEGIN {_SQLITE_REMOVE} {_SQLITE_ADD} END",
+        *PIPELINE_REBUILD,
+    ],
+    "postgresql": [
+        "CREATE OR REPLACE FUNCTION deal_stage_summary_apply(scope integer, stage_ text, deals_ integer, "
+        "amount_ numeric) RETURNS void AS $$ BEGIN "
+        "INSERT INTO deal_stage_summary AS s (contact_id, stage, deals, amount) "
+        "VALUES (scope, stage_, deals_, amount_) ON CONFLICT (contact_id, stage) "
+        "DO UPDATE SET deals = s.deals + excluded.deals, amount = s.amount + excluded.amount; "
+        "DELETE FROM deal_stage_summary WHERE contact_id = scope AND stage = stage_ AND deals = 0; "
+        "END $$ LANGUAGE plpgsql",
+        "CREATE OR REPLACE FUNCTION deal_stage_summary_track() RETURNS trigger AS $$ BEGIN "
+        "IF TG_OP IN ('UPDATE', 'DELETE') THEN "
+        "PERFORM deal_stage_summary_apply(coalesce(OLD.contact_id, 0), coalesce(OLD.stage, ''), -1, -OLD.amount); "
+        "END IF; "
+        "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+        "PERFORM deal_stage_summary_apply(coalesce(NEW.contact_id, 0), coalesce(NEW.stage, ''), 1, NEW.amount); "
+        "END IF; "
+        "RETURN NULL; END $$ LANGUAGE plpgsql",
+        "DROP TRIGGER IF EXISTS deal_stage_summary_track ON deal",
+        "CREATE TRIGGER deal_stage_summary_track AFTER INSERT OR DELETE OR UPDATE OF stage, amount, contact_id "
+        "ON deal FOR EACH ROW EXECUTE FUNCTION deal_stage_summary_track()",
+        *PIPELINE_REBUILD,
+    ],
+}
+_PIPELINE_TRIGGER_PRESENT = {
+    "sqlite": "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'deal_stage_summary_ai'",
+    "postgresql": "SELECT 1 FROM pg_trigger WHERE tgname = 'deal_stage_summary_track'",
+}
+
+
+def pipeline_summary_supported(dialect: str) -> bool:
+    return dialect in PIPELINE_DDL
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_pipeline_summary(metadata, connection, **kw) -> None:
+    dialect = connection.dialect.name
+    if not pipeline_summary_supported(dialect):
+        return
+    if connection.execute(text(_PIPELINE_TRIGGER_PRESENT[dialect])).first():
+        return  # triggers have kept it current; skip the rebuild
+    for statement in PIPELINE_DDL[dialect]:
+        connection.execute(text(statement))
@@ -0,0 +1,110 @@
+from sqlalchemy import Column, DateTime, Float, Index, Integer, Numeric, String, event, func, text
+from app.db import Base
+
+# The log outlives the deals it records, so deal ids carry no foreign key.
+
+
+class DealStageEvent(Base):
+    """A deal entering a stage: its creation, or a change of `deal.stage` (append-only, see HISTORY_DDL)."""
+
+    __tablename__ = "deal_stage_event"
+
+    id = Column(Integer, primary_key=True, index=True)
+    deal_id = Column(Integer, nullable=False)
+    from_stage = Column(String(50), nullable=True)  # NULL on creation, or when the deal had no stage
+    to_stage = Column(String(50), nullable=True)
+    amount = Column(Numeric(12, 2), nullable=False, default=0)  # the deal's amount at the time
+    changed_at = Column(DateTime(timezone=True), nullable=False)
+
+    # a deal's history in order, for the compaction's window functions
+    __table_args__ = (Index("ix_deal_stage_event_deal_id_id", "deal_id", "id"),)
+
+
+class DealStageRollup(Base):
+    """Per-stage totals over the compacted part of the log (see app.stage_analytics)."""
+
+    __tablename__ = "deal_stage_rollup"
+
+    stage = Column(String(50), primary_key=True)  # '' for no stage
+    entered = Column(Integer, nullable=False, default=0)
+    entered_amount = Column(Numeric(16, 2), nullable=False, default=0)
+    entered_age = Column(Float, nullable=False, default=0)  # seconds from the deal's creation, summed
+    exited = Column(Integer, nullable=False, default=0)
+    converted = Column(Integer, nullable=False, default=0)  # exits to a stage other than a lost one
+    stay_seconds = Column(Float, nullable=False, default=0)  # time in stage of the exits, summed
+
+
+class DealStageDuration(Base):
+    """How many finished stays in `stage` lasted about as long as `bucket` says (for medians)."""
+
+    __tablename__ = "deal_stage_duration"
+
+    stage = Column(String(50), primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    stays = Column(Integer, nullable=False, default=0)
+
+
+class DealStageCompaction(Base):
+    """One pass folding the log's new events into the rollups."""
+
+    __tablename__ = "deal_stage_compaction"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String(20), nullable=False, default="running")  # running, completed, superseded, failed
+    last_event_id = Column(Integer, nullable=False, default=0)  # events up to here are in the rollups
+    events = Column(Integer, nullable=False, default=0)
+    stays = Column(Integer, nullable=False, default=0)
+    error = Column(String(500), nullable=True)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+# Triggers append an event whenever a deal is created or its stage changes,
+# whatever issued the write (ORM, bulk statements, raw SQL). Creating them
+# records every existing deal as entering its current stage now: history
+# starts there. Migration 0012 carries the same DDL.
+_SQLITE_LOG = (
+    "INSERT INTO deal_stage_event (deal_id, from_stage, to_stage, amount, changed_at) "
+    "VALUES (new.id, {from_stage}, new.stage, new.amount, strftime('%Y-%m-%d %H:%M:%f', 'now'));"
+)
+HISTORY_DDL = {
+    "sqlite": [
+        "CREATE TRIGGER IF NOT EXISTS deal_stage_event_ai AFTER INSERT ON deal "
+        f"BEGIN {_SQLITE_LOG.format(from_stage='NULL')} END",
+        "CREATE TRIGGER IF NOT EXISTS deal_stage_event_au AFTER UPDATE OF stage ON deal "
+        f"WHEN old.stage IS NOT new.stage BEGIN {_SQLITE_LOG.format(from_stage='old.stage')} END",
+        "INSERT INTO deal_stage_event (deal_id, from_stage, to_stage, amount, changed_at) "
+        "SELECT id, NULL, stage, amount, strftime('%Y-%m-%d %H:%M:%f', 'now') FROM deal ORDER BY id",
+    ],
+    "postgresql": [
+        "CREATE OR REPLACE FUNCTION deal_stage_event_log() RETURNS trigger AS $$ "
+        "DECLARE from_stage_ text; BEGIN "
+        "IF TG_OP = 'UPDATE' THEN from_stage_ := OLD.stage; END IF; "
+        "INSERT INTO deal_stage_event (deal_id, from_stage, to_stage, amount, changed_at) "
+        "VALUES (NEW.id, from_stage_, NEW.stage, NEW.amount, clock_timestamp()); "
+        "RETURN NULL; END $$ LANGUAGE plpgsql",
+        "DROP TRIGGER IF EXISTS deal_stage_event_ai ON deal",
+        "CREATE TRIGGER deal_stage_event_ai AFTER INSERT ON deal "
+        "FOR EACH ROW EXECUTE FUNCTION deal_stage_event_log()",
+        "DROP TRIGGER IF EXISTS deal_stage_event_au ON deal",
+        "CREATE TRIGGER deal_stage_event_au AFTER UPDATE OF stage ON deal "
+        "FOR EACH ROW WHEN (OLD.stage IS DISTINCT FROM NEW.stage) EXECUTE FUNCTION deal_stage_event_log()",
+        "INSERT INTO deal_stage_event (deal_id, from_stage, to_stage, amount, changed_at) "
+        "SELECT id, NULL, stage, amount, now() FROM deal ORDER BY id",
+    ],
+}
+_HISTORY_TRIGGER_PRESENT = {
+    "sqlite": "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'deal_stage_event_ai'",
+    "postgresql": "SELECT 1 FROM pg_trigger WHERE tgname = 'deal_stage_event_ai'",
+}
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_history_triggers(metadata, connection, **kw) -> None:
+    dialect = connection.dialect.name
+    if dialect not in HISTORY_DDL:
+        return
+    if connection.execute(text(_HISTORY_TRIGGER_PRESENT[dialect])).first():
+        return  # already logging; the backfill ran when they were created
+    for statement in HISTORY_DDL[dialect]:
+        connection.execute(text(statement))
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, func
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from app.db import Base
+from app.db.types import Timestamp
 
 class Department(Base):
     __tablename__ = "department"
@@ -31,6 +32,7 @@ class Attendance(Base):
     check_out = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     employee = relationship("Employee")
+    __table_args__ = (Index("ix_attendance_date_id", "date", "id"),)  # keyset pagination
 
 class LeaveRequest(Base):
     __tablename__ = "leave_request"
@@ -41,5 +43,6 @@ class LeaveRequest(Base):
     type = Column(String(50), nullable=False)  # vacation, sick, personal
     status = Column(String(50), nullable=False, default="pending")  # pending, approved, rejected
     reason = Column(String(300), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now(), nullable=False)
     employee = relationship("Employee")
+    __table_args__ = (Index("ix_leave_request_created_at_id", "created_at", "id"),)  # keyset pagination
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, DateTime, func, Date
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, DateTime, func, Date, Index
 from sqlalchemy.orm import relationship
 from app.db import Base
 
@@ -24,6 +24,15 @@ class Invoice(Base):
     contact = relationship("Contact", backref="invoices")
     items = relationship("InvoiceItem", back_populates="invoice", cascade="all, delete-orphan")
 
+    # filter/sort access patterns (app.filters)
+    __table_args__ = (
+        Index("ix_invoice_status_id", "status", "id"),
+        Index("ix_invoice_contact_id_id", "contact_id", "id"),
+        Index("ix_invoice_invoice_date_id", "invoice_date", "id"),
+        Index("ix_invoice_due_date_id", "due_date", "id"),
+        Index("ix_invoice_total_id", "total", "id"),
+    )
+
 
 class InvoiceItem(Base):
     __tablename__ = "invoice_item"
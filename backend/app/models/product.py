@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, func
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, func, Index
 from app.db import Base
 
 
@@ -13,3 +13,9 @@ class Product(Base):
     stock = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # filter/sort access patterns (app.filters)
+    __table_args__ = (
+        Index("ix_product_price_id", "price", "id"),
+        Index("ix_product_stock_id", "stock", "id"),
+    )
@@ -0,0 +1,20 @@
+from sqlalchemy import JSON, Column, DateTime, Integer, String, func
+from app.db import Base
+
+
+class ProductFeedJob(Base):
+    """Progress and error report of one bulk product upsert (see app.product_feed)."""
+
+    __tablename__ = "product_feed"
+
+    id = Column(Integer, primary_key=True, index=True)
+    format = Column(String(16), nullable=False)
+    status = Column(String(20), nullable=False, default="running")  # running, completed, failed
+    processed = Column(Integer, nullable=False, default=0)
+    inserted = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    unchanged = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    errors = Column(JSON, nullable=False, default=list)  # first FEED_MAX_ERRORS problem rows
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func, Date, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func, Date, Text, Index
 from sqlalchemy.orm import relationship
 from app.db import Base
 
@@ -20,6 +20,12 @@ class Project(Base):
     contact = relationship("Contact", backref="projects")
     tasks = relationship("Task", back_populates="project", cascade="all, delete-orphan")
 
+    # filter/sort access patterns (app.filters)
+    __table_args__ = (
+        Index("ix_project_status_id", "status", "id"),
+        Index("ix_project_contact_id_id", "contact_id", "id"),
+    )
+
 
 class Task(Base):
     __tablename__ = "task"
@@ -39,6 +45,12 @@ class Task(Base):
     assigned_to = relationship("User", backref="tasks")
     time_sheets = relationship("TimeSheet", back_populates="task", cascade="all, delete-orphan")
 
+    # filter/sort access patterns (app.filters)
+    __table_args__ = (
+        Index("ix_task_project_id_status_id", "project_id", "status", "id"),
+        Index("ix_task_project_id_due_date_id", "project_id", "due_date", "id"),
+    )
+
 
 class TimeSheet(Base):
     __tablename__ = "time_sheet"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, DateTime, func, Index
 from sqlalchemy.orm import relationship
 from app.db import Base
 
@@ -17,6 +17,13 @@ class SaleOrder(Base):
     contact = relationship("Contact", backref="sale_orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    # filter/sort access patterns (app.filters)
+    __table_args__ = (
+        Index("ix_sale_order_status_id", "status", "id"),
+        Index("ix_sale_order_contact_id_id", "contact_id", "id"),
+        Index("ix_sale_order_total_id", "total", "id"),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_item"
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, DateTime, Index, Integer, String, func
+from app.db import Base
+
+# The ledger outlives the products it records, so product ids carry no foreign key.
+
+
+class StockMovement(Base):
+    """One change to a product's stock; `product.stock` is the running sum (see app.stock)."""
+
+    __tablename__ = "stock_movement"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, nullable=False)
+    kind = Column(String(20), nullable=False)  # receipt, sale, adjustment, return
+    quantity = Column(Integer, nullable=False)  # signed: positive into stock, negative out
+    reference = Column(String(100), nullable=True)  # order number, delivery note, ...
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    # a product's ledger, newest first (keyset), and the delta after a snapshot
+    __table_args__ = (Index("ix_stock_movement_product_id_id", "product_id", "id"),)
+
+
+class StockSnapshot(Base):
+    """A product's stock counting every movement of it up to `movement_id`."""
+
+    __tablename__ = "stock_snapshot"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, nullable=False)
+    movement_id = Column(Integer, nullable=False)
+    on_hand = Column(Integer, nullable=False)
+    taken_at = Column(DateTime(timezone=True), nullable=False)  # created_at of the latest movement counted
+
+    # the latest snapshot of a product at or before a time
+    __table_args__ = (Index("ix_stock_snapshot_product_id_taken_at", "product_id", "taken_at"),)
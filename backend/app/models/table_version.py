@@ -0,0 +1,11 @@
+from sqlalchemy import BigInteger, Column, String
+from app.db import Base
+
+
+class TableVersion(Base):
+    """Change counter per table, bumped in the same transaction as every write (see app.etags)."""
+
+    __tablename__ = "table_version"
+
+    table_name = Column(String(64), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
@@ -20,6 +20,7 @@ class User(Base):
     password_hash = Column(String(200), nullable=True)  # hashed password (bcrypt, etc.)
     role_id = Column(Integer, ForeignKey("role.id"), nullable=False, index=True)
     is_active = Column(Integer, nullable=False, default=1)  # SQLite uses integer for boolean
+    token_version = Column(Integer, nullable=False, default=0)  # bump to revoke issued tokens
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -0,0 +1,105 @@
+"""
+`/contacts/<id>/overview`: a contact with its recent deals and sale orders,
+open invoices and active projects, for the customer view.
+
+The response costs a fixed seven queries, whatever the contact has: the
+contact, one UNION ALL of the per-relation totals, the open invoice balance,
+and one keyset-style `WHERE contact_id = ? ORDER BY id DESC LIMIT n` per
+relation, each served by that table's (contact_id, id) index. Each list is
+capped at `?<relation>_limit=` (default DEFAULT_ITEMS, at most MAX_ITEMS);
+`total` says how many there are.
+
+There are no payments yet, so an open invoice (draft or sent) is owed in
+full: `balance` is their total and `overdue` the part past its due date.
+
+    overview = ContactOverview(contact_id, parse_limits(request.args))
+    rows = {name: db.execute(stmt).all() for name, stmt in overview.statements()}
+    return overview.render(rows)
+"""
+from datetime import date
+from typing import Dict, Iterable, Mapping, Optional, Sequence
+
+from sqlalchemy import case, func, literal, select, union_all
+
+from app.models.contact import Contact
+from app.models.deal import Deal
+from app.models.invoice import Invoice
+from app.models.project import Project
+from app.models.sale_order import SaleOrder
+from app.projections import CONTACT, DEAL, INVOICE, PROJECT, SALE_ORDER
+
+DEFAULT_ITEMS = 5
+MAX_ITEMS = 100
+OPEN_INVOICE_STATUSES = ("draft", "sent")
+ACTIVE_PROJECT_STATUSES = ("active",)
+
+# name -> (projection, model, extra condition); items leave out the contact_id they all share
+RELATIONS = {
+    "deals": (DEAL, Deal, None),
+    "orders": (SALE_ORDER, SaleOrder, None),
+    "open_invoices": (INVOICE, Invoice, Invoice.status.in_(OPEN_INVOICE_STATUSES)),
+    "active_projects": (PROJECT, Project, Project.status.in_(ACTIVE_PROJECT_STATUSES)),
+}
+
+
+class InvalidOverview(ValueError):
+    """A per-relation limit that is not an integer in range."""
+
+
+def parse_limits(args: Mapping[str, str]) -> Dict[str, int]:
+    limits = {}
+    for name in RELATIONS:
+        raw = args.get(f"{name}_limit")
+        try:
+            limits[name] = int(raw) if raw not in (None, "") else DEFAULT_ITEMS
+        except (TypeError, ValueError):
+            raise InvalidOverview(f"{name}_limit must be an integer")
+        if not 0 <= limits[name] <= MAX_ITEMS:
+            raise InvalidOverview(f"{name}_limit must be between 0 and {MAX_ITEMS}")
+    return limits
+
+
+def _fields(projection) -> Sequence[str]:
+    return tuple(name for name in projection.list_fields if name != "contact_id")
+
+
+class ContactOverview:
+    def __init__(self, contact_id: int, limits: Optional[Mapping[str, int]] = None, today: Optional[date] = None):
+        self.contact_id = contact_id
+        self.limits = {name: DEFAULT_ITEMS for name in RELATIONS}
+        self.limits.update(limits or {})
+        self.today = today or date.today()
+
+    def _where(self, model, condition):
+        clause = model.contact_id == self.contact_id
+        return clause if condition is None else clause & condition
+
+    def statements(self) -> Iterable:
+        """(name, statement) pairs; run each once and pass the rows to `render`."""
+        yield "contact", CONTACT.select(CONTACT.detail_fields).where(Contact.id == self.contact_id)
+        yield "totals", union_all(*(
+            select(literal(name).label("relation"), func.count().label("total"))
+            .select_from(model).where(self._where(model, condition))
+            for name, (_, model, condition) in RELATIONS.items()
+        ))
+        open_invoice = self._where(Invoice, RELATIONS["open_invoices"][2])
+        overdue = case((Invoice.due_date < self.today, Invoice.total), else_=0)
+        yield "balance", select(func.coalesce(func.sum(Invoice.total), 0).label("balance"),
+                                func.coalesce(func.sum(overdue), 0).label("overdue")).where(open_invoice)
+        for name, (projection, model, condition) in RELATIONS.items():
+            if self.limits[name]:
+                yield name, (projection.select(_fields(projection)).where(self._where(model, condition))
+                             .order_by(model.id.desc()).limit(self.limits[name]))
+
+    def render(self, rows: Mapping[str, Sequence]) -> Optional[Dict]:
+        """The response body, or None when the contact does not exist."""
+        if not rows["contact"]:
+            return None
+        totals = dict(rows["totals"])
+        body = {"contact": CONTACT.render_one(rows["contact"][0], CONTACT.detail_fields)}
+        for name, (projection, _, _) in RELATIONS.items():
+            items = projection.render(rows.get(name, ()), _fields(projection))
+            body[name] = {"items": items, "total": totals.get(name, 0)}
+        balance = rows["balance"][0]
+        body["open_invoices"].update(balance=balance.balance, overdue=balance.overdue)
+        return body
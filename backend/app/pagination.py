@@ -0,0 +1,166 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Every list orders by a key that ends in the primary key, newest first unless
+`?sort=` asks otherwise (see app.filters), and a page starts strictly after
+the last row of the previous one:
+
+    WHERE (date, id) < (:date, :id) ORDER BY date DESC, id DESC LIMIT :limit + 1
+
+so each page is one index range scan however deep the client has paged.
+Cursors are opaque (URL-safe base64 of the last row's key). Bodies stay
+plain JSON lists; the paging state travels in headers:
+
+    X-Next-Cursor   cursor for the next page (absent on the last page)
+    Link            the next page's URL with rel="next"
+    X-Total-Count   only with ?count=1; an estimate for whole-table lists
+
+Key columns must be NOT NULL; NULLs never compare below a cursor. On SQLite a
+DateTime key must use app.db.types.Timestamp, which stores values in the
+format its func.now() default writes them in.
+"""
+import base64
+import json
+import os
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Mapping, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+from sqlalchemy import func, literal, select, text, tuple_
+from sqlalchemy.sql import Select
+
+DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", "100"))
+MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "1000"))
+# Browsers only let the admin UI read these cross-origin when CORS exposes them
+PAGE_HEADERS = ["X-Next-Cursor", "Link", "X-Total-Count"]
+
+
+class InvalidPage(ValueError):
+    """Bad `limit`, `after` or `count` query parameter."""
+
+
+@dataclass(frozen=True)
+class PageParams:
+    limit: int = DEFAULT_LIMIT
+    after: Optional[str] = None
+    with_total: bool = False
+
+
+def parse_page_params(args: Mapping[str, str]) -> PageParams:
+    """Validate `limit`, `after` and `count` from a query-string mapping."""
+    try:
+        limit = int(args.get("limit", DEFAULT_LIMIT))
+    except (TypeError, ValueError):
+        raise InvalidPage("limit must be an integer")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise InvalidPage(f"limit must be between 1 and {MAX_LIMIT}")
+    with_total = str(args.get("count", "")).lower() in ("1", "true", "yes")
+    return PageParams(limit=limit, after=args.get("after") or None, with_total=with_total)
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _from_json(value: Any, column) -> Any:
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    return python_type(value)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_to_json(v) for v in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, keys: Sequence) -> Tuple[Any, ...]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        return tuple(_from_json(v, key) for v, key in zip(values, keys))
+    except (ValueError, TypeError):
+        raise InvalidPage("invalid cursor")
+
+
+def after_cursor(stmt: Select, keys: Sequence, after: Optional[str], descending: bool = True) -> Select:
+    """Order `stmt` by `keys` (descending by default), starting after the cursor (if any)."""
+    if after:
+        # Bound as the key columns' own types, so values compare in the format they are stored in
+        values = [literal(value, key.type) for value, key in zip(decode_cursor(after, keys), keys)]
+        left = keys[0] if len(keys) == 1 else tuple_(*keys)
+        right = values[0] if len(keys) == 1 else tuple_(*values)
+        stmt = stmt.where(left < right if descending else left > right)
+    return stmt.order_by(*(key.desc() if descending else key.asc() for key in keys))
+
+
+def keyset(stmt: Select, keys: Sequence, page: PageParams, descending: bool = True) -> Select:
+    """One page of `stmt` after the cursor, plus one look-ahead row."""
+    return after_cursor(stmt, keys, page.after, descending).limit(page.limit + 1)
+
+
+def split_page(rows: Sequence, keys: Sequence, page: PageParams) -> Tuple[List, Optional[str]]:
+    """Trim the look-ahead row; return the page and the cursor for the next one."""
+    rows = list(rows)
+    if len(rows) <= page.limit:
+        return rows, None
+    rows = rows[:page.limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, key.key) for key in keys])
+
+
+def total_statement(stmt: Select, dialect_name: str):
+    """
+    Count rows matching `stmt`. Unfiltered lists on Postgres use the planner's
+    row estimate (pg_class.reltuples) instead of scanning the table.
+    """
+    froms = stmt.get_final_froms()
+    if dialect_name == "postgresql" and stmt.whereclause is None and len(froms) == 1 and hasattr(froms[0], "fullname"):
+        return text(
+            "SELECT CASE WHEN reltuples >= 0 THEN reltuples::bigint "
+            f"ELSE (SELECT count(*) FROM {froms[0].fullname}) END "
+            "FROM pg_class WHERE oid = CAST(:table AS regclass)"
+        ).bindparams(table=froms[0].fullname)
+    return select(func.count()).select_from(stmt.order_by(None).subquery())
+
+
+def page_headers(base_url: str, args: Mapping[str, str], next_cursor: Optional[str],
+                 total: Optional[int] = None) -> dict:
+    headers = {}
+    if next_cursor:
+        query = {k: v for k, v in args.items() if k != "after"}
+        query["after"] = next_cursor
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{base_url}?{urlencode(query)}>; rel="next"'
+    if total is not None:
+        headers["X-Total-Count"] = str(total)
+    return headers
+
+
+def fetch_page(db, stmt: Select, keys: Sequence, scalars: bool = True, descending: bool = True) -> Tuple[List, dict]:
+    """Flask glue: run one page of `stmt` for the current request; returns (rows, headers)."""
+    from flask import abort, request
+
+    try:
+        page = parse_page_params(request.args)
+        query = keyset(stmt, keys, page, descending)
+    except InvalidPage as exc:
+        abort(400, description=str(exc))
+    result = db.execute(query)
+    rows, cursor = split_page(result.scalars().all() if scalars else result.all(), keys, page)
+    total = db.execute(total_statement(stmt, db.get_bind().dialect.name)).scalar() if page.with_total else None
+    return rows, page_headers(request.base_url, request.args, cursor, total)
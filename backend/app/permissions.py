@@ -0,0 +1,133 @@
+"""
+Precompiled role -> permission resolution.
+
+Each permission maps to bit `permission.id` and each role's grants are
+folded into a single integer mask, so `has()` is a dict lookup plus a bit
+test with no join per request. Bit positions are stable across processes,
+which lets the mask travel inside access tokens. The map reloads lazily after any committed
+change to `Permission`/`RolePermission` in this process, and at least every
+PERMISSIONS_REFRESH_SECONDS to pick up changes made by other workers.
+
+The load is a blocking query, so the async stack awaits `refresh_async`
+first, which runs a due reload in a worker thread; the checks that follow
+find the map fresh and never touch the database on the event loop.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Tuple
+
+import anyio
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app import metrics
+from app.db import SessionLocal
+from app.models.permission import Permission, RolePermission
+
+ADMIN_ROLE_ID = 1
+
+Grant = Tuple[int, int, str]  # (role_id, permission_id, permission_name)
+
+
+def _load_grants() -> Iterable[Grant]:
+    with SessionLocal(info={"read_only": True}) as db:
+        rows = db.execute(
+            select(RolePermission.role_id, Permission.id, Permission.name)
+            .join(Permission, Permission.id == RolePermission.permission_id)
+        ).all()
+        return [tuple(row) for row in rows]
+
+
+class PermissionMap:
+    def __init__(self, loader: Callable[[], Iterable[Grant]] = _load_grants,
+                 refresh_seconds: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self._loader = loader
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._bits: Dict[str, int] = {}
+        self._masks: Dict[int, int] = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def bit(self, name: str) -> int:
+        """Return the bit for `name` (0 if the permission is unknown)."""
+        self._ensure_fresh()
+        return self._bits.get(name, 0)
+
+    def mask_for(self, role_id: int) -> int:
+        self._ensure_fresh()
+        return self._masks.get(role_id, 0)
+
+    def has(self, role_id: int, name: str) -> bool:
+        self._ensure_fresh()
+        return bool(self._masks.get(role_id, 0) & self._bits.get(name, 0))
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def due(self) -> bool:
+        """Whether the next check reloads the map first."""
+        loaded_at = self._loaded_at
+        return loaded_at is None or self._clock() - loaded_at >= self.refresh_seconds
+
+    async def refresh_async(self) -> None:
+        """Reload now if due, in a worker thread, so that the checks after it run without a query."""
+        if self.due():
+            await anyio.to_thread.run_sync(self._ensure_fresh)
+
+    def stats(self) -> dict:
+        return {"permissions": len(self._bits), "roles": len(self._masks), "reloads": self.reloads}
+
+    def _ensure_fresh(self) -> None:
+        loaded_at = self._loaded_at
+        if loaded_at is not None and self._clock() - loaded_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if self._loaded_at is loaded_at:
+                self._reload()
+
+    def _reload(self) -> None:
+        bits: Dict[str, int] = {}
+        masks: Dict[int, int] = {}
+        for role_id, permission_id, name in self._loader():
+            bits[name] = 1 << permission_id
+            masks[role_id] = masks.get(role_id, 0) | bits[name]
+        self._bits = bits
+        self._masks = masks
+        self._loaded_at = self._clock()
+        self.reloads += 1
+
+
+permission_map = PermissionMap(refresh_seconds=float(os.getenv("PERMISSIONS_REFRESH_SECONDS", "300")))
+metrics.register("permissions", permission_map.stats)
+
+
+def has_permission(role_id: int, permission_name: str) -> bool:
+    """Admins hold every permission; other roles are checked against the precompiled mask."""
+    return role_id == ADMIN_ROLE_ID or permission_map.has(role_id, permission_name)
+
+
+def mask_allows(role_id: int, mask: int, permission_name: str) -> bool:
+    """`has_permission` against a mask carried by an access token (see app.tokens)."""
+    return role_id == ADMIN_ROLE_ID or bool(mask & permission_map.bit(permission_name))
+
+
+@event.listens_for(Session, "after_flush")
+def _track_permission_changes(session: Session, flush_context) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (Permission, RolePermission)):
+            session.info["permissions_changed"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _reload_after_commit(session: Session) -> None:
+    if session.info.pop("permissions_changed", False):
+        permission_map.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop("permissions_changed", None)
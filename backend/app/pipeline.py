@@ -0,0 +1,66 @@
+"""
+`/deals/pipeline`: deal count, total and average amount per stage.
+
+Reads `deal_stage_summary` (see app.models.deal), which triggers keep in step
+with every write to `deal`: one row per stage and contact. A contact's
+pipeline (`?contact_id=`) reads its rows; the unfiltered one sums every
+contact's rows per stage, which grows with the number of contacts that have
+deals rather than with the number of deals. There is no all-deals row: every
+deal write would update it, one hot row under concurrent writers. Databases
+without the triggers get the same numbers from a GROUP BY over `deal`.
+
+    stmt = pipeline_statement(db.get_bind().dialect.name, parse_contact(request.args.get("contact_id")))
+    return render(db.execute(stmt).all())
+"""
+from decimal import Decimal
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import func, select
+
+from app.models.deal import Deal, DealStageSummary, pipeline_summary_supported
+
+_CENTS = Decimal("0.01")
+
+
+class InvalidPipeline(ValueError):
+    """A contact_id that is not a positive integer."""
+
+
+def parse_contact(raw) -> Optional[int]:
+    if raw in (None, ""):
+        return None
+    try:
+        contact_id = int(raw)
+    except (TypeError, ValueError):
+        contact_id = None
+    if contact_id is None or contact_id < 1:  # 0 would read the deals without a contact
+        raise InvalidPipeline("contact_id must be a positive integer")
+    return contact_id
+
+
+def pipeline_statement(dialect: str, contact_id: Optional[int] = None):
+    """(stage, deals, amount) rows, one per stage; stage '' or None means no stage."""
+    if pipeline_summary_supported(dialect):
+        summary = DealStageSummary
+        if contact_id is not None:
+            return (select(summary.stage, summary.deals, summary.amount)
+                    .where(summary.contact_id == contact_id).order_by(summary.stage))
+        return (select(summary.stage, func.sum(summary.deals).label("deals"),
+                       func.sum(summary.amount).label("amount"))
+                .group_by(summary.stage).order_by(summary.stage))
+    stmt = select(Deal.stage, func.count().label("deals"), func.coalesce(func.sum(Deal.amount), 0).label("amount"))
+    if contact_id is not None:
+        stmt = stmt.where(Deal.contact_id == contact_id)
+    return stmt.group_by(Deal.stage).order_by(Deal.stage)
+
+
+def _average(amount, deals: int) -> Decimal:
+    return (Decimal(amount) / deals).quantize(_CENTS) if deals else Decimal("0.00")
+
+
+def render(rows: Sequence) -> Dict:
+    stages = [{"stage": stage or None, "count": deals, "sum": amount, "average": _average(amount, deals)}
+              for stage, deals, amount in rows]
+    count = sum(s["count"] for s in stages)
+    total = sum((Decimal(s["sum"]) for s in stages), Decimal("0.00"))
+    return {"stages": stages, "total": {"count": count, "sum": total, "average": _average(total, count)}}
@@ -0,0 +1,125 @@
+"""
+Bounded in-process cache of authenticated principals keyed by bearer token.
+
+Saves re-verifying and decoding the token on every protected request.
+Entries expire after a TTL and the least recently used entry is evicted once
+the cache is full. Any change to a user's active flag, role or password drops
+that user's cached tokens immediately (revocation itself is enforced by
+app.tokens, which also covers changes made in other processes).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Set
+
+from sqlalchemy import event, inspect
+
+from app import metrics
+from app.models.user import User
+
+# Attributes whose change must drop the user's cached principals
+_SENSITIVE_ATTRS = ("is_active", "role_id", "password_hash", "username")
+
+
+class PrincipalCache:
+    def __init__(self, maxsize: int = 4096, ttl: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # token -> (expires_at, user_id, principal)
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token: str):
+        """Return the cached principal for `token`, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, user_id, principal = entry
+            if expires_at <= self._clock():
+                self._drop(token, user_id)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return principal
+
+    def put(self, token: str, user_id: int, principal) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            old = self._entries.pop(token, None)
+            if old is not None:
+                self._tokens_by_user.get(old[1], set()).discard(token)
+            self._entries[token] = (self._clock() + self.ttl, user_id, principal)
+            self._tokens_by_user.setdefault(user_id, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                old_token, (_, old_user_id, _) = self._entries.popitem(last=False)
+                self._forget_token(old_token, old_user_id)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop every cached token belonging to `user_id`."""
+        with self._lock:
+            tokens = self._tokens_by_user.pop(user_id, None)
+            if not tokens:
+                return
+            for token in tokens:
+                self._entries.pop(token, None)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _drop(self, token: str, user_id: int) -> None:
+        self._entries.pop(token, None)
+        self._forget_token(token, user_id)
+
+    def _forget_token(self, token: str, user_id: int) -> None:
+        tokens = self._tokens_by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user_id]
+
+
+principal_cache = PrincipalCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "60")),
+)
+metrics.register("principal_cache", principal_cache.stats)
+
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target: User) -> None:
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in _SENSITIVE_ATTRS):
+        principal_cache.invalidate_user(target.id)
+
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target: User) -> None:
+    principal_cache.invalidate_user(target.id)
@@ -0,0 +1,311 @@
+"""
+Bulk product upsert for supplier price-list and stock feeds: `POST
+/inventory/feed` and the CLI.
+
+The body is CSV or NDJSON, decoded as it arrives like a contact import (see
+app.contact_import), with a `sku` and any of `name`, `description`, `price`
+and `stock` per row; a missing or empty value leaves that field as it is, so
+a price list can carry just sku and price. A new SKU needs a name.
+
+Rows are written FEED_BATCH_ROWS at a time, each batch in its own commit:
+
+  1. the batch's existing products are read (FOR UPDATE on PostgreSQL, in
+     id order like a reservation) on the unique sku index;
+  2. rows that would change nothing are counted as unchanged and dropped;
+  3. the rest go out as one executemany
+         INSERT ... ON CONFLICT (sku) DO UPDATE SET ...
+         WHERE <any field is distinct> RETURNING id, sku
+     so a SKU created meanwhile by someone else is updated, not a failure;
+  4. stock changes are logged to the ledger in the same commit: a new
+     product's stock as its opening receipt, a changed stock as an
+     adjustment by the difference (see app.stock).
+
+A SKU repeated within one batch is merged, later values winning, and counts
+once. Every feed is a `product_feed` row whose counters are committed with
+each batch, so `GET /inventory/feeds/<id>` shows progress while it runs and
+the final report after; a feed cut short by any error ends as `failed`,
+keeping the batches committed before it.
+
+    python -m app.product_feed prices.csv
+    python -m app.product_feed stock.ndjson --format ndjson
+"""
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.contact_import import FORMATS, InvalidImport, RowDecoder, describe_errors
+from app.models.product import Product
+from app.models.product_feed import ProductFeedJob
+from app.models.stock_movement import StockMovement
+
+BATCH_ROWS = int(os.getenv("FEED_BATCH_ROWS", "5000"))
+MAX_ERRORS = int(os.getenv("FEED_MAX_ERRORS", "1000"))
+
+FIELDS = ("name", "description", "price", "stock")
+_UPSERTS = {"sqlite": sqlite_insert, "postgresql": pg_insert}
+# SKUs per existing-product lookup (bound parameters per statement stay well inside SQLite's limit)
+_LOOKUP_CHUNK = 500
+
+
+class FeedRow(BaseModel):
+    sku: str = Field(min_length=1, max_length=100)
+    name: Optional[str] = Field(None, min_length=1, max_length=200)
+    description: Optional[str] = Field(None, max_length=500)
+    price: Optional[Decimal] = Field(None, ge=0, max_digits=12, decimal_places=2)
+    stock: Optional[int] = Field(None, ge=0)
+
+
+def upsert_statement(dialect: str):
+    """INSERT ... ON CONFLICT (sku) DO UPDATE of every field, skipping rows it would not change."""
+    # On the Table rather than the entity: the ORM's bulk INSERT path costs more than the statement itself
+    product = Product.__table__
+    stmt = _UPSERTS[dialect](product)
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[product.c.sku],
+        set_={**{name: excluded[name] for name in FIELDS}, "updated_at": func.now()},
+        where=or_(*(product.c[name].is_distinct_from(excluded[name]) for name in FIELDS)),
+    ).returning(product.c.id, product.c.sku)
+
+
+class ProductFeed:
+    """Validation, batching and change detection of one feed; the drivers below do the I/O.
+
+    `feed` returns the batches that are ready, each a list of (row, values);
+    for each, run `lookups(batch)`, pass the rows they return to `prepare`,
+    upsert what it returns with `statement` and hand the (id, sku) rows that
+    come back to `upserted`, then insert the ledger movements it returns.
+    """
+
+    def __init__(self, fmt: str, job: ProductFeedJob, dialect: str):
+        self.decoder = RowDecoder(fmt, required="sku")
+        self.job = job
+        self.statement = upsert_statement(dialect)
+        self.lock = dialect == "postgresql"
+        self.row = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self._batch: List[Tuple[int, dict]] = []
+        self._new: Dict[str, int] = {}  # sku -> opening stock
+        self._changed: Dict[str, Tuple[int, int]] = {}  # sku -> (id, stock difference)
+
+    def feed(self, chunk: bytes, final: bool = False) -> List[List[Tuple[int, dict]]]:
+        batches = []
+        for record in self.decoder.feed(chunk, final):
+            self.row += 1
+            self._validate(record)
+            if self.row % BATCH_ROWS == 0:
+                batches.append(self._take())
+        if final and self.row % BATCH_ROWS:
+            batches.append(self._take())
+        return batches
+
+    def _take(self) -> List[Tuple[int, dict]]:
+        batch, self._batch = self._batch, []
+        self.job.processed = self.row
+        return batch
+
+    def _validate(self, record) -> None:
+        if isinstance(record, str):
+            return self._error(self.row, record)
+        try:
+            values = FeedRow(**{name: record.get(name) for name in ("sku",) + FIELDS})
+        except ValidationError as exc:
+            return self._error(self.row, describe_errors(exc))
+        self._batch.append((self.row, values.model_dump(exclude_none=True)))
+
+    def _error(self, row: int, error: str, **extra) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"row": row, "error": error, **extra})
+
+    def lookups(self, batch: List[Tuple[int, dict]]):
+        """SELECTs of the existing products sharing a SKU with `batch`."""
+        skus = sorted({values["sku"] for _, values in batch})
+        for start in range(0, len(skus), _LOOKUP_CHUNK):
+            stmt = select(Product.id, Product.sku, *(getattr(Product, name) for name in FIELDS)) \
+                .where(Product.sku.in_(skus[start:start + _LOOKUP_CHUNK])).order_by(Product.id)
+            yield stmt.with_for_update() if self.lock else stmt
+
+    def prepare(self, batch: List[Tuple[int, dict]], existing: Iterable) -> List[dict]:
+        """The rows of `batch` to upsert; unchanged ones are counted and new ones without a name fail."""
+        merged: Dict[str, Tuple[int, dict]] = {}
+        for row, values in batch:
+            merged[values["sku"]] = (row, {**merged.get(values["sku"], (row, {}))[1], **values})
+        found = {product.sku: product for product in existing}
+        rows, self._new, self._changed = [], {}, {}
+        for sku, (row, given) in merged.items():
+            product = found.get(sku)
+            if product is None:
+                if "name" not in given:
+                    self._error(row, "name is required for a new sku", sku=sku)
+                    continue
+                values = {"description": None, "price": Decimal(0), "stock": 0, **given}
+                self._new[sku] = values["stock"]
+            else:
+                current = {name: getattr(product, name) for name in FIELDS}
+                values = {**current, **given}
+                if values == current:
+                    self.job.unchanged += 1
+                    continue
+                self._changed[sku] = (product.id, values["stock"] - product.stock)
+            rows.append({"sku": sku, **{name: values[name] for name in FIELDS}})
+        return rows
+
+    def upserted(self, rows: List[Tuple[int, str]]) -> List[dict]:
+        """Count the (id, sku) rows RETURNING gave back; the stock movements to log for them."""
+        ids = {sku: id_ for id_, sku in rows}
+        movements = []
+        for sku, stock in self._new.items():
+            if sku in ids:
+                self.job.inserted += 1
+                if stock:
+                    movements.append({"product_id": ids[sku], "kind": "receipt", "quantity": stock,
+                                      "reference": "opening stock"})
+        for sku, (product_id, difference) in self._changed.items():
+            if sku in ids:
+                self.job.updated += 1
+                if difference:
+                    movements.append({"product_id": product_id, "kind": "adjustment", "quantity": difference,
+                                      "reference": f"product feed {self.job.id}"})
+        # Rows a concurrent writer had already brought to these values were skipped by the WHERE
+        self.job.unchanged += len(self._new) + len(self._changed) - len(ids)
+        self._sync()
+        return movements
+
+    def _sync(self) -> None:
+        self.job.failed = self.failed
+        self.job.errors = list(self.errors)  # a new list, so the JSON column is seen as changed
+
+    def finish(self, status: str, error: Optional[str] = None) -> None:
+        if error:
+            self.errors.append({"row": self.row, "error": error})
+        self._sync()
+        self.job.processed = self.row
+        self.job.status = status
+        self.job.finished_at = datetime.now(timezone.utc)
+
+
+_MOVE = insert(StockMovement)
+
+
+def new_job(fmt: str) -> ProductFeedJob:
+    return ProductFeedJob(format=fmt, status="running", processed=0, inserted=0, updated=0, unchanged=0,
+                          failed=0, errors=[])
+
+
+def run_feed(db, job: ProductFeedJob, chunks: Iterable[bytes]) -> ProductFeedJob:
+    """Upsert `chunks` into the committed `job` with a Session; the job's final state is committed too.
+
+    A malformed feed ends the job as failed; any other error does as well, and is raised again after.
+    """
+    feed = ProductFeed(job.format, job, db.get_bind().dialect.name)
+    try:
+        for chunk in chunks:
+            _write(db, feed, feed.feed(chunk))
+        _write(db, feed, feed.feed(b"", final=True))
+    except InvalidImport as exc:
+        db.rollback()
+        feed.finish("failed", str(exc))
+    except Exception as exc:
+        # Anything else (a database error, the client going away) still ends the job
+        db.rollback()
+        feed.finish("failed", str(exc)[:500])
+        db.commit()
+        raise
+    else:
+        feed.finish("completed")
+    db.commit()
+    return job
+
+
+def _write(db, feed: ProductFeed, batches) -> None:
+    for batch in batches:
+        existing = [row for stmt in feed.lookups(batch) for row in db.execute(stmt).all()]
+        rows = feed.prepare(batch, existing)
+        movements = feed.upserted(db.execute(feed.statement, rows).all() if rows else [])
+        if movements:
+            db.execute(_MOVE, movements)
+        db.commit()
+
+
+async def run_feed_async(db, job: ProductFeedJob, chunks) -> ProductFeedJob:
+    """`run_feed` for an AsyncSession and an async iterable of chunks."""
+    feed = ProductFeed(job.format, job, db.bind.dialect.name)
+    try:
+        async for chunk in chunks:
+            await _write_async(db, feed, feed.feed(chunk))
+        await _write_async(db, feed, feed.feed(b"", final=True))
+    except InvalidImport as exc:
+        await db.rollback()
+        await db.refresh(job)  # the rollback expired it, and async sessions do not lazy-load
+        feed.finish("failed", str(exc))
+    except Exception as exc:
+        await db.rollback()
+        await db.refresh(job)
+        feed.finish("failed", str(exc)[:500])
+        await db.commit()
+        raise
+    else:
+        feed.finish("completed")
+    await db.commit()
+    return job
+
+
+async def _write_async(db, feed: ProductFeed, batches) -> None:
+    for batch in batches:
+        existing = [row for stmt in feed.lookups(batch) for row in (await db.execute(stmt)).all()]
+        rows = feed.prepare(batch, existing)
+        movements = feed.upserted((await db.execute(feed.statement, rows)).all() if rows else [])
+        if movements:
+            await db.execute(_MOVE, movements)
+        await db.commit()
+
+
+def report(job: ProductFeedJob) -> dict:
+    return {
+        "id": job.id,
+        "format": job.format,
+        "status": job.status,
+        "processed": job.processed,
+        "inserted": job.inserted,
+        "updated": job.updated,
+        "unchanged": job.unchanged,
+        "failed": job.failed,
+        "errors": job.errors,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def main() -> None:
+    import argparse
+    import json
+
+    import app.main  # noqa: F401  registers every model with the mapper
+
+    from app.db import SessionLocal
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=sorted(FORMATS), help="default: from the file extension")
+    args = parser.parse_args()
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+
+    with SessionLocal() as db, open(args.path, "rb") as body:
+        job = new_job(fmt)
+        db.add(job)
+        db.commit()
+        print(f"feed {job.id}: progress at GET /inventory/feeds/{job.id}")
+        run_feed(db, job, iter(lambda: body.read(1 << 20), b""))
+        print(json.dumps(report(job), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Column projections for list and detail responses.
+
+Each resource declares the fields its list and detail responses carry; the
+query selects exactly those columns and rows come back as plain tuples, so no
+ORM entities are built, tracked in the identity map or instrumented. Clients
+can ask for a sparse fieldset with `?fields=id,name`; unknown names are a 400.
+Values are left as the driver returns them (Decimal, date, datetime) for
+app.serialization to encode, except that a NULL money column reads as zero.
+
+    names = CONTACT.names(request.args.get("fields"))
+    rows = db.execute(CONTACT.select(names)).all()
+    return CONTACT.render(rows, names)
+"""
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.sql import Select
+
+from app.models.accounting import JournalEntry, JournalLine
+from app.models.contact import Contact
+from app.models.contact_dedupe import ContactDuplicate
+from app.models.deal import Deal
+from app.models.hr import Attendance, Employee, LeaveRequest
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.product import Product
+from app.models.project import Project, Task
+from app.models.sale_order import OrderItem, SaleOrder
+from app.models.stock_movement import StockMovement
+
+
+class InvalidFields(ValueError):
+    """`fields=` named something the resource does not expose."""
+
+
+_ZERO = Decimal("0.00")
+
+
+def money(value) -> Decimal:
+    return _ZERO if value is None else value
+
+
+class Projection:
+    def __init__(self, model, list_fields: Sequence[str], detail_fields: Optional[Sequence[str]] = None,
+                 render: Optional[Mapping[str, Callable]] = None):
+        self.model = model
+        self.list_fields = tuple(list_fields)
+        self.detail_fields = tuple(detail_fields or list_fields)
+        self.available = frozenset(self.list_fields + self.detail_fields)
+        self._render = dict(render or {})
+
+    def names(self, fields: Optional[str] = None, detail: bool = False) -> Tuple[str, ...]:
+        """Field names for a response: the declared set, or the `fields=` subset of it."""
+        if not fields:
+            return self.detail_fields if detail else self.list_fields
+        requested = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in requested if f not in self.available]
+        if unknown or not requested:
+            raise InvalidFields(f"unknown fields: {', '.join(unknown) or '(none given)'}")
+        return requested
+
+    def select(self, names: Sequence[str], keys: Iterable = ()) -> Select:
+        """SELECT the named columns, then any pagination `keys` not already among them."""
+        columns = [getattr(self.model, name).label(name) for name in names]
+        columns += [key.label(key.key) for key in keys if key.key not in names]
+        return select(*columns)
+
+    def render(self, rows: Iterable, names: Sequence[str]) -> List[Dict]:
+        spec = [(name, self._render.get(name)) for name in names]
+        if not any(fn for _, fn in spec):
+            return [dict(zip(names, row)) for row in rows]
+        return [{name: fn(value) if fn else value for (name, fn), value in zip(spec, row)} for row in rows]
+
+    def render_one(self, row, names: Sequence[str]) -> Dict:
+        return self.render([row], names)[0]
+
+
+CONTACT = Projection(Contact, ("id", "name", "email", "phone", "company"))
+CONTACT_DUPLICATE = Projection(ContactDuplicate, ("id", "contact_id", "duplicate_id", "score", "signals", "status"))
+DEAL = Projection(Deal, ("id", "title", "amount", "stage", "contact_id"), render={"amount": money})
+PRODUCT = Projection(Product, ("id", "name", "sku", "description", "price", "stock"), render={"price": money})
+STOCK_MOVEMENT = Projection(StockMovement, ("id", "product_id", "kind", "quantity", "reference", "created_at"))
+SALE_ORDER = Projection(SaleOrder, ("id", "order_number", "contact_id", "status", "total"), render={"total": money})
+ORDER_ITEM = Projection(OrderItem, ("id", "product_id", "quantity", "unit_price", "subtotal"),
+                        render={"unit_price": money, "subtotal": money})
+INVOICE = Projection(
+    Invoice,
+    ("id", "invoice_number", "sale_order_id", "contact_id", "status", "invoice_date", "due_date", "total"),
+    ("id", "invoice_number", "sale_order_id", "contact_id", "status", "invoice_date", "due_date",
+     "subtotal", "tax", "total", "notes"),
+    render={"subtotal": money, "tax": money, "total": money},
+)
+INVOICE_ITEM = Projection(InvoiceItem, ("id", "product_id", "description", "quantity", "unit_price", "subtotal"),
+                          render={"unit_price": money, "subtotal": money})
+PROJECT = Projection(
+    Project,
+    ("id", "name", "code", "status", "contact_id", "start_date", "end_date"),
+    ("id", "name", "code", "description", "contact_id", "status", "start_date", "end_date"),
+)
+TASK = Projection(Task, ("id", "project_id", "title", "status", "priority", "assigned_to_id", "due_date"))
+# Tasks nested under a project omit the project id
+PROJECT_TASK_FIELDS = ("id", "title", "status", "priority", "assigned_to_id", "due_date")
+EMPLOYEE = Projection(
+    Employee,
+    ("id", "first_name", "last_name", "email", "title", "department_id", "manager_id", "hire_date"),
+)
+ATTENDANCE = Projection(Attendance, ("id", "employee_id", "date", "check_in", "check_out"))
+LEAVE_REQUEST = Projection(LeaveRequest, ("id", "employee_id", "start_date", "end_date", "type", "status", "reason"))
+JOURNAL_ENTRY = Projection(JournalEntry, ("id", "ref", "memo", "posted_at", "currency_id"))
+JOURNAL_LINE = Projection(JournalLine, ("id", "account_id", "description", "debit", "credit"))
@@ -0,0 +1,207 @@
+"""
+Server-side cache of encoded GET responses for read-heavy endpoints.
+
+Entries are keyed by the caller's scope (role) and the request's ETag (see
+app.etags), which already folds in the path, query, Accept header and the
+change versions of every table the response is built from. A write anywhere
+bumps those versions, so a stale entry can never be served, in this process
+or any other sharing the backend; commits also drop this process's entries
+for the written tables right away so they stop taking memory.
+
+Backends (RESPONSE_CACHE_URL):
+
+    memory (default)   in-process LRU bounded by entries and bytes
+    redis://host/0     shared between processes/hosts (needs the `redis` package)
+    none               disabled
+
+Flask routes pass `cache=response_cache` to `@conditional`; FastAPI handlers
+take a `CacheSlot` via `Depends(cached(...))` from app.api.deps.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Set, Tuple
+
+import orjson
+
+from app import etags, metrics
+
+# Never replayed from the cache
+_UNCACHED_HEADERS = {"content-length", "set-cookie"}
+
+Entry = Tuple[bytes, List[Tuple[str, str]]]  # (body, headers)
+
+
+class MemoryBackend:
+    """LRU over (body, headers) entries, bounded by entry count and total bytes."""
+
+    name = "memory"
+
+    def __init__(self, maxsize: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (entry, tables, size)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            self._entries.move_to_end(key)
+            return item[0]
+
+    def put(self, key: str, entry: Entry, tables: Iterable[str]) -> None:
+        size = len(key) + len(entry[0]) + sum(len(k) + len(v) for k, v in entry[1])
+        if self.maxsize <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (entry, frozenset(tables), size)
+            self.bytes += size
+            while len(self._entries) > self.maxsize or self.bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tables: Set[str]) -> int:
+        with self._lock:
+            stale = [key for key, (_, used, _) in self._entries.items() if used & tables]
+            for key in stale:
+                self._pop(key)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def usage(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize, "bytes": self.bytes,
+                    "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+    def _pop(self, key: str) -> None:
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self.bytes -= item[2]
+
+
+class RedisBackend:
+    """Shared backend. Stale entries are unreachable (versioned keys) and expire after `ttl`."""
+
+    name = "redis"
+
+    def __init__(self, url: str, ttl: int = 300, prefix: str = "respcache:"):
+        try:
+            import redis
+        except ImportError as exc:  # optional dependency
+            raise RuntimeError("RESPONSE_CACHE_URL=redis://... requires the `redis` package") from exc
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Entry]:
+        raw = self._client.get(self.prefix + key)
+        if raw is None:
+            return None
+        headers, _, body = raw.partition(b"\n")
+        return body, [tuple(pair) for pair in orjson.loads(headers)]
+
+    def put(self, key: str, entry: Entry, tables: Iterable[str]) -> None:
+        body, headers = entry
+        self._client.set(self.prefix + key, orjson.dumps(headers) + b"\n" + body, ex=self.ttl)
+
+    def invalidate(self, tables: Set[str]) -> int:
+        return 0  # version bumps already make other processes miss
+
+    def clear(self) -> None:
+        for key in self._client.scan_iter(self.prefix + "*"):
+            self._client.delete(key)
+
+    def usage(self) -> dict:
+        return {"used_memory": self._client.info("memory").get("used_memory"), "ttl": self.ttl}
+
+
+class ResponseCache:
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def get(self, key: str) -> Optional[Entry]:
+        if self.backend is None:
+            return None
+        entry = self.backend.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def put(self, key: str, body: bytes, headers: Iterable[Tuple[str, str]], tables: Iterable[str]) -> None:
+        if self.backend is None:
+            return
+        kept = [(k, v) for k, v in headers if k.lower() not in _UNCACHED_HEADERS]
+        self.backend.put(key, (bytes(body), kept), tables)
+        with self._lock:
+            self.stores += 1
+
+    def invalidate(self, tables: Set[str]) -> None:
+        if self.backend is not None and self.backend.invalidate(tables):
+            with self._lock:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            counters = {
+                "backend": self.backend.name if self.backend else "none",
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "invalidations": self.invalidations,
+            }
+        if self.backend is not None:
+            counters.update(self.backend.usage())
+        return counters
+
+
+def cache_key(scope: str, tag: str) -> str:
+    return f"{scope}|{tag}"
+
+
+def principal_scope(principal) -> str:
+    """Responses are shared between callers with the same role (permissions are per role)."""
+    return f"role:{principal.role_id}" if principal is not None else "anonymous"
+
+
+def _backend_from_env():
+    url = os.getenv("RESPONSE_CACHE_URL", "memory")
+    if url in ("", "none"):
+        return None
+    if url.startswith("redis"):
+        return RedisBackend(url, ttl=int(os.getenv("RESPONSE_CACHE_TTL", "300")))
+    return MemoryBackend(
+        maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+        max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    )
+
+
+response_cache = ResponseCache(_backend_from_env())
+metrics.register("response_cache", response_cache.stats)
+etags.on_commit(response_cache.invalidate)
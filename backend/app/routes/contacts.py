@@ -1,8 +1,20 @@
+import shutil
+
 from flask import Blueprint, request, jsonify, abort
-from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from app.db import SessionLocal
+from app.pagination import fetch_page
+from app.projections import CONTACT, CONTACT_DUPLICATE
 from app.models.contact import Contact
 from app.auth import require_auth
+from app.etags import conditional
+from app.search import ContactSearch, InvalidSearch, parse_limit
+from app.contact_import import (InvalidImport, import_format, new_job, report, run_import, runs_inline, spool,
+                                start_import)
+from app.models.contact_import import ContactImportJob
+from app.models.contact_dedupe import ContactDedupeRun, ContactDuplicate
+from app import dedupe
+from app.overview import ContactOverview, InvalidOverview, parse_limits
 
 contacts_bp = Blueprint("contacts", __name__)
 
@@ -13,19 +25,29 @@ def get_session():
 
 @contacts_bp.get("/")
 @require_auth
+@conditional("contact")
 def list_contacts():
+    names = CONTACT.names(request.args.get("fields"))
+    with get_session() as db:
+        rows, headers = fetch_page(db, CONTACT.select(names, [Contact.id]), [Contact.id], scalars=False)
+        return jsonify(CONTACT.render(rows, names)), 200, headers
+
+
+@contacts_bp.get("/search")
+@require_auth
+@conditional("contact")
+def search_contacts():
+    names = CONTACT.names(request.args.get("fields"))
     with get_session() as db:
-        rows = db.execute(select(Contact).order_by(Contact.id.desc())).scalars().all()
-        return jsonify([
-            {
-                "id": c.id,
-                "name": c.name,
-                "email": c.email,
-                "phone": c.phone,
-                "company": c.company,
-            }
-            for c in rows
-        ])
+        try:
+            limit = parse_limit(request.args.get("limit"))
+            search = ContactSearch(db.get_bind().dialect.name, request.args.get("q", ""), CONTACT, names, limit)
+        except InvalidSearch as exc:
+            abort(400, description=str(exc))
+        for stmt in search.statements():
+            if search.add(db.execute(stmt).all()):
+                break
+        return jsonify(CONTACT.render(search.rows, names))
 
 
 @contacts_bp.post("/")
@@ -44,7 +66,10 @@ def create_contact():
     )
     with get_session() as db:
         db.add(c)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            abort(409, description="A contact with this email already exists")
         db.refresh(c)
         return jsonify({
             "id": c.id,
@@ -55,19 +80,122 @@ def create_contact():
         }), 201
 
 
+@contacts_bp.post("/import")
+@require_auth
+def import_contacts():
+    try:
+        fmt = import_format(request.args.get("format"), request.content_type)
+    except InvalidImport as exc:
+        abort(400, description=str(exc))
+    if runs_inline(request.content_length):
+        with get_session() as db:
+            job = new_job(fmt)
+            db.add(job)
+            db.commit()
+            run_import(db, job, iter(lambda: request.stream.read(1 << 16), b""))
+            return jsonify(report(job)), 201 if job.status == "completed" else 422
+    # Too large to hold the request for: take the whole body, then import it in the background
+    body = spool()
+    try:
+        shutil.copyfileobj(request.stream, body, 1 << 16)
+        with get_session() as db:
+            job = new_job(fmt)
+            db.add(job)
+            db.commit()
+            started = report(job)
+    except Exception:
+        body.close()
+        raise
+    start_import(started["id"], body)
+    return jsonify(started), 202
+
+
+@contacts_bp.get("/imports/<int:import_id>")
+@require_auth
+def get_import(import_id: int):
+    with get_session() as db:
+        job = db.get(ContactImportJob, import_id)
+        if not job:
+            abort(404, description="Import not found")
+        return jsonify(report(job))
+
+
+@contacts_bp.get("/duplicates")
+@require_auth
+@conditional("contact_duplicate")
+def list_duplicates():
+    names = CONTACT_DUPLICATE.names(request.args.get("fields"))
+    keys = [ContactDuplicate.score, ContactDuplicate.id]
+    with get_session() as db:
+        stmt = CONTACT_DUPLICATE.select(names, keys).where(ContactDuplicate.status == "open")
+        rows, headers = fetch_page(db, stmt, keys, scalars=False)
+        return jsonify(CONTACT_DUPLICATE.render(rows, names)), 200, headers
+
+
+@contacts_bp.post("/duplicates/scan")
+@require_auth
+def scan_duplicates():
+    run = dedupe.start_scan()
+    if run is None:
+        abort(409, description="A duplicate scan is already running")
+    return jsonify(run), 202 if run["status"] == "running" else 200
+
+
+@contacts_bp.get("/duplicates/runs/<int:run_id>")
+@require_auth
+def get_duplicate_run(run_id: int):
+    with get_session() as db:
+        run = db.get(ContactDedupeRun, run_id)
+        if not run:
+            abort(404, description="Scan not found")
+        return jsonify(dedupe.report(run))
+
+
+@contacts_bp.post("/<int:contact_id>/merge")
+@require_auth
+def merge_contacts(contact_id: int):
+    data = request.get_json(force=True) or {}
+    duplicates = data.get("duplicates")
+    if not isinstance(duplicates, list) or not all(isinstance(i, int) for i in duplicates):
+        abort(400, description="duplicates must be a list of contact ids")
+    with get_session() as db:
+        try:
+            repointed = dedupe.merge(db, contact_id, duplicates)
+        except dedupe.MergeError as exc:
+            abort(400, description=str(exc))
+        except LookupError as exc:
+            abort(404, description=str(exc))
+        row = db.execute(CONTACT.select(CONTACT.list_fields).where(Contact.id == contact_id)).first()
+        return jsonify({"contact": CONTACT.render_one(row, CONTACT.list_fields),
+                        "merged": sorted(set(duplicates)), "repointed": repointed})
+
+
 @contacts_bp.get("/<int:contact_id>")
+@conditional("contact")
 def get_contact(contact_id: int):
+    names = CONTACT.names(request.args.get("fields"), detail=True)
     with get_session() as db:
-        c = db.get(Contact, contact_id)
-        if not c:
+        row = db.execute(CONTACT.select(names).where(Contact.id == contact_id)).first()
+        if not row:
             abort(404, description="Contact not found")
-        return jsonify({
-            "id": c.id,
-            "name": c.name,
-            "email": c.email,
-            "phone": c.phone,
-            "company": c.company,
-        })
+        return jsonify(CONTACT.render_one(row, names))
+
+
+@contacts_bp.get("/<int:contact_id>/overview")
+@require_auth
+@conditional("contact", "deal", "sale_order", "invoice", "project")
+def contact_overview(contact_id: int):
+    try:
+        overview = ContactOverview(contact_id, parse_limits(request.args))
+    except InvalidOverview as exc:
+        abort(400, description=str(exc))
+    rows = {}
+    with get_session() as db:
+        for name, stmt in overview.statements():
+            rows[name] = db.execute(stmt).all()
+            if name == "contact" and not rows[name]:
+                abort(404, description="Contact not found")
+    return jsonify(overview.render(rows))
 
 
 @contacts_bp.put("/<int:contact_id>")
@@ -81,7 +209,10 @@ def update_contact(contact_id: int):
             if key in data:
                 setattr(c, key, data[key])
         db.add(c)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            abort(409, description="A contact with this email already exists")
         db.refresh(c)
         return jsonify({
             "id": c.id,
@@ -1,8 +1,13 @@
 from flask import Blueprint, request, jsonify, abort
-from sqlalchemy import select
 from app.db import SessionLocal
+from app.pagination import fetch_page
+from app.filters import DEALS
+from app.projections import DEAL, money
 from app.models.deal import Deal
 from app.auth import require_auth
+from app.etags import conditional
+from app.pipeline import InvalidPipeline, parse_contact, pipeline_statement, render as render_pipeline
+from app import stage_analytics
 
 
 deals_bp = Blueprint("deals", __name__)
@@ -14,19 +19,45 @@ def get_session():
 
 @deals_bp.get("/")
 @require_auth
+@conditional("deal")
 def list_deals():
+    names = DEAL.names(request.args.get("fields"))
+    stmt, keys, descending = DEALS.query(DEAL, names, request.args)
     with get_session() as db:
-        rows = db.execute(select(Deal).order_by(Deal.id.desc())).scalars().all()
-        return jsonify([
-            {
-                "id": d.id,
-                "title": d.title,
-                "amount": float(d.amount) if d.amount is not None else 0.0,
-                "stage": d.stage,
-                "contact_id": d.contact_id,
-            }
-            for d in rows
-        ])
+        rows, headers = fetch_page(db, stmt, keys, scalars=False, descending=descending)
+        return jsonify(DEAL.render(rows, names)), 200, headers
+
+
+@deals_bp.get("/pipeline")
+@require_auth
+@conditional("deal")
+def deal_pipeline():
+    try:
+        contact_id = parse_contact(request.args.get("contact_id"))
+    except InvalidPipeline as exc:
+        abort(400, description=str(exc))
+    with get_session() as db:
+        rows = db.execute(pipeline_statement(db.get_bind().dialect.name, contact_id)).all()
+        return jsonify(render_pipeline(rows))
+
+
+@deals_bp.get("/analytics")
+@require_auth
+@conditional(*stage_analytics.TABLES)
+def deal_analytics():
+    with get_session() as db:
+        dialect = db.get_bind().dialect.name
+        rows = {name: db.execute(stmt).all() for name, stmt in stage_analytics.statements(dialect)}
+        return jsonify(stage_analytics.render(rows))
+
+
+@deals_bp.post("/analytics/compact")
+@require_auth
+def compact_analytics():
+    run = stage_analytics.start_compaction()
+    if run is None:
+        abort(409, description="A stage compaction is already running")
+    return jsonify(run), 202 if run["status"] == "running" else 200
 
 
 @deals_bp.post("/")
@@ -50,25 +81,21 @@ def create_deal():
         return jsonify({
             "id": d.id,
             "title": d.title,
-            "amount": float(d.amount) if d.amount is not None else 0.0,
+            "amount": money(d.amount),
             "stage": d.stage,
             "contact_id": d.contact_id,
         }), 201
 
 
 @deals_bp.get("/<int:deal_id>")
+@conditional("deal")
 def get_deal(deal_id: int):
+    names = DEAL.names(request.args.get("fields"), detail=True)
     with get_session() as db:
-        d = db.get(Deal, deal_id)
-        if not d:
+        row = db.execute(DEAL.select(names).where(Deal.id == deal_id)).first()
+        if not row:
             abort(404, description="Deal not found")
-        return jsonify({
-            "id": d.id,
-            "title": d.title,
-            "amount": float(d.amount) if d.amount is not None else 0.0,
-            "stage": d.stage,
-            "contact_id": d.contact_id,
-        })
+        return jsonify(DEAL.render_one(row, names))
 
 
 @deals_bp.put("/<int:deal_id>")
@@ -87,7 +114,7 @@ def update_deal(deal_id: int):
         return jsonify({
             "id": d.id,
             "title": d.title,
-            "amount": float(d.amount) if d.amount is not None else 0.0,
+            "amount": money(d.amount),
             "stage": d.stage,
             "contact_id": d.contact_id,
         })
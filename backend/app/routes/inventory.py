@@ -1,8 +1,17 @@
 from flask import Blueprint, request, jsonify, abort
 from sqlalchemy import select
 from app.db import SessionLocal
+from app.pagination import fetch_page
+from app.filters import PRODUCTS
+from app.projections import PRODUCT, STOCK_MOVEMENT, money
 from app.models.product import Product
+from app.models.product_feed import ProductFeedJob
+from app.models.stock_movement import StockMovement
 from app.auth import require_auth
+from app.etags import conditional
+from app.response_cache import response_cache
+from app.contact_import import InvalidImport, import_format
+from app import product_feed, sku_index, stock
 
 
 inventory_bp = Blueprint("inventory", __name__)
@@ -14,20 +23,13 @@ def get_session():
 
 @inventory_bp.get("/")
 @require_auth
+@conditional("product", cache=response_cache)
 def list_products():
+    names = PRODUCT.names(request.args.get("fields"))
+    stmt, keys, descending = PRODUCTS.query(PRODUCT, names, request.args)
     with get_session() as db:
-        rows = db.execute(select(Product).order_by(Product.id.desc())).scalars().all()
-        return jsonify([
-            {
-                "id": p.id,
-                "name": p.name,
-                "sku": p.sku,
-                "description": p.description,
-                "price": float(p.price) if p.price is not None else 0.0,
-                "stock": p.stock,
-            }
-            for p in rows
-        ])
+        rows, headers = fetch_page(db, stmt, keys, scalars=False, descending=descending)
+        return jsonify(PRODUCT.render(rows, names)), 200, headers
 
 
 @inventory_bp.post("/")
@@ -48,6 +50,10 @@ def create_product():
     )
     with get_session() as db:
         db.add(p)
+        db.flush()
+        opening = stock.opening_movement(p)
+        if opening is not None:
+            db.add(opening)
         db.commit()
         db.refresh(p)
         return jsonify({
@@ -55,37 +61,146 @@ def create_product():
             "name": p.name,
             "sku": p.sku,
             "description": p.description,
-            "price": float(p.price) if p.price is not None else 0.0,
+            "price": money(p.price),
             "stock": p.stock,
         }), 201
 
 
+@inventory_bp.post("/reserve")
+@require_auth
+def reserve_stock():
+    data = request.get_json(force=True) or {}
+    try:
+        quantities, reference = stock.parse_items(data), stock.parse_reference(data)
+        with get_session() as db:
+            items = stock.reserve(db, quantities, reference)
+    except (stock.InvalidReservation, stock.InvalidMovement) as exc:
+        abort(400, description=str(exc))
+    except stock.OutOfStock as exc:
+        return jsonify({"error": str(exc), "shortages": exc.shortages}), 409
+    return jsonify({"items": items})
+
+
+@inventory_bp.post("/release")
+@require_auth
+def release_stock():
+    data = request.get_json(force=True) or {}
+    try:
+        quantities, reference = stock.parse_items(data), stock.parse_reference(data)
+        with get_session() as db:
+            items = stock.release(db, quantities, reference)
+    except (stock.InvalidReservation, stock.InvalidMovement) as exc:
+        abort(400, description=str(exc))
+    return jsonify({"items": items})
+
+
+@inventory_bp.post("/lookup")
+@require_auth
+def lookup_skus():
+    try:
+        skus = sku_index.parse_skus(request.get_json(force=True) or {})
+    except sku_index.InvalidLookup as exc:
+        abort(400, description=str(exc))
+    with get_session() as db:
+        return jsonify(sku_index.lookup(db, skus))
+
+
+@inventory_bp.post("/feed")
+@require_auth
+def upsert_feed():
+    try:
+        fmt = import_format(request.args.get("format"), request.content_type)
+    except InvalidImport as exc:
+        abort(400, description=str(exc))
+    with get_session() as db:
+        job = product_feed.new_job(fmt)
+        db.add(job)
+        db.commit()
+        product_feed.run_feed(db, job, iter(lambda: request.stream.read(1 << 16), b""))
+        return jsonify(product_feed.report(job)), 201 if job.status == "completed" else 422
+
+
+@inventory_bp.get("/feeds/<int:feed_id>")
+@require_auth
+def get_feed(feed_id: int):
+    with get_session() as db:
+        job = db.get(ProductFeedJob, feed_id)
+        if not job:
+            abort(404, description="Feed not found")
+        return jsonify(product_feed.report(job))
+
+
+@inventory_bp.post("/movements")
+@require_auth
+def record_movement():
+    data = request.get_json(force=True) or {}
+    product_id = data.get("product_id")
+    if not isinstance(product_id, int):
+        abort(400, description="product_id is required")
+    try:
+        kind, quantity, reference = stock.parse_movement(data)
+        with get_session() as db:
+            movement = stock.record(db, product_id, kind, quantity, reference)
+    except stock.InvalidMovement as exc:
+        abort(400, description=str(exc))
+    except stock.OutOfStock as exc:
+        return jsonify({"error": str(exc), "shortages": exc.shortages}), 409
+    if movement is None:
+        abort(404, description="Product not found")
+    return jsonify(movement), 201
+
+
+@inventory_bp.get("/<int:product_id>/movements")
+@require_auth
+@conditional("stock_movement")
+def list_movements(product_id: int):
+    names = STOCK_MOVEMENT.names(request.args.get("fields"))
+    stmt = STOCK_MOVEMENT.select(names, [StockMovement.id]).where(StockMovement.product_id == product_id)
+    with get_session() as db:
+        rows, headers = fetch_page(db, stmt, [StockMovement.id], scalars=False)
+        return jsonify(STOCK_MOVEMENT.render(rows, names)), 200, headers
+
+
+@inventory_bp.get("/<int:product_id>/stock")
+@require_auth
+@conditional("product", "stock_movement", "stock_snapshot")
+def stock_as_of(product_id: int):
+    try:
+        as_of = stock.parse_as_of(request.args.get("as_of"))
+    except stock.InvalidMovement as exc:
+        abort(400, description=str(exc))
+    with get_session() as db:
+        if db.execute(select(Product.id).where(Product.id == product_id)).first() is None:
+            abort(404, description="Product not found")
+        return jsonify(stock.stock_as_of(db, product_id, as_of))
+
+
 @inventory_bp.get("/<int:product_id>")
+@conditional("product")
 def get_product(product_id: int):
+    names = PRODUCT.names(request.args.get("fields"), detail=True)
     with get_session() as db:
-        p = db.get(Product, product_id)
-        if not p:
+        row = db.execute(PRODUCT.select(names).where(Product.id == product_id)).first()
+        if not row:
             abort(404, description="Product not found")
-        return jsonify({
-            "id": p.id,
-            "name": p.name,
-            "sku": p.sku,
-            "description": p.description,
-            "price": float(p.price) if p.price is not None else 0.0,
-            "stock": p.stock,
-        })
+        return jsonify(PRODUCT.render_one(row, names))
 
 
 @inventory_bp.put("/<int:product_id>")
 def update_product(product_id: int):
     data = request.get_json(force=True) or {}
+    if "stock" in data and (not isinstance(data["stock"], int) or isinstance(data["stock"], bool)):
+        abort(400, description="stock must be an integer")
     with get_session() as db:
-        p = db.get(Product, product_id)
+        # Locked when the stock changes, so the adjustment logged is the real difference
+        p = db.get(Product, product_id, with_for_update="stock" in data)
         if not p:
             abort(404, description="Product not found")
-        for key in ("name", "sku", "description", "price", "stock"):
+        for key in ("name", "sku", "description", "price"):
             if key in data:
                 setattr(p, key, data[key])
+        if "stock" in data:
+            stock.set_stock(db, p, data["stock"])
         db.add(p)
         db.commit()
         db.refresh(p)
@@ -94,7 +209,7 @@ def update_product(product_id: int):
             "name": p.name,
             "sku": p.sku,
             "description": p.description,
-            "price": float(p.price) if p.price is not None else 0.0,
+            "price": money(p.price),
             "stock": p.stock,
         })
 
@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify, abort
-from sqlalchemy import select
 from app.db import SessionLocal
+from app.pagination import fetch_page
+from app.filters import INVOICES
+from app.projections import INVOICE, INVOICE_ITEM, money
 from app.models.invoice import Invoice, InvoiceItem
 from app.auth import require_auth
+from app.etags import conditional
 
 invoices_bp = Blueprint("invoices", __name__)
 
@@ -13,22 +16,13 @@ def get_session():
 
 @invoices_bp.get("/")
 @require_auth
+@conditional("invoice")
 def list_invoices():
+    names = INVOICE.names(request.args.get("fields"))
+    stmt, keys, descending = INVOICES.query(INVOICE, names, request.args)
     with get_session() as db:
-        rows = db.execute(select(Invoice).order_by(Invoice.id.desc())).scalars().all()
-        return jsonify([
-            {
-                "id": inv.id,
-                "invoice_number": inv.invoice_number,
-                "sale_order_id": inv.sale_order_id,
-                "contact_id": inv.contact_id,
-                "status": inv.status,
-                "invoice_date": str(inv.invoice_date) if inv.invoice_date else None,
-                "due_date": str(inv.due_date) if inv.due_date else None,
-                "total": float(inv.total) if inv.total is not None else 0.0,
-            }
-            for inv in rows
-        ])
+        rows, headers = fetch_page(db, stmt, keys, scalars=False, descending=descending)
+        return jsonify(INVOICE.render(rows, names)), 200, headers
 
 
 @invoices_bp.post("/")
@@ -61,41 +55,23 @@ def create_invoice():
             "sale_order_id": inv.sale_order_id,
             "contact_id": inv.contact_id,
             "status": inv.status,
-            "total": float(inv.total) if inv.total is not None else 0.0,
+            "total": money(inv.total),
         }), 201
 
 
 @invoices_bp.get("/<int:invoice_id>")
 @require_auth
+@conditional("invoice", "invoice_item")
 def get_invoice(invoice_id: int):
+    names = INVOICE.names(request.args.get("fields"), detail=True)
     with get_session() as db:
-        inv = db.get(Invoice, invoice_id)
-        if not inv:
+        row = db.execute(INVOICE.select(names).where(Invoice.id == invoice_id)).first()
+        if not row:
             abort(404, description="Invoice not found")
-        return jsonify({
-            "id": inv.id,
-            "invoice_number": inv.invoice_number,
-            "sale_order_id": inv.sale_order_id,
-            "contact_id": inv.contact_id,
-            "status": inv.status,
-            "invoice_date": str(inv.invoice_date) if inv.invoice_date else None,
-            "due_date": str(inv.due_date) if inv.due_date else None,
-            "subtotal": float(inv.subtotal) if inv.subtotal is not None else 0.0,
-            "tax": float(inv.tax) if inv.tax is not None else 0.0,
-            "total": float(inv.total) if inv.total is not None else 0.0,
-            "notes": inv.notes,
-            "items": [
-                {
-                    "id": item.id,
-                    "product_id": item.product_id,
-                    "description": item.description,
-                    "quantity": item.quantity,
-                    "unit_price": float(item.unit_price) if item.unit_price is not None else 0.0,
-                    "subtotal": float(item.subtotal) if item.subtotal is not None else 0.0,
-                }
-                for item in inv.items
-            ]
-        })
+        items = db.execute(
+            INVOICE_ITEM.select(INVOICE_ITEM.list_fields).where(InvoiceItem.invoice_id == invoice_id).order_by(InvoiceItem.id)
+        ).all()
+        return jsonify({**INVOICE.render_one(row, names), "items": INVOICE_ITEM.render(items, INVOICE_ITEM.list_fields)})
 
 
 @invoices_bp.put("/<int:invoice_id>")
@@ -117,7 +93,7 @@ def update_invoice(invoice_id: int):
             "id": inv.id,
             "invoice_number": inv.invoice_number,
             "status": inv.status,
-            "total": float(inv.total) if inv.total is not None else 0.0,
+            "total": money(inv.total),
         })
 
 
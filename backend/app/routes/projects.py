@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify, abort
-from sqlalchemy import select
 from app.db import SessionLocal
+from app.pagination import fetch_page
+from app.filters import PROJECT_TASKS, PROJECTS
+from app.projections import PROJECT, PROJECT_TASK_FIELDS, TASK
 from app.models.project import Project, Task, TimeSheet
 from app.auth import require_auth
+from app.etags import conditional
 
 projects_bp = Blueprint("projects", __name__)
 
@@ -13,21 +16,13 @@ def get_session():
 
 @projects_bp.get("/")
 @require_auth
+@conditional("project")
 def list_projects():
+    names = PROJECT.names(request.args.get("fields"))
+    stmt, keys, descending = PROJECTS.query(PROJECT, names, request.args)
     with get_session() as db:
-        rows = db.execute(select(Project).order_by(Project.id.desc())).scalars().all()
-        return jsonify([
-            {
-                "id": p.id,
-                "name": p.name,
-                "code": p.code,
-                "status": p.status,
-                "contact_id": p.contact_id,
-                "start_date": str(p.start_date) if p.start_date else None,
-                "end_date": str(p.end_date) if p.end_date else None,
-            }
-            for p in rows
-        ])
+        rows, headers = fetch_page(db, stmt, keys, scalars=False, descending=descending)
+        return jsonify(PROJECT.render(rows, names)), 200, headers
 
 
 @projects_bp.post("/")
@@ -62,52 +57,30 @@ def create_project():
 
 @projects_bp.get("/<int:project_id>")
 @require_auth
+@conditional("project", "task")
 def get_project(project_id: int):
+    names = PROJECT.names(request.args.get("fields"), detail=True)
     with get_session() as db:
-        p = db.get(Project, project_id)
-        if not p:
+        row = db.execute(PROJECT.select(names).where(Project.id == project_id)).first()
+        if not row:
             abort(404, description="Project not found")
-        return jsonify({
-            "id": p.id,
-            "name": p.name,
-            "code": p.code,
-            "description": p.description,
-            "contact_id": p.contact_id,
-            "status": p.status,
-            "start_date": str(p.start_date) if p.start_date else None,
-            "end_date": str(p.end_date) if p.end_date else None,
-            "tasks": [
-                {
-                    "id": t.id,
-                    "title": t.title,
-                    "status": t.status,
-                    "priority": t.priority,
-                    "assigned_to_id": t.assigned_to_id,
-                    "due_date": str(t.due_date) if t.due_date else None,
-                }
-                for t in p.tasks
-            ]
-        })
+        tasks = db.execute(
+            TASK.select(PROJECT_TASK_FIELDS).where(Task.project_id == project_id).order_by(Task.id)
+        ).all()
+        return jsonify({**PROJECT.render_one(row, names), "tasks": TASK.render(tasks, PROJECT_TASK_FIELDS)})
 
 
 # Task endpoints
 @projects_bp.get("/<int:project_id>/tasks")
 @require_auth
+@conditional("task")
 def list_tasks(project_id: int):
+    names = TASK.names(request.args.get("fields"))
+    stmt, keys, descending = PROJECT_TASKS.query(TASK, names, request.args)
     with get_session() as db:
-        rows = db.execute(select(Task).where(Task.project_id == project_id).order_by(Task.id.desc())).scalars().all()
-        return jsonify([
-            {
-                "id": t.id,
-                "project_id": t.project_id,
-                "title": t.title,
-                "status": t.status,
-                "priority": t.priority,
-                "assigned_to_id": t.assigned_to_id,
-                "due_date": str(t.due_date) if t.due_date else None,
-            }
-            for t in rows
-        ])
+        stmt = stmt.where(Task.project_id == project_id)
+        rows, headers = fetch_page(db, stmt, keys, scalars=False, descending=descending)
+        return jsonify(TASK.render(rows, names)), 200, headers
 
 
 @projects_bp.post("/<int:project_id>/tasks")
@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify, abort
-from sqlalchemy import select
 from app.db import SessionLocal
+from app.pagination import fetch_page
+from app.filters import SALE_ORDERS
+from app.projections import ORDER_ITEM, SALE_ORDER, money
 from app.models.sale_order import SaleOrder, OrderItem
 from app.auth import require_auth
+from app.etags import conditional
 
 
 sales_bp = Blueprint("sales", __name__)
@@ -14,19 +17,13 @@ def get_session():
 
 @sales_bp.get("/")
 @require_auth
+@conditional("sale_order")
 def list_orders():
+    names = SALE_ORDER.names(request.args.get("fields"))
+    stmt, keys, descending = SALE_ORDERS.query(SALE_ORDER, names, request.args)
     with get_session() as db:
-        rows = db.execute(select(SaleOrder).order_by(SaleOrder.id.desc())).scalars().all()
-        return jsonify([
-            {
-                "id": o.id,
-                "order_number": o.order_number,
-                "contact_id": o.contact_id,
-                "status": o.status,
-                "total": float(o.total) if o.total is not None else 0.0,
-            }
-            for o in rows
-        ])
+        rows, headers = fetch_page(db, stmt, keys, scalars=False, descending=descending)
+        return jsonify(SALE_ORDER.render(rows, names)), 200, headers
 
 
 @sales_bp.post("/")
@@ -52,33 +49,22 @@ def create_order():
             "order_number": o.order_number,
             "contact_id": o.contact_id,
             "status": o.status,
-            "total": float(o.total) if o.total is not None else 0.0,
+            "total": money(o.total),
         }), 201
 
 
 @sales_bp.get("/<int:order_id>")
+@conditional("sale_order", "order_item")
 def get_order(order_id: int):
+    names = SALE_ORDER.names(request.args.get("fields"), detail=True)
     with get_session() as db:
-        o = db.get(SaleOrder, order_id)
-        if not o:
+        row = db.execute(SALE_ORDER.select(names).where(SaleOrder.id == order_id)).first()
+        if not row:
             abort(404, description="Order not found")
-        return jsonify({
-            "id": o.id,
-            "order_number": o.order_number,
-            "contact_id": o.contact_id,
-            "status": o.status,
-            "total": float(o.total) if o.total is not None else 0.0,
-            "items": [
-                {
-                    "id": item.id,
-                    "product_id": item.product_id,
-                    "quantity": item.quantity,
-                    "unit_price": float(item.unit_price) if item.unit_price is not None else 0.0,
-                    "subtotal": float(item.subtotal) if item.subtotal is not None else 0.0,
-                }
-                for item in o.items
-            ]
-        })
+        items = db.execute(
+            ORDER_ITEM.select(ORDER_ITEM.list_fields).where(OrderItem.order_id == order_id).order_by(OrderItem.id)
+        ).all()
+        return jsonify({**SALE_ORDER.render_one(row, names), "items": ORDER_ITEM.render(items, ORDER_ITEM.list_fields)})
 
 
 @sales_bp.put("/<int:order_id>")
@@ -99,7 +85,7 @@ def update_order(order_id: int):
             "order_number": o.order_number,
             "contact_id": o.contact_id,
             "status": o.status,
-            "total": float(o.total) if o.total is not None else 0.0,
+            "total": money(o.total),
         })
 
 
@@ -9,6 +9,7 @@ from pathlib import Path
 # Add backend to path
 sys.path.insert(0, str(Path(__file__).parent))
 
+from app import stock
 from app.db import SessionLocal, Base, engine
 from app.models.user import User, Role
 from app.models.contact import Contact
@@ -118,6 +119,9 @@ def seed():
                 Product(name="Gadget X", sku="GDG-001", description="Advanced gadget", price=99.99, stock=50),
             ]
             db.add_all(products)
+            db.flush()
+            # Opening stock goes in the ledger too, so its sum matches `stock` (see app.stock)
+            db.add_all([stock.opening_movement(p) for p in products if p.stock])
             db.commit()
             print("✓ Seeded 3 products")
 
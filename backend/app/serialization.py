@@ -0,0 +1,61 @@
+"""
+JSON encoding shared by the Flask and FastAPI apps (orjson).
+
+`date`/`datetime` are encoded natively as ISO 8601. `Decimal` (money columns)
+is encoded as a JSON number by default; with JSON_EXACT_DECIMALS=true it is
+emitted as the exact decimal string instead ("19.90"), so clients that care
+about cents never see binary-float rounding.
+
+Handlers return raw column values (see app.projections) and leave the
+encoding to this module:
+
+    FastAPI  FastAPI(default_response_class=ORJSONResponse)
+    Flask    app.json = ORJSONProvider(app)
+"""
+import os
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from flask.json.provider import JSONProvider
+
+EXACT_DECIMALS = os.getenv("JSON_EXACT_DECIMALS", "false").lower() in ("1", "true", "yes")
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def encode_decimal(value: Decimal):
+    return str(value) if EXACT_DECIMALS else float(value)
+
+
+def _default(obj: Any):
+    # orjson calls back only for types it does not encode natively
+    if isinstance(obj, Decimal):
+        return encode_decimal(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class ORJSONProvider(JSONProvider):
+    """Flask `app.json` backed by orjson; keys keep the order handlers built them in."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj).decode()
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype="application/json")
@@ -0,0 +1,216 @@
+"""
+Batch SKU lookup for scanning terminals, with an in-process SKU index.
+
+`POST /inventory/lookup` resolves up to SKU_LOOKUP_MAX_SKUS SKUs at once to
+(id, name, price, stock). SKUs the index does not hold are read in one
+`WHERE sku IN (...)` on the unique sku index, so a batch costs at most one
+query however many SKUs it carries; repeated SKUs are resolved once. A batch
+whose SKUs are all indexed touches no database at all.
+
+The index is an LRU of SKU_CACHE_SIZE entries (0 disables it). A commit that
+wrote products drops their entries once it lands: ORM flushes name their
+products, and statements name theirs with the `product_ids` execution option
+(see app.stock); a product statement that names none drops the whole index.
+Writes made by other processes are not seen, so entries also expire after
+SKU_CACHE_TTL seconds. Stock read here is advisory: POST /inventory/reserve
+is what takes it.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app import metrics
+from app.models.product import Product
+
+MAX_SKUS = int(os.getenv("SKU_LOOKUP_MAX_SKUS", "5000"))
+
+Entry = Tuple[int, str, str, object, int]  # (id, sku, name, price, stock)
+_ALL = "*"  # written_products marker: some product statement named no ids
+
+
+class InvalidLookup(ValueError):
+    """A malformed lookup request."""
+
+
+class SkuIndex:
+    def __init__(self, maxsize: int = 100_000, ttl: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # sku -> (expires_at, entry)
+        self._skus_by_id: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; a fill read before one is dropped rather than stored stale
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_many(self, skus: Iterable[str]) -> Tuple[Dict[str, Entry], List[str]]:
+        """({sku: entry} for the indexed SKUs, [the SKUs to read])."""
+        found, missing = {}, []
+        now = self._clock()
+        with self._lock:
+            for sku in skus:
+                item = self._entries.get(sku)
+                if item is not None and item[0] > now:
+                    self._entries.move_to_end(sku)
+                    found[sku] = item[1]
+                else:
+                    if item is not None:
+                        self._drop(sku)
+                    missing.append(sku)
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, entries: Iterable[Entry], generation: int) -> None:
+        """Index `entries` read while `generation` was current, unless something was invalidated since."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            expires_at = self._clock() + self.ttl
+            for entry in entries:
+                product_id, sku = entry[0], entry[1]
+                self._drop(sku)
+                self._entries[sku] = (expires_at, entry)
+                self._skus_by_id[product_id] = sku
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_products(self, product_ids: Iterable[int]) -> None:
+        with self._lock:
+            self.generation += 1
+            for product_id in product_ids:
+                sku = self._skus_by_id.get(product_id)
+                if sku is not None:
+                    self._drop(sku)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._skus_by_id.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _drop(self, sku: str) -> None:
+        item = self._entries.pop(sku, None)
+        if item is not None:
+            self._skus_by_id.pop(item[1][0], None)
+
+
+sku_index = SkuIndex(
+    maxsize=int(os.getenv("SKU_CACHE_SIZE", "100000")),
+    ttl=float(os.getenv("SKU_CACHE_TTL", "30")),
+)
+metrics.register("sku_index", sku_index.stats)
+
+
+def parse_skus(payload) -> List[str]:
+    """The distinct SKUs of `{"skus": [...]}`, in request order."""
+    skus = payload.get("skus") if isinstance(payload, dict) else None
+    if not isinstance(skus, list) or not skus:
+        raise InvalidLookup("skus must be a non-empty list of strings")
+    if len(skus) > MAX_SKUS:
+        raise InvalidLookup(f"at most {MAX_SKUS} skus per request")
+    if not all(isinstance(sku, str) and sku for sku in skus):
+        raise InvalidLookup("skus must be a non-empty list of strings")
+    return list(dict.fromkeys(skus))
+
+
+def lookup_statement(skus: Sequence[str]):
+    return select(Product.id, Product.sku, Product.name, Product.price, Product.stock).where(Product.sku.in_(skus))
+
+
+def _entries(rows) -> List[Entry]:
+    return [(row.id, row.sku, row.name, row.price, row.stock) for row in rows]
+
+
+def _body(skus: Sequence[str], found: Dict[str, Entry]) -> dict:
+    items = [{"sku": sku, "id": entry[0], "name": entry[2], "price": entry[3], "stock": entry[4]}
+             for sku in skus for entry in (found.get(sku),) if entry is not None]
+    return {"items": items, "missing": [sku for sku in skus if sku not in found]}
+
+
+def lookup(db, skus: Sequence[str]) -> dict:
+    """{"items": [{sku, id, name, price, stock}], "missing": [sku]}, both in request order."""
+    found, missing = sku_index.get_many(skus)
+    if missing:
+        generation = sku_index.generation
+        entries = _entries(db.execute(lookup_statement(missing)).all())
+        sku_index.put_many(entries, generation)
+        found.update((entry[1], entry) for entry in entries)
+    return _body(skus, found)
+
+
+async def lookup_async(db, skus: Sequence[str]) -> dict:
+    """`lookup` for an AsyncSession."""
+    found, missing = sku_index.get_many(skus)
+    if missing:
+        generation = sku_index.generation
+        entries = _entries((await db.execute(lookup_statement(missing))).all())
+        sku_index.put_many(entries, generation)
+        found.update((entry[1], entry) for entry in entries)
+    return _body(skus, found)
+
+
+def _note_written(session: Session, product_ids: Optional[Iterable[int]]) -> None:
+    written = session.info.setdefault("written_products", set())
+    if product_ids is None:
+        written.add(_ALL)
+    else:
+        written.update(product_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _flushed_products(session: Session, flush_context) -> None:
+    ids = [obj.id for obj in (*session.dirty, *session.deleted)
+           if isinstance(obj, Product) and (obj not in session.dirty or session.is_modified(obj))]
+    if ids:
+        _note_written(session, ids)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _product_statements(state: ORMExecuteState) -> None:
+    table = getattr(state.statement, "table", None)
+    if (state.is_insert or state.is_update or state.is_delete) and getattr(table, "name", None) == "product":
+        _note_written(state.session, state.execution_options.get("product_ids"))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    written = session.info.pop("written_products", None)
+    if written:
+        if _ALL in written:
+            sku_index.clear()
+        else:
+            sku_index.invalidate_products(written)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop("written_products", None)
@@ -0,0 +1,258 @@
+"""
+Deal stage analytics: `GET /deals/analytics` and the compaction job.
+
+Triggers append to `deal_stage_event` whenever a deal is created or its
+stage changes (see app.models.deal_history), so the log holds every stay: a
+deal enters a stage with one event and leaves it with its next one.
+
+Requests never read the log. A compaction pass folds the events added since
+the previous pass into two small rollups, DEAL_ANALYTICS_BATCH_EVENTS at a
+time, one commit per batch. For the deals with new events it reads their
+history with window functions (LEAD for where and when each stay ended,
+FIRST_VALUE for when the deal was created) and adds:
+
+    deal_stage_rollup     per stage: entries (count, amount, deal age),
+                          exits, exits that were not to a lost stage, and
+                          the summed time in stage of the exits
+    deal_stage_duration   per stage, finished stays by duration bucket
+
+so the response costs O(stages) however long the log grows. Buckets are
+quarter powers of two of the seconds spent, so medians are interpolated to
+within about 10%; averages are exact. Passes run from cron (below) or
+`POST /deals/analytics/compact`, never from a read: the response says how far
+the rollups reach (`compacted`), and a pass with no new events to fold is not
+started at all.
+
+Per stage, `conversion` is the share of the deals that left it that moved on
+to a stage that is not a lost one. Pipeline velocity is the expected value
+the open pipeline closes per day:
+
+    open deals * win rate * average won amount / average days to win
+
+    python -m app.stage_analytics    # one pass, e.g. from cron
+"""
+import math
+import os
+from collections import Counter, defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import func, or_, select
+
+from app.batch_job import BatchJob
+from app.models.deal_history import DealStageCompaction, DealStageDuration, DealStageEvent, DealStageRollup
+from app.pipeline import pipeline_statement
+
+BATCH_EVENTS = int(os.getenv("DEAL_ANALYTICS_BATCH_EVENTS", "5000"))
+
+WON_STAGES = ("won",)
+LOST_STAGES = ("lost",)
+CLOSED_STAGES = WON_STAGES + LOST_STAGES
+# Tables a response is built from, for its ETag
+TABLES = ("deal", "deal_stage_rollup", "deal_stage_duration", "deal_stage_compaction")
+
+_BUCKETS_PER_DOUBLING = 4
+_DAY = 86400
+_CENTS = Decimal("0.01")
+
+
+def bucket(seconds: float) -> int:
+    return int(_BUCKETS_PER_DOUBLING * math.log2(1 + max(seconds, 0)))
+
+
+def median_seconds(buckets: Sequence[Tuple[int, int]]) -> Optional[float]:
+    """Median of a (bucket, stays) histogram sorted by bucket, interpolated within its bucket."""
+    half = sum(stays for _, stays in buckets) / 2
+    for number, stays in buckets:
+        if stays >= half:
+            return 2 ** ((number + half / stays) / _BUCKETS_PER_DOUBLING) - 1
+        half -= stays
+    return None
+
+
+def _stage_key(stage: Optional[str]) -> str:
+    return stage or ""
+
+
+def _seconds(start: datetime, end: datetime) -> float:
+    return max((end - start).total_seconds(), 0.0)
+
+
+def compact_batch(db, after_id: int, upto: int) -> Tuple[int, int, int]:
+    """Fold up to BATCH_EVENTS events in (`after_id`, `upto`] into the rollups (not committed).
+
+    Returns (last event id, events, finished stays); (after_id, 0, 0) once there are none.
+    """
+    batch = select(DealStageEvent.id).where(DealStageEvent.id > after_id, DealStageEvent.id <= upto) \
+        .order_by(DealStageEvent.id).limit(BATCH_EVENTS).subquery()
+    last_id, events = db.execute(select(func.max(batch.c.id), func.count())).one()
+    if not events:
+        return after_id, 0, 0
+
+    e = DealStageEvent
+    touched = select(e.deal_id).where(e.id > after_id, e.id <= last_id)
+    window = {"partition_by": e.deal_id, "order_by": e.id}
+    history = select(
+        e.id, e.to_stage, e.amount, e.changed_at,
+        func.lead(e.id).over(**window).label("next_id"),
+        func.lead(e.to_stage).over(**window).label("next_stage"),
+        func.lead(e.changed_at, type_=e.changed_at.type).over(**window).label("left_at"),
+        func.first_value(e.changed_at, type_=e.changed_at.type).over(**window).label("created_at"),
+    ).where(e.deal_id.in_(touched), e.id <= last_id).subquery()
+    # Entries made in this batch, and stays an event of this batch ended
+    rows = db.execute(select(history).where(or_(history.c.id > after_id, history.c.next_id > after_id))).all()
+
+    totals: Dict[str, Dict[str, object]] = defaultdict(lambda: {
+        "entered": 0, "entered_amount": Decimal(0), "entered_age": 0.0, "exited": 0, "converted": 0,
+        "stay_seconds": 0.0,
+    })
+    durations: Counter = Counter()
+    stays = 0
+    for row in rows:
+        stage = totals[_stage_key(row.to_stage)]
+        if row.id > after_id:
+            stage["entered"] += 1
+            stage["entered_amount"] += row.amount
+            stage["entered_age"] += _seconds(row.created_at, row.changed_at)
+        if row.next_id is not None and row.next_id > after_id:
+            seconds = _seconds(row.changed_at, row.left_at)
+            stage["exited"] += 1
+            stage["converted"] += row.next_stage not in LOST_STAGES
+            stage["stay_seconds"] += seconds
+            durations[_stage_key(row.to_stage), bucket(seconds)] += 1
+            stays += 1
+
+    existing = {r.stage: r for r in db.scalars(select(DealStageRollup).where(DealStageRollup.stage.in_(totals)))}
+    for name, added in totals.items():
+        rollup = existing.get(name)
+        if rollup is None:
+            db.add(DealStageRollup(stage=name, **added))
+            continue
+        for column, value in added.items():
+            setattr(rollup, column, getattr(rollup, column) + value)
+    counted = {(r.stage, r.bucket): r for r in db.scalars(
+        select(DealStageDuration).where(DealStageDuration.stage.in_({name for name, _ in durations})))}
+    for (name, number), count in durations.items():
+        if (name, number) in counted:
+            counted[name, number].stays += count
+        else:
+            db.add(DealStageDuration(stage=name, bucket=number, stays=count))
+    return last_id, events, stays
+
+
+def run_compaction(db, run: DealStageCompaction) -> DealStageCompaction:
+    """Compact every event logged since the last pass, committing `run`'s progress with each batch."""
+    return JOB.run(db, run)
+
+
+def new_run(db) -> Optional[DealStageCompaction]:
+    """A committed run that starts where the furthest previous one got to; None if no event is past it."""
+    return JOB.new_run(db)
+
+
+def start_compaction() -> Optional[dict]:
+    """Start a run in a background thread (its report, or a caught-up one); None if one is already running."""
+    return JOB.start()
+
+
+def report(run: DealStageCompaction) -> dict:
+    return {
+        "id": run.id,
+        "status": run.status,
+        "last_event_id": run.last_event_id,
+        "events": run.events,
+        "stays": run.stays,
+        "error": run.error,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+    }
+
+
+JOB = BatchJob("deal-stage-compaction", DealStageEvent.id, DealStageCompaction, "last_event_id", ("events", "stays"),
+               compact_batch, report)
+
+
+def statements(dialect: str):
+    """(name, statement) pairs for `render`; `pipeline` is app.pipeline's current deals per stage."""
+    yield "rollup", select(DealStageRollup).order_by(DealStageRollup.stage)
+    yield "durations", (select(DealStageDuration.stage, DealStageDuration.bucket, DealStageDuration.stays)
+                        .order_by(DealStageDuration.stage, DealStageDuration.bucket))
+    yield "pipeline", pipeline_statement(dialect)
+    yield "compaction", (select(DealStageCompaction).where(DealStageCompaction.status == "completed")
+                         .order_by(DealStageCompaction.id.desc()).limit(1))
+
+
+def _days(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds / _DAY, 3)
+
+
+def _ratio(part, whole) -> Optional[float]:
+    return round(part / whole, 4) if whole else None
+
+
+def render(rows) -> dict:
+    rollups = {r[0].stage: r[0] for r in rows["rollup"]}
+    histograms: Dict[str, list] = defaultdict(list)
+    for stage, number, stays in rows["durations"]:
+        histograms[stage].append((number, stays))
+    current = {_stage_key(stage): (deals, amount) for stage, deals, amount in rows["pipeline"]}
+
+    stages = []
+    for name in sorted(set(rollups) | set(current)):
+        r = rollups.get(name) or DealStageRollup(entered=0, exited=0, converted=0, stay_seconds=0)
+        stages.append({
+            "stage": name or None,
+            "current": current.get(name, (0, 0))[0],
+            "entered": r.entered,
+            "exited": r.exited,
+            "converted": r.converted,
+            "conversion": _ratio(r.converted, r.exited),
+            "median_days": _days(median_seconds(histograms[name])),
+            "average_days": _days(r.stay_seconds / r.exited if r.exited else None),
+        })
+
+    won = [rollups[s] for s in WON_STAGES if s in rollups]
+    won_deals = sum(r.entered for r in won)
+    lost_deals = sum(rollups[s].entered for s in LOST_STAGES if s in rollups)
+    open_deals = sum(deals for name, (deals, _) in current.items() if name not in CLOSED_STAGES)
+    open_amount = sum((Decimal(amount) for name, (_, amount) in current.items() if name not in CLOSED_STAGES),
+                      Decimal("0.00"))
+    won_amount = sum((Decimal(r.entered_amount) for r in won), Decimal(0)) / won_deals if won_deals else None
+    cycle_seconds = sum(r.entered_age for r in won) / won_deals if won_deals else None
+    per_day = None
+    if won_deals and cycle_seconds:
+        expected = open_deals * won_deals * won_amount / (won_deals + lost_deals)
+        per_day = (expected * _DAY / Decimal(str(cycle_seconds))).quantize(_CENTS)
+
+    compaction = rows["compaction"][0][0] if rows["compaction"] else None
+    return {
+        "stages": stages,
+        "velocity": {
+            "open_deals": open_deals,
+            "open_amount": open_amount,
+            "win_rate": _ratio(won_deals, won_deals + lost_deals),
+            "average_won_amount": won_amount.quantize(_CENTS) if won_amount is not None else None,
+            "average_days_to_win": _days(cycle_seconds),
+            "per_day": per_day,
+        },
+        "compacted": {
+            "last_event_id": compaction.last_event_id if compaction else 0,
+            "finished_at": compaction.finished_at.isoformat() if compaction else None,
+        },
+    }
+
+
+def main() -> None:
+    import json
+
+    import app.main  # noqa: F401  registers every model with the mapper
+
+    from app.db import SessionLocal
+
+    with SessionLocal() as db:
+        print(json.dumps(JOB.run_once(db), indent=2))
+
+
+if __name__ == "__main__":
+    main()
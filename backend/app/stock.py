@@ -0,0 +1,392 @@
+"""
+Stock: reservations, the movement ledger and as-of balances.
+
+Reading `stock`, subtracting in Python and writing it back loses updates
+when two orders run at once: both read 10 and both sell 10. A reservation
+instead takes each line with one conditional UPDATE:
+
+    UPDATE product SET stock = stock - :quantity
+    WHERE id = :id AND stock >= :quantity RETURNING stock
+
+which the database applies atomically against the current row (PostgreSQL
+re-checks the WHERE after waiting for a concurrent writer's lock; SQLite has
+a single writer). No row means not enough stock.
+
+A request is all or nothing: every line is taken in one transaction, and if
+any falls short the whole reservation is rolled back and each shortfall is
+reported. Lines are taken in product id order, so two reservations sharing
+SKUs always lock their rows in the same order and cannot deadlock (the
+`table_version` bump of app.etags comes after them, at commit). Repeated
+SKUs are summed into one line. Releasing (a cancelled order) adds the
+quantities back the same way.
+
+Every change is also a `stock_movement` row (receipt, sale, adjustment,
+return; signed quantity), written in the same transaction as the change to
+`product.stock`, so the ledger is the record and `stock` its running sum,
+kept current one movement at a time. Reservations are sales and releases
+returns; `POST /inventory/movements` records the rest, and setting `stock`
+through `PUT /inventory/<id>` records the difference as an adjustment.
+
+Stock as of a past time (`GET /inventory/<id>/stock?as_of=`) starts from the
+product's latest `stock_snapshot` taken by then and adds the movements after
+it up to the product's next snapshot, if there is one, so it reads only the
+movements between two snapshots, however far back `as_of` is.
+Snapshots are taken by
+
+    python -m app.stock    # e.g. nightly from cron
+
+which adds the movements since the previous run to each changed product's
+last snapshot. A run stops at the last movement every transaction writing
+the ledger has committed (see app.batch_job.committed_upto): on PostgreSQL a
+movement can commit after a later one, and one left below a snapshot would
+never be counted.
+"""
+import os
+from datetime import date, datetime, time, timezone
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+
+from app.batch_job import committed_upto
+from app.models.product import Product
+from app.models.stock_movement import StockMovement, StockSnapshot
+
+MAX_ITEMS = int(os.getenv("STOCK_RESERVE_MAX_ITEMS", "1000"))
+
+# The sign each kind of movement gives its quantity; adjustments are signed by the caller
+KINDS = {"receipt": 1, "return": 1, "sale": -1, "adjustment": 0}
+# Product ids per snapshot lookup (bound parameters per statement stay well inside SQLite's limit)
+_SNAPSHOT_CHUNK = 500
+
+
+class InvalidReservation(ValueError):
+    """A malformed request, or SKUs that match no product."""
+
+
+class InvalidMovement(ValueError):
+    """A movement with an unknown kind or a bad quantity, or an `as_of` that is not a date or time."""
+
+
+class OutOfStock(Exception):
+    """Some lines exceed the stock on hand; nothing was reserved."""
+
+    def __init__(self, shortages: List[dict]):
+        super().__init__("Insufficient stock for " + ", ".join(s["sku"] for s in shortages))
+        self.shortages = shortages
+
+
+def parse_items(payload) -> Dict[str, int]:
+    """{sku: quantity} from `{"items": [{"sku": ..., "quantity": ...}, ...]}`."""
+    items = payload.get("items") if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        raise InvalidReservation("items must be a non-empty list of {sku, quantity}")
+    if len(items) > MAX_ITEMS:
+        raise InvalidReservation(f"at most {MAX_ITEMS} items per request")
+    quantities: Dict[str, int] = {}
+    for number, item in enumerate(items, 1):
+        sku = item.get("sku") if isinstance(item, dict) else None
+        quantity = item.get("quantity") if isinstance(item, dict) else None
+        if not isinstance(sku, str) or not sku:
+            raise InvalidReservation(f"item {number}: sku is required")
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            raise InvalidReservation(f"item {number}: quantity must be a positive integer")
+        quantities[sku] = quantities.get(sku, 0) + quantity
+    return quantities
+
+
+def products_statement(skus):
+    """(id, sku) of the products to lock, in lock order."""
+    return select(Product.id, Product.sku).where(Product.sku.in_(list(skus))).order_by(Product.id)
+
+
+def _lines(quantities: Mapping[str, int], products) -> List[tuple]:
+    found = {sku for _, sku in products}
+    unknown = sorted(set(quantities) - found)
+    if unknown:
+        raise InvalidReservation("unknown sku: " + ", ".join(unknown))
+    return [(product_id, sku, quantities[sku]) for product_id, sku in products]
+
+
+def take_statement(product_id: int, quantity: int):
+    """Subtract `quantity` only if that much is on hand; returns the new stock, or no row."""
+    return (update(Product).where(Product.id == product_id, Product.stock >= quantity)
+            .values(stock=Product.stock - quantity).returning(Product.stock)
+            .execution_options(synchronize_session=False, product_ids=(product_id,)))
+
+
+def put_back_statement(product_id: int, quantity: int):
+    return (update(Product).where(Product.id == product_id)
+            .values(stock=Product.stock + quantity).returning(Product.stock)
+            .execution_options(synchronize_session=False, product_ids=(product_id,)))
+
+
+def parse_reference(payload) -> Optional[str]:
+    reference = payload.get("reference") if isinstance(payload, dict) else None
+    if reference is not None and (not isinstance(reference, str) or len(reference) > 100):
+        raise InvalidMovement("reference must be a string of at most 100 characters")
+    return reference
+
+
+def parse_movement(payload) -> Tuple[str, int, Optional[str]]:
+    """(kind, signed quantity, reference) from `{"kind", "quantity", "reference"}`.
+
+    Receipts and returns add `quantity` and sales take it away (give it
+    positive); an adjustment adds it as given, so a negative one removes stock.
+    """
+    kind = payload.get("kind") if isinstance(payload, dict) else None
+    if kind not in KINDS:
+        raise InvalidMovement(f"kind must be one of: {', '.join(KINDS)}")
+    quantity = payload.get("quantity")
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or not quantity:
+        raise InvalidMovement("quantity must be a non-zero integer")
+    if KINDS[kind] and quantity < 0:
+        raise InvalidMovement(f"a {kind} quantity must be positive")
+    return kind, quantity * (KINDS[kind] or 1), parse_reference(payload)
+
+
+_MOVE = insert(StockMovement)
+
+
+def _movements(lines, kind: str, reference: Optional[str]) -> List[dict]:
+    sign = KINDS[kind]
+    return [{"product_id": product_id, "kind": kind, "quantity": sign * quantity, "reference": reference}
+            for product_id, _, quantity in lines]
+
+
+def _shortage(sku: str, quantity: int, available) -> dict:
+    return {"sku": sku, "requested": quantity, "available": available}
+
+
+def _line(product_id: int, sku: str, quantity: int, stock: int) -> dict:
+    return {"product_id": product_id, "sku": sku, "quantity": quantity, "stock": stock}
+
+
+def reserve(db, quantities: Mapping[str, int], reference: Optional[str] = None) -> List[dict]:
+    """Take every line or none, in one transaction (committed here) with its sales; raises OutOfStock."""
+    lines = _lines(quantities, db.execute(products_statement(quantities)).all())
+    taken, shortages = [], []
+    for product_id, sku, quantity in lines:
+        stock = db.execute(take_statement(product_id, quantity)).scalar()
+        if stock is None:
+            available = db.execute(select(Product.stock).where(Product.id == product_id)).scalar()
+            shortages.append(_shortage(sku, quantity, available))
+        else:
+            taken.append(_line(product_id, sku, quantity, stock))
+    if shortages:
+        db.rollback()
+        raise OutOfStock(shortages)
+    db.execute(_MOVE, _movements(lines, "sale", reference))
+    db.commit()
+    return taken
+
+
+async def reserve_async(db, quantities: Mapping[str, int], reference: Optional[str] = None) -> List[dict]:
+    """`reserve` for an AsyncSession."""
+    lines = _lines(quantities, (await db.execute(products_statement(quantities))).all())
+    taken, shortages = [], []
+    for product_id, sku, quantity in lines:
+        stock = (await db.execute(take_statement(product_id, quantity))).scalar()
+        if stock is None:
+            available = (await db.execute(select(Product.stock).where(Product.id == product_id))).scalar()
+            shortages.append(_shortage(sku, quantity, available))
+        else:
+            taken.append(_line(product_id, sku, quantity, stock))
+    if shortages:
+        await db.rollback()
+        raise OutOfStock(shortages)
+    await db.execute(_MOVE, _movements(lines, "sale", reference))
+    await db.commit()
+    return taken
+
+
+def release(db, quantities: Mapping[str, int], reference: Optional[str] = None) -> List[dict]:
+    """Add the quantities back (a cancelled reservation) as returns, in the same lock order."""
+    lines = _lines(quantities, db.execute(products_statement(quantities)).all())
+    released = [_line(product_id, sku, quantity, db.execute(put_back_statement(product_id, quantity)).scalar())
+                for product_id, sku, quantity in lines]
+    db.execute(_MOVE, _movements(lines, "return", reference))
+    db.commit()
+    return released
+
+
+async def release_async(db, quantities: Mapping[str, int], reference: Optional[str] = None) -> List[dict]:
+    """`release` for an AsyncSession."""
+    lines = _lines(quantities, (await db.execute(products_statement(quantities))).all())
+    released = [_line(product_id, sku, quantity, (await db.execute(put_back_statement(product_id, quantity))).scalar())
+                for product_id, sku, quantity in lines]
+    await db.execute(_MOVE, _movements(lines, "return", reference))
+    await db.commit()
+    return released
+
+
+def move_statement(product_id: int, quantity: int):
+    """Apply a signed quantity to `stock`; taking more than is on hand matches no row."""
+    return take_statement(product_id, -quantity) if quantity < 0 else put_back_statement(product_id, quantity)
+
+
+def _recorded(movement, stock: int) -> dict:
+    return {"id": movement.id, "product_id": movement.product_id, "kind": movement.kind,
+            "quantity": movement.quantity, "reference": movement.reference,
+            "created_at": movement.created_at, "stock": stock}
+
+
+def record(db, product_id: int, kind: str, quantity: int, reference: Optional[str] = None) -> Optional[dict]:
+    """Apply and log one movement (committed here); None if there is no such product, OutOfStock if short."""
+    stock = db.execute(move_statement(product_id, quantity)).scalar()
+    if stock is None:
+        product = db.execute(select(Product.sku, Product.stock).where(Product.id == product_id)).first()
+        db.rollback()
+        if product is None:
+            return None
+        raise OutOfStock([_shortage(product.sku, -quantity, product.stock)])
+    movement = StockMovement(product_id=product_id, kind=kind, quantity=quantity, reference=reference)
+    db.add(movement)
+    db.commit()
+    db.refresh(movement)
+    return _recorded(movement, stock)
+
+
+async def record_async(db, product_id: int, kind: str, quantity: int, reference: Optional[str] = None):
+    """`record` for an AsyncSession."""
+    stock = (await db.execute(move_statement(product_id, quantity))).scalar()
+    if stock is None:
+        product = (await db.execute(select(Product.sku, Product.stock).where(Product.id == product_id))).first()
+        await db.rollback()
+        if product is None:
+            return None
+        raise OutOfStock([_shortage(product.sku, -quantity, product.stock)])
+    movement = StockMovement(product_id=product_id, kind=kind, quantity=quantity, reference=reference)
+    db.add(movement)
+    await db.commit()
+    await db.refresh(movement)
+    return _recorded(movement, stock)
+
+
+def opening_movement(product: Product) -> Optional[StockMovement]:
+    """The receipt of a new (flushed) product's initial stock, if it has any."""
+    if not product.stock:
+        return None
+    return StockMovement(product_id=product.id, kind="receipt", quantity=product.stock, reference="opening stock")
+
+
+def set_stock(db, product: Product, stock: int, reference: Optional[str] = None) -> None:
+    """Set `product.stock` outright (a stock count), logging the difference as an adjustment.
+
+    Load `product` with `with_for_update=True`, so the difference is taken
+    against a row no one else can change before the commit.
+    """
+    difference = stock - product.stock
+    if difference:
+        product.stock = stock
+        db.add(StockMovement(product_id=product.id, kind="adjustment", quantity=difference,
+                             reference=reference or "stock count"))
+
+
+def parse_as_of(raw: Optional[str]) -> datetime:
+    """A naive UTC datetime from `?as_of=`: an ISO time, or a date meaning the end of that day."""
+    if not raw:
+        raise InvalidMovement("as_of is required (an ISO date or date and time)")
+    try:
+        if len(raw) == 10:
+            return datetime.combine(date.fromisoformat(raw), time.max)
+        value = datetime.fromisoformat(raw)
+    except ValueError:
+        raise InvalidMovement(f"as_of must be an ISO date or date and time, not {raw!r}")
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def snapshot_statement(product_id: int, as_of: datetime):
+    """The product's latest snapshot taken by `as_of`, if any."""
+    return (select(StockSnapshot.movement_id, StockSnapshot.on_hand, StockSnapshot.taken_at)
+            .where(StockSnapshot.product_id == product_id, StockSnapshot.taken_at <= as_of)
+            .order_by(StockSnapshot.taken_at.desc(), StockSnapshot.id.desc()).limit(1))
+
+
+def next_snapshot_statement(product_id: int, as_of: datetime):
+    """The movement id of the product's first snapshot taken after `as_of`, if any."""
+    return (select(StockSnapshot.movement_id)
+            .where(StockSnapshot.product_id == product_id, StockSnapshot.taken_at > as_of)
+            .order_by(StockSnapshot.taken_at, StockSnapshot.id).limit(1))
+
+
+def delta_statement(product_id: int, as_of: datetime, after_movement_id: int,
+                    upto_movement_id: Optional[int] = None):
+    """Sum and count of the product's movements after a snapshot, up to `as_of` (an index range).
+
+    `upto_movement_id` (the next snapshot's) closes the range, so a read far
+    in the past does not run on to the product's latest movement.
+    """
+    stmt = (select(func.coalesce(func.sum(StockMovement.quantity), 0), func.count())
+            .where(StockMovement.product_id == product_id, StockMovement.id > after_movement_id,
+                   StockMovement.created_at <= as_of))
+    return stmt if upto_movement_id is None else stmt.where(StockMovement.id <= upto_movement_id)
+
+
+def as_of_body(product_id: int, as_of: datetime, snapshot, delta) -> dict:
+    quantity, movements = delta
+    return {
+        "product_id": product_id,
+        "as_of": as_of.isoformat(),
+        "stock": (snapshot.on_hand if snapshot else 0) + quantity,
+        "snapshot": {"movement_id": snapshot.movement_id, "taken_at": snapshot.taken_at.isoformat()}
+        if snapshot else None,
+        "movements_read": movements,
+    }
+
+
+def stock_as_of(db, product_id: int, as_of: datetime) -> dict:
+    snapshot = db.execute(snapshot_statement(product_id, as_of)).first()
+    upto = db.execute(next_snapshot_statement(product_id, as_of)).scalar()
+    delta = db.execute(delta_statement(product_id, as_of, snapshot.movement_id if snapshot else 0, upto)).one()
+    return as_of_body(product_id, as_of, snapshot, delta)
+
+
+async def stock_as_of_async(db, product_id: int, as_of: datetime) -> dict:
+    snapshot = (await db.execute(snapshot_statement(product_id, as_of))).first()
+    upto = (await db.execute(next_snapshot_statement(product_id, as_of))).scalar()
+    delta = (await db.execute(delta_statement(product_id, as_of, snapshot.movement_id if snapshot else 0,
+                                              upto))).one()
+    return as_of_body(product_id, as_of, snapshot, delta)
+
+
+def take_snapshots(db) -> dict:
+    """Snapshot every product moved since the last run, from its previous snapshot (committed here)."""
+    upto = committed_upto(db, StockMovement.id)
+    after = db.execute(select(func.max(StockSnapshot.movement_id))).scalar() or 0
+    if upto <= after:
+        return {"products": 0, "movement_id": after}
+    deltas = db.execute(
+        select(StockMovement.product_id, func.sum(StockMovement.quantity), func.max(StockMovement.id),
+               func.max(StockMovement.created_at))
+        .where(StockMovement.id > after, StockMovement.id <= upto).group_by(StockMovement.product_id)
+    ).all()
+    ids = [product_id for product_id, *_ in deltas]
+    previous: Dict[int, int] = {}
+    for start in range(0, len(ids), _SNAPSHOT_CHUNK):
+        chunk = ids[start:start + _SNAPSHOT_CHUNK]
+        latest = select(func.max(StockSnapshot.id)).where(StockSnapshot.product_id.in_(chunk)) \
+            .group_by(StockSnapshot.product_id)
+        previous.update(db.execute(select(StockSnapshot.product_id, StockSnapshot.on_hand)
+                                   .where(StockSnapshot.id.in_(latest))).all())
+    db.execute(insert(StockSnapshot), [
+        {"product_id": product_id, "movement_id": last_id, "on_hand": previous.get(product_id, 0) + quantity,
+         "taken_at": taken_at}
+        for product_id, quantity, last_id, taken_at in deltas
+    ])
+    db.commit()
+    return {"products": len(deltas), "movement_id": upto}
+
+
+def main() -> None:
+    import json
+
+    import app.main  # noqa: F401  registers every model with the mapper
+
+    from app.db import SessionLocal
+
+    with SessionLocal() as db:
+        print(json.dumps(take_snapshots(db), indent=2))
+
+
+if __name__ == "__main__":
+    main()
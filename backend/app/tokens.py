@@ -0,0 +1,217 @@
+"""
+Self-contained signed access tokens.
+
+A token carries everything needed to authorize a request: user id, username,
+role id, the role's permission mask (hex, see app.permissions) and the user's
+`token_version`, signed and timestamped with itsdangerous. Verifying one
+needs no database access; revocation is handled by `TokenVersions`, a small
+in-memory table of the current version of every active user that is
+refreshed in bulk every TOKEN_VERSIONS_REFRESH_SECONDS. Bumping a user's
+`token_version` (done automatically on deactivation, role or password
+change) revokes all tokens issued before it.
+
+A token whose permission mask no longer matches its role's current one in
+`permission_map` is refused as well, so a grant withdrawn from a role stops
+working once the map has reloaded rather than when the token expires; the
+user logs in again for a token carrying the new mask.
+
+Both tables reload with a blocking query; `authenticate_async`, for the
+async stack, runs any reload that is due in a worker thread before checking.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import anyio
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app import metrics
+from app.db import SessionLocal
+from app.models.user import User
+from app.permissions import permission_map
+from app.principal_cache import principal_cache
+
+TOKEN_MAX_AGE = 60 * 60 * 24  # 24h
+_SALT = "kellyos.access"
+# Changing any of these revokes the user's outstanding tokens
+_REVOKING_ATTRS = ("is_active", "role_id", "password_hash", "username")
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller, as described by a verified access token."""
+    id: int
+    username: str
+    role_id: int
+    permissions: int
+    token_version: int
+    expires_at: float
+
+
+@lru_cache(maxsize=8)
+def _serializer(secret: str) -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(secret, salt=_SALT)
+
+
+def issue_token(user: User, secret: str) -> str:
+    claims = {
+        "u": user.id,
+        "n": user.username,
+        "r": user.role_id,
+        "p": format(permission_map.mask_for(user.role_id), "x"),
+        "v": user.token_version or 0,
+    }
+    return _serializer(secret).dumps(claims)
+
+
+def decode_token(token: str, secret: str, max_age: int = TOKEN_MAX_AGE) -> Optional[Principal]:
+    try:
+        claims, issued_at = _serializer(secret).loads(token, max_age=max_age, return_timestamp=True)
+        return Principal(
+            id=int(claims["u"]),
+            username=claims["n"],
+            role_id=int(claims["r"]),
+            permissions=int(claims["p"], 16),
+            token_version=int(claims["v"]),
+            expires_at=issued_at.timestamp() + max_age,
+        )
+    except (BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+def _load_versions() -> Iterable[Tuple[int, int]]:
+    with SessionLocal(info={"read_only": True}) as db:
+        rows = db.execute(select(User.id, User.token_version).where(User.is_active != 0)).all()
+        return [(user_id, version or 0) for user_id, version in rows]
+
+
+class TokenVersions:
+    """In-memory user_id -> token_version table for active users."""
+
+    def __init__(self, loader: Callable[[], Iterable[Tuple[int, int]]] = _load_versions,
+                 refresh_seconds: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self._loader = loader
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._versions: Dict[int, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def is_current(self, user_id: int, version: int) -> bool:
+        self.refresh(user_id)
+        return self._versions.get(user_id) == version
+
+    def refresh(self, user_id: int) -> None:
+        """Reload if the table is stale, or if it lacks `user_id` and was not loaded in the last second."""
+        self._ensure_fresh()
+        if self._missing(user_id):
+            # Possibly a user created by another worker since the last refresh;
+            # reload at most once a second so bogus ids cannot hammer the DB.
+            self.invalidate()
+            self._ensure_fresh()
+
+    def due(self, user_id: int) -> bool:
+        """Whether checking `user_id` reloads the table first."""
+        loaded_at = self._loaded_at
+        return loaded_at is None or self._clock() - loaded_at >= self.refresh_seconds or self._missing(user_id)
+
+    async def refresh_async(self, user_id: int) -> None:
+        """`refresh` in a worker thread, if due, so that the check after it runs without a query."""
+        if self.due(user_id):
+            await anyio.to_thread.run_sync(self.refresh, user_id)
+
+    def _missing(self, user_id: int) -> bool:
+        return user_id not in self._versions and self._clock() - (self._loaded_at or 0) >= 1.0
+
+    def note(self, user_id: int, version: Optional[int]) -> None:
+        """Record a locally committed change; `None` means the user can no longer log in."""
+        if version is None:
+            self._versions.pop(user_id, None)
+        else:
+            self._versions[user_id] = version
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def stats(self) -> dict:
+        return {"users": len(self._versions), "reloads": self.reloads}
+
+    def _ensure_fresh(self) -> None:
+        loaded_at = self._loaded_at
+        if loaded_at is not None and self._clock() - loaded_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if self._loaded_at is loaded_at:
+                self._versions = dict(self._loader())
+                self._loaded_at = self._clock()
+                self.reloads += 1
+
+
+token_versions = TokenVersions(refresh_seconds=float(os.getenv("TOKEN_VERSIONS_REFRESH_SECONDS", "30")))
+metrics.register("token_versions", token_versions.stats)
+
+
+def _principal(token: str, secret: str) -> Optional[Principal]:
+    principal = principal_cache.get(token)
+    if principal is None:
+        principal = decode_token(token, secret)
+        if principal is not None:
+            principal_cache.put(token, principal.id, principal)
+    return principal
+
+
+def _valid(principal: Principal) -> bool:
+    if principal.expires_at <= time.time():
+        return False
+    if not token_versions.is_current(principal.id, principal.token_version):
+        return False
+    # False if the role's grants changed since the token was issued
+    return principal.permissions == permission_map.mask_for(principal.role_id)
+
+
+def authenticate(token: str, secret: str) -> Optional[Principal]:
+    """Verify `token` and return its principal, or None if invalid, expired, revoked or its mask is stale."""
+    principal = _principal(token, secret)
+    return principal if principal is not None and _valid(principal) else None
+
+
+async def authenticate_async(token: str, secret: str) -> Optional[Principal]:
+    """`authenticate` for the async stack: a reload either table needs runs in a worker thread."""
+    principal = _principal(token, secret)
+    if principal is None:
+        return None
+    await token_versions.refresh_async(principal.id)
+    await permission_map.refresh_async()
+    return principal if _valid(principal) else None
+
+
+@event.listens_for(User, "before_update")
+def _bump_token_version(mapper, connection, target: User) -> None:
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in _REVOKING_ATTRS):
+        target.token_version = (target.token_version or 0) + 1
+
+
+@event.listens_for(Session, "after_flush")
+def _track_user_changes(session: Session, flush_context) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            live = obj.is_active and obj not in session.deleted
+            session.info.setdefault("token_versions", {})[obj.id] = (obj.token_version or 0) if live else None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_user_changes(session: Session) -> None:
+    for user_id, version in session.info.pop("token_versions", {}).items():
+        token_versions.note(user_id, version)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_changes(session: Session) -> None:
+    session.info.pop("token_versions", None)
@@ -1,5 +1,19 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 import bcrypt
 
+_executor: Optional[ThreadPoolExecutor] = None
+_slots: Optional[threading.BoundedSemaphore] = None
+_executor_lock = threading.Lock()
+
+
+class PasswordHashBusy(RuntimeError):
+    """Every bcrypt slot is taken; the caller should answer 503 rather than queue more."""
+
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt."""
@@ -9,3 +23,40 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     """Verify a password against a hashed password."""
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+def password_executor() -> ThreadPoolExecutor:
+    """Dedicated pool for bcrypt work, sized by PASSWORD_HASH_WORKERS (default: CPU count).
+
+    At most PASSWORD_HASH_BACKLOG jobs per worker may be running or waiting
+    for one; past that `hash_password_async`/`verify_password_async` raise
+    PasswordHashBusy instead of growing the queue.
+    """
+    global _executor, _slots
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = int(os.getenv("PASSWORD_HASH_WORKERS", "0")) or os.cpu_count() or 2
+                _slots = threading.BoundedSemaphore(workers * int(os.getenv("PASSWORD_HASH_BACKLOG", "4")))
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+    return _executor
+
+
+async def _on_executor(fn, *args):
+    executor = password_executor()
+    if not _slots.acquire(blocking=False):
+        raise PasswordHashBusy("too many password checks in flight")
+    job = executor.submit(fn, *args)
+    # Freed when the job ends, not when its caller gives up waiting on it
+    job.add_done_callback(lambda _, slots=_slots: slots.release())
+    return await asyncio.wrap_future(job)
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the bcrypt executor without blocking the event loop."""
+    return await _on_executor(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    """Verify a password on the bcrypt executor without blocking the event loop."""
+    return await _on_executor(verify_password, password, hashed)
@@ -0,0 +1,111 @@
+"""
+Sync vs async database path throughput.
+
+Drives two equivalent list endpoints over ASGI with many concurrent clients:
+
+  /sync   the pre-async pattern: `with SessionLocal() as db` inside `async def`
+  /async  the routers' AsyncSession via `Depends(get_db)`
+
+`--latency-ms` makes every query sleep inside the database driver (via a SQL
+function), standing in for network round trips to Postgres. The sync path
+blocks the event loop for that time; the async path does not.
+
+    python -m benchmarks.bench_async_db --requests 400 --concurrency 50 --latency-ms 5
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import summarize, use_temp_database
+
+use_temp_database()
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy import event, func, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+from app.api.deps import get_db  # noqa: E402
+from app.db import Base, SessionLocal, async_engine, async_read_engine, engine, read_engine  # noqa: E402
+from app.models.contact import Contact  # noqa: E402
+
+LATENCY_S = 0.0
+
+
+def _install_sleep(dbapi_connection, connection_record):
+    dbapi_connection.create_function("bench_sleep", 1, lambda ms: time.sleep(LATENCY_S) or 0)
+
+
+for _eng in {engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine}:
+    event.listen(_eng, "connect", _install_sleep)
+
+# The uncorrelated scalar subquery makes SQLite call bench_sleep once per query
+QUERY = (
+    select(Contact.id, Contact.name, Contact.email)
+    .where(select(func.bench_sleep(0)).scalar_subquery() == 0)
+    .order_by(Contact.id.desc())
+    .limit(50)
+)
+
+bench_app = FastAPI()
+
+
+@bench_app.get("/sync")
+async def list_sync():
+    with SessionLocal() as db:
+        return [dict(row._mapping) for row in db.execute(QUERY)]
+
+
+@bench_app.get("/async")
+async def list_async(db: AsyncSession = Depends(get_db)):
+    return [dict(row._mapping) for row in await db.execute(QUERY)]
+
+
+def seed(rows: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        if db.query(Contact).count() >= rows:
+            return
+        db.add_all(Contact(name=f"Contact {i}", email=f"c{i}@example.com") for i in range(rows))
+        db.commit()
+
+
+async def drive(path: str, requests: int, concurrency: int) -> None:
+    transport = httpx.ASGITransport(app=bench_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        sem = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one():
+            async with sem:
+                started = time.perf_counter()
+                resp = await client.get(path)
+                resp.raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+    # aiosqlite connections run on worker threads bound to this event loop
+    await async_engine.dispose()
+    await async_read_engine.dispose()
+    print(f"{path:<7} {requests / elapsed:8.1f} req/s   " + summarize("", latencies).strip())
+
+
+def main() -> None:
+    global LATENCY_S
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--rows", type=int, default=1000)
+    args = parser.parse_args()
+    LATENCY_S = args.latency_ms / 1000
+
+    seed(args.rows)
+    for path in ("/sync", "/async"):
+        asyncio.run(drive(path, args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
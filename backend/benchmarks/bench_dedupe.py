@@ -0,0 +1,100 @@
+"""
+Throughput and recall of the duplicate-contact scan (app.dedupe).
+
+Seeds contacts with generated names, companies, emails and phones, then
+plants near-duplicates of a share of them: the same person with the phone
+reformatted, the company suffix changed ("Ltd" / "Limited") or the email
+left out (an email can only belong to one contact). Times a full scan from scratch, reports how many planted pairs
+became candidates, then times an incremental run over a small batch of new
+contacts.
+
+    python -m benchmarks.bench_dedupe --rows 200000 --duplicates 0.05
+"""
+import argparse
+import cProfile
+import pstats
+import random
+import time
+
+from benchmarks.common import use_temp_database
+
+use_temp_database()
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.db import Base, SessionLocal, engine  # noqa: E402
+from app import dedupe  # noqa: E402
+from app.models.contact import Contact  # noqa: E402
+from app.models.contact_dedupe import ContactDuplicate  # noqa: E402
+from app.models.product import Product  # noqa: E402,F401  create_all resolves invoice_item.product_id
+from app.models.user import User  # noqa: E402,F401  create_all resolves employee.user_id
+
+
+def people(count: int, rnd: random.Random):
+    consonants, vowels = "bcdfghjklmnprstvwz", "aeiouy"
+
+    def word(parts: int) -> str:
+        return "".join(rnd.choice(consonants) + rnd.choice(vowels) for _ in range(parts)).capitalize()
+
+    first = [word(2) for _ in range(3_000)]
+    last = [word(rnd.randint(2, 4)) for _ in range(60_000)]
+    companies = [word(rnd.randint(2, 3)) for _ in range(20_000)]
+    for i in range(count):
+        f, l, c = rnd.choice(first), rnd.choice(last), rnd.choice(companies)
+        yield {"name": f"{f} {l}", "email": f"{f.lower()}.{l.lower()}{i}@{c.lower()}.example.com",
+               "phone": f"+1 {rnd.randint(200, 999)} {rnd.randint(200, 999)} {rnd.randint(1000, 9999)}",
+               "company": f"{c} {rnd.choice(['Ltd', 'Inc', 'Group'])}"}
+
+
+def variant(person: dict, rnd: random.Random) -> dict:
+    twin = dict(person)
+    change = rnd.choice(["phone", "company", "email"])
+    if change == "phone":
+        twin["phone"] = "(" + "".join(ch for ch in person["phone"] if ch.isdigit())[1:4] + ") " + person["phone"][7:]
+    elif change == "company":
+        twin["company"] = person["company"].rsplit(" ", 1)[0] + " Limited"
+    else:
+        twin["email"] = None
+    return twin
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--duplicates", type=float, default=0.05)
+    parser.add_argument("--incremental", type=int, default=1_000)
+    parser.add_argument("--profile", action="store_true", help="print where the full scan spends its time")
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    Base.metadata.create_all(bind=engine)
+    rows = list(people(args.rows, rnd))
+    planted = rnd.sample(range(args.rows), int(args.rows * args.duplicates))
+    with engine.begin() as conn:
+        conn.execute(insert(Contact), rows + [variant(rows[i], rnd) for i in planted])
+        first_id = conn.execute(select(Contact.id).order_by(Contact.id).limit(1)).scalar()
+    expected = {(first_id + i, first_id + args.rows + n) for n, i in enumerate(planted)}
+
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        profiler = cProfile.Profile() if args.profile else None
+        if profiler:
+            profiler.enable()
+        run = dedupe.run_scan(db, dedupe.new_run(db))
+        elapsed = time.perf_counter() - started
+        if profiler:
+            profiler.disable()
+            pstats.Stats(profiler).sort_stats("tottime").print_stats(15)
+        found = set(db.execute(select(ContactDuplicate.contact_id, ContactDuplicate.duplicate_id)).all())
+        print(f"full scan    {run.scanned} contacts in {elapsed:.1f}s ({run.scanned / elapsed:,.0f}/s), "
+              f"{run.candidates} candidates, recall {len(expected & found) / len(expected):.3f}")
+
+        db.execute(insert(Contact), list(people(args.incremental, rnd)))
+        db.commit()
+        started = time.perf_counter()
+        run = dedupe.run_scan(db, dedupe.new_run(db))
+        print(f"incremental  {run.scanned} contacts in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
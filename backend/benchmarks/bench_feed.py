@@ -0,0 +1,78 @@
+"""
+Throughput of the bulk product upsert (app.product_feed) against the
+one-PUT-per-product path it replaces.
+
+Streams a feed of `--rows` SKUs through run_feed in 64 KiB chunks, the way
+the endpoint reads a request body, twice: first into an empty catalogue (all
+inserts), then again with `--changed` of the rows carrying a new price or
+stock (the rest unchanged). Then times `--single` updates made the way
+`PUT /inventory/<id>` makes them: get, set, commit, refresh.
+
+    python -m benchmarks.bench_feed --rows 200000 --changed 0.1
+"""
+import argparse
+import io
+import random
+import time
+
+from benchmarks.common import use_temp_database
+
+use_temp_database()
+
+from app.db import Base, SessionLocal, engine  # noqa: E402
+from app.product_feed import new_job, report, run_feed  # noqa: E402
+from app.models.product import Product  # noqa: E402
+from app.models.user import User  # noqa: E402,F401  tables the metadata refers to
+from app import stock  # noqa: E402
+
+
+def body(rows: int, changed: float, rnd: random.Random) -> bytes:
+    out = io.StringIO()
+    out.write("sku,name,price,stock\n")
+    for i in range(rows):
+        price, units = i % 500 + 0.99, i % 40
+        if rnd.random() < changed:
+            price, units = (price + 1, units) if rnd.random() < 0.5 else (price, units + 5)
+        out.write(f"FEED-{i:07d},Feed product {i},{price:.2f},{units}\n")
+    return out.getvalue().encode()
+
+
+def feed(db, data: bytes) -> None:
+    job = new_job("csv")
+    db.add(job)
+    db.commit()
+    started = time.perf_counter()
+    run_feed(db, job, (data[i:i + (1 << 16)] for i in range(0, len(data), 1 << 16)))
+    elapsed = time.perf_counter() - started
+    result = report(job)
+    print(f"feed    {result['processed']} rows ({result['inserted']} inserted, {result['updated']} updated, "
+          f"{result['unchanged']} unchanged) in {elapsed:.1f}s: {result['processed'] / elapsed:,.0f} rows/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--changed", type=float, default=0.1, help="share of rows changed in the second feed")
+    parser.add_argument("--single", type=int, default=2_000, help="single-product updates to compare with")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(1)
+    with SessionLocal() as db:
+        feed(db, body(args.rows, 0, rnd))
+        feed(db, body(args.rows, args.changed, rnd))
+
+        ids = [id_ for id_, in db.query(Product.id).limit(args.single)]
+        started = time.perf_counter()
+        for id_ in ids:
+            product = db.get(Product, id_, with_for_update=True)
+            product.price = product.price + 1
+            stock.set_stock(db, product, product.stock + 1)
+            db.commit()
+            db.refresh(product)
+        elapsed = time.perf_counter() - started
+        print(f"single  {len(ids)} rows in {elapsed:.1f}s: {len(ids) / elapsed:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
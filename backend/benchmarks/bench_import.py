@@ -0,0 +1,65 @@
+"""
+Throughput of the bulk contact import (app.contact_import) against the
+one-POST-per-contact path it replaces.
+
+Generates a CSV with a share of repeated emails (in-file duplicates) and
+streams it through run_import in 64 KiB chunks, the way the endpoint reads a
+request body, then times the same number of single-contact inserts, each
+committed on its own like `POST /contacts/`.
+
+    python -m benchmarks.bench_import --rows 200000 --duplicates 0.1
+"""
+import argparse
+import io
+import random
+import time
+
+from benchmarks.common import use_temp_database
+
+use_temp_database()
+
+from app.db import Base, SessionLocal, engine  # noqa: E402
+from app.contact_import import new_job, run_import  # noqa: E402
+from app.models.contact import Contact  # noqa: E402
+from app.models.user import User  # noqa: E402,F401  create_all resolves employee.user_id
+
+
+def body(rows: int, duplicates: float, rnd: random.Random) -> bytes:
+    out = io.StringIO()
+    out.write("name,email,phone,company\n")
+    for i in range(rows):
+        n = rnd.randrange(i) if i and rnd.random() < duplicates else i
+        out.write(f"Import {i},import{n}@bench.example.com,+1555{i:07d},Company {i % 997}\n")
+    return out.getvalue().encode()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--duplicates", type=float, default=0.1)
+    parser.add_argument("--single", type=int, default=2_000, help="single-row inserts to compare with")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    data = body(args.rows, args.duplicates, random.Random(1))
+    chunks = (data[i:i + (1 << 16)] for i in range(0, len(data), 1 << 16))
+    with SessionLocal() as db:
+        job = new_job("csv")
+        db.add(job)
+        db.commit()
+        started = time.perf_counter()
+        run_import(db, job, chunks)
+        elapsed = time.perf_counter() - started
+        print(f"import  {job.processed} rows ({job.inserted} inserted, {job.duplicates} duplicates) "
+              f"in {elapsed:.1f}s: {job.processed / elapsed:,.0f} rows/s")
+
+        started = time.perf_counter()
+        for i in range(args.single):
+            db.add(Contact(name=f"Single {i}", email=f"single{i}@bench.example.com", phone="+15550000000"))
+            db.commit()
+        elapsed = time.perf_counter() - started
+        print(f"single  {args.single} rows in {elapsed:.1f}s: {args.single / elapsed:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
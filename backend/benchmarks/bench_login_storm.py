@@ -0,0 +1,90 @@
+"""
+Login storm benchmark.
+
+Measures latency of a cheap endpoint (GET /) while a storm of concurrent
+logins runs against the FastAPI app, in-process over ASGI. Compare the
+bcrypt executor against the old inline call on the event loop:
+
+    python -m benchmarks.bench_login_storm
+    python -m benchmarks.bench_login_storm --inline
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import summarize, use_temp_database
+
+use_temp_database()
+
+import httpx  # noqa: E402
+
+from app import fastapi_auth  # noqa: E402
+from app.db import SessionLocal  # noqa: E402
+from app.fastapi_main import app  # noqa: E402
+from app.models.user import Role, User  # noqa: E402
+from app.utils import hash_password, verify_password  # noqa: E402
+
+
+def seed() -> None:
+    with SessionLocal() as db:
+        if db.query(User).filter_by(username="bench").first():
+            return
+        role = Role(name="bench")
+        db.add(role)
+        db.flush()
+        db.add(User(username="bench", password_hash=hash_password("bench123"), role_id=role.id, is_active=1))
+        db.commit()
+
+
+async def run(logins: int, concurrency: int, probe_interval: float) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        sem = asyncio.Semaphore(concurrency)
+        storm_done = asyncio.Event()
+        probe_ms = []
+
+        async def one_login():
+            async with sem:
+                resp = await client.post("/auth/login", json={"username": "bench", "password": "bench123"})
+                assert resp.status_code == 200, resp.text
+
+        async def probe():
+            # Latency is measured from when each probe was *scheduled*, so time
+            # spent waiting for a blocked event loop is counted too.
+            scheduled = time.perf_counter()
+            while not storm_done.is_set():
+                await client.get("/")
+                probe_ms.append((time.perf_counter() - scheduled) * 1000)
+                scheduled = max(scheduled + probe_interval, time.perf_counter())
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(one_login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        storm_done.set()
+        await probe_task
+
+    print(f"{logins} logins in {elapsed:.2f}s ({logins / elapsed:.1f}/s)")
+    print(summarize("GET / during login storm", probe_ms))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--probe-interval", type=float, default=0.005)
+    parser.add_argument("--inline", action="store_true", help="verify bcrypt on the event loop (pre-executor behaviour)")
+    args = parser.parse_args()
+
+    if args.inline:
+        async def inline_verify(password: str, hashed: str) -> bool:
+            return verify_password(password, hashed)
+        fastapi_auth.verify_password_async = inline_verify
+
+    seed()
+    asyncio.run(run(args.logins, args.concurrency, args.probe_interval))
+
+
+if __name__ == "__main__":
+    main()
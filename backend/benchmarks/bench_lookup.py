@@ -0,0 +1,86 @@
+"""
+Resolving scanned SKUs to products, one batch at a time.
+
+Each batch is `--batch` SKUs drawn at random from `--products` products
+and resolved with one of three strategies:
+
+  per-sku   one SELECT ... WHERE sku = ? per SKU (a terminal looking each
+            scan up on its own)
+  batch     app.sku_index.lookup with the index disabled: one
+            WHERE sku IN (...) per batch
+  indexed   app.sku_index.lookup with a warm index: no query
+
+    python -m benchmarks.bench_lookup --products 20000 --batch 1 20 1000
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import summarize, use_temp_database
+
+use_temp_database()
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.db import Base, SessionLocal, engine  # noqa: E402
+from app.models.product import Product  # noqa: E402
+from app.models.user import User  # noqa: E402,F401  tables the metadata refers to
+from app import sku_index  # noqa: E402
+
+
+def seed(products: int) -> list:
+    Base.metadata.create_all(bind=engine)
+    skus = [f"BENCH-{n:07d}" for n in range(products)]
+    with SessionLocal() as db:
+        if db.query(Product).filter(Product.sku.like("BENCH-%")).count() < products:
+            db.query(Product).filter(Product.sku.like("BENCH-%")).delete(synchronize_session=False)
+            db.execute(insert(Product), [{"name": sku, "sku": sku, "price": n % 100, "stock": n % 50}
+                                         for n, sku in enumerate(skus)])
+            db.commit()
+    return skus
+
+
+def per_sku(db, skus) -> int:
+    found = 0
+    for sku in skus:
+        found += db.execute(select(Product.id, Product.price, Product.stock).where(Product.sku == sku)).first() \
+            is not None
+    return found
+
+
+def batched(db, skus) -> int:
+    return len(sku_index.lookup(db, skus)["items"])
+
+
+def run(strategy, skus: list, size: int, batches: int) -> None:
+    index = sku_index.sku_index
+    index.clear()
+    index.maxsize = 0 if strategy == "batch" else len(skus)
+    lookup = per_sku if strategy == "per-sku" else batched
+    with SessionLocal() as db:
+        if strategy == "indexed":
+            for start in range(0, len(skus), sku_index.MAX_SKUS):
+                lookup(db, skus[start:start + sku_index.MAX_SKUS])
+        latencies = []
+        for _ in range(batches):
+            batch = random.sample(skus, size)
+            started = time.perf_counter()
+            assert lookup(db, batch) == size
+            latencies.append((time.perf_counter() - started) * 1000)
+    print("  " + summarize(f"{strategy} x{size}", latencies))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 20, 1000], help="SKUs per lookup")
+    parser.add_argument("--batches", type=int, default=200)
+    args = parser.parse_args()
+    skus = seed(args.products)
+    for size in args.batch:
+        for strategy in ("per-sku", "batch", "indexed"):
+            run(strategy, skus, size, args.batches)
+
+
+if __name__ == "__main__":
+    main()
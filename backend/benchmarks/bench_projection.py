@@ -0,0 +1,89 @@
+"""
+ORM entities vs column projection for list responses.
+
+Walks the whole product table in keyset pages (as GET /inventory/ does) and
+builds the response dicts both ways:
+
+  orm         select(Product) -> entities -> dict per row (the old handlers)
+  projection  PRODUCT.select(...) -> plain rows -> PRODUCT.render
+
+    python -m benchmarks.bench_projection --rows 1000000 --page 1000
+"""
+import argparse
+import time
+
+from benchmarks.common import use_temp_database
+
+use_temp_database()
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app.db import Base, SessionLocal, engine  # noqa: E402
+from app.models.product import Product  # noqa: E402
+from app.models.user import User  # noqa: E402,F401  create_all resolves employee.user_id
+from app.pagination import PageParams, keyset, split_page  # noqa: E402
+from app.projections import PRODUCT  # noqa: E402
+
+
+def seed(rows: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        have = db.scalar(select(func.count()).select_from(Product))
+    batch = 10_000
+    with engine.begin() as conn:
+        for start in range(have, rows, batch):
+            conn.execute(insert(Product), [
+                {"name": f"Product {i}", "sku": f"SKU-{i:08d}", "description": "x" * 120, "price": i % 1000, "stock": i % 50}
+                for i in range(start, min(rows, start + batch))
+            ])
+
+
+def orm_page(db, page):
+    rows = db.execute(keyset(select(Product), [Product.id], page)).scalars().all()
+    rows, cursor = split_page(rows, [Product.id], page)
+    return [
+        {
+            "id": p.id,
+            "name": p.name,
+            "sku": p.sku,
+            "description": p.description,
+            "price": float(p.price) if p.price is not None else 0.0,
+            "stock": p.stock,
+        }
+        for p in rows
+    ], cursor
+
+
+def projection_page(db, page):
+    names = PRODUCT.list_fields
+    rows = db.execute(keyset(PRODUCT.select(names, [Product.id]), [Product.id], page)).all()
+    rows, cursor = split_page(rows, [Product.id], page)
+    return PRODUCT.render(rows, names), cursor
+
+
+def walk(label: str, fetch, page_size: int) -> None:
+    total, cursor = 0, None
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        while True:
+            items, cursor = fetch(db, PageParams(limit=page_size, after=cursor))
+            total += len(items)
+            if not cursor:
+                break
+            db.expunge_all()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<11} {total:>9} rows in {elapsed:7.2f}s  {total / elapsed:>10,.0f} rows/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page", type=int, default=1000)
+    args = parser.parse_args()
+    seed(args.rows)
+    walk("orm", orm_page, args.page)
+    walk("projection", projection_page, args.page)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Contention on one hot SKU: concurrent buyers each taking a few units.
+
+Every buyer thread waits at a barrier, then buys `--quantity` units of the
+same product, one transaction each, with one of two strategies:
+
+  naive     what PUT /inventory/<id> does: db.get, subtract in Python,
+            setattr, commit (read-modify-write)
+  reserve   app.stock.reserve: one conditional UPDATE ... WHERE stock >= qty
+
+against a fresh database per run, under two pool profiles:
+
+  pooled         several writer connections (sqlite_single_writer off, or
+                 any PostgreSQL DATABASE_URL)
+  single-writer  the SQLite default: writes queue for one connection
+
+A run reports the units sold against the stock there was. `oversold` is
+units sold beyond it, and `drift` how far the stock left disagrees with
+what was sold: both are lost updates.
+
+On PostgreSQL every buyer of the hot SKU queues on its product row from its
+UPDATE to its commit, and on the `table_version` row for `product` (app.etags)
+for the bump issued at commit. Either way one buyer commits at a time, so
+expect throughput bounded by commit latency rather than by the pool.
+
+    python -m benchmarks.bench_reserve --buyers 200 --stock 100 --quantity 1
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_reserve
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.common import summarize, use_temp_database
+
+CONFIGURED_URL = os.getenv("DATABASE_URL")
+use_temp_database()
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.core.config import Settings  # noqa: E402
+from app.db import Base  # noqa: E402
+from app.db.session import create_db_engine  # noqa: E402
+from app.models.product import Product  # noqa: E402
+from app.models.user import User  # noqa: E402,F401  tables the metadata refers to
+from app import stock  # noqa: E402
+
+PROFILES = {
+    "pooled": dict(sqlite_single_writer=False, db_pool_size=20, db_max_overflow=0),
+    "single-writer": {},
+}
+SKU = "BENCH-HOT"
+
+
+def naive(db, quantity: int) -> bool:
+    product = db.query(Product).filter_by(sku=SKU).one()
+    if product.stock < quantity:
+        return False
+    product.stock = product.stock - quantity
+    db.commit()
+    return True
+
+
+def reserved(db, quantity: int) -> bool:
+    try:
+        stock.reserve(db, {SKU: quantity})
+    except stock.OutOfStock:
+        return False
+    return True
+
+
+STRATEGIES = {"naive": naive, "reserve": reserved}
+
+
+def run(profile: str, strategy: str, buyers: int, units: int, quantity: int) -> None:
+    url = CONFIGURED_URL or f"sqlite:///{tempfile.mkdtemp(prefix='kellyos-reserve-')}/reserve.db"
+    engine = create_db_engine(cfg=Settings(DATABASE_URL=url, **PROFILES[profile]), name=f"bench_{profile}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.query(Product).filter_by(sku=SKU).delete()
+        db.add(Product(name="Hot item", sku=SKU, price=1, stock=units))
+        db.commit()
+
+    barrier = threading.Barrier(buyers)
+    latencies, sold, rejected, errors = [], [], [], []
+
+    def buyer():
+        barrier.wait()
+        started = time.perf_counter()
+        try:
+            with Session() as db:
+                (sold if STRATEGIES[strategy](db, quantity) else rejected).append(quantity)
+        except OperationalError as exc:
+            errors.append(str(exc.orig))
+            return
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=buyer) for _ in range(buyers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    with Session() as db:
+        left = db.query(Product.stock).filter_by(sku=SKU).scalar()
+    engine.dispose()
+    print(f"[{profile:<13} {strategy:<7}] sold {sum(sold):4d} of {units} units, {left} left, "
+          f"oversold {max(sum(sold) - units, 0):3d}, drift {units - sum(sold) - left:4d}, "
+          f"rejected {len(rejected):3d}, errors {len(errors)}, {len(latencies) / elapsed:7.1f} buyers/s"
+          + (f" (e.g. {errors[0]!r})" if errors else ""))
+    print("  " + summarize("buyer latency", latencies))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buyers", type=int, default=200)
+    parser.add_argument("--stock", type=int, default=100, help="units on hand at the start")
+    parser.add_argument("--quantity", type=int, default=1, help="units per buyer")
+    args = parser.parse_args()
+    for profile in PROFILES:
+        for strategy in STRATEGIES:
+            run(profile, strategy, args.buyers, args.stock, args.quantity)
+
+
+if __name__ == "__main__":
+    main()
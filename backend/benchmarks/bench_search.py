@@ -0,0 +1,109 @@
+"""
+Latency of /contacts/search lookups (app.search) on a large contact table.
+
+Contacts get generated names (a pool of random syllables, so surnames repeat
+the way real ones do), emails, phone numbers and companies. Queries are drawn
+from random existing contacts:
+
+  exact      a surname
+  prefix     its first five letters
+  two-words  first name plus the surname's first four letters
+  typo-del   the surname with one letter dropped
+  typo-sub   the surname with one letter replaced
+
+Each is timed end to end through ContactSearch (every pass it runs, plus
+scoring). Reuses DATABASE_URL if it already holds enough contacts.
+
+    python -m benchmarks.bench_search --rows 5000000 --queries 200
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import summarize, use_temp_database
+
+use_temp_database()
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app.db import Base, SessionLocal, engine  # noqa: E402
+from app.models.contact import Contact  # noqa: E402
+from app.models.user import User  # noqa: E402,F401  create_all resolves employee.user_id
+from app.projections import CONTACT  # noqa: E402
+from app.search import ContactSearch  # noqa: E402
+
+
+def seed(rows: int, rnd: random.Random) -> None:
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        have = db.scalar(select(func.count()).select_from(Contact))
+    consonants, vowels = "bcdfghjklmnprstvwz", "aeiouy"
+    syllables = list({rnd.choice(consonants) + rnd.choice(vowels) + rnd.choice(["", "", rnd.choice(consonants)])
+                      for _ in range(2000)})
+
+    def word(parts: int) -> str:
+        return "".join(rnd.choice(syllables) for _ in range(parts)).capitalize()
+
+    first = [word(rnd.randint(2, 3)) for _ in range(20_000)]
+    last = [word(rnd.randint(2, 4)) for _ in range(300_000)]
+    companies = [f"{word(rnd.randint(2, 3))} {rnd.choice(['Ltd', 'Inc', 'Group', 'Co'])}" for _ in range(50_000)]
+    batch = 50_000
+    for start in range(have, rows, batch):
+        chunk = []
+        for i in range(start, min(rows, start + batch)):
+            f, l = rnd.choice(first), rnd.choice(last)
+            chunk.append({"name": f"{f} {l}", "email": f"{f.lower()}.{l.lower()}{i}@example.com",
+                          "phone": f"+1{rnd.randint(2_000_000_000, 9_999_999_999)}", "company": rnd.choice(companies)})
+        with engine.begin() as conn:
+            conn.execute(insert(Contact), chunk)
+
+
+def queries(count: int, rnd: random.Random):
+    with SessionLocal() as db:
+        top = db.scalar(select(func.max(Contact.id)))
+        for _ in range(count):
+            name = db.scalar(select(Contact.name).where(Contact.id >= rnd.randint(1, top)).limit(1))
+            first, last = name.split(" ", 1)
+            word = last.lower()
+            at = rnd.randrange(1, len(word) - 1)
+            yield "exact", word
+            yield "prefix", word[:5]
+            yield "two-words", f"{first} {last[:4]}"
+            yield "typo-del", word[:at] + word[at + 1:]
+            yield "typo-sub", word[:at] + "x" + word[at + 1:]
+
+
+def run(kind_queries) -> dict:
+    samples = {}
+    with SessionLocal() as db:
+        dialect = db.get_bind().dialect.name
+        for kind, q in kind_queries:
+            start = time.perf_counter()
+            search = ContactSearch(dialect, q, CONTACT, CONTACT.list_fields)
+            for stmt in search.statements():
+                if search.add(db.execute(stmt).all()):
+                    break
+            samples.setdefault(kind, []).append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    started = time.perf_counter()
+    seed(args.rows, rnd)
+    print(f"seeded {args.rows} contacts in {time.perf_counter() - started:.0f}s")
+    workload = list(queries(args.queries, rnd))
+    run(workload[:50])  # warm the page cache
+    samples = run(workload)
+    for kind, times in samples.items():
+        print(summarize(kind, times))
+    print(summarize("all", [t for times in samples.values() for t in times]))
+
+
+if __name__ == "__main__":
+    main()
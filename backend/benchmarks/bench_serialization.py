@@ -0,0 +1,84 @@
+"""
+Serializer overhead per 10k list rows: the previous JSON path vs app.serialization.
+
+Rows are invoice-shaped (ints, strings, two dates, a Decimal total), the way
+the driver returns them. Timed from row tuples to response bytes:
+
+  flask-json      float()/str() per value, then Flask's default provider (json, sorted keys)
+  fastapi-json    float()/str() per value, jsonable_encoder, then json.dumps
+  orjson          raw values straight to app.serialization.dumps
+  orjson-exact    the same with JSON_EXACT_DECIMALS (Decimal as exact strings)
+
+    python -m benchmarks.bench_serialization --rows 10000 --repeat 20
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+
+from app import serialization
+
+NAMES = ("id", "invoice_number", "sale_order_id", "contact_id", "status", "invoice_date", "due_date", "total")
+
+
+def make_rows(count: int):
+    start = date(2026, 1, 1)
+    return [
+        (i, f"INV-{i:08d}", i // 3, i % 500, "sent", start + timedelta(days=i % 365),
+         start + timedelta(days=i % 365 + 30), Decimal(f"{i % 100000}.{i % 100:02d}"))
+        for i in range(count)
+    ]
+
+
+def _legacy_dicts(rows):
+    out = []
+    for r in rows:
+        item = dict(zip(NAMES, r))
+        item["invoice_date"] = str(item["invoice_date"]) if item["invoice_date"] else None
+        item["due_date"] = str(item["due_date"]) if item["due_date"] else None
+        item["total"] = float(item["total"]) if item["total"] is not None else 0.0
+        out.append(item)
+    return out
+
+
+def flask_json(rows) -> bytes:
+    return json.dumps(_legacy_dicts(rows), sort_keys=True, ensure_ascii=True).encode()
+
+
+def fastapi_json(rows) -> bytes:
+    return json.dumps(jsonable_encoder(_legacy_dicts(rows)), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def orjson_raw(rows) -> bytes:
+    return serialization.dumps([dict(zip(NAMES, r)) for r in rows])
+
+
+def time_it(label: str, fn, rows, repeat: int) -> None:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(rows)
+        samples.append((time.perf_counter() - started) * 1000)
+    per_10k = statistics.median(samples) * 10_000 / len(rows)
+    print(f"{label:<13} median {statistics.median(samples):8.2f}ms  {per_10k:8.2f}ms per 10k rows")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    rows = make_rows(args.rows)
+    time_it("flask-json", flask_json, rows, args.repeat)
+    time_it("fastapi-json", fastapi_json, rows, args.repeat)
+    time_it("orjson", orjson_raw, rows, args.repeat)
+    serialization.EXACT_DECIMALS = True
+    time_it("orjson-exact", orjson_raw, rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
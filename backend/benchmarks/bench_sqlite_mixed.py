@@ -0,0 +1,108 @@
+"""
+Mixed read/write load against SQLite, before and after the tuning profile.
+
+Reader threads list the newest contacts through read-only sessions while
+writer threads insert contacts one transaction at a time, for a fixed
+duration, against two fresh database files:
+
+  before  rollback journal, synchronous=FULL, no mmap, one shared pool
+  after   the Settings defaults: WAL, synchronous=NORMAL, mmap, a single
+          serialized writer connection and a separate mode=ro read pool
+
+    python -m benchmarks.bench_sqlite_mixed --readers 8 --writers 4 --seconds 5
+"""
+import argparse
+import tempfile
+import threading
+import time
+
+from benchmarks.common import summarize, use_temp_database
+
+use_temp_database()
+
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.core.config import Settings  # noqa: E402
+from app.db import Base  # noqa: E402
+from app.db.routing import EngineRouter, RoutingSession  # noqa: E402
+from app.db.session import create_db_engine  # noqa: E402
+from app.models.contact import Contact  # noqa: E402
+
+PROFILES = {
+    "before": dict(sqlite_journal_mode="DELETE", sqlite_synchronous="FULL", sqlite_mmap_size=0,
+                   sqlite_cache_size=-2000, sqlite_read_pool_size=0, sqlite_single_writer=False),
+    "after": {},
+}
+
+
+def build(profile: str, url: str) -> sessionmaker:
+    cfg = Settings(DATABASE_URL=url, **PROFILES[profile])
+    writer = create_db_engine(cfg=cfg, name=f"bench_{profile}")
+    readers = [create_db_engine(cfg=cfg, name=f"bench_{profile}_read", read_only=True)] if cfg.sqlite_read_pool_size else []
+    Base.metadata.create_all(bind=writer)
+    return sessionmaker(bind=writer, class_=RoutingSession, router=EngineRouter(writer, readers))
+
+
+def run(profile: str, readers: int, writers: int, seconds: float, rows: int) -> None:
+    url = f"sqlite:///{tempfile.mkdtemp(prefix=f'kellyos-{profile}-')}/mixed.db"
+    Session = build(profile, url)
+    with Session() as db:
+        db.add_all(Contact(name=f"Seed {i}", email=f"seed{i}@example.com") for i in range(rows))
+        db.commit()
+
+    reads, writes, errors = [], [], []
+    deadline = time.perf_counter() + seconds
+
+    def reader():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                with Session(info={"read_only": True}) as db:
+                    db.execute(select(Contact.id, Contact.name).order_by(Contact.id.desc()).limit(50)).all()
+            except OperationalError as exc:
+                errors.append(str(exc.orig))
+                continue
+            reads.append((time.perf_counter() - started) * 1000)
+
+    def writer(n: int):
+        i = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                with Session() as db:
+                    db.add(Contact(name=f"Writer {n}-{i}", email=f"w{n}-{i}@example.com"))
+                    db.commit()
+            except OperationalError as exc:
+                errors.append(str(exc.orig))
+                continue
+            writes.append((time.perf_counter() - started) * 1000)
+            i += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f"[{profile}] reads {len(reads) / seconds:8.1f}/s  writes {len(writes) / seconds:8.1f}/s  "
+          f"errors {len(errors)}" + (f" (e.g. {errors[0]!r})" if errors else ""))
+    print("  " + summarize("read latency", reads))
+    print("  " + summarize("write latency", writes))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+    for profile in PROFILES:
+        run(profile, args.readers, args.writers, args.seconds, args.rows)
+
+
+if __name__ == "__main__":
+    main()
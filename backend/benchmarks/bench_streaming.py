@@ -0,0 +1,92 @@
+"""
+Peak memory of a full-table pull: buffered JSON vs streamed NDJSON.
+
+  buffered  the whole product table fetched, rendered and encoded as one list
+  streamed  app.api.streaming: yield_per batches off a server-side cursor,
+            each encoded and handed to the client before the next is read
+
+Peak Python allocations are measured with tracemalloc; the streamed body is
+consumed (and dropped) chunk by chunk, as an ASGI server would send it.
+
+    python -m benchmarks.bench_streaming --rows 200000
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from benchmarks.common import use_temp_database
+
+use_temp_database()
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app.api.streaming import _generate  # noqa: E402
+from app.db import AsyncSessionLocal, Base, SessionLocal, async_engine, async_read_engine, engine  # noqa: E402
+from app.models.product import Product  # noqa: E402
+from app.models.user import User  # noqa: E402,F401  create_all resolves employee.user_id
+from app.projections import PRODUCT  # noqa: E402
+
+
+def seed(rows: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        have = db.scalar(select(func.count()).select_from(Product))
+    batch = 10_000
+    with engine.begin() as conn:
+        for start in range(have, rows, batch):
+            conn.execute(insert(Product), [
+                {"name": f"Product {i}", "sku": f"SKU-{i:08d}", "description": "x" * 120, "price": i % 1000, "stock": i % 50}
+                for i in range(start, min(rows, start + batch))
+            ])
+
+
+def statement():
+    names = PRODUCT.list_fields
+    return names, PRODUCT.select(names, [Product.id]).order_by(Product.id.desc())
+
+
+async def buffered() -> int:
+    names, stmt = statement()
+    async with AsyncSessionLocal(info={"read_only": True}) as db:
+        rows = (await db.execute(stmt)).all()
+    return len(json.dumps(PRODUCT.render(rows, names), default=str))
+
+
+async def streamed() -> int:
+    names, stmt = statement()
+    sent = 0
+    async for chunk in _generate(stmt, PRODUCT, names, "ndjson", True, None):
+        sent += len(chunk)
+    return sent
+
+
+async def dispose() -> None:
+    # aiosqlite connections run on worker threads that would keep the process alive
+    for eng in {async_engine, async_read_engine}:
+        await eng.dispose()
+
+
+def measure(label: str, fn) -> None:
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = asyncio.run(fn())
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    asyncio.run(dispose())
+    print(f"{label:<9} {size / 2**20:8.1f} MiB body in {elapsed:6.2f}s  peak {peak / 2**20:8.1f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+    seed(args.rows)
+    measure("buffered", buffered)
+    measure("streamed", streamed)
+
+
+if __name__ == "__main__":
+    main()
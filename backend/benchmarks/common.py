@@ -0,0 +1,26 @@
+"""Shared helpers for the benchmark scripts (run from backend/ with `python -m benchmarks.<name>`)."""
+import os
+import statistics
+import tempfile
+
+
+def use_temp_database() -> str:
+    """Point DATABASE_URL at a fresh SQLite file unless one is already configured."""
+    if "DATABASE_URL" not in os.environ:
+        tmpdir = tempfile.mkdtemp(prefix="kellyos-bench-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmpdir}/bench.db"
+    return os.environ["DATABASE_URL"]
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(label: str, samples_ms) -> str:
+    return (f"{label:<28} n={len(samples_ms):<6} p50={percentile(samples_ms, 50):8.2f}ms "
+            f"p99={percentile(samples_ms, 99):8.2f}ms max={max(samples_ms, default=0):8.2f}ms "
+            f"mean={statistics.fmean(samples_ms) if samples_ms else 0:8.2f}ms")
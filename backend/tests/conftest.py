@@ -0,0 +1,60 @@
+import os
+import tempfile
+
+# Point the app at a throwaway database before anything imports app.db
+_tmpdir = tempfile.mkdtemp(prefix="kellyos-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{_tmpdir}/test.db")
+
+import pytest  # noqa: E402
+from flask.testing import FlaskClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.db import SessionLocal  # noqa: E402
+from app.models.user import User, Role  # noqa: E402
+from app.utils import hash_password  # noqa: E402
+
+
+def _seed_admin() -> None:
+    with SessionLocal() as db:
+        role = db.query(Role).filter_by(name="admin").first()
+        if not role:
+            role = Role(name="admin", description="Full system access")
+            db.add(role)
+            db.commit()
+        if not db.query(User).filter_by(username="admin").first():
+            db.add(User(username="admin", email="admin@openerp.local",
+                        password_hash=hash_password("admin123"), role_id=role.id, is_active=1))
+            db.commit()
+
+
+def login(client, username: str = "admin", password: str = "admin123") -> str:
+    resp = client.post("/auth/login", json={"username": username, "password": password})
+    assert resp.status_code == 200, resp.data
+    return resp.get_json()["token"]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def authenticated_test_client():
+    """Make `app.test_client()` send an admin bearer token by default."""
+    _seed_admin()
+    with app.test_client() as client:
+        token = login(client)
+
+    class AuthenticatedClient(FlaskClient):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+
+    app.test_client_class = AuthenticatedClient
+    yield token
+    app.test_client_class = None
+
+
+@pytest.fixture()
+def api_client(authenticated_test_client):
+    """FastAPI TestClient carrying the admin bearer token."""
+    from fastapi.testclient import TestClient
+    from app.fastapi_main import app as fastapi_app
+
+    with TestClient(fastapi_app, headers={"Authorization": f"Bearer {authenticated_test_client}"}) as client:
+        yield client
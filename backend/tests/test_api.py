@@ -0,0 +1,26 @@
+def test_async_routers_round_trip(api_client):
+    resp = api_client.post("/contacts/", json={"name": "Async Ada"})
+    assert resp.status_code == 200, resp.text
+    contact_id = resp.json()["id"]
+    assert any(c["id"] == contact_id for c in api_client.get("/contacts/").json())
+
+    resp = api_client.post("/projects/", json={"name": "Async Project", "code": "ASYNC-1", "contact_id": contact_id})
+    project_id = resp.json()["id"]
+    assert api_client.post(f"/projects/{project_id}/tasks", json={"title": "First"}).status_code == 200
+    project = api_client.get(f"/projects/{project_id}").json()
+    assert [t["title"] for t in project["tasks"]] == ["First"]
+    assert api_client.delete(f"/projects/{project_id}").json() == {"ok": True}
+
+
+def test_async_accounting_reports(api_client):
+    cash = api_client.post("/accounting/accounts", json={"code": "1000", "name": "Cash", "type": "asset"}).json()
+    sales = api_client.post("/accounting/accounts", json={"code": "4000", "name": "Sales", "type": "revenue"}).json()
+    resp = api_client.post("/accounting/journal", json={"ref": "J1", "lines": [
+        {"account_id": cash["id"], "debit": 100},
+        {"account_id": sales["id"], "credit": 100},
+    ]})
+    assert resp.status_code == 200, resp.text
+    journal = api_client.get("/accounting/journal").json()
+    assert len(journal[0]["lines"]) == 2
+    assert api_client.get("/accounting/reports/balance_sheet").json()["assets"] == 100.0
+    assert api_client.get("/accounting/reports/pl").json()["revenue"] == 100.0
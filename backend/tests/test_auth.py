@@ -0,0 +1,84 @@
+from app.db import SessionLocal
+from app.main import app
+from app.models.user import User, Role
+from app.principal_cache import PrincipalCache, principal_cache
+from app.utils import hash_password
+from conftest import login
+
+
+def test_principal_cache_lru_and_ttl():
+    now = [0.0]
+    cache = PrincipalCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.put("a", 1, "user-1")
+    cache.put("b", 2, "user-2")
+    assert cache.get("a") == "user-1"  # "b" is now least recently used
+    cache.put("c", 3, "user-3")
+    assert cache.get("b") is None
+    assert cache.evictions == 1
+
+    now[0] = 11
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+
+
+def test_cached_principal_dropped_on_deactivation():
+    with SessionLocal() as db:
+        role = db.query(Role).filter_by(name="admin").one()
+        db.add(User(username="temp", password_hash=hash_password("temp123"), role_id=role.id, is_active=1))
+        db.commit()
+
+    with app.test_client() as client:
+        token = login(client, "temp", "temp123")
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.get("/contacts/", headers=headers).status_code == 200
+        hits = principal_cache.hits
+        assert client.get("/contacts/", headers=headers).status_code == 200
+        assert principal_cache.hits == hits + 1
+
+        with SessionLocal() as db:
+            user = db.query(User).filter_by(username="temp").one()
+            user.is_active = 0
+            db.commit()
+        assert client.get("/contacts/", headers=headers).status_code == 401
+
+
+def test_token_verification_needs_no_database():
+    from sqlalchemy import event
+    from app.db import engine, read_engine
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.test_client() as client:
+        client.get("/contacts/")  # warm the token version table
+        for eng in {engine, read_engine}:
+            event.listen(eng, "before_cursor_execute", count)
+        try:
+            assert client.get("/contacts/").status_code == 200
+        finally:
+            for eng in {engine, read_engine}:
+                event.remove(eng, "before_cursor_execute", count)
+    assert not any('"user"' in s or "role_permission" in s for s in statements), statements
+
+
+def test_password_change_revokes_issued_tokens():
+    with SessionLocal() as db:
+        role = db.query(Role).filter_by(name="admin").one()
+        db.add(User(username="rotating", password_hash=hash_password("old123"), role_id=role.id, is_active=1))
+        db.commit()
+
+    with app.test_client() as client:
+        token = login(client, "rotating", "old123")
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.get("/contacts/", headers=headers).status_code == 200
+
+        with SessionLocal() as db:
+            user = db.query(User).filter_by(username="rotating").one()
+            user.password_hash = hash_password("new123")
+            db.commit()
+        assert client.get("/contacts/", headers=headers).status_code == 401
+        new_token = login(client, "rotating", "new123")
+        assert client.get("/contacts/", headers={"Authorization": f"Bearer {new_token}"}).status_code == 200
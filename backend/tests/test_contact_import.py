@@ -0,0 +1,101 @@
+import threading
+
+from app import contact_import
+from app.contact_import import RowDecoder
+from app.main import app
+
+
+def test_decoder_handles_chunk_splits_quoted_newlines_and_bom():
+    body = '﻿Name,Email,Company\r\n"Imp, Ada","ada@imp.example.com","Line\none"\r\nImp Bo,,\r\n'.encode()
+    decoder = RowDecoder("csv")
+    records = [r for i in range(len(body)) for r in decoder.feed(body[i:i + 1])] + decoder.feed(b"", final=True)
+    assert records == [{"name": "Imp, Ada", "email": "ada@imp.example.com", "company": "Line\none"},
+                       {"name": "Imp Bo", "email": None, "company": None}]
+
+    decoder = RowDecoder("ndjson")
+    records = decoder.feed(b'{"name": "A"}\n[1]\n{bad') + decoder.feed(b"", final=True)
+    assert records[:2] == [{"name": "A"}, "expected a JSON object"] and records[2].startswith("invalid JSON")
+
+
+def test_flask_import_dedupes_in_batches_and_reports_rows(monkeypatch):
+    monkeypatch.setattr(contact_import, "BATCH_ROWS", 2)
+    with app.test_client() as client:
+        client.post("/contacts/", json={"name": "Already There", "email": "taken@imp.example.com"})
+        body = ("name,email,phone\n"
+                "Imp One,one@imp.example.com,1\n"
+                "Imp Taken,TAKEN@imp.example.com,2\n"
+                ",nameless@imp.example.com,3\n"
+                "Imp Bad,not-an-email,4\n"
+                "Imp One Again,One@Imp.example.com,5\n"
+                "Imp Twin A,twin@imp.example.com,6\n"
+                "Imp Twin B,twin@imp.example.com,7\n"
+                "Imp No Email,,8\n")
+        resp = client.post("/contacts/import", data=body, content_type="text/csv")
+        assert resp.status_code == 201, resp.data
+        job = resp.get_json()
+        assert (job["status"], job["processed"], job["inserted"], job["duplicates"], job["failed"]) == \
+            ("completed", 8, 3, 3, 2)
+        errors = {e["row"]: e for e in job["errors"]}
+        assert set(errors) == {2, 3, 4, 5, 7}
+        assert errors[3]["error"].startswith("name:") and errors[4]["error"].startswith("email:")
+        ids = {c["name"]: c["id"] for c in client.get("/contacts/?limit=1000").get_json()}
+        assert errors[2]["duplicate_of"] == ids["Already There"]
+        assert errors[5]["duplicate_of"] == ids["Imp One"] and errors[7]["duplicate_of"] == ids["Imp Twin A"]
+        assert "Imp No Email" in ids
+
+        assert client.get(f"/contacts/imports/{job['id']}").get_json() == job
+        assert client.post("/contacts/import", data=body, content_type="text/plain").status_code == 400
+        resp = client.post("/contacts/import?format=csv", data="email\nx@imp.example.com\n")
+        assert resp.status_code == 422 and resp.get_json()["status"] == "failed"
+
+
+def test_fastapi_import_streams_ndjson(api_client):
+    body = b'{"name": "Nd One", "email": "nd@imp.example.com"}\nnot json\n{"name": "Nd Two", "email": "ND@imp.example.com"}\n'
+    resp = api_client.post("/contacts/import?format=ndjson", content=body)
+    assert resp.status_code == 201, resp.text
+    job = resp.json()
+    assert (job["inserted"], job["duplicates"], job["failed"]) == (1, 1, 1)
+    assert job["errors"][0]["row"] == 2 and job["errors"][0]["error"].startswith("invalid JSON")
+    assert api_client.get(f"/contacts/imports/{job['id']}").json()["status"] == "completed"
+    assert api_client.get("/contacts/imports/999999").status_code == 404
+
+
+def test_email_committed_after_the_lookup_is_reported_as_a_duplicate(monkeypatch, api_client):
+    taken = api_client.post("/contacts/", json={"name": "Race Taken", "email": "race@imp.example.com"}).json()
+    assert api_client.post("/contacts/", json={"name": "Race Again", "email": "RACE@imp.example.com"}).status_code == 409
+    with app.test_client() as client:
+        resp = client.post("/contacts/", json={"name": "Race Again", "email": "Race@imp.example.com"})
+        assert resp.status_code == 409
+
+    # As if the contact committed between the batch's lookup and its INSERT
+    prepare = contact_import.ContactImporter.prepare
+    monkeypatch.setattr(contact_import.ContactImporter, "prepare", lambda self, batch, existing: prepare(self, batch, []))
+    body = "name,email\nRace One,race@imp.example.com\nRace Two,Race@Imp.example.com\nRace New,race.new@imp.example.com\n"
+    with app.test_client() as client:
+        resp = client.post("/contacts/import", data=body, content_type="text/csv")
+    assert resp.status_code == 201, resp.data
+    job = resp.get_json()
+    assert (job["inserted"], job["duplicates"], job["failed"]) == (1, 2, 0)
+    assert [(e["row"], e["duplicate_of"]) for e in job["errors"]] == [(1, taken["id"]), (2, taken["id"])]
+
+
+def test_large_import_runs_in_the_background(monkeypatch, api_client):
+    monkeypatch.setattr(contact_import, "INLINE_BYTES", 16)
+    body = b'{"name": "Bg One", "email": "bg.one@imp.example.com"}\n{"name": "Bg Two"}\n'
+    resp = api_client.post("/contacts/import?format=ndjson", content=body)
+    assert resp.status_code == 202, resp.text
+    assert resp.json()["status"] == "running"
+    for thread in threading.enumerate():
+        if thread.name == f"contact-import-{resp.json()['id']}":
+            thread.join(timeout=30)
+    job = api_client.get(f"/contacts/imports/{resp.json()['id']}").json()
+    assert (job["status"], job["inserted"]) == ("completed", 2)
+
+    with app.test_client() as client:
+        resp = client.post("/contacts/import", data="name,email\nBg Three,bg.three@imp.example.com\n", content_type="text/csv")
+        assert resp.status_code == 202, resp.data
+        for thread in threading.enumerate():
+            if thread.name == f"contact-import-{resp.get_json()['id']}":
+                thread.join(timeout=30)
+        job = client.get(f"/contacts/imports/{resp.get_json()['id']}").get_json()
+        assert (job["status"], job["inserted"]) == ("completed", 1)
@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+from app.core.config import Settings
+from app.db.session import create_db_engine
+
+
+def test_engine_factory_applies_pool_settings(tmp_path):
+    cfg = Settings(DATABASE_URL=f"sqlite:///{tmp_path}/pool.db", db_pool_size=1, db_max_overflow=0, db_pool_timeout=0.05)
+    eng = create_db_engine(cfg=cfg, name="db_pool_test")
+    try:
+        held = eng.connect()
+        with pytest.raises(PoolTimeout):
+            eng.connect()
+        stats = eng.pool.__class__.__name__, eng.pool.size(), eng.pool.timeout()
+        assert stats == ("InstrumentedQueuePool", 1, 0.05)
+        held.close()
+        with eng.connect() as conn:
+            assert conn.execute(text("select 1")).scalar() == 1
+    finally:
+        eng.dispose()
+
+
+def test_pool_metrics_are_published():
+    from app.main import app
+
+    with app.test_client() as client:
+        client.get("/contacts/")
+        snapshot = client.get("/metrics").get_json()
+    assert snapshot["db_pool_read"]["checkouts"] >= 1
+    assert 0.0 <= snapshot["db_pool_read"]["saturation"] <= 1.0
+    assert snapshot["db_pool"]["capacity"] == 1  # SQLite: one serialized writer
+    assert "db_pool_async" in snapshot
+
+
+def test_sqlite_profile_and_read_routing():
+    from app.db import SessionLocal, engine, read_engine
+    from app.db.routing import read_only
+    from app.models.contact import Contact
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+    assert read_engine is not engine and "mode=ro" in str(read_engine.url)
+
+    with read_only(), SessionLocal() as db:
+        assert db.get_bind() is read_engine
+        db.add(Contact(name="Routed"))
+        db.commit()  # flushes always go to the writer
+        assert db.get_bind() is read_engine
+        assert db.query(Contact).filter_by(name="Routed").count() == 1
+    with SessionLocal() as db:
+        assert db.get_bind() is engine
+
+
+def test_reads_go_to_replica_until_client_writes(tmp_path, monkeypatch):
+    from app.db import Base
+    from app.db.session import router
+    from app.main import app
+    from app.models.contact import Contact
+    from sqlalchemy.orm import Session
+
+    # A second local database stands in for a replica that has not caught up
+    replica = create_db_engine(f"sqlite:///{tmp_path}/replica.db", name="db_replica_test")
+    Base.metadata.create_all(bind=replica)
+    with Session(replica) as db:
+        db.add(Contact(name="Only on replica"))
+        db.commit()
+    monkeypatch.setattr(router, "readers", [replica])
+
+    def names(client, **kwargs):
+        return {c["name"] for c in client.get("/contacts/", **kwargs).get_json()}
+
+    with app.test_client() as client:
+        assert names(client) == {"Only on replica"}
+        assert "Only on replica" not in names(client, headers={"X-Read-Your-Writes": "1"})
+
+        resp = client.post("/contacts/", json={"name": "Fresh write"})
+        assert "recent_write=1" in resp.headers["Set-Cookie"]
+        assert "Fresh write" in names(client)  # pinned to the primary by the cookie
+    replica.dispose()
+
+
+def test_replica_strategies(tmp_path):
+    from app.db.routing import EngineRouter
+    from sqlalchemy import create_engine
+
+    a, b = (create_engine(f"sqlite:///{tmp_path}/{name}.db") for name in "ab")
+    rr = EngineRouter(a, [a, b])
+    assert [rr.reader() for _ in range(3)] == [a, b, a]
+    lc = EngineRouter(a, [a, b], strategy="least_connections")
+    with a.connect():
+        assert lc.reader() is b
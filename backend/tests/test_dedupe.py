@@ -0,0 +1,135 @@
+import threading
+from types import SimpleNamespace
+
+from sqlalchemy import select
+
+from app import dedupe
+from app.db import SessionLocal
+from app.main import app
+from app.models.contact import Contact
+from app.models.contact_dedupe import ContactDedupeRun, ContactDuplicate
+from app.models.deal import Deal
+from app.models.project import Project
+
+
+def _features(id_, name, email=None, phone=None, company=None):
+    return dedupe.features(SimpleNamespace(id=id_, name=name, email=email, phone=phone, company=company))
+
+
+def test_scoring_normalizes_names_and_phones_and_penalizes_conflicts():
+    acme = _features(1, "Acme Corp", "sales@acme.example.com", "+1 (555) 010-2030")
+    acme_again = _features(2, "ACME Corporation", None, "555.010.2030", "Acme")
+    assert dedupe.similarity(acme, acme_again) == {"phone": 1.0, "name": 1.0}
+    assert dedupe.score(dedupe.similarity(acme, acme_again)) > 0.95
+    assert dedupe.block_keys(acme) == {"email:sales@acme.example.com", "domain:acme.example.com",
+                                       "phone:5550102030", "name:acme"}
+    assert "domain:gmail.com" not in dedupe.block_keys(_features(3, "Jo", "jo@gmail.com"))
+
+    namesakes = dedupe.similarity(_features(4, "John Smith", "js@a.example.com"),
+                                  _features(5, "John Smith", "john@b.example.com"))
+    assert dedupe.score(namesakes) < dedupe.MIN_SCORE
+
+
+def test_flask_scan_finds_duplicates_and_merge_repoints_references():
+    with app.test_client() as client:
+        keep = client.post("/contacts/", json={"name": "Dedupe Brightwater Ltd", "phone": "+44 20 7946 0958"}).get_json()
+        dup = client.post("/contacts/", json={"name": "Brightwater Limited Dedupe", "phone": "020-7946-0958",
+                                              "email": "hello@brightwater.example.com"}).get_json()
+        other = client.post("/contacts/", json={"name": "Dedupe Unrelated Person"}).get_json()
+        with SessionLocal() as db:
+            db.add_all([Deal(title="Dedupe deal", amount=10, contact_id=dup["id"]),
+                        Project(name="Dedupe project", code="DEDUPE-1", contact_id=dup["id"])])
+            db.commit()
+            run = dedupe.run_scan(db, dedupe.new_run(db))
+            assert run.status == "completed" and run.last_contact_id >= other["id"]
+
+        pairs = {(c["contact_id"], c["duplicate_id"]): c for c in client.get("/contacts/duplicates?limit=1000").get_json()}
+        assert pairs[(keep["id"], dup["id"])]["signals"]["phone"] == 1.0
+        assert not any(other["id"] in pair for pair in pairs)
+        # Already scanned contacts are not compared again: no run is started
+        with SessionLocal() as db:
+            assert dedupe.new_run(db) is None
+
+        resp = client.post(f"/contacts/{keep['id']}/merge", json={"duplicates": [dup["id"]]})
+        assert resp.status_code == 200, resp.data
+        merged = resp.get_json()
+        assert merged["contact"]["email"] == "hello@brightwater.example.com"
+        assert merged["repointed"]["deal"] == 1 and merged["repointed"]["project"] == 1
+        assert client.get(f"/contacts/{dup['id']}").status_code == 404
+        with SessionLocal() as db:
+            assert db.query(Deal).filter_by(title="Dedupe deal").one().contact_id == keep["id"]
+        assert (keep["id"], dup["id"]) not in {(c["contact_id"], c["duplicate_id"])
+                                               for c in client.get("/contacts/duplicates?limit=1000").get_json()}
+
+
+def test_fastapi_scan_runs_in_background_and_merge_validates(api_client):
+    first = api_client.post("/contacts/", json={"name": "Quorvane Hollis", "email": "q.hollis@quorvane.example.com",
+                                                "phone": "+1 555 0187 332"}).json()
+    second = api_client.post("/contacts/", json={"name": "Quorvane Holis", "phone": "(555) 0187-332"}).json()
+    resp = api_client.post("/contacts/duplicates/scan")
+    assert resp.status_code == 202, resp.text
+    for thread in threading.enumerate():
+        if thread.name == "contact-dedupe":
+            thread.join(timeout=30)
+    run = api_client.get(f"/contacts/duplicates/runs/{resp.json()['id']}").json()
+    assert run["status"] == "completed"
+    found = [c for c in api_client.get("/contacts/duplicates?limit=1000").json() if c["duplicate_id"] == second["id"]]
+    assert found and found[0]["contact_id"] == first["id"] and found[0]["score"] > 0.95
+
+    assert api_client.post(f"/contacts/{first['id']}/merge", json={"duplicates": [first["id"]]}).status_code == 400
+    assert api_client.post(f"/contacts/{first['id']}/merge", json={"duplicates": [999999]}).status_code == 404
+    resp = api_client.post(f"/contacts/{first['id']}/merge", json={"duplicates": [second["id"]]})
+    assert resp.status_code == 200 and resp.json()["merged"] == [second["id"]]
+
+
+def test_merged_ids_are_not_given_out_again_and_merged_pairs_keep_their_status():
+    with SessionLocal() as db:
+        keep = Contact(name="Marlowe Ostrander", phone="+1 555 0142 901")
+        drop = Contact(name="Ostrander Marlowe", phone="555-0142-901")
+        db.add_all([keep, drop])
+        db.commit()
+        keep_id, drop_id = keep.id, drop.id
+        dedupe.JOB.run_once(db)
+        dedupe.merge(db, keep_id, [drop_id])
+        db.expunge(drop)  # deleted by the merge's bulk DELETE
+        # The merged-away contact had the highest id; it is not handed out again
+        again = Contact(name="Marlowe Ostrander", phone="(555) 0142901")
+        db.add(again)
+        db.commit()
+        assert again.id > drop_id
+        run = dedupe.run_scan(db, dedupe.new_run(db))
+        assert (run.scanned, run.candidates) == (1, 1)
+
+        pairs = [{"contact_id": keep_id, "duplicate_id": drop_id, "score": 0.5, "status": "open", "signals": {}},
+                 {"contact_id": keep_id, "duplicate_id": again.id, "score": 0.5, "status": "open", "signals": {}}]
+        db.execute(dedupe._candidates_statement(db.get_bind().dialect.name), pairs)
+        db.commit()
+        recorded = {id_: (status, score) for id_, status, score in db.execute(
+            select(ContactDuplicate.duplicate_id, ContactDuplicate.status, ContactDuplicate.score)
+            .where(ContactDuplicate.contact_id == keep_id)).all()}
+        assert recorded[drop_id][0] == "merged" and recorded[drop_id][1] > 0.9
+        assert recorded[again.id] == ("open", 0.5)
+
+
+def test_overlapping_scans_record_each_pair_once(monkeypatch):
+    monkeypatch.setattr(dedupe, "BATCH_ROWS", 1)
+    with SessionLocal() as db:
+        dedupe.JOB.run_once(db)
+        db.add_all([Contact(name=f"Overlap Vantrell {n}", phone="+1 555 0199 777") for n in range(4)])
+        db.commit()
+        # Both start from the same position, as two workers' runs would
+        runs = [dedupe.new_run(db).id for _ in range(2)]
+
+    def scan(run_id):
+        with SessionLocal() as db:
+            dedupe.run_scan(db, db.get(ContactDedupeRun, run_id))
+
+    threads = [threading.Thread(target=scan, args=(run_id,)) for run_id in runs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    with SessionLocal() as db:
+        done = [db.get(ContactDedupeRun, run_id) for run_id in runs]
+        assert sorted(run.status for run in done) == ["completed", "superseded"]
+        assert sum(run.scanned for run in done) == 4 and sum(run.candidates for run in done) == 6
@@ -0,0 +1,63 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import event, update
+
+from app import stock
+from app.db import SessionLocal, engine
+from app.fastapi_main import app as fastapi_app
+from app.main import app
+from app.models.product import Product
+
+
+def test_flask_list_and_detail_revalidate_until_a_write():
+    with app.test_client() as client:
+        created = client.post("/contacts/", json={"name": "Tagged"}).get_json()
+
+        first = client.get("/contacts/")
+        tag = first.headers["ETag"]
+        again = client.get("/contacts/", headers={"If-None-Match": tag})
+        assert again.status_code == 304 and again.data == b"" and again.headers["ETag"] == tag
+
+        detail = client.get(f"/contacts/{created['id']}")
+        assert detail.headers["ETag"] != tag
+
+        client.put(f"/contacts/{created['id']}", json={"phone": "555"})
+        assert client.get("/contacts/", headers={"If-None-Match": tag}).status_code == 200
+
+
+def test_fastapi_etag_tracks_statement_writes_and_requires_auth(api_client):
+    api_client.post("/inventory/", json={"name": "Tagged", "sku": "ETAG-1", "price": 1})
+    tag = api_client.get("/inventory/").headers["ETag"]
+    assert api_client.get("/inventory/", headers={"If-None-Match": tag}).status_code == 304
+    assert api_client.get("/inventory/?limit=1", headers={"If-None-Match": tag}).status_code == 200
+
+    with SessionLocal() as db:
+        db.execute(update(Product).where(Product.sku == "ETAG-1").values(stock=7))
+        db.commit()
+    resp = api_client.get("/inventory/", headers={"If-None-Match": tag})
+    assert resp.status_code == 200 and resp.headers["ETag"] != tag
+
+    with TestClient(fastapi_app) as anonymous:
+        assert anonymous.get("/inventory/", headers={"If-None-Match": tag}).status_code == 401
+
+
+def test_versions_are_bumped_last():
+    with SessionLocal() as db:
+        db.add_all([Product(name="Order A", sku="ETAG-ORDER-A", price=1, stock=5),
+                    Product(name="Order B", sku="ETAG-ORDER-B", price=1, stock=5)])
+        db.commit()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[:3])
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        with SessionLocal() as db:
+            stock.reserve(db, {"ETAG-ORDER-B": 1, "ETAG-ORDER-A": 2})
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    writes = [words for words in statements if words[0] in ("INSERT", "UPDATE", "DELETE")]
+    # the product UPDATEs and the ledger INSERT, then one upsert of both tables' versions
+    assert writes == [["UPDATE", "product", "SET"], ["UPDATE", "product", "SET"],
+                                               ["INSERT", "INTO", "stock_movement"], ["INSERT", "INTO", "table_version"]]
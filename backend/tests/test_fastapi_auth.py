@@ -0,0 +1,74 @@
+import asyncio
+import threading
+
+from fastapi.testclient import TestClient
+
+from app import fastapi_auth, utils
+from app.permissions import permission_map
+from app.tokens import token_versions
+from app.fastapi_main import app
+
+client = TestClient(app)
+
+
+def test_login_verifies_password_off_the_event_loop(monkeypatch):
+    threads = []
+    verify = utils.verify_password
+
+    def recording(password, hashed):
+        threads.append(threading.current_thread().name)
+        return verify(password, hashed)
+
+    monkeypatch.setattr(utils, "verify_password", recording)
+    resp = client.post("/auth/login", json={"username": "admin", "password": "admin123"})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["token"]
+    assert len(threads) == 1 and threads[0].startswith("bcrypt")
+
+    resp = client.post("/auth/login", json={"username": "admin", "password": "wrong"})
+    assert resp.status_code == 401
+
+
+def test_cheap_rejections_skip_the_bcrypt_executor(monkeypatch):
+    async def must_not_run(password, hashed):
+        raise AssertionError("bcrypt executor used for a cheap rejection")
+
+    monkeypatch.setattr(fastapi_auth, "verify_password_async", must_not_run)
+    assert client.post("/auth/login", json={"username": "nobody", "password": "x"}).status_code == 401
+    assert client.post("/auth/login", json={"username": "admin"}).status_code == 400
+
+
+def test_login_answers_503_when_every_bcrypt_slot_is_taken(monkeypatch):
+    utils.password_executor()
+    monkeypatch.setattr(utils, "_slots", threading.BoundedSemaphore(1))
+    utils._slots.acquire()  # the one slot is busy
+    resp = client.post("/auth/login", json={"username": "admin", "password": "admin123"})
+    assert resp.status_code == 503 and resp.headers["Retry-After"] == "1"
+    utils._slots.release()
+    assert client.post("/auth/login", json={"username": "admin", "password": "admin123"}).status_code == 200
+
+
+def test_permission_and_token_version_reloads_run_off_the_event_loop(monkeypatch, api_client):
+    loads = []
+
+    def recording(loader, name):
+        def load():
+            try:
+                asyncio.get_running_loop()
+                loads.append((name, "event loop"))
+            except RuntimeError:
+                loads.append((name, "thread"))
+            return loader()
+        return load
+
+    monkeypatch.setattr(permission_map, "_loader", recording(permission_map._loader, "permissions"))
+    monkeypatch.setattr(token_versions, "_loader", recording(token_versions._loader, "token versions"))
+    permission_map.invalidate()
+    token_versions.invalidate()
+    assert api_client.get("/contacts/?limit=1").status_code == 200
+    assert sorted(loads) == [("permissions", "thread"), ("token versions", "thread")]
+
+    permission_map.invalidate()
+    resp = api_client.post("/auth/login", json={"username": "admin", "password": "admin123"})
+    assert resp.status_code == 200, resp.text
+    assert loads[-1] == ("permissions", "thread")
@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table
+from sqlalchemy.orm import registry
+
+from app.filters import EQ, ListSpec
+from app.main import app
+
+
+def _walk(get, path, **params):
+    seen, after = [], None
+    while True:
+        resp = get(path, params={**params, **({"after": after} if after else {})})
+        assert resp.status_code == 200, resp.text
+        seen += resp.json()
+        after = resp.headers.get("X-Next-Cursor")
+        if not after:
+            return seen
+
+
+def test_flask_deals_filter_by_stage_and_sort_by_amount():
+    with app.test_client() as client:
+        for i, stage in enumerate(["filt-won", "filt-lost", "filt-won", "filt-won"]):
+            client.post("/deals/", json={"title": f"Filtered {i}", "amount": 10 * (4 - i), "stage": stage})
+
+        won = client.get("/deals/?stage=filt-won&sort=amount").get_json()
+        assert [d["title"] for d in won] == ["Filtered 3", "Filtered 2", "Filtered 0"]
+        both = client.get("/deals/?stage=filt-won,filt-lost&amount__gte=20&sort=-amount").get_json()
+        assert [d["title"] for d in both] == ["Filtered 0", "Filtered 1", "Filtered 2"]
+
+        resp = client.get("/deals/?title=Filtered 0")
+        assert resp.status_code == 400 and "supported: stage" in resp.get_json()["error"]
+        assert client.get("/deals/?sort=title").status_code == 400
+        assert client.get("/deals/?amount__gte=lots").status_code == 400
+
+
+def test_fastapi_products_keyset_pages_in_price_order(api_client):
+    for i, price in enumerate([5, 3, 5, 1, 3]):
+        api_client.post("/inventory/", json={"name": f"Sorted {i}", "sku": f"SORT-{i}", "price": price})
+
+    get = lambda path, params: api_client.get(path, params={"limit": 2, "fields": "id,name,price", **params})
+    ascending = [p for p in _walk(get, "/inventory/", sort="price", price__lte=5) if p["name"].startswith("Sorted")]
+    assert [(p["price"], p["name"]) for p in ascending] == [
+        (1, "Sorted 3"), (3, "Sorted 1"), (3, "Sorted 4"), (5, "Sorted 0"), (5, "Sorted 2")]
+    descending = [p for p in _walk(get, "/inventory/", sort="-price") if p["name"].startswith("Sorted")]
+    assert descending == ascending[::-1]
+
+    assert api_client.get("/inventory/?sku=SORT-1").status_code == 400
+    assert api_client.get("/projects/1/tasks?priority=high").status_code == 400
+
+
+def test_spec_refuses_unindexed_filters():
+    mapper = registry(metadata=MetaData())
+    table = Table("widget", mapper.metadata, Column("id", Integer, primary_key=True),
+                  Column("colour", String), Column("size", Integer, index=True))
+
+    class Widget:
+        pass
+
+    mapper.map_imperatively(Widget, table)
+    assert list(ListSpec(Widget, {"size": EQ}).describe()) == ["size"]
+    with pytest.raises(ValueError, match="no index leads with colour"):
+        ListSpec(Widget, {"colour": EQ})
+    with pytest.raises(ValueError, match="cannot sort on nullable size"):
+        ListSpec(Widget, {}, sorts=("size",))
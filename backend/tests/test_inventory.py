@@ -19,3 +19,63 @@ def test_create_and_list_products():
         assert resp.status_code == 200
         items = resp.get_json()
         assert any(p["sku"] == "WGT-001" for p in items)
+
+
+def _stock(client, product_id):
+    return client.get(f"/inventory/{product_id}").get_json()["stock"]
+
+
+def test_reserve_takes_every_line_or_none():
+    with app.test_client() as client:
+        ids = {sku: client.post("/inventory/", json={"name": sku, "sku": sku, "stock": stock}).get_json()["id"]
+               for sku, stock in (("RSV-HOT", 5), ("RSV-COLD", 2))}
+
+        resp = client.post("/inventory/reserve", json={"items": [
+            {"sku": "RSV-HOT", "quantity": 2}, {"sku": "RSV-COLD", "quantity": 1}, {"sku": "RSV-HOT", "quantity": 1}]})
+        assert resp.status_code == 200, resp.data
+        assert {i["sku"]: (i["quantity"], i["stock"]) for i in resp.get_json()["items"]} == {
+            "RSV-HOT": (3, 2), "RSV-COLD": (1, 1)}
+
+        # One short line rolls back the whole reservation
+        resp = client.post("/inventory/reserve", json={"items": [
+            {"sku": "RSV-HOT", "quantity": 2}, {"sku": "RSV-COLD", "quantity": 5}]})
+        assert resp.status_code == 409
+        assert resp.get_json()["shortages"] == [{"sku": "RSV-COLD", "requested": 5, "available": 1}]
+        assert (_stock(client, ids["RSV-HOT"]), _stock(client, ids["RSV-COLD"])) == (2, 1)
+
+        resp = client.post("/inventory/release", json={"items": [{"sku": "RSV-HOT", "quantity": 3}]})
+        assert resp.get_json()["items"][0]["stock"] == 5
+        assert client.post("/inventory/reserve", json={"items": [{"sku": "RSV-NONE", "quantity": 1}]}).status_code == 400
+        assert client.post("/inventory/reserve", json={"items": [{"sku": "RSV-HOT", "quantity": 0}]}).status_code == 400
+
+
+def test_concurrent_reservations_never_oversell():
+    import threading
+
+    with app.test_client() as client:
+        product_id = client.post("/inventory/", json={"name": "Race", "sku": "RSV-RACE", "stock": 10}).get_json()["id"]
+    statuses = []
+
+    def buy():
+        with app.test_client() as client:
+            statuses.append(client.post("/inventory/reserve", json={"items": [{"sku": "RSV-RACE", "quantity": 3}]})
+                            .status_code)
+
+    threads = [threading.Thread(target=buy) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(statuses) == [200] * 3 + [409] * 5
+    with app.test_client() as client:
+        assert _stock(client, product_id) == 1
+
+
+def test_fastapi_reserve(api_client):
+    api_client.post("/inventory/", json={"name": "Async stock", "sku": "RSV-ASYNC", "stock": 4})
+    resp = api_client.post("/inventory/reserve", json={"items": [{"sku": "RSV-ASYNC", "quantity": 4}]})
+    assert resp.status_code == 200 and resp.json()["items"][0]["stock"] == 0
+    resp = api_client.post("/inventory/reserve", json={"items": [{"sku": "RSV-ASYNC", "quantity": 1}]})
+    assert resp.status_code == 409 and resp.json()["shortages"][0]["available"] == 0
+    assert api_client.post("/inventory/release", json={"items": [{"sku": "RSV-ASYNC", "quantity": 2}]}) \
+        .json()["items"][0]["stock"] == 2
@@ -0,0 +1,83 @@
+from datetime import date, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.db import SessionLocal
+from app.main import app
+from app.models.contact import Contact
+from app.models.deal import Deal
+from app.models.invoice import Invoice
+from app.models.project import Project
+from app.models.sale_order import SaleOrder
+
+
+def _contact(db, name: str, size: int) -> int:
+    contact = Contact(name=name)
+    db.add(contact)
+    db.flush()
+    past = date.today() - timedelta(days=10)
+    for i in range(size):
+        db.add_all([
+            Deal(title=f"{name} deal {i}", amount=100 + i, contact_id=contact.id),
+            SaleOrder(order_number=f"OV-{contact.id}-{i}", total=50, contact_id=contact.id),
+            Invoice(invoice_number=f"OV-INV-{contact.id}-{i}", status="sent", total=10, due_date=past,
+                    contact_id=contact.id),
+            Invoice(invoice_number=f"OV-PAID-{contact.id}-{i}", status="paid", total=999, contact_id=contact.id),
+            Project(name=f"{name} project {i}", code=f"OV-{contact.id}-{i}",
+                    status="active" if i % 2 else "completed", contact_id=contact.id),
+        ])
+    db.commit()
+    return contact.id
+
+
+def _count_queries(client, url):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    # Every engine: GETs read through the read pool
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        resp = client.get(url)
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+    assert resp.status_code == 200, resp.data
+    return resp.get_json(), len(statements)
+
+
+def test_flask_overview_batches_relations_into_fixed_queries():
+    with SessionLocal() as db:
+        small, large = _contact(db, "Overview Small", 2), _contact(db, "Overview Large", 12)
+    with app.test_client() as client:
+        _count_queries(client, f"/contacts/{small}/overview?orders_limit=1")  # warms the principal cache
+        _, small_queries = _count_queries(client, f"/contacts/{small}/overview")
+        _, large_queries = _count_queries(client, f"/contacts/{large}/overview")
+        assert small_queries == large_queries == 8  # seven plus the ETag versions lookup
+
+        body, _ = _count_queries(client, f"/contacts/{large}/overview?deals_limit=3&orders_limit=0")
+        assert body["contact"]["name"] == "Overview Large"
+        assert [d["title"] for d in body["deals"]["items"]] == [f"Overview Large deal {i}" for i in (11, 10, 9)]
+        assert body["deals"]["total"] == 12 and body["orders"] == {"items": [], "total": 12}
+        invoices = body["open_invoices"]
+        assert invoices["total"] == 12 and len(invoices["items"]) == 5
+        assert {i["status"] for i in invoices["items"]} == {"sent"}
+        assert float(invoices["balance"]) == 120 and float(invoices["overdue"]) == 120
+        assert body["active_projects"]["total"] == 6 and "contact_id" not in body["active_projects"]["items"][0]
+
+        assert client.get(f"/contacts/{large}/overview?deals_limit=1000").status_code == 400
+        assert client.get("/contacts/999999/overview").status_code == 404
+
+
+def test_fastapi_overview_matches_flask(api_client):
+    with SessionLocal() as db:
+        contact_id = _contact(db, "Overview Async", 3)
+    body = api_client.get(f"/contacts/{contact_id}/overview?active_projects_limit=1").json()
+    assert body["orders"]["total"] == 3 and len(body["active_projects"]["items"]) == 1
+    assert float(body["open_invoices"]["balance"]) == 30
+    with app.test_client() as client:
+        flask_body = client.get(f"/contacts/{contact_id}/overview?active_projects_limit=1").get_json()
+    assert flask_body == body
+    assert api_client.get(f"/contacts/{contact_id}/overview?deals_limit=-1").status_code == 422
+    assert api_client.get("/contacts/999999/overview").status_code == 404
@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+from datetime import date
+
+from app.db import SessionLocal
+from app.main import app
+from app.models.accounting import JournalEntry
+from app.models.hr import Attendance, Employee, LeaveRequest
+from app.pagination import encode_cursor
+
+
+def test_flask_contacts_walk_pages_by_cursor():
+    with app.test_client() as client:
+        ids = {client.post("/contacts/", json={"name": f"Paged {i}"}).get_json()["id"] for i in range(5)}
+
+        seen, after = [], None
+        while True:
+            resp = client.get("/contacts/", query_string={"limit": 2, **({"after": after} if after else {})})
+            assert resp.status_code == 200
+            page = resp.get_json()
+            assert len(page) <= 2
+            seen += [c["id"] for c in page]
+            after = resp.headers.get("X-Next-Cursor")
+            if not after:
+                break
+            assert 'rel="next"' in resp.headers["Link"]
+        assert ids <= set(seen)
+        assert seen == sorted(seen, reverse=True) and len(seen) == len(set(seen))
+
+        resp = client.get("/contacts/?limit=1&count=1")
+        assert int(resp.headers["X-Total-Count"]) == len(seen)
+        assert client.get("/contacts/?after=not-a-cursor").status_code == 400
+        assert client.get("/contacts/?limit=0").status_code == 400
+
+
+def test_fastapi_attendance_pages_on_date_then_id(api_client):
+    with SessionLocal() as db:
+        emp = Employee(first_name="Page", last_name="Walker")
+        db.add(emp)
+        db.flush()
+        db.add_all(Attendance(employee_id=emp.id, date=date(2026, 1, day)) for day in (1, 2, 2, 3))
+        db.commit()
+
+    first = api_client.get("/hr/attendance", params={"limit": 3})
+    assert [a["date"] for a in first.json()] == ["2026-01-03", "2026-01-02", "2026-01-02"]
+    rest = api_client.get("/hr/attendance", params={"limit": 3, "after": first.headers["X-Next-Cursor"]})
+    assert [a["date"] for a in rest.json()] == ["2026-01-01"]
+    assert "X-Next-Cursor" not in rest.headers
+    assert api_client.get("/hr/attendance", params={"after": "%%%"}).status_code == 400
+
+
+def _walk(api_client, path):
+    seen, after = [], None
+    while True:
+        resp = api_client.get(path, params={"limit": 1, **({"after": after} if after else {})})
+        assert resp.status_code == 200, resp.text
+        seen += [row["id"] for row in resp.json()]
+        after = resp.headers.get("X-Next-Cursor")
+        if not after:
+            return seen
+        assert len(seen) < 1000, "the walk is not advancing"
+
+
+def test_fastapi_datetime_keyed_lists_walk_to_the_end(api_client):
+    with SessionLocal() as db:
+        emp = Employee(first_name="Leave", last_name="Walker")
+        db.add(emp)
+        db.flush()
+        # Stamped by server defaults, several within the same second
+        db.add_all(LeaveRequest(employee_id=emp.id, start_date=date(2026, 2, day), end_date=date(2026, 2, day),
+                                type="vacation") for day in range(1, 5))
+        db.add_all(JournalEntry(ref=f"PAGE-{n}") for n in range(4))
+        db.commit()
+
+    for path, model in (("/hr/leave", LeaveRequest), ("/accounting/journal", JournalEntry)):
+        with SessionLocal() as db:
+            expected = [id_ for id_, in db.query(model.id).order_by(model.id.desc())]
+        seen = _walk(api_client, path)
+        assert seen == expected, path
+
+        # A stream resumed after a row picks up right below it
+        middle = api_client.get(path, params={"limit": 2}).headers["X-Next-Cursor"]
+        resumed = api_client.get(path, params={"format": "ndjson", "after": middle}).text.splitlines()
+        assert [json.loads(line)["id"] for line in resumed] == expected[2:], path
+
+
+def test_fastapi_streams_ndjson_and_csv(api_client):
+    ids = [api_client.post("/contacts/", json={"name": f"Streamed {i}", "company": "Acme, Inc"}).json()["id"] for i in range(3)]
+
+    resp = api_client.get("/contacts/", headers={"Accept": "application/x-ndjson"}, params={"limit": 1})
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert set(ids) <= {r["id"] for r in rows} and len(rows) > 1
+
+    resp = api_client.get("/contacts/", params={"format": "csv", "fields": "id,company"})
+    assert resp.headers["content-type"].startswith("text/csv")
+    table = list(csv.reader(io.StringIO(resp.text)))
+    assert table[0] == ["id", "company"]
+    assert [str(ids[-1]), "Acme, Inc"] in table[1:]
+
+    cursor = encode_cursor([ids[1]])
+    resumed = api_client.get("/contacts/", params={"format": "ndjson", "after": cursor}).text.splitlines()
+    assert all(json.loads(line)["id"] < ids[1] for line in resumed)
+    assert api_client.get("/contacts/", params={"format": "xml"}).status_code == 422
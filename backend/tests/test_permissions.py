@@ -0,0 +1,68 @@
+from app.db import SessionLocal
+from app.models.permission import Permission, RolePermission
+from app.models.user import Role
+from app.permissions import PermissionMap, has_permission, permission_map
+
+
+def test_permission_map_bit_tests():
+    grants = [(2, 1, "contacts.read"), (2, 4, "deals.read"), (3, 1, "contacts.read")]
+    perms = PermissionMap(loader=lambda: grants)
+    assert perms.has(2, "deals.read")
+    assert not perms.has(3, "deals.read")
+    assert not perms.has(3, "unknown.perm")
+    assert perms.mask_for(2) == (1 << 1) | (1 << 4) == perms.bit("contacts.read") | perms.bit("deals.read")
+    assert perms.reloads == 1
+
+
+def test_permission_map_reloads_after_commit():
+    with SessionLocal() as db:
+        role = Role(name="auditor")
+        perm = Permission(name="reports.read")
+        db.add_all([role, perm])
+        db.commit()
+        role_id, perm_id = role.id, perm.id
+
+    assert not has_permission(role_id, "reports.read")
+    reloads = permission_map.reloads
+
+    with SessionLocal() as db:
+        db.add(RolePermission(role_id=role_id, permission_id=perm_id))
+        db.commit()
+
+    assert has_permission(role_id, "reports.read")
+    assert permission_map.reloads == reloads + 1
+
+
+def test_withdrawn_grant_revokes_tokens_carrying_it():
+    from flask import Flask
+
+    from app.auth import require_permission
+    from app.models.user import User
+    from app.tokens import issue_token
+    from app.utils import hash_password
+
+    with SessionLocal() as db:
+        role = Role(name="archivist")
+        perm = Permission(name="archive.read")
+        db.add_all([role, perm])
+        db.flush()
+        grant = RolePermission(role_id=role.id, permission_id=perm.id)
+        user = User(username="archivist", password_hash=hash_password("archive123"), role_id=role.id, is_active=1)
+        db.add_all([grant, user])
+        db.commit()
+        token, grant_id, user_id = issue_token(user, "archive-secret"), grant.id, user.id
+
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "archive-secret"
+    app.add_url_rule("/archive", "archive", require_permission("archive.read")(lambda: "ok"))
+    headers = {"Authorization": f"Bearer {token}"}
+    with app.test_client() as client:
+        assert client.get("/archive", headers=headers).status_code == 200
+        with SessionLocal() as db:
+            db.delete(db.get(RolePermission, grant_id))
+            db.commit()
+        assert client.get("/archive", headers=headers).status_code == 401  # its mask is stale
+
+        with SessionLocal() as db:
+            token = issue_token(db.get(User, user_id), "archive-secret")
+        assert client.get("/archive", headers={"Authorization": f"Bearer {token}"}).status_code == 403
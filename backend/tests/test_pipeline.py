@@ -0,0 +1,92 @@
+from sqlalchemy import select, update
+
+from app.db import SessionLocal
+from app.main import app
+from app.models.contact import Contact
+from app.models.deal import Deal, DealStageSummary
+from app.pipeline import pipeline_statement
+
+
+def _stages(body):
+    return {s["stage"]: (s["count"], float(s["sum"])) for s in body["stages"]}
+
+
+def _grouped(db, contact_id=None):
+    # The GROUP BY databases without the summary use, straight over deal
+    return {stage or None: (deals, float(amount))
+            for stage, deals, amount in db.execute(pipeline_statement("other", contact_id)).all()}
+
+
+def test_summary_follows_every_kind_of_write():
+    with SessionLocal() as db:
+        contact, other = Contact(name="Pipeline One"), Contact(name="Pipeline Two")
+        db.add_all([contact, other])
+        db.flush()
+        deals = [Deal(title=f"Pipeline {i}", amount=10 * (i + 1), stage=stage, contact_id=contact.id)
+                 for i, stage in enumerate(["lead", "lead", "won", None])]
+        db.add_all(deals)
+        db.commit()
+        contact_id, other_id = contact.id, other.id
+        ids = [deal.id for deal in deals]
+
+    with app.test_client() as client:
+        body = client.get(f"/deals/pipeline?contact_id={contact_id}").get_json()
+        assert _stages(body) == {"lead": (2, 30.0), "won": (1, 30.0), None: (1, 40.0)}
+        assert body["total"]["count"] == 4 and float(body["total"]["sum"]) == 100
+        assert {s["stage"]: float(s["average"]) for s in body["stages"]}["lead"] == 15
+
+        with SessionLocal() as db:
+            lead = db.get(Deal, ids[0])
+            lead.stage, lead.amount = "won", 25  # moves between stages with a new amount
+            db.get(Deal, ids[3]).contact_id = other_id
+            db.delete(db.get(Deal, ids[1]))
+            db.commit()
+            db.execute(update(Deal).where(Deal.contact_id == contact_id).values(stage="lost"))  # bulk UPDATE
+            db.commit()
+            assert _grouped(db, contact_id) == {"lost": (2, 55.0)}
+            everything = _grouped(db)
+
+        body = client.get(f"/deals/pipeline?contact_id={contact_id}").get_json()
+        assert _stages(body) == {"lost": (2, 55.0)}
+        assert float(body["total"]["average"]) == 27.5
+        assert _stages(client.get(f"/deals/pipeline?contact_id={other_id}").get_json()) == {None: (1, 40.0)}
+        assert _stages(client.get("/deals/pipeline").get_json()) == everything
+        for bad in ("abc", "0", "-1"):
+            assert client.get(f"/deals/pipeline?contact_id={bad}").status_code == 400
+
+
+def test_each_deal_counts_in_its_own_contacts_row_only():
+    with SessionLocal() as db:
+        first, second = Contact(name="Pipeline Shard One"), Contact(name="Pipeline Shard Two")
+        db.add_all([first, second])
+        db.flush()
+        db.add_all([Deal(title="Shard one", amount=3, stage="shard", contact_id=first.id),
+                    Deal(title="Shard two", amount=4, stage="shard", contact_id=second.id),
+                    Deal(title="Shard none", amount=5, stage="shard")])
+        db.commit()
+        rows = dict(db.execute(select(DealStageSummary.contact_id, DealStageSummary.deals)
+                               .where(DealStageSummary.stage == "shard")).all())
+        # No row counts every deal: writes for different contacts update different rows
+        assert rows == {first.id: 1, second.id: 1, 0: 1}
+        everything = _grouped(db)
+    with app.test_client() as client:
+        body = client.get("/deals/pipeline").get_json()
+    assert _stages(body) == everything and everything["shard"] == (3, 12.0)
+
+
+def test_fastapi_pipeline_matches_flask(api_client):
+    with SessionLocal() as db:
+        contact = Contact(name="Pipeline Async")
+        db.add(contact)
+        db.flush()
+        db.add_all([Deal(title="Async lead", amount=12.5, stage="lead", contact_id=contact.id),
+                    Deal(title="Async won", amount=7.5, stage="won", contact_id=contact.id)])
+        db.commit()
+        contact_id = contact.id
+    body = api_client.get(f"/deals/pipeline?contact_id={contact_id}").json()
+    assert _stages(body) == {"lead": (1, 12.5), "won": (1, 7.5)}
+    with app.test_client() as client:
+        assert client.get(f"/deals/pipeline?contact_id={contact_id}").get_json() == body
+    for bad in ("abc", "0", "-1"):
+        assert api_client.get(f"/deals/pipeline?contact_id={bad}").status_code == 422
+    assert api_client.get("/deals/pipeline?contact_id=999999").json()["total"]["count"] == 0
@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from app import product_feed
+from app.db import SessionLocal
+from app.main import app
+from app.models.product_feed import ProductFeedJob
+
+
+def test_flask_feed_upserts_on_sku_and_logs_stock_changes(monkeypatch, api_client):
+    monkeypatch.setattr(product_feed, "BATCH_ROWS", 3)
+    with app.test_client() as client:
+        ids = {sku: client.post("/inventory/", json={"name": sku, "sku": sku, "price": price, "stock": stock})
+               .get_json()["id"] for sku, price, stock in (("FEED-A", 5, 10), ("FEED-B", 2, 3))}
+        body = ("sku,name,price,stock\n"
+                "FEED-A,,5.00,10\n"
+                "FEED-B,,2.50,\n"
+                "FEED-N,Feed New,1,4\n"
+                "FEED-X,,1,1\n"
+                "FEED-A,,,7\n"
+                "FEED-N,,,6\n"
+                ",Nameless,1,1\n"
+                "FEED-M,Feed Merged,1,1\n"
+                "FEED-M,,3,\n")
+        resp = client.post("/inventory/feed", data=body, content_type="text/csv")
+        assert resp.status_code == 201, resp.data
+        job = resp.get_json()
+        assert (job["status"], job["processed"], job["inserted"], job["updated"], job["unchanged"], job["failed"]) \
+            == ("completed", 9, 2, 3, 1, 2)
+        errors = {e["row"]: e for e in job["errors"]}
+        assert errors[4]["sku"] == "FEED-X" and errors[7]["error"].startswith("sku:")
+
+        products = {p["sku"]: p for p in client.get("/inventory/?limit=1000").get_json()}
+        assert (float(products["FEED-B"]["price"]), products["FEED-B"]["stock"]) == (2.5, 3)
+        assert (float(products["FEED-M"]["price"]), products["FEED-M"]["stock"]) == (3, 1)
+        assert products["FEED-N"]["stock"] == 6 and products["FEED-A"]["name"] == "FEED-A"
+        movements = client.get(f"/inventory/{ids['FEED-A']}/movements").get_json()
+        assert (movements[0]["kind"], movements[0]["quantity"], movements[0]["reference"]) == \
+            ("adjustment", -3, f"product feed {job['id']}")
+        movements = client.get(f"/inventory/{products['FEED-N']['id']}/movements").get_json()
+        assert [(m["kind"], m["quantity"]) for m in movements] == [("adjustment", 2), ("receipt", 4)]
+
+        resp = client.post("/inventory/feed", data="sku,stock,price\nFEED-A,7,\nFEED-B,,2.5\n", content_type="text/csv")
+        assert (resp.get_json()["updated"], resp.get_json()["unchanged"]) == (0, 2)
+        assert client.get(f"/inventory/feeds/{job['id']}").get_json() == job
+    assert api_client.get(f"/inventory/feeds/{job['id']}").json() == job
+
+
+def test_fastapi_feed_reads_ndjson_and_fails_without_a_sku_column(api_client):
+    body = b'{"sku": "FEED-API", "name": "Feed API", "price": 9.99, "stock": 2}\n{"sku": "FEED-API", "stock": -1}\n'
+    resp = api_client.post("/inventory/feed", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert resp.status_code == 201, resp.text
+    job = resp.json()
+    assert (job["inserted"], job["failed"]) == (1, 1) and job["errors"][0]["error"].startswith("stock:")
+    assert api_client.get(f"/inventory/feeds/{job['id']}").json()["status"] == "completed"
+
+    resp = api_client.post("/inventory/feed", content=b"name,price\nNo Sku,1\n", headers={"Content-Type": "text/csv"})
+    assert resp.status_code == 422 and resp.json()["errors"][-1]["error"] == "CSV header must include a sku column"
+    assert api_client.post("/inventory/feed", content=b"x").status_code == 400
+
+
+@pytest.mark.parametrize("path", ["flask", "fastapi"])
+def test_feed_that_fails_midway_is_marked_failed(monkeypatch, api_client, path):
+    monkeypatch.setattr(product_feed, "BATCH_ROWS", 1)
+    prepare, batches = product_feed.ProductFeed.prepare, []
+
+    def flaky(self, batch, existing):
+        batches.append(batch)
+        if len(batches) > 1:
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        return prepare(self, batch, existing)
+
+    monkeypatch.setattr(product_feed.ProductFeed, "prepare", flaky)
+    body = f"sku,name,price\nFAIL-{path}-1,First,1\nFAIL-{path}-2,Second,2\n".encode()
+    if path == "flask":
+        with app.test_client() as client:
+            assert client.post("/inventory/feed", data=body, content_type="text/csv").status_code == 500
+    else:
+        with pytest.raises(OperationalError):
+            api_client.post("/inventory/feed", content=body, headers={"Content-Type": "text/csv"})
+    with SessionLocal() as db:
+        job_id = db.execute(select(ProductFeedJob.id).order_by(ProductFeedJob.id.desc()).limit(1)).scalar()
+    job = api_client.get(f"/inventory/feeds/{job_id}").json()
+    assert (job["status"], job["inserted"]) == ("failed", 1) and "database is locked" in job["errors"][-1]["error"]
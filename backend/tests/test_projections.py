@@ -0,0 +1,32 @@
+from app.main import app
+
+
+def test_flask_sparse_fieldsets():
+    with app.test_client() as client:
+        created = client.post("/inventory/", json={"name": "Widget", "sku": "PROJ-1", "price": 9.5, "stock": 3}).get_json()
+
+        listed = client.get("/inventory/").get_json()
+        assert set(listed[0]) == {"id", "name", "sku", "description", "price", "stock"}
+
+        sparse = client.get("/inventory/?fields=sku,price&limit=1").get_json()
+        assert sparse == [{"sku": "PROJ-1", "price": 9.5}]
+
+        detail = client.get(f"/inventory/{created['id']}?fields=name").get_json()
+        assert detail == {"name": "Widget"}
+
+        resp = client.get("/inventory/?fields=sku,password_hash")
+        assert resp.status_code == 400
+        assert "password_hash" in resp.get_json()["error"]
+
+
+def test_fastapi_projection_detail_keeps_nested_rows(api_client):
+    project = api_client.post("/projects/", json={"name": "Projected", "code": "PROJ-API"}).json()
+    api_client.post(f"/projects/{project['id']}/tasks", json={"title": "Only task"})
+
+    detail = api_client.get(f"/projects/{project['id']}").json()
+    assert detail["description"] is None and detail["start_date"] is None
+    assert [set(t) for t in detail["tasks"]] == [{"id", "title", "status", "priority", "assigned_to_id", "due_date"}]
+
+    names = api_client.get("/projects/", params={"fields": "code", "limit": 1}).json()
+    assert names == [{"code": "PROJ-API"}]
+    assert api_client.get("/projects/", params={"fields": "nope"}).status_code == 400
@@ -0,0 +1,38 @@
+from app.main import app
+from app.response_cache import MemoryBackend, ResponseCache, response_cache
+
+
+def test_memory_backend_is_bounded_by_bytes_and_drops_written_tables():
+    cache = ResponseCache(MemoryBackend(maxsize=10, max_bytes=300))
+    for i in range(4):
+        cache.put(f"k{i}", b"x" * 100, [("Content-Type", "application/json")], ["product"])
+    stats = cache.stats()
+    assert stats["size"] < 4 and stats["bytes"] <= 300 and stats["evictions"] >= 1
+    assert cache.get("k0") is None and cache.get("k3") is not None
+
+    cache.invalidate({"product"})
+    assert cache.get("k3") is None and cache.stats()["hit_ratio"] == 0.3333
+
+
+def test_fastapi_departments_replay_until_a_write(api_client):
+    api_client.post("/hr/departments", json={"name": "Cached Ops"})
+    first = api_client.get("/hr/departments")
+    hits = response_cache.hits
+    second = api_client.get("/hr/departments")
+    assert response_cache.hits == hits + 1
+    assert second.content == first.content and second.headers["ETag"] == first.headers["ETag"]
+
+    api_client.post("/hr/departments", json={"name": "Cached Sales"})
+    assert "Cached Sales" in {d["name"] for d in api_client.get("/hr/departments").json()}
+
+
+def test_flask_inventory_replays_page_headers():
+    with app.test_client() as client:
+        for i in range(3):
+            client.post("/inventory/", json={"name": f"Cached {i}", "sku": f"CACHE-{i}"})
+        first = client.get("/inventory/?limit=2")
+        hits = response_cache.hits
+        second = client.get("/inventory/?limit=2")
+        assert response_cache.hits == hits + 1
+        assert second.get_json() == first.get_json()
+        assert second.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
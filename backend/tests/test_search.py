@@ -0,0 +1,57 @@
+from app import search
+from app.main import app
+from app.search import pieces
+
+
+def _names(resp):
+    assert resp.status_code == 200, resp.data
+    return [c["name"] for c in resp.get_json()]
+
+
+def test_flask_search_ranks_prefixes_and_tolerates_typos():
+    with app.test_client() as client:
+        for name, email, company in [("Quillon Marbeck", "q.marbeck@zephyra.io", "Zephyra"),
+                                     ("Aramarbeckian Tull", None, None),
+                                     ("Edda Quillonson", "edda@orvale.test", "Orvale Shipping")]:
+            client.post("/contacts/", json={"name": name, "email": email, "company": company, "phone": "+15550001"})
+
+        assert _names(client.get("/contacts/search?q=marbeck"))[:2] == ["Quillon Marbeck", "Aramarbeckian Tull"]
+        assert _names(client.get("/contacts/search?q=quill marb")) == ["Quillon Marbeck"]
+        assert _names(client.get("/contacts/search?q=orvale")) == ["Edda Quillonson"]
+        assert _names(client.get("/contacts/search?q=zephyra.io")) == ["Quillon Marbeck"]
+        assert _names(client.get("/contacts/search?q=quilonson"))[0] == "Edda Quillonson"
+        assert _names(client.get("/contacts/search?q=marbeck&limit=1")) == ["Quillon Marbeck"]
+
+        resp = client.get("/contacts/search?q=marbeck&fields=id")
+        assert list(resp.get_json()[0]) == ["id"]
+        assert client.get("/contacts/search?q=qu").status_code == 400
+        assert client.get("/contacts/search?q=marbeck&limit=0").status_code == 400
+
+
+def test_search_index_follows_updates_and_deletes(api_client):
+    created = api_client.post("/contacts/", json={"name": "Ottoline Brackwater"}).json()
+    assert [c["id"] for c in api_client.get("/contacts/search?q=brackwater").json()] == [created["id"]]
+
+    with app.test_client() as client:
+        client.put(f"/contacts/{created['id']}", json={"name": "Ottoline Fenwright"})
+        assert _names(client.get("/contacts/search?q=fenwright")) == ["Ottoline Fenwright"]
+        assert _names(client.get("/contacts/search?q=brackwater")) == []
+        client.delete(f"/contacts/{created['id']}")
+    assert api_client.get("/contacts/search?q=fenwright").json() == []
+    assert api_client.get("/contacts/search?q=fenwright&limit=1000").status_code == 422
+
+
+def test_typo_variants_keep_an_intact_part():
+    for typo, word in [("marbek", "marbeck"), ("mrabeck", "marbeck"), ("marbxck", "marbeck")]:
+        assert any(all(part in word for part in group) for group in pieces(typo))
+
+
+def test_best_match_survives_a_broad_word(monkeypatch):
+    monkeypatch.setattr(search, "CANDIDATES", 5)
+    with app.test_client() as client:
+        best = client.post("/contacts/", json={"name": "Vellacort Ames"}).get_json()
+        # Newer, weaker matches: more than the candidate window
+        for n in range(12):
+            client.post("/contacts/", json={"name": f"Filler Person {n}", "company": "Vellacortian Holdings"})
+        found = client.get("/contacts/search?q=vellacort&fields=id,name").get_json()
+    assert found[0]["id"] == best["id"] and len(found) == 5
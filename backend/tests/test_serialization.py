@@ -0,0 +1,41 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from app import serialization
+from app.main import app
+
+
+def test_dumps_encodes_decimals_and_dates_natively(monkeypatch):
+    row = {"price": Decimal("19.90"), "day": date(2026, 1, 2), "at": datetime(2026, 1, 2, 9, 30, tzinfo=timezone.utc)}
+    assert serialization.dumps(row) == b'{"price":19.9,"day":"2026-01-02","at":"2026-01-02T09:30:00+00:00"}'
+
+    monkeypatch.setattr(serialization, "EXACT_DECIMALS", True)
+    assert serialization.dumps({"price": Decimal("19.90")}) == b'{"price":"19.90"}'
+
+
+def test_both_apps_emit_exact_decimals_when_enabled(api_client, monkeypatch):
+    with app.test_client() as client:
+        created = client.post("/inventory/", json={"name": "Exact", "sku": "EXACT-1", "price": "19.90"}).get_json()
+        assert created["price"] == 19.9
+
+        monkeypatch.setattr(serialization, "EXACT_DECIMALS", True)
+        listed = client.get("/inventory/?fields=sku,price&limit=1").get_json()
+        assert listed == [{"sku": "EXACT-1", "price": "19.90"}]
+
+    assert api_client.get("/inventory/", params={"fields": "price", "limit": 1}).json() == [{"price": "19.90"}]
+    # Handlers returning plain dicts go through jsonable_encoder first
+    assert api_client.post("/inventory/", json={"name": "Exact", "sku": "EXACT-2", "price": "5.25"}).json()["price"] == "5.25"
+
+
+def test_null_money_reads_as_zero_on_both_paths(monkeypatch):
+    import app.fastapi_main  # noqa: F401  installs the jsonable_encoder Decimal encoder
+    from fastapi.encoders import jsonable_encoder
+
+    from app.projections import DEAL, money
+
+    rows = DEAL.render([(1, "Unpriced", None, None, None)], DEAL.list_fields)
+    assert serialization.dumps(rows) == b'[{"id":1,"title":"Unpriced","amount":0.0,"stage":null,"contact_id":null}]'
+    assert jsonable_encoder({"amount": money(None)}) == {"amount": 0.0}
+
+    monkeypatch.setattr(serialization, "EXACT_DECIMALS", True)
+    assert serialization.dumps(DEAL.render([(None,)], ["amount"])) == b'[{"amount":"0.00"}]'
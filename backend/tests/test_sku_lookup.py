@@ -0,0 +1,70 @@
+from sqlalchemy import event, update
+from sqlalchemy.engine import Engine
+
+from app.db import SessionLocal
+from app.main import app
+from app.models.product import Product
+from app.sku_index import SkuIndex, sku_index
+
+
+def _lookup(client, skus):
+    product_reads = []
+
+    def record(conn, cursor, statement, *args):
+        if "FROM product" in statement:
+            product_reads.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        resp = client.post("/inventory/lookup", json={"skus": skus})
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+    assert resp.status_code == 200, resp.data
+    return resp.get_json(), len(product_reads)
+
+
+def test_lookup_reads_a_batch_once_then_serves_it_from_the_index(api_client):
+    skus = [f"LKP-{n:03d}" for n in range(300)]
+    with SessionLocal() as db:
+        db.add_all(Product(name=sku, sku=sku, price=n, stock=n) for n, sku in enumerate(skus))
+        db.commit()
+    sku_index.clear()
+    with app.test_client() as client:
+        body, reads = _lookup(client, skus[::-1] + ["LKP-NONE", skus[0]])
+        assert reads == 1
+        assert [item["sku"] for item in body["items"]] == skus[::-1] and body["missing"] == ["LKP-NONE"]
+        assert body["items"][-1]["stock"] == 0 and body["items"][0]["stock"] == 299
+
+        body, reads = _lookup(client, skus[:10])
+        assert reads == 0 and [item["stock"] for item in body["items"]] == list(range(10))
+
+        # Writes drop exactly the products they touched, once committed
+        client.post("/inventory/reserve", json={"items": [{"sku": skus[5], "quantity": 2}]})
+        product_id = body["items"][7]["id"]
+        client.put(f"/inventory/{product_id}", json={"price": 70})
+        body, reads = _lookup(client, skus[:10])
+        assert reads == 1 and body["items"][5]["stock"] == 3 and float(body["items"][7]["price"]) == 70
+        with SessionLocal() as db:
+            db.execute(update(Product).where(Product.sku == skus[1]).values(stock=99))  # names no ids
+            db.commit()
+        body, reads = _lookup(client, skus[:10])
+        assert reads == 1 and body["items"][1]["stock"] == 99
+
+        assert client.post("/inventory/lookup", json={"skus": "LKP-001"}).status_code == 400
+        assert client.post("/inventory/lookup", json={"skus": [1]}).status_code == 400
+    assert api_client.post("/inventory/lookup", json={"skus": skus[:10]}).json() == body
+
+
+def test_a_fill_read_before_an_invalidation_is_not_stored():
+    now = [0.0]
+    index = SkuIndex(maxsize=2, ttl=10, clock=lambda: now[0])
+    generation = index.generation
+    index.invalidate_products([1])  # a commit lands while the fill is reading
+    index.put_many([(1, "A", "a", 1, 5)], generation)
+    assert index.get_many(["A"]) == ({}, ["A"])
+
+    index.put_many([(1, "A", "a", 1, 5), (2, "B", "b", 1, 5), (3, "C", "c", 1, 5)], index.generation)
+    assert index.get_many(["A", "B", "C"])[1] == ["A"]  # least recently used evicted
+    now[0] = 11
+    assert index.get_many(["B"]) == ({}, ["B"])  # expired
+    assert index.stats()["evictions"] == 1
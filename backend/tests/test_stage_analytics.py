@@ -0,0 +1,114 @@
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from app import stage_analytics
+from app.db import SessionLocal
+from app.main import app
+from app.models.deal import Deal
+from app.models.deal_history import DealStageCompaction, DealStageEvent, DealStageRollup
+
+
+def _compact(db):
+    """Run a pass to the end; None if there was nothing new to fold (no run is recorded then)."""
+    run = stage_analytics.new_run(db)
+    return run and stage_analytics.run_compaction(db, run)
+
+
+def test_every_stage_change_is_logged():
+    with SessionLocal() as db:
+        deal = Deal(title="History deal", amount=100, stage="new")
+        db.add(deal)
+        db.commit()
+        deal.stage = "qualified"
+        db.commit()
+        deal.amount = 150  # no stage change, nothing logged
+        db.commit()
+        db.execute(update(Deal).where(Deal.id == deal.id).values(stage="won"))  # bulk UPDATE
+        db.commit()
+        events = db.execute(select(DealStageEvent.from_stage, DealStageEvent.to_stage, DealStageEvent.amount)
+                            .where(DealStageEvent.deal_id == deal.id).order_by(DealStageEvent.id)).all()
+    assert [(e.from_stage, e.to_stage, float(e.amount)) for e in events] == [
+        (None, "new", 100), ("new", "qualified", 100), ("qualified", "won", 150)]
+
+
+def _events(deal_id, start, *steps):
+    """Events for one deal: (stage, days after `start`) in order."""
+    return [DealStageEvent(deal_id=deal_id, from_stage=previous, to_stage=stage, amount=10,
+                           changed_at=start + timedelta(days=days))
+            for (previous, _), (stage, days) in zip([(None, 0)] + list(steps), steps)]
+
+
+def test_compaction_rolls_up_stays_incrementally(monkeypatch, api_client):
+    monkeypatch.setattr(stage_analytics, "BATCH_EVENTS", 2)
+    start = datetime(2026, 1, 5, 9, 0)
+    first = [("hist-a", 0), ("hist-b", 1)]
+    with SessionLocal() as db:
+        db.add_all(_events(9_000_001, start, *first) + _events(9_000_002, start, ("hist-a", 0))
+                   + _events(9_000_003, start, ("hist-a", 0)))
+        db.commit()
+        _compact(db)
+        # The rest of each history arrives after a pass: stays it closes still count
+        db.add_all(_events(9_000_001, start, *first, ("lost", 3))[2:]
+                   + _events(9_000_002, start, ("hist-a", 0), ("hist-b", 3))[1:]
+                   + _events(9_000_003, start, ("hist-a", 0), ("lost", 2))[1:])
+        db.commit()
+        run = _compact(db)
+        assert run.status == "completed" and run.events == 3 and run.stays >= 3
+        assert _compact(db) is None
+        last_event_id = run.last_event_id
+        runs = db.query(DealStageCompaction).count()
+        rollup = {r.stage: r for r in db.scalars(select(DealStageRollup).where(
+            DealStageRollup.stage.in_(["hist-a", "hist-b"])))}
+    a, b = rollup["hist-a"], rollup["hist-b"]
+    assert (a.entered, a.exited, a.converted, a.stay_seconds) == (3, 3, 2, 6 * 86400)
+    assert (b.entered, b.exited, b.converted, b.entered_age) == (2, 1, 0, 4 * 86400)
+
+    with app.test_client() as client:
+        body = client.get("/deals/analytics").get_json()
+        resp = client.post("/deals/analytics/compact")
+        assert resp.status_code == 200 and resp.get_json() == {"status": "caught_up", "last_event_id": last_event_id}
+    stages = {s["stage"]: s for s in body["stages"]}
+    assert stages["hist-a"]["conversion"] == 0.6667 and stages["hist-a"]["average_days"] == 2
+    assert abs(stages["hist-a"]["median_days"] - 2) < 0.2
+    assert stages["hist-b"]["median_days"] is not None and stages["hist-b"]["current"] == 0
+    assert body["compacted"]["last_event_id"] == last_event_id
+    assert set(body["velocity"]) == {"open_deals", "open_amount", "win_rate", "average_won_amount",
+                                     "average_days_to_win", "per_day"}
+    assert api_client.get("/deals/analytics").json() == body
+    assert api_client.post("/deals/analytics/compact").status_code == 200
+    with SessionLocal() as db:
+        assert db.query(DealStageCompaction).count() == runs  # neither reads nor a caught-up job recorded a run
+
+
+def test_overlapping_compactions_fold_each_event_once(monkeypatch):
+    monkeypatch.setattr(stage_analytics, "BATCH_EVENTS", 1)
+    start = datetime(2026, 2, 2, 9, 0)
+    with SessionLocal() as db:
+        _compact(db)
+        db.add_all([event for deal_id in range(9_000_101, 9_000_111)
+                    for event in _events(deal_id, start, ("overlap-a", 0), ("overlap-b", 1))])
+        db.commit()
+        # Both start from the same position, as two workers' runs would
+        runs = [stage_analytics.new_run(db).id for _ in range(2)]
+
+    def compact(run_id):
+        with SessionLocal() as db:
+            stage_analytics.run_compaction(db, db.get(DealStageCompaction, run_id))
+
+    threads = [threading.Thread(target=compact, args=(run_id,)) for run_id in runs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    with SessionLocal() as db:
+        done = [db.get(DealStageCompaction, run_id) for run_id in runs]
+        assert sum(run.events for run in done) == 20
+        assert {run.status for run in done} <= {"completed", "superseded"}
+        assert "superseded" in {run.status for run in done}
+        rollup = {r.stage: r for r in db.scalars(select(DealStageRollup).where(
+            DealStageRollup.stage.in_(["overlap-a", "overlap-b"])))}
+        assert (rollup["overlap-a"].entered, rollup["overlap-a"].exited, rollup["overlap-b"].entered) == (10, 10, 10)
+        # A run that starts after both have finished finds nothing left
+        assert _compact(db) is None
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app import stock
+from app.db import SessionLocal
+from app.main import app
+from app.models.product import Product
+from app.models.stock_movement import StockMovement
+
+
+def _ledger(product_id):
+    with SessionLocal() as db:
+        return db.execute(select(func.sum(StockMovement.quantity)).where(StockMovement.product_id == product_id)) \
+            .scalar()
+
+
+def test_every_stock_change_is_a_movement():
+    with app.test_client() as client:
+        product = client.post("/inventory/", json={"name": "Ledger", "sku": "LDG-1", "stock": 10}).get_json()
+        product_id = product["id"]
+        assert client.post("/inventory/reserve", json={"items": [{"sku": "LDG-1", "quantity": 3}],
+                                                       "reference": "SO-77"}).status_code == 200
+        client.post("/inventory/release", json={"items": [{"sku": "LDG-1", "quantity": 1}]})
+        resp = client.post("/inventory/movements", json={"product_id": product_id, "kind": "receipt", "quantity": 5})
+        assert resp.status_code == 201 and resp.get_json()["stock"] == 13
+        resp = client.post("/inventory/movements", json={"product_id": product_id, "kind": "adjustment", "quantity": -2})
+        assert resp.get_json()["quantity"] == -2 and resp.get_json()["stock"] == 11
+        resp = client.post("/inventory/movements", json={"product_id": product_id, "kind": "sale", "quantity": 50})
+        assert resp.status_code == 409 and resp.get_json()["shortages"][0]["available"] == 11
+        assert client.post("/inventory/movements", json={"product_id": product_id, "kind": "theft",
+                                                         "quantity": 1}).status_code == 400
+        assert client.post("/inventory/movements", json={"product_id": 999999, "kind": "receipt",
+                                                         "quantity": 1}).status_code == 404
+        assert client.put(f"/inventory/{product_id}", json={"stock": 20}).get_json()["stock"] == 20
+
+        movements = client.get(f"/inventory/{product_id}/movements").get_json()
+        assert [(m["kind"], m["quantity"]) for m in movements] == [
+            ("adjustment", 9), ("adjustment", -2), ("receipt", 5), ("return", 1), ("sale", -3), ("receipt", 10)]
+        assert movements[4]["reference"] == "SO-77"
+    assert _ledger(product_id) == 20
+
+
+def test_stock_as_of_reads_a_snapshot_and_the_movements_after_it(api_client):
+    start = datetime(2026, 3, 1, 12, 0)
+    with SessionLocal() as db:
+        product = Product(name="History", sku="LDG-HIST", price=1, stock=0)
+        db.add(product)
+        db.commit()
+        product_id = product.id
+
+        def move(day, quantity):
+            db.add(StockMovement(product_id=product_id, kind="adjustment", quantity=quantity,
+                                 created_at=start + timedelta(days=day)))
+            db.commit()
+
+        for day, quantity in ((0, 100), (1, -10), (2, -20)):
+            move(day, quantity)
+        stock.take_snapshots(db)
+        for day, quantity in ((3, 5), (4, -1), (5, -4)):
+            move(day, quantity)
+        assert stock.take_snapshots(db)["products"] >= 1
+        move(6, 50)
+
+        expected = {-1: 0, 0: 100, 1: 90, 2: 70, 3: 75, 4: 74, 5: 70, 6: 120}
+        for day, on_hand in expected.items():
+            body = stock.stock_as_of(db, product_id, start + timedelta(days=day, hours=1))
+            assert body["stock"] == on_hand, day
+            assert body["movements_read"] <= 2  # at most those between two snapshots, never the history
+        assert stock.stock_as_of(db, product_id, start + timedelta(days=2, hours=1))["snapshot"]["movement_id"]
+
+    with app.test_client() as client:
+        body = client.get(f"/inventory/{product_id}/stock?as_of=2026-03-04").get_json()
+        assert body["stock"] == 75 and body["movements_read"] == 1  # the end of that day
+        assert client.get(f"/inventory/{product_id}/stock?as_of=yesterday").status_code == 400
+        assert client.get("/inventory/999999/stock?as_of=2026-03-04").status_code == 404
+    assert api_client.get(f"/inventory/{product_id}/stock?as_of=2026-03-04").json() == body
+
+
+def test_stock_as_of_reads_only_up_to_the_next_snapshot():
+    start = datetime(2025, 6, 1, 12, 0)
+    with SessionLocal() as db:
+        product = Product(name="Far Back", sku="LDG-BACK", price=1, stock=0)
+        db.add(product)
+        db.commit()
+        product_id = product.id
+
+        def move(day, quantity):
+            db.add(StockMovement(product_id=product_id, kind="adjustment", quantity=quantity,
+                                 created_at=start + timedelta(days=day)))
+            db.commit()
+
+        cuts = []
+        for day in range(12):
+            move(day, 10 + day)
+            if day % 3 == 2:
+                stock.take_snapshots(db)
+                cuts.append(db.execute(select(func.max(StockMovement.id))).scalar())
+        # A row dated before later snapshots but written after them: only a scan running on past
+        # the next snapshot would see it
+        move(0, 1000)
+
+        for day in range(11):
+            body = stock.stock_as_of(db, product_id, start + timedelta(days=day, hours=1))
+            assert body["stock"] == sum(10 + d for d in range(day + 1)), day
+            assert body["movements_read"] == (day + 1) % 3, day
+        # after the last snapshot nothing closes the range, so the late row is counted
+        body = stock.stock_as_of(db, product_id, start + timedelta(days=11, hours=1))
+        assert (body["stock"], body["movements_read"]) == (sum(10 + d for d in range(12)) + 1000, 1)
+        upto = db.execute(stock.next_snapshot_statement(product_id, start + timedelta(days=4, hours=1))).scalar()
+        assert upto == cuts[1]